@@ -0,0 +1,138 @@
+import base64
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import F, Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Постраничная выдача по ключу (keyset/cursor) вместо OFFSET.
+
+    Сортировка берётся из queryset (её выставляет OrderingFilter) и
+    дополняется id для однозначности: (price, id), (-name, -id) и т.п.
+    Курсор хранит значения этой пары у крайней строки страницы, а
+    следующая страница выбирается условием
+
+        price >= v AND (price > v OR id > last_id) ORDER BY price, id LIMIT n
+
+    которое PostgreSQL выполняет диапазонным сканированием индекса
+    (price, id), поэтому страница 10 000 стоит столько же, сколько первая.
+    Для сортируемых полей нужны составные индексы с id.
+    """
+    page_size = 50
+    max_page_size = 500
+    page_size_query_param = 'page_size'
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Неверный курсор'
+
+    # значение поля сортировки кладётся в аннотацию: при ?fields=
+    # само поле может быть отложено через .only()
+    value_attr = '_keyset_value'
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(size, 1), self.max_page_size)
+
+    def get_ordering(self, queryset, view):
+        ordering = ([f for f in queryset.query.order_by if isinstance(f, str)]
+                    or getattr(view, 'ordering', None) or ['pk'])[0]
+        field = ordering.lstrip('-')
+        if field in ('id', 'pk'):
+            field = 'pk'
+        return field, ordering.startswith('-')
+
+    def encode_cursor(self, value, pk, reverse):
+        payload = json.dumps({'v': value, 'id': pk, 'r': reverse}, default=str, separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii')
+
+    def decode_cursor(self, request):
+        raw = request.query_params.get(self.cursor_query_param)
+        if not raw:
+            return None
+        try:
+            data = json.loads(base64.urlsafe_b64decode(raw.encode('ascii')))
+            return data['v'], int(data['id']), bool(data['r'])
+        except (ValueError, TypeError, KeyError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.field, self.descending = self.get_ordering(queryset, view)
+        cursor = self.decode_cursor(request)
+        # reverse — идём к предыдущей странице: сортировка разворачивается,
+        # а результат переворачивается обратно
+        self.reverse = cursor[2] if cursor else False
+        descending = self.descending != self.reverse
+
+        prefix = '-' if descending else ''
+        queryset = queryset.annotate(**{self.value_attr: F(self.field)}).order_by(
+            f'{prefix}{self.field}', f'{prefix}pk'
+        )
+        if cursor:
+            value, pk, _ = cursor
+            if self.field == 'pk':
+                condition = Q(pk__lt=pk) if descending else Q(pk__gt=pk)
+            elif descending:
+                condition = Q(**{f'{self.field}__lte': value}) & (
+                    Q(**{f'{self.field}__lt': value}) | Q(pk__lt=pk))
+            else:
+                condition = Q(**{f'{self.field}__gte': value}) & (
+                    Q(**{f'{self.field}__gt': value}) | Q(pk__gt=pk))
+            try:
+                rows = list(queryset.filter(condition)[:self.page_size + 1])
+            except (ValueError, TypeError, ValidationError):
+                raise NotFound(self.invalid_cursor_message)
+        else:
+            rows = list(queryset[:self.page_size + 1])
+
+        self.has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if self.reverse:
+            rows.reverse()
+        self.has_cursor = cursor is not None
+        self.page = rows
+        return rows
+
+    def _link(self, obj, reverse):
+        value = getattr(obj, self.value_attr)
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(value, obj.pk, reverse))
+
+    def get_next_link(self):
+        # вперёд можно идти, если за страницей есть строки или мы пришли назад
+        if not self.page or not (self.reverse or self.has_more):
+            return None
+        return self._link(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        # назад можно идти, если мы пришли по курсору или перед страницей есть строки
+        if not self.page or not (self.has_more if self.reverse else self.has_cursor):
+            return None
+        return self._link(self.page[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
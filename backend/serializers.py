@@ -0,0 +1,40 @@
+from rest_framework import serializers
+
+
+class SparseFieldsetMixin:
+    """
+    Поддержка ?fields=id,name,price: сериализатор отдаёт только
+    перечисленные поля, а model_paths() подсказывает view, какие
+    колонки загрузить через .only().
+    """
+    fields_query_param = 'fields'
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        requested = self.requested_fields(self.context.get('request'))
+        if requested:
+            for name in set(self.fields) - requested:
+                self.fields.pop(name)
+
+    @classmethod
+    def requested_fields(cls, request):
+        if request is None:
+            return None
+        raw = request.query_params.get(cls.fields_query_param)
+        if not raw:
+            return None
+        requested = {name.strip() for name in raw.split(',') if name.strip()}
+        unknown = requested - set(cls.Meta.fields)
+        if unknown:
+            raise serializers.ValidationError(
+                {cls.fields_query_param: f"Неизвестные поля: {', '.join(sorted(unknown))}"}
+            )
+        return requested
+
+    @classmethod
+    def model_paths(cls, names):
+        """
+        Пути моделей для .only(): source='shop.name' -> 'shop__name'.
+        """
+        fields = cls().fields
+        return [fields[name].source.replace('.', '__') for name in names]
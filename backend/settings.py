@@ -38,6 +38,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'users',
     'orders',
     'products',
@@ -48,7 +49,7 @@ INSTALLED_APPS = [
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'users.authentication.CachedJWTAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
@@ -141,6 +142,90 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 
+# Загруженные файлы (прайсы поставщиков для фонового импорта)
+MEDIA_URL = 'media/'
+MEDIA_ROOT = BASE_DIR / 'media'
+
+# Кэш сжатых выгрузок прайсов (см. shops.services.export_cache)
+SHOP_EXPORT_CACHE_ROOT = BASE_DIR / 'export_cache'
+
+# Кэш ответов каталога (см. products.services.catalog_cache):
+# catalog_local — LRU в памяти процесса, catalog — общий уровень в Redis.
+# Без CATALOG_CACHE_URL общий уровень тоже живёт в памяти процесса.
+# Под кэш каталога нужна отдельная база Redis: clear() очищает её целиком
+CATALOG_CACHE_URL = os.getenv('CATALOG_CACHE_URL')
+CATALOG_CACHE_TIMEOUT = int(os.getenv('CATALOG_CACHE_TIMEOUT', 300))
+# Кэш аутентификации (см. users.services.auth_cache): проверенные claims
+# JWT и снимки пользователей. auth_local — LRU в памяти процесса, снимок
+# живёт в нём не дольше AUTH_CACHE_LOCAL_TIMEOUT секунд после изменения
+# пользователя в другом процессе; auth — общий уровень в Redis.
+AUTH_CACHE_URL = os.getenv('AUTH_CACHE_URL')
+AUTH_CACHE_TIMEOUT = int(os.getenv('AUTH_CACHE_TIMEOUT', 300))
+AUTH_CACHE_LOCAL_TIMEOUT = int(os.getenv('AUTH_CACHE_LOCAL_TIMEOUT', 5))
+# Кэш наличия (см. products.services.availability): остатки, цены и
+# активность товаров и магазинов для проверок корзины и оформления.
+# availability_local — near-cache процесса на AVAILABILITY_LOCAL_TIMEOUT
+# секунд, availability — общий уровень в Redis, куда пишутся новые
+# значения после каждого списания, импорта и смены магазина.
+AVAILABILITY_CACHE_URL = os.getenv('AVAILABILITY_CACHE_URL')
+AVAILABILITY_CACHE_TIMEOUT = int(os.getenv('AVAILABILITY_CACHE_TIMEOUT', 300))
+AVAILABILITY_LOCAL_TIMEOUT = float(os.getenv('AVAILABILITY_LOCAL_TIMEOUT', 1))
+# Общие для всех процессов флаги фоновых задач (например, «разбор
+# очереди писем уже запланирован», см. users.tasks.schedule_flush).
+# Без LOCK_CACHE_URL флаг живёт в памяти процесса и действует только в нём.
+LOCK_CACHE_URL = os.getenv('LOCK_CACHE_URL')
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'catalog': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': CATALOG_CACHE_URL,
+    } if CATALOG_CACHE_URL else {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'catalog',
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+    'catalog_local': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'catalog-local',
+        'OPTIONS': {'MAX_ENTRIES': 1000},
+    },
+    'auth': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': AUTH_CACHE_URL,
+    } if AUTH_CACHE_URL else {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'auth',
+        'OPTIONS': {'MAX_ENTRIES': 100000},
+    },
+    'auth_local': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'auth-local',
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+    'availability': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': AVAILABILITY_CACHE_URL,
+    } if AVAILABILITY_CACHE_URL else {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'availability',
+        'OPTIONS': {'MAX_ENTRIES': 100000},
+    },
+    'availability_local': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'availability-local',
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+    'locks': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': LOCK_CACHE_URL,
+    } if LOCK_CACHE_URL else {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'locks',
+    },
+}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -153,6 +238,20 @@ SIMPLE_JWT = {
 
 CELERY_BROKER_URL = 'redis://redis:6379'
 CELERY_RESULT_BACKEND = 'redis://redis:6379'
+# CELERY_TASK_ALWAYS_EAGER=1 выполняет задачи прямо в процессе (локальная отладка без воркера)
+CELERY_TASK_ALWAYS_EAGER = os.getenv('CELERY_TASK_ALWAYS_EAGER') == '1'
+# периодические задачи (celery -A backend beat)
+CELERY_BEAT_SCHEDULE = {
+    'expire-stock-reservations': {
+        'task': 'orders.tasks.expire_stock_reservations',
+        'schedule': int(os.getenv('RESERVATION_SWEEP_INTERVAL', 60)),
+    },
+}
+
+# резерв товара в корзине: сколько секунд держится после последнего
+# добавления и сколько истёкших резервов снимается за одну транзакцию
+CART_RESERVATION_TTL = int(os.getenv('CART_RESERVATION_TTL', 900))
+RESERVATION_SWEEP_BATCH_SIZE = int(os.getenv('RESERVATION_SWEEP_BATCH_SIZE', 5000))
 
 EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
 EMAIL_HOST = 'smtp.mail.ru'
@@ -162,3 +261,18 @@ EMAIL_HOST_PASSWORD = os.getenv('EMAIL_HOST_PASSWORD')
 EMAIL_USE_SSL = True
 DEFAULT_FROM_EMAIL = EMAIL_HOST_USER
 
+EMAIL_TIMEOUT = int(os.getenv('EMAIL_TIMEOUT', 30))
+
+# Очередь исходящих писем (см. users.services.mail): письма уходят
+# пачками по EMAIL_BATCH_SIZE через одно SMTP-соединение, не чаще
+# EMAIL_RATE_LIMIT писем в секунду на воркер (0 — без ограничения).
+# Разбор очереди запускается через EMAIL_FLUSH_DELAY секунд после
+# первого письма, неотправленные письма повторяются через
+# EMAIL_RETRY_DELAY секунд с удвоением, до EMAIL_MAX_ATTEMPTS попыток.
+EMAIL_BATCH_SIZE = int(os.getenv('EMAIL_BATCH_SIZE', 100))
+EMAIL_RATE_LIMIT = float(os.getenv('EMAIL_RATE_LIMIT', 0))
+EMAIL_FLUSH_DELAY = int(os.getenv('EMAIL_FLUSH_DELAY', 2))
+EMAIL_RETRY_DELAY = int(os.getenv('EMAIL_RETRY_DELAY', 60))
+EMAIL_MAX_ATTEMPTS = int(os.getenv('EMAIL_MAX_ATTEMPTS', 5))
+# Кому отправлять копию подтверждения заказа, через запятую
+ORDER_NOTIFY_EMAILS = [email.strip() for email in os.getenv('ORDER_NOTIFY_EMAILS', '').split(',') if email.strip()]
@@ -21,7 +21,7 @@ from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 
 from orders.views import CartViewSet, OrderViewSet, ShopOrderViewSet
 from products.views import ProductViewSet
-from shops.views import SupplierFeedUpload, ShopToggleAvailability, ShopExportView
+from shops.views import SupplierFeedUpload, FeedImportJobDetail, ShopToggleAvailability, ShopExportView
 from users.views import RegisterAPIView, EmailTokenObtainPairView, DeliveryContactViewSet
 
 router = DefaultRouter()
@@ -45,6 +45,8 @@ urlpatterns = [
 
     # For suppliers: upload file
     path('api/suppliers/upload-feed/', SupplierFeedUpload.as_view(), name='supplier_feed_upload'),
+    # For suppliers: feed import progress
+    path('api/suppliers/import-jobs/<int:pk>/', FeedImportJobDetail.as_view(), name='feed_import_job'),
     # For suppliers: toggle store availability
     path('api/shops/<int:pk>/availability/', ShopToggleAvailability.as_view(), name='shop_availability'),
     # For suppliers: export products from db to yaml
@@ -0,0 +1,116 @@
+"""
+Бенчмарк аутентификации по JWT: CPU-время и SQL-запросы на один
+вызов authenticate() и на запрос к API поставщика.
+
+- legacy       — JWTAuthentication: проверка подписи и чтение User;
+- cold         — CachedJWTAuthentication с пустым кэшем;
+- shared hit   — claims и снимок из общего уровня (локальный очищен);
+- local hit    — claims и снимок из LRU процесса.
+
+Общий уровень по умолчанию в памяти процесса; с --redis-url он
+работает через Redis, как в docker-compose (AUTH_CACHE_URL).
+
+    python -m benchmarks.auth_cache [--repeat 2000] [--redis-url redis://localhost:6379/2]
+"""
+import argparse
+import logging
+import time
+from unittest import mock
+
+from benchmarks.utils import median, print_table, setup_django, test_database
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--repeat', type=int, default=2000)
+    parser.add_argument('--redis-url')
+    args = parser.parse_args()
+
+    setup_django()
+    from django.conf import settings
+    from django.db import connection
+    from django.test.utils import override_settings
+    from django.urls import reverse
+    from rest_framework.test import APIClient, APIRequestFactory
+    from rest_framework.request import Request
+    from rest_framework.views import APIView
+    from rest_framework_simplejwt.authentication import JWTAuthentication
+    from rest_framework_simplejwt.tokens import AccessToken
+
+    from orders.tests.factories import make_orders, make_products, make_shop, make_user
+    from users.authentication import CachedJWTAuthentication
+    from users.services.auth_cache import auth_cache
+
+    caches = dict(settings.CACHES)
+    if args.redis_url:
+        caches['auth'] = {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': args.redis_url}
+
+    with override_settings(CACHES=caches), test_database():
+        shop = make_shop('Бенчмарк', 'supplier@example.com')
+        make_orders(make_user('buyer@example.com'), make_products(shop, 2), 100)
+        supplier = shop.supplier.user
+        token = str(AccessToken.for_user(supplier))
+        request = Request(APIRequestFactory().get('/', HTTP_AUTHORIZATION=f'Bearer {token}'))
+
+        def count(counter):
+            def wrapper(execute, sql, params, many, context):
+                counter['queries'] += 1
+                return execute(sql, params, many, context)
+            return wrapper
+
+        def measure(call, before=None):
+            counter = {'queries': 0}
+            cpu = wall = 0.0
+            with connection.execute_wrapper(count(counter)):
+                for _ in range(args.repeat):
+                    if before:
+                        before()
+                    cpu_start, wall_start = time.process_time(), time.perf_counter()
+                    call()
+                    cpu += time.process_time() - cpu_start
+                    wall += time.perf_counter() - wall_start
+            return counter['queries'] / args.repeat, cpu / args.repeat * 1e6, wall / args.repeat * 1e6
+
+        legacy, cached = JWTAuthentication(), CachedJWTAuthentication()
+        runs = [
+            ('legacy', lambda: legacy.authenticate(request), None),
+            ('cold', lambda: cached.authenticate(request), auth_cache.clear),
+            ('shared hit', lambda: cached.authenticate(request), auth_cache.local.clear),
+            ('local hit', lambda: cached.authenticate(request), None),
+        ]
+        rows = []
+        for name, call, before in runs:
+            auth_cache.clear()
+            queries, cpu_us, wall_us = measure(call, before)
+            rows.append([name, f'{queries:.0f}', f'{cpu_us:.0f}', f'{wall_us:.0f}'])
+        print('authenticate()')
+        print_table(['engine', 'queries', 'cpu us', 'wall us'], rows)
+
+        # upload-feed без файла отвечает 400 — не шумим в лог
+        logging.getLogger('django.request').setLevel(logging.ERROR)
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        endpoints = [('upload-feed (400)', 'post', reverse('supplier_feed_upload')),
+                     ('shop-orders/summary', 'get', reverse('shop-orders-summary'))]
+        rows = []
+        for label, method, url in endpoints:
+            for name, auth_class in (('legacy', JWTAuthentication), ('cached', CachedJWTAuthentication)):
+                auth_cache.clear()
+                getattr(client, method)(url)
+                counter = {'queries': 0}
+                timings = []
+                with mock.patch.object(APIView, 'authentication_classes', [auth_class]), \
+                        connection.execute_wrapper(count(counter)):
+                    for _ in range(args.repeat // 10):
+                        start = time.perf_counter()
+                        response = getattr(client, method)(url)
+                        timings.append(time.perf_counter() - start)
+                assert response.status_code in (200, 400), response.status_code
+                rows.append([label, name, f'{counter["queries"] / len(timings):.0f}',
+                             f'{median(timings) * 1000:.2f}'])
+        print('\nAPI')
+        print_table(['endpoint', 'auth', 'queries', 'median ms'], rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+"""
+Нагрузочный тест добавления в корзину при ажиотажном спросе: --users
+покупателей (по умолчанию 1000) одновременно добавляют в свои корзины
+товары из --skus «горячих» позиций (по умолчанию 10), по --adds раз
+каждый. Запросы идут через API из пула --workers потоков, каждый со
+своим соединением с БД; все стартуют одновременно.
+
+- db    — проверки корзины читают товар и магазин из PostgreSQL;
+- cache — кэш наличия: near-cache процесса и общий уровень.
+
+Для каждого режима — запросов в секунду, p50/p99/max ответа и чтений
+products_product на запрос. Общий уровень по умолчанию в памяти
+процесса; с --redis-url он работает через Redis (AVAILABILITY_CACHE_URL).
+
+    python -m benchmarks.cart_availability [--users 1000] [--skus 10] [--adds 3] [--workers 100]
+                                           [--redis-url redis://localhost:6379/3]
+"""
+import argparse
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+from benchmarks.utils import percentile, print_table, setup_django, test_database, timer
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--skus', type=int, default=10)
+    parser.add_argument('--adds', type=int, default=3)
+    parser.add_argument('--workers', type=int, default=100)
+    parser.add_argument('--redis-url')
+    args = parser.parse_args()
+
+    setup_django()
+    from django.conf import settings
+    from django.contrib.auth import get_user_model
+    from django.db import connection
+    from django.test.utils import override_settings
+    from django.urls import reverse
+    from rest_framework.test import APIClient
+
+    from orders.models import Cart, CartItem
+    from orders.tests.factories import make_products, make_shop
+    from products.services.availability import availability_cache
+
+    caches = dict(settings.CACHES)
+    if args.redis_url:
+        caches['availability'] = {'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+                                  'LOCATION': args.redis_url}
+
+    with override_settings(CACHES=caches), test_database():
+        User = get_user_model()
+        products = make_products(make_shop('Бенчмарк'), args.skus, quantity=10_000_000)
+        users = User.objects.bulk_create([
+            User(username=f'buyer{i}@example.com', email=f'buyer{i}@example.com') for i in range(args.users)
+        ])
+        url = reverse('cart-add-item')
+
+        def run():
+            lock = threading.Lock()
+            timings, reads = [], [0]
+            barrier = threading.Barrier(min(args.workers, args.users))
+
+            def count_reads(execute, sql, params, many, context):
+                if 'FROM "products_product"' in sql:
+                    with lock:
+                        reads[0] += 1
+                return execute(sql, params, many, context)
+
+            def shop(user):
+                rng = random.Random(user.pk)
+                client = APIClient()
+                client.force_authenticate(user)
+                local = []
+                try:
+                    try:
+                        barrier.wait(timeout=10)
+                    except threading.BrokenBarrierError:
+                        pass
+                    with connection.execute_wrapper(count_reads):
+                        for _ in range(args.adds):
+                            product = rng.choice(products)
+                            with timer() as t:
+                                response = client.post(url, {'product_id': product.pk, 'quantity': 1})
+                            assert response.status_code == 201, response.data
+                            local.append(t['seconds'] * 1000)
+                finally:
+                    connection.close()
+                with lock:
+                    timings.extend(local)
+
+            with timer() as total, ThreadPoolExecutor(max_workers=args.workers) as pool:
+                list(pool.map(shop, users))
+            return timings, reads[0], total['seconds']
+
+        rows = []
+        for mode in ('db', 'cache'):
+            CartItem.objects.all().delete()
+            Cart.objects.all().delete()
+            availability_cache.clear()
+            if mode == 'db':
+                with mock.patch.object(availability_cache, '_get_many', side_effect=lambda keys: {}), \
+                        mock.patch.object(availability_cache, '_set_many'):
+                    timings, reads, seconds = run()
+            else:
+                timings, reads, seconds = run()
+            rows.append([mode, len(timings), f'{len(timings) / seconds:.0f}',
+                         f'{percentile(timings, 50):.1f}', f'{percentile(timings, 99):.1f}',
+                         f'{max(timings):.1f}', f'{reads / len(timings):.2f}'])
+        print(f'{args.users} покупателей, {args.skus} товаров, {args.workers} потоков')
+        print_table(['mode', 'requests', 'req/s', 'p50 ms', 'p99 ms', 'max ms', 'product reads/req'], rows)
+        print(availability_cache.stats())
+
+
+if __name__ == '__main__':
+    main()
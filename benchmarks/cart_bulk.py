@@ -0,0 +1,69 @@
+"""
+Бенчмарк наполнения корзины: заявка на 10/100/300 строк построчными
+POST /api/cart/items/ против одного POST /api/cart/items/bulk/ —
+число HTTP-запросов, SQL-запросов и общее время.
+
+    python -m benchmarks.cart_bulk [--sizes 10 100 300] [--repeat 3]
+"""
+import argparse
+
+from benchmarks.utils import median, print_table, setup_django, test_database, timer
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 100, 300])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.db import connection
+    from django.urls import reverse
+    from rest_framework.test import APIClient
+
+    from orders.models import Cart
+    from orders.tests.factories import make_products, make_shop, make_user
+
+    with test_database():
+        products = make_products(make_shop('Бенчмарк'), max(args.sizes))
+        user = make_user('buyer@example.com')
+        client = APIClient()
+        client.force_authenticate(user)
+
+        def single(lines):
+            for line in lines:
+                response = client.post(reverse('cart-add-item'), line)
+                assert response.status_code == 201, response.data
+            return len(lines)
+
+        def bulk(lines):
+            response = client.post(reverse('cart-bulk-update'), {'items': lines}, format='json')
+            assert response.status_code == 200, response.data
+            return 1
+
+        def count(counter):
+            def wrapper(execute, sql, params, many, context):
+                counter['queries'] += 1
+                return execute(sql, params, many, context)
+            return wrapper
+
+        rows = []
+        for size in args.sizes:
+            lines = [{'product_id': product.pk, 'quantity': 2} for product in products[:size]]
+            for name, func in (('single', single), ('bulk', bulk)):
+                results = []
+                for _ in range(args.repeat):
+                    Cart.objects.filter(user=user).delete()
+                    counter = {'queries': 0}
+                    with connection.execute_wrapper(count(counter)), timer() as t:
+                        requests = func(lines)
+                    results.append((requests, counter['queries'], t['seconds']))
+                requests, queries, _ = results[0]
+                ms = median([seconds for *_, seconds in results]) * 1000
+                rows.append([size, name, requests, queries, f'{ms:.1f}'])
+
+        print_table(['lines', 'api', 'http', 'queries', 'median ms'], rows)
+
+
+if __name__ == '__main__':
+    main()
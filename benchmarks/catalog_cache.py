@@ -0,0 +1,95 @@
+"""
+Бенчмарк кэша ответов каталога: задержка GET /api/products/ (первая
+страница, поиск, фасеты категории) и карточки товара на 100k товаров
+при промахе, попадании в общий уровень и в локальный LRU.
+
+Общий уровень по умолчанию в памяти процесса; с --redis-url он
+работает через Redis, как в docker-compose (CATALOG_CACHE_URL).
+
+    python -m benchmarks.catalog_cache [--size 100000] [--repeat 50] [--redis-url redis://localhost:6379/1]
+"""
+import argparse
+
+from benchmarks.utils import percentile, print_table, setup_django, test_database, timer
+
+
+def fill_catalog(shop, size, chunk=20_000):
+    from django.db import connection
+
+    from products.models import Category, Product
+
+    categories = [Category.objects.create(external_id=i, name=f'Категория {i}') for i in range(20)]
+    for start in range(0, size, chunk):
+        Product.objects.bulk_create([
+            Product(
+                external_id=i, category=categories[i % 20], shop=shop, model=f'model-{i}',
+                name=f'Смартфон {i}' if i % 10 == 0 else f'Товар {i}', description='Описание товара ' * 10,
+                characteristics={'Цвет': ('черный', 'белый')[i % 2], 'Память (Гб)': 64 << (i % 4)},
+                price=1000 + i * 31 % 5000, price_rrc=1200, quantity=i % 100,
+            )
+            for i in range(start, min(start + chunk, size))
+        ])
+    with connection.cursor() as cursor:
+        cursor.execute('VACUUM ANALYZE products_product')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--size', type=int, default=100_000)
+    parser.add_argument('--repeat', type=int, default=50)
+    parser.add_argument('--redis-url')
+    args = parser.parse_args()
+
+    setup_django()
+    from django.conf import settings
+    from django.test.utils import override_settings
+    from django.urls import reverse
+    from rest_framework.test import APIClient
+
+    from orders.tests.factories import make_shop, make_user
+    from products.models import Product
+    from products.services.catalog_cache import catalog_cache
+
+    caches = dict(settings.CACHES)
+    if args.redis_url:
+        caches['catalog'] = {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': args.redis_url}
+
+    with override_settings(CACHES=caches), test_database():
+        fill_catalog(make_shop('Бенчмарк', 'supplier@example.com'), args.size)
+        client = APIClient()
+        client.force_authenticate(make_user('buyer@example.com'))
+        list_url = reverse('products-list')
+        requests = [
+            ('список, 50 строк', list_url, {'page_size': 50}),
+            ('поиск «смартфон»', list_url, {'search': 'смартфон', 'page_size': 50}),
+            ('фасеты категории', reverse('products-facets'), {'category': 7}),
+            ('карточка', reverse('products-detail', args=[Product.objects.order_by('pk').values_list('pk', flat=True)[500]]), {}),
+        ]
+
+        def measure(url, params, before, expected):
+            times = []
+            for _ in range(args.repeat):
+                before()
+                with timer() as t:
+                    response = client.get(url, params)
+                assert response.status_code == 200 and response['X-Cache'] == expected, response['X-Cache']
+                times.append(t['seconds'] * 1000)
+            return f'{percentile(times, 50):.2f}', f'{percentile(times, 99):.2f}'
+
+        catalog_cache.clear()
+        rows = []
+        for label, url, params in requests:
+            for expected, before in [
+                ('MISS', catalog_cache.clear),
+                ('HIT-SHARED', catalog_cache.local.clear),
+                ('HIT-LOCAL', lambda: None),
+            ]:
+                rows.append([label, expected, *measure(url, params, before, expected)])
+        catalog_cache.clear()
+
+        print_table(['запрос', 'кэш', 'p50 ms', 'p99 ms'], rows)
+        print('shared tier:', 'redis' if args.redis_url else 'locmem', '|', catalog_cache.stats())
+
+
+if __name__ == '__main__':
+    main()
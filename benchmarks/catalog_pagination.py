@@ -0,0 +1,110 @@
+"""
+Бенчмарк постраничной выдачи каталога: задержка GET /api/products/
+на первой и на глубокой странице (по умолчанию 10 000-й при 50 строках
+на странице) для keyset-пагинации и для прежнего LIMIT/OFFSET.
+
+    python -m benchmarks.catalog_pagination [--size 1000000] [--page 10000] [--page-size 50] [--repeat 5]
+"""
+import argparse
+
+from benchmarks.utils import median, print_table, setup_django, test_database, timer
+
+
+def fill_catalog(shop, size, chunk=20_000):
+    from django.db import connection
+
+    from products.models import Category, Product
+
+    category = Category.objects.create(external_id=1, name='Категория')
+    for start in range(0, size, chunk):
+        Product.objects.bulk_create([
+            Product(
+                external_id=i, category=category, shop=shop, model=f'model-{i}',
+                name=f'Товар {i * 7919 % size:07d}', description='Описание товара ' * 10,
+                characteristics={'Цвет': 'чёрный', 'Память (Гб)': 128},
+                price=1000 + i * 31 % 5000, price_rrc=1200, quantity=i % 100,
+            )
+            for i in range(start, min(start + chunk, size))
+        ])
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE products_product')
+
+
+def deep_cursor(ordering, offset):
+    """
+    Курсор, указывающий на строку перед offset, — как если бы клиент
+    дошёл до этой страницы по ссылкам next.
+    """
+    from backend.pagination import KeysetPagination
+    from products.models import Product
+
+    field = ordering.lstrip('-')
+    prefix = '-' if ordering.startswith('-') else ''
+    row = (Product.objects.filter(is_active=True)
+           .order_by(f'{prefix}{field}', f'{prefix}pk')
+           .values_list(field, 'pk')[offset - 1])
+    return KeysetPagination().encode_cursor(row[0], row[1], False)
+
+
+def offset_page(ordering, offset, page_size):
+    """
+    Прежний путь: та же сериализация, но страница выбирается через OFFSET.
+    """
+    from products.models import Product
+    from products.serializers import ProductSerializer
+
+    prefix = '-' if ordering.startswith('-') else ''
+    queryset = (Product.objects.select_related('shop', 'category').filter(is_active=True)
+                .order_by(ordering, f'{prefix}pk')[offset:offset + page_size])
+    return ProductSerializer(queryset, many=True).data
+
+
+def measure(func, repeat):
+    times = []
+    for _ in range(repeat):
+        with timer() as t:
+            func()
+        times.append(t['seconds'] * 1000)
+    return median(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--size', type=int, default=1_000_000)
+    parser.add_argument('--page', type=int, default=10_000)
+    parser.add_argument('--page-size', type=int, default=50)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.urls import reverse
+    from rest_framework.test import APIClient
+
+    from orders.tests.factories import make_shop, make_user
+
+    with test_database():
+        fill_catalog(make_shop('Бенчмарк', 'supplier@example.com'), args.size)
+        client = APIClient()
+        client.force_authenticate(make_user('buyer@example.com'))
+        url = reverse('products-list')
+        offset = (args.page - 1) * args.page_size
+
+        rows = []
+        for ordering in ('price', '-name', 'quantity'):
+            params = {'ordering': ordering, 'page_size': args.page_size}
+            cursor = deep_cursor(ordering, offset)
+            for label, func in [
+                ('keyset, page 1', lambda: client.get(url, params)),
+                (f'keyset, page {args.page}', lambda: client.get(url, {**params, 'cursor': cursor})),
+                (f'keyset, page {args.page}, ?fields=id,name,price',
+                 lambda: client.get(url, {**params, 'cursor': cursor, 'fields': 'id,name,price'})),
+                ('offset, page 1', lambda: offset_page(ordering, 0, args.page_size)),
+                (f'offset, page {args.page}', lambda: offset_page(ordering, offset, args.page_size)),
+            ]:
+                rows.append([args.size, ordering, label, f'{measure(func, args.repeat):.1f}'])
+
+        print_table(['products', 'ordering', 'page', 'median ms'], rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+"""
+Бенчмарк оформления заказа: число запросов и время для корзин
+на 10/100/1000 позиций — прежний построчный алгоритм против CheckoutService.
+
+    python -m benchmarks.checkout [--sizes 10 100 1000] [--shops 5] [--repeat 3]
+"""
+import argparse
+from collections import defaultdict
+
+from benchmarks.utils import median, print_table, setup_django, test_database, timer
+
+
+def legacy_checkout(user, cart, contact):
+    """
+    Прежняя реализация OrderViewSet.confirm: INSERT на каждую позицию,
+    пересчёт сумм через calculate_total() и UPDATE остатка по каждой строке.
+    """
+    from django.db.models import F
+
+    from orders.models import Order, ShopOrder, ShopOrderItem
+    from products.models import Product
+
+    order = Order.objects.create(user=user, delivery_contact=contact,
+                                 status=Order.STATUS_NEW, total_amount=0)
+    by_shop = defaultdict(list)
+    for ci in cart.items.select_related('product__shop'):
+        by_shop[ci.product.shop].append(ci)
+    for shop, items in by_shop.items():
+        so = ShopOrder.objects.create(order=order, shop=shop,
+                                      status=ShopOrder.STATUS_NEW, total_amount=0)
+        for ci in items:
+            ShopOrderItem.objects.create(shop_order=so, product=ci.product,
+                                         quantity=ci.quantity, unit_price=ci.unit_price)
+        so.calculate_total()
+    order.calculate_total()
+    for so in order.shop_orders.all():
+        for item in so.items.all():
+            Product.objects.filter(pk=item.product_id).update(quantity=F('quantity') - item.quantity)
+    cart.items.all().delete()
+    return order
+
+
+class Rollback(Exception):
+    pass
+
+
+def measure(func, user, cart, contact):
+    from django.db import connection, transaction
+    from django.test.utils import CaptureQueriesContext
+
+    try:
+        with transaction.atomic():
+            with CaptureQueriesContext(connection) as ctx, timer() as t:
+                func(user, cart, contact)
+            raise Rollback
+    except Rollback:
+        pass
+    return len(ctx.captured_queries), t['seconds']
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 100, 1000])
+    parser.add_argument('--shops', type=int, default=5)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    setup_django()
+    from orders.services.checkout import CheckoutService
+    from orders.tests.factories import fill_cart, make_contact, make_products, make_shop, make_user
+
+    def engine(user, cart, contact):
+        return CheckoutService(user, cart, contact).run()
+
+    with test_database():
+        shops = [make_shop(f'Магазин {i}') for i in range(args.shops)]
+        rows = []
+        for size in args.sizes:
+            user = make_user(f'bench{size}@example.com')
+            contact = make_contact(user)
+            products = []
+            for i, shop in enumerate(shops):
+                products += make_products(shop, size // len(shops) + (i < size % len(shops)))
+            cart = fill_cart(user, products)
+
+            for name, func in (('legacy', legacy_checkout), ('bulk', engine)):
+                results = [measure(func, user, cart, contact) for _ in range(args.repeat)]
+                queries = results[0][0]
+                ms = median([seconds for _, seconds in results]) * 1000
+                rows.append([size, name, queries, f'{ms:.1f}'])
+
+        print_table(['lines', 'engine', 'queries', 'median ms'], rows)
+
+
+if __name__ == '__main__':
+    main()
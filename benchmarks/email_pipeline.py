@@ -0,0 +1,85 @@
+"""
+Бенчмарк отправки подтверждений заказов (клиенту и копия
+администратору) на локальный SMTP-сервер с задержкой рукопожатия
+--connect-ms (имитация SSL к smtp.mail.ru):
+
+- legacy   — прежняя задача: рендер обоих шаблонов и send_mail
+             с новым соединением на каждое письмо;
+- pipeline — очередь OutgoingEmail и EmailPipeline пачками по --batch.
+
+Считаются письма в секунду, SMTP-соединения и SQL-запросы.
+
+    python -m benchmarks.email_pipeline [--orders 500] [--batch 10 100] [--connect-ms 20]
+"""
+import argparse
+
+from benchmarks.utils import print_table, setup_django, test_database, timer
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--orders', type=int, default=500)
+    parser.add_argument('--batch', type=int, nargs='+', default=[10, 100])
+    parser.add_argument('--connect-ms', type=float, default=20)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.conf import settings
+    from django.core.mail import send_mail
+    from django.db import connection
+    from django.template.loader import render_to_string
+    from django.test.utils import override_settings
+
+    from orders.models import Order
+    from orders.tests.factories import make_orders, make_products, make_shop, make_user
+    from users.models import OutgoingEmail
+    from users.services.mail import EmailPipeline, enqueue
+    from users.tests.smtp import SMTPSink
+
+    with test_database(), override_settings(DEFAULT_FROM_EMAIL='shop@example.com',
+                                            ORDER_NOTIFY_EMAILS=['admin@example.com'], EMAIL_RATE_LIMIT=0):
+        shop = make_shop('Бенчмарк', 'supplier@example.com')
+        order_ids = [order.pk for order in make_orders(make_user('buyer@example.com'), make_products(shop, 3),
+                                                        args.orders)]
+
+        def legacy(_):
+            for order_id in order_ids:
+                order = (Order.objects.select_related('delivery_contact', 'user')
+                         .prefetch_related('shop_orders__items').get(pk=order_id))
+                context = {'order': order}
+                text_body = render_to_string('emails/order_confirmation.txt', context)
+                html_body = render_to_string('emails/order_confirmation.html', context)
+                send_mail(f'Ваш заказ #{order.id} принят', text_body, settings.DEFAULT_FROM_EMAIL,
+                          [order.delivery_contact.email], html_message=html_body)
+                send_mail(f'[ADMIN] Новый заказ #{order.id}', text_body, settings.DEFAULT_FROM_EMAIL,
+                          settings.ORDER_NOTIFY_EMAILS, html_message=html_body)
+
+        def pipeline(batch_size):
+            enqueue(OutgoingEmail.KIND_ORDER_CONFIRMATION, order_ids)
+            enqueue(OutgoingEmail.KIND_ORDER_ADMIN, order_ids)
+            EmailPipeline(batch_size=batch_size).run()
+
+        def count(counter):
+            def wrapper(execute, sql, params, many, context):
+                counter['queries'] += 1
+                return execute(sql, params, many, context)
+            return wrapper
+
+        rows = []
+        runs = [('legacy', legacy, None)] + [(f'pipeline/{size}', pipeline, size) for size in args.batch]
+        for name, func, batch_size in runs:
+            OutgoingEmail.objects.all().delete()
+            counter = {'queries': 0}
+            with SMTPSink(connect_delay=args.connect_ms / 1000) as sink, override_settings(**sink.settings()):
+                with connection.execute_wrapper(count(counter)), timer() as t:
+                    func(batch_size)
+            sent = len(sink.messages)
+            assert sent == 2 * len(order_ids), sent
+            rows.append([name, sent, sink.connections, counter['queries'],
+                         f'{sent / t["seconds"]:.0f}', f'{t["seconds"]:.2f}'])
+
+        print_table(['engine', 'messages', 'smtp connections', 'queries', 'messages/s', 'seconds'], rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+"""
+Бенчмарк импорта прайса: синтетические фиды на 10k/100k/1M товаров,
+построенные из data/shop1.yaml. Измеряет время, строк в секунду
+и пиковый прирост RSS процесса при импорте.
+
+    python -m benchmarks.feed_import [--sizes 10000 100000 1000000] [--batch-size 1000] [--legacy]
+
+--legacy дополнительно прогоняет прежний путь (yaml.safe_load + update_or_create
+на каждую строку); на больших фидах он работает очень долго.
+"""
+import argparse
+import os
+import gc
+import tempfile
+
+import yaml
+
+from benchmarks.utils import print_table, rss_peak, setup_django, test_database, timer
+
+SOURCE_FEED = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'shop1.yaml')
+
+
+def write_synthetic_feed(path, size, chunk=1000, change_every=0, id_start=10_000_000, shop=None):
+    """
+    Записывает фид на size товаров, размножая товары из shop1.yaml
+    с новыми id. Файл пишется кусками, целиком в памяти не держится.
+
+    change_every=N меняет цену у каждого N-го товара — так строится
+    «повторная выгрузка» с небольшой долей изменений; id_start и shop
+    позволяют построить несколько прайсов с непересекающимися товарами.
+    """
+    with open(SOURCE_FEED, encoding='utf-8') as f:
+        source = yaml.safe_load(f)
+    templates = source['goods']
+
+    with open(path, 'w', encoding='utf-8') as out:
+        out.write(yaml.safe_dump({'shop': shop or source['shop'], 'categories': source['categories']},
+                                 allow_unicode=True, sort_keys=False))
+        out.write('goods:\n')
+        for start in range(0, size, chunk):
+            goods = []
+            for i in range(start, min(start + chunk, size)):
+                good = dict(templates[i % len(templates)])
+                good['id'] = id_start + i
+                good['name'] = f"{good['name']} #{i}"
+                good['parameters'] = dict(good.get('parameters') or {})
+                if change_every and i % change_every == 0:
+                    good['price'] += 1
+                goods.append(good)
+            out.write(yaml.safe_dump(goods, allow_unicode=True, sort_keys=False))
+
+
+def legacy_import(supplier, path):
+    from products.models import Category, Product
+    from shops.models import Shop
+
+    with open(path, encoding='utf-8') as f:
+        data = yaml.safe_load(f)
+    shop, _ = Shop.objects.get_or_create(name=data['shop'], supplier=supplier,
+                                         defaults={'description': data['shop']})
+    for cat in data['categories']:
+        Category.objects.get_or_create(external_id=cat['id'], defaults={'name': cat['name']})
+    for item in data['goods']:
+        category = Category.objects.get(external_id=item['category'])
+        Product.objects.update_or_create(
+            external_id=item['id'],
+            defaults={
+                'category': category, 'shop': shop, 'model': item['model'],
+                'name': item['name'], 'description': item.get('description', ''),
+                'characteristics': item.get('parameters', {}), 'price': item['price'],
+                'price_rrc': item['price_rrc'], 'quantity': item['quantity'],
+            }
+        )
+
+
+def streaming_import(supplier, path, batch_size):
+    from shops.services.shop_import import ShopImportService
+
+    with open(path, 'rb') as f:
+        ShopImportService(supplier, f, batch_size=batch_size).run()
+
+
+def measure(func, *args):
+    from django.db import connection
+
+    with connection.cursor() as cursor:
+        cursor.execute('TRUNCATE products_product CASCADE')
+    gc.collect()
+    with rss_peak() as peak, timer() as t:
+        func(*args)
+    return t['seconds'], peak['bytes']
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--batch-size', type=int, default=1000)
+    parser.add_argument('--legacy', action='store_true')
+    args = parser.parse_args()
+
+    setup_django()
+    from orders.tests.factories import make_user
+    from users.models import SupplierProfile
+
+    with test_database(), tempfile.TemporaryDirectory() as tmp:
+        supplier = SupplierProfile.objects.create(user=make_user('supplier@example.com'))
+        rows = []
+        for size in args.sizes:
+            path = os.path.join(tmp, f'feed_{size}.yaml')
+            write_synthetic_feed(path, size)
+            file_mb = os.path.getsize(path) / 2 ** 20
+
+            runs = [('streaming', streaming_import, (supplier, path, args.batch_size))]
+            if args.legacy:
+                runs.append(('legacy', legacy_import, (supplier, path)))
+            for name, func, func_args in runs:
+                seconds, peak = measure(func, *func_args)
+                rows.append([size, f'{file_mb:.1f}', name, f'{seconds:.1f}',
+                             f'{size / seconds:,.0f}', f'{peak / 2 ** 20:.1f}'])
+            os.remove(path)
+
+        print_table(['goods', 'file MB', 'import', 'seconds', 'rows/s', 'peak RSS MB'], rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+"""
+Бенчмарк инкрементальной синхронизации прайса: повторная выгрузка
+фида на 100k товаров, в которой изменился 1% строк. Сравнивает полный
+режим и инкрементальный по числу записанных строк, объёму WAL и времени.
+
+    python -m benchmarks.feed_sync [--size 100000] [--change-percent 1]
+"""
+import argparse
+import os
+import tempfile
+
+from benchmarks.feed_import import write_synthetic_feed
+from benchmarks.utils import print_table, setup_django, test_database, timer
+
+
+def wal_lsn():
+    from django.db import connection
+
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT pg_current_wal_lsn()')
+        return cursor.fetchone()[0]
+
+
+def wal_bytes_since(lsn):
+    from django.db import connection
+
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT pg_wal_lsn_diff(pg_current_wal_lsn(), %s)', [lsn])
+        return int(cursor.fetchone()[0])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--size', type=int, default=100_000)
+    parser.add_argument('--change-percent', type=float, default=1.0)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.db import connection
+
+    from orders.tests.factories import make_user
+    from shops.services.shop_import import ShopImportService
+    from users.models import SupplierProfile
+
+    with test_database(), tempfile.TemporaryDirectory() as tmp:
+        supplier = SupplierProfile.objects.create(user=make_user('supplier@example.com'))
+        base = os.path.join(tmp, 'base.yaml')
+        changed = os.path.join(tmp, 'changed.yaml')
+        write_synthetic_feed(base, args.size)
+        write_synthetic_feed(changed, args.size, change_every=round(100 / args.change_percent))
+
+        rows = []
+        for mode, incremental in (('full', False), ('incremental', True)):
+            with connection.cursor() as cursor:
+                cursor.execute('TRUNCATE products_product CASCADE')
+            with open(base, 'rb') as f:
+                ShopImportService(supplier, f).run()
+
+            lsn = wal_lsn()
+            with open(changed, 'rb') as f, timer() as t:
+                result = ShopImportService(supplier, f, incremental=incremental).run()
+            written = result['created_products'] + result['updated_products']
+            rows.append([mode, args.size, written, result['unchanged_products'],
+                         f'{wal_bytes_since(lsn) / 2 ** 20:.1f}', f"{t['seconds']:.1f}"])
+
+        print_table(['mode', 'goods', 'rows written', 'unchanged', 'WAL MB', 'seconds'], rows)
+
+
+if __name__ == '__main__':
+    main()
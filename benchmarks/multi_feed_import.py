@@ -0,0 +1,64 @@
+"""
+Бенчмарк импорта нескольких прайсов: последовательный импорт каждого
+файла через ShopImportService против команды import_feeds, которая
+разбирает yaml в пуле процессов и пишет товары несколькими потоками.
+
+    python -m benchmarks.multi_feed_import [--feeds 8] [--size 20000] [--processes 4] [--writers 4]
+"""
+import argparse
+import io
+import os
+import tempfile
+
+from benchmarks.feed_import import measure, streaming_import, write_synthetic_feed
+from benchmarks.utils import print_table, setup_django, test_database
+
+
+def serial_import(supplier, paths, batch_size):
+    for path in paths:
+        streaming_import(supplier, path, batch_size)
+
+
+def parallel_import(directory, batch_size, processes, writers):
+    from django.core.management import call_command
+
+    call_command('import_feeds', directory, supplier_email='supplier@example.com',
+                 batch_size=batch_size, processes=processes, writers=writers, stdout=io.StringIO())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--feeds', type=int, default=8)
+    parser.add_argument('--size', type=int, default=20_000)
+    parser.add_argument('--batch-size', type=int, default=1000)
+    parser.add_argument('--processes', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--writers', type=int, default=4)
+    args = parser.parse_args()
+
+    setup_django()
+    from orders.tests.factories import make_user
+    from users.models import SupplierProfile
+
+    with test_database(), tempfile.TemporaryDirectory() as tmp:
+        supplier = SupplierProfile.objects.create(user=make_user('supplier@example.com'))
+        paths = []
+        for n in range(args.feeds):
+            path = os.path.join(tmp, f'feed_{n}.yaml')
+            write_synthetic_feed(path, args.size, id_start=10_000_000 * (n + 1), shop=f'Магазин {n}')
+            paths.append(path)
+
+        total = args.feeds * args.size
+        rows = []
+        for name, func, func_args in [
+            ('serial', serial_import, (supplier, paths, args.batch_size)),
+            (f'import_feeds ({args.processes}p/{args.writers}w)', parallel_import,
+             (tmp, args.batch_size, args.processes, args.writers)),
+        ]:
+            seconds, _ = measure(func, *func_args)
+            rows.append([args.feeds, total, name, f'{seconds:.1f}', f'{total / seconds:,.0f}'])
+
+        print_table(['feeds', 'goods', 'import', 'seconds', 'rows/s'], rows)
+
+
+if __name__ == '__main__':
+    main()
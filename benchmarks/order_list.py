@@ -0,0 +1,78 @@
+"""
+Бенчмарк GET /api/orders/ для клиента с 1000 заказов (3 магазина,
+по 2 позиции в подзаказе): прежняя выдача всего списка без
+prefetch против страницы keyset-пагинации с Prefetch и
+ограниченными колонками — число запросов и время.
+
+    python -m benchmarks.order_list [--orders 1000] [--page-size 50] [--repeat 5]
+"""
+import argparse
+
+from benchmarks.utils import median, print_table, setup_django, test_database, timer
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--orders', type=int, default=1000)
+    parser.add_argument('--page-size', type=int, default=50)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.db import connection
+    from django.urls import reverse
+    from rest_framework.test import APIClient
+
+    from orders.models import Order
+    from orders.serializers import OrderSerializer
+    from orders.services.order_queries import orders_for_read
+    from orders.tests.factories import make_orders, make_products, make_shop, make_user
+
+    with test_database():
+        products = [product for i in range(3) for product in make_products(make_shop(f'Магазин {i}'), 2)]
+        user = make_user('buyer@example.com')
+        make_orders(user, products, args.orders)
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+        client = APIClient()
+        client.force_authenticate(user)
+        url = reverse('orders-list')
+
+        def legacy():
+            # прежний OrderViewSet: весь список, связи читаются построчно
+            return len(OrderSerializer(Order.objects.filter(user=user), many=True).data)
+
+        def prefetch_all():
+            return len(OrderSerializer(orders_for_read(Order.objects.filter(user=user)), many=True).data)
+
+        def page():
+            response = client.get(url, {'page_size': args.page_size})
+            assert response.status_code == 200
+            return len(response.data['results'])
+
+        def count(counter):
+            def wrapper(execute, sql, params, many, context):
+                counter['queries'] += 1
+                return execute(sql, params, many, context)
+            return wrapper
+
+        rows = []
+        for name, func in (('legacy, весь список', legacy),
+                           ('prefetch, весь список', prefetch_all),
+                           (f'API, страница {args.page_size}', page)):
+            results = []
+            for _ in range(args.repeat):
+                counter = {'queries': 0}
+                with connection.execute_wrapper(count(counter)), timer() as t:
+                    orders = func()
+                results.append((orders, counter['queries'], t['seconds']))
+            orders, queries, _ = results[0]
+            ms = median([seconds for *_, seconds in results]) * 1000
+            rows.append([name, orders, queries, f'{ms:.1f}'])
+
+        print_table(['выдача', 'orders', 'queries', 'median ms'], rows)
+
+
+if __name__ == '__main__':
+    main()
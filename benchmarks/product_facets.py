@@ -0,0 +1,129 @@
+"""
+Бенчмарк фасетов по характеристикам на каталоге 1M товаров:
+
+- подсчёт фасетов категории: GET /api/products/facets/?category=…
+  (jsonb_each + GROUP BY в одном запросе) против прежнего пути —
+  выгрузить characteristics категории и посчитать значения в Python;
+- выборка по характеристике GET /api/products/?attr=…;
+
+с индексами product_characteristics и product_active_category_facets
+и без них.
+
+    python -m benchmarks.product_facets [--size 1000000] [--categories 50] [--repeat 5]
+"""
+import argparse
+from collections import Counter
+
+from benchmarks.utils import median, print_table, setup_django, test_database, timer
+
+COLORS = ['черный', 'белый', 'красный', 'синий', 'золотистый', 'серебристый']
+MEMORY = [32, 64, 128, 256, 512]
+
+
+def fill_catalog(shop, size, categories, chunk=20_000):
+    from django.db import connection
+
+    from products.models import Category, Product
+
+    cats = [Category.objects.create(external_id=i, name=f'Категория {i}') for i in range(categories)]
+    for start in range(0, size, chunk):
+        Product.objects.bulk_create([
+            Product(
+                external_id=i, category=cats[i % categories], shop=shop, model=f'model-{i}',
+                name=f'Товар {i}', price=1000 + i % 5000, price_rrc=1200, quantity=i % 100,
+                characteristics={
+                    'Цвет': COLORS[i % len(COLORS)],
+                    'Встроенная память (Гб)': MEMORY[(i // 7) % len(MEMORY)],
+                    'Диагональ (дюйм)': 5 + (i % 30) / 10,
+                    'Бренд': f'brand{i % 400}',
+                    'NFC': i % 3 == 0,
+                },
+            )
+            for i in range(start, min(start + chunk, size))
+        ])
+    with connection.cursor() as cursor:
+        # как после автовакуума: карта видимости нужна для index-only scan
+        cursor.execute('VACUUM ANALYZE products_product')
+
+
+def python_facets(category):
+    """
+    Прежний путь: все характеристики категории загружаются и считаются на клиенте.
+    """
+    from products.models import Product
+
+    counters = {}
+    for characteristics in (Product.objects.filter(is_active=True, category__external_id=category)
+                            .values_list('characteristics', flat=True).iterator(chunk_size=5000)):
+        for key, value in (characteristics or {}).items():
+            counters.setdefault(key, Counter())[value] += 1
+    return counters
+
+
+def measure(func, repeat):
+    times = []
+    for _ in range(repeat):
+        with timer() as t:
+            func()
+        times.append(t['seconds'] * 1000)
+    return median(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--size', type=int, default=1_000_000)
+    parser.add_argument('--categories', type=int, default=50)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.db import connection
+    from django.urls import reverse
+    from rest_framework.test import APIClient
+
+    from orders.tests.factories import make_shop, make_user
+
+    with test_database():
+        fill_catalog(make_shop('Бенчмарк', 'supplier@example.com'), args.size, args.categories)
+        client = APIClient()
+        client.force_authenticate(make_user('buyer@example.com'))
+        facets_url = reverse('products-facets')
+        list_url = reverse('products-list')
+
+        def get(url, params):
+            response = client.get(url, params)
+            assert response.status_code == 200, response.content
+            return response
+
+        per_category = args.size // args.categories
+        filters = [
+            ('Бренд:brand7', {'attr': 'Бренд:brand7', 'page_size': 50}),
+            ('Бренд + память >= 256', {'attr': 'Бренд:brand7', 'attr_min': 'Встроенная память (Гб):256',
+                                        'page_size': 50}),
+            ('категория + цвет + память', {'category': 7, 'attr': ['Цвет:черный', 'Цвет:белый'],
+                                           'attr_min': 'Встроенная память (Гб):128', 'page_size': 50}),
+        ]
+
+        def run(indexes):
+            result = [
+                ['фасеты категории', f'{per_category} товаров', 'python', indexes,
+                 f'{measure(lambda: python_facets(7), args.repeat):.1f}'],
+                ['фасеты категории', f'{per_category} товаров', 'jsonb_each + GROUP BY', indexes,
+                 f'{measure(lambda: get(facets_url, {"category": 7}), args.repeat):.1f}'],
+            ]
+            for label, params in filters:
+                result.append(['выборка', label, '?attr=…', indexes,
+                               f'{measure(lambda: get(list_url, params), args.repeat):.1f}'])
+            return result
+
+        rows = run('есть')
+        with connection.cursor() as cursor:
+            cursor.execute('DROP INDEX product_characteristics')
+            cursor.execute('DROP INDEX product_active_category_facets')
+        rows += run('нет')
+
+        print_table(['запрос', 'данные', 'способ', 'индексы', 'median ms'], rows)
+
+
+if __name__ == '__main__':
+    main()
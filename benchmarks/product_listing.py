@@ -0,0 +1,193 @@
+"""
+Бенчмарк витрины каталога (ProductListing) на --size товаров в --shops
+магазинах, из которых десятая часть не принимает заказы.
+
+Чтение — p50/p99 ответа списка, поиска и фасетов (кэш ответов отключён):
+
+- join    — прежний queryset: товары с JOIN магазинов и категорий,
+            неактивные магазины отсекаются условием shop__is_active;
+- listing — витрина с частичными индексами по is_listed.
+
+Запись — медиана времени операций с триггерами витрины и с
+отключёнными триггерами: списание остатков 10 товаров, пачка импорта
+в 1000 товаров, переименование магазина. И время полной пересборки
+и сверки витрины.
+
+    python -m benchmarks.product_listing [--size 500000] [--shops 200] [--repeat 20]
+"""
+import argparse
+import random
+from unittest import mock
+
+from benchmarks.utils import median, percentile, print_table, setup_django, test_database, timer
+
+WORDS = ['смартфон', 'телевизор', 'ноутбук', 'наушники', 'планшет', 'монитор', 'колонка', 'часы']
+COLORS = ['черный', 'белый', 'красный', 'синий']
+
+
+def fill(size, shops, chunk=20_000):
+    from django.db import connection
+
+    from orders.tests.factories import make_user
+    from products.models import Category, Product
+    from shops.models import Shop
+    from users.models import SupplierProfile
+
+    rng = random.Random(1)
+    supplier = SupplierProfile.objects.create(user=make_user('supplier@example.com'))
+    shop_ids = [shop.pk for shop in Shop.objects.bulk_create([
+        Shop(supplier=supplier, name=f'Магазин {i}', description='-', is_active=i % 10 != 0)
+        for i in range(shops)
+    ])]
+    categories = Category.objects.bulk_create([Category(external_id=i, name=f'Категория {i}') for i in range(50)])
+    # витрина заполняется одной пересборкой после загрузки
+    with connection.cursor() as cursor:
+        cursor.execute('ALTER TABLE products_product DISABLE TRIGGER USER')
+    for start in range(0, size, chunk):
+        Product.objects.bulk_create([
+            Product(
+                external_id=i, category=categories[i % len(categories)], shop_id=rng.choice(shop_ids),
+                model=f'model-{i}', name=f'{WORDS[i % len(WORDS)]} {i * 7919 % size:07d}',
+                description='Описание товара ' * 5,
+                characteristics={'Цвет': COLORS[i % len(COLORS)], 'Память (Гб)': 64 << (i % 4)},
+                price=1000 + i * 31 % 5000, price_rrc=1200, quantity=i % 100,
+            )
+            for i in range(start, min(start + chunk, size))
+        ])
+    with connection.cursor() as cursor:
+        cursor.execute('ALTER TABLE products_product ENABLE TRIGGER USER')
+    return shop_ids
+
+
+def legacy_viewset():
+    from products.filters import ProductFilter
+    from products.models import Product
+    from products.serializers import ProductSerializer
+    from products.views import ProductViewSet
+
+    class JoinProductViewSet(ProductViewSet):
+        queryset = Product.objects.select_related('shop', 'category').filter(is_active=True, shop__is_active=True)
+        serializer_class = ProductSerializer
+        filterset_class = ProductFilter
+
+        def get_queryset(self):
+            return self.queryset.all()
+
+    return JoinProductViewSet
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--size', type=int, default=500_000)
+    parser.add_argument('--shops', type=int, default=200)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.db import connection, transaction
+    from rest_framework.test import APIRequestFactory, force_authenticate
+
+    from orders.services.stock import reserve_stock
+    from orders.tests.factories import make_user
+    from products.models import Product
+    from products.services.catalog_cache import BYPASS, catalog_cache
+    from products.services.listing import check_listing, rebuild_listing
+    from products.views import ProductViewSet
+    from shops.models import Shop
+
+    with test_database():
+        shop_ids = fill(args.size, args.shops)
+        with timer() as rebuild_time:
+            stats = rebuild_listing()
+        with connection.cursor() as cursor:
+            cursor.execute('VACUUM ANALYZE products_product, products_productlisting')
+        with timer() as check_time:
+            report = check_listing()
+        assert not any(report.values()), report
+
+        factory = APIRequestFactory()
+        user = make_user('buyer@example.com')
+        views = {
+            'join': legacy_viewset().as_view({'get': 'list'}),
+            'listing': ProductViewSet.as_view({'get': 'list'}),
+        }
+        facet_views = {
+            'join': legacy_viewset().as_view({'get': 'facets'}),
+            'listing': ProductViewSet.as_view({'get': 'facets'}),
+        }
+        active_shop = next(pk for pk in shop_ids if Shop.objects.get(pk=pk).is_active)
+        scenarios = [
+            ('page 1, name', views, {}),
+            ('page 1, -price', views, {'ordering': '-price'}),
+            ('?category=7', views, {'category': 7}),
+            ('?supplier=…', views, {'supplier': active_shop}),
+            ('?search=ноутбук', views, {'search': 'ноутбук'}),
+            ('?attr=Цвет:красный', views, {'attr': 'Цвет:красный'}),
+            ('facets ?category=7', facet_views, {'category': 7}),
+        ]
+
+        rows = []
+        with mock.patch.object(catalog_cache, 'lookup', return_value=(None, None, BYPASS)):
+            for label, handlers, params in scenarios:
+                results = {}
+                for name, view in handlers.items():
+                    times = []
+                    for _ in range(args.repeat):
+                        request = factory.get('/api/products/', params)
+                        force_authenticate(request, user)
+                        with timer() as t:
+                            response = view(request)
+                            response.render()
+                        times.append(t['seconds'] * 1000)
+                    results[name] = response.data
+                    rows.append([label, name, f'{percentile(times, 50):.1f}', f'{percentile(times, 99):.1f}'])
+                assert results['join'] == results['listing'], label
+        print(f'{args.size} товаров, {args.shops} магазинов')
+        print_table(['request', 'source', 'p50 ms', 'p99 ms'], rows)
+
+        rng = random.Random(2)
+        product_ids = list(Product.objects.filter(quantity__gt=0).values_list('pk', flat=True)[:50_000])
+        batch = list(Product.objects.filter(shop_id=active_shop)[:1000])
+        shop = Shop.objects.get(pk=active_shop)
+
+        def reserve():
+            reserve_stock({pk: 1 for pk in rng.sample(product_ids, 10)})
+
+        def import_batch():
+            for product in batch:
+                product.price += 1
+            Product.objects.bulk_create(batch, update_conflicts=True, unique_fields=['external_id'],
+                                        update_fields=['price', 'updated_at'])
+
+        def rename_shop():
+            Shop.objects.filter(pk=shop.pk).update(name=f'Магазин {rng.random()}')
+
+        rows = []
+        for label, func in [('reserve_stock, 10 товаров', reserve), ('пачка импорта, 1000 товаров', import_batch),
+                            (f'переименование магазина, {Product.objects.filter(shop=shop).count()} товаров',
+                             rename_shop)]:
+            for triggers in ('on', 'off'):
+                times = []
+                for _ in range(args.repeat):
+                    with transaction.atomic():
+                        if triggers == 'off':
+                            with connection.cursor() as cursor:
+                                cursor.execute('ALTER TABLE products_product DISABLE TRIGGER USER')
+                                cursor.execute('ALTER TABLE shops_shop DISABLE TRIGGER USER')
+                        with timer() as t:
+                            func()
+                        transaction.set_rollback(True)
+                    times.append(t['seconds'] * 1000)
+                rows.append([label, triggers, f'{median(times):.2f}'])
+        print()
+        print_table(['write', 'triggers', 'median ms'], rows)
+
+        print()
+        print_table(['operation', 'rows', 'seconds'], [
+            ['rebuild_listing()', stats['written'], f"{rebuild_time['seconds']:.1f}"],
+            ['check_listing()', args.size, f"{check_time['seconds']:.1f}"],
+        ])
+
+
+if __name__ == '__main__':
+    main()
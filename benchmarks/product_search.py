@@ -0,0 +1,114 @@
+"""
+Бенчмарк поиска по каталогу: p50/p99 первой страницы ?search=… для
+прежнего SearchFilter (ILIKE '%…%' по name и description) и для
+ProductSearchFilter (tsvector + триграммы, сортировка по релевантности)
+на каталогах 100k и 1M товаров, построенных из data/shop1.yaml.
+
+    python -m benchmarks.product_search [--sizes 100000 1000000] [--repeat 20] [--page-size 50]
+"""
+import argparse
+import os
+
+import yaml
+
+from benchmarks.utils import percentile, print_table, setup_django, test_database, timer
+
+SOURCE_FEED = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'shop1.yaml')
+
+# частое слово, редкая модель, опечатка и фраза из нескольких слов
+QUERIES = ['смартфон', 'kingston/datatraveler-32gb-70007', 'iphonr', 'Samsung Galaxy Note20']
+
+# слова для описаний, чтобы тексты товаров различались
+WORDS = ['быстрый', 'надёжный', 'компактный', 'лёгкий', 'тонкий', 'яркий', 'тихий',
+         'мощный', 'удобный', 'стильный', 'прочный', 'новый']
+
+
+def fill_catalog(shop, size, chunk=20_000):
+    from django.db import connection
+
+    from products.models import Category, Product
+    from products.services.search import remember_words
+
+    with open(SOURCE_FEED, encoding='utf-8') as f:
+        source = yaml.safe_load(f)
+    categories = {c['id']: Category.objects.create(external_id=c['id'], name=c['name'])
+                  for c in source['categories']}
+    templates = source['goods']
+    for start in range(0, size, chunk):
+        goods = []
+        for i in range(start, min(start + chunk, size)):
+            item = templates[i % len(templates)]
+            words = ' '.join(WORDS[(i * k) % len(WORDS)] for k in (1, 3, 7))
+            goods.append(Product(
+                external_id=i, category=categories[item['category']], shop=shop,
+                model=f"{item['model']}-{i}", name=f"{item['name']} #{i}",
+                description=f'{words} товар, модель {i}', characteristics=item.get('parameters'),
+                price=item['price'], price_rrc=item['price_rrc'], quantity=item['quantity'],
+            ))
+        Product.objects.bulk_create(goods)
+    remember_words(item['name'] for item in templates)
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE products_product')
+
+
+def legacy_search(text, page_size):
+    """
+    Как DRF SearchFilter с search_fields = ['name', 'description'].
+    """
+    from django.db.models import Q
+
+    from products.models import Product
+
+    queryset = Product.objects.select_related('shop', 'category').filter(is_active=True)
+    for term in text.split():
+        queryset = queryset.filter(Q(name__icontains=term) | Q(description__icontains=term))
+    return list(queryset.order_by('name', 'pk')[:page_size])
+
+
+def fts_search(text, page_size):
+    from rest_framework.test import APIRequestFactory
+    from rest_framework.request import Request
+
+    from products.filters import ProductSearchFilter
+    from products.models import Product
+
+    request = Request(APIRequestFactory().get('/', {'search': text}))
+    queryset = ProductSearchFilter().filter_queryset(
+        request, Product.objects.select_related('shop', 'category').filter(is_active=True), None
+    )
+    return list(queryset.order_by('-search_rank', '-pk')[:page_size])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100_000, 1_000_000])
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--page-size', type=int, default=50)
+    args = parser.parse_args()
+
+    setup_django()
+    from orders.tests.factories import make_shop
+
+    with test_database():
+        shop = make_shop('Бенчмарк', 'supplier@example.com')
+        rows = []
+        for size in args.sizes:
+            from products.models import Category, Product
+            Product.objects.all().delete()
+            Category.objects.all().delete()
+            fill_catalog(shop, size)
+            for text in QUERIES:
+                for name, func in [('ILIKE', legacy_search), ('tsvector+trgm', fts_search)]:
+                    times, found = [], 0
+                    for _ in range(args.repeat):
+                        with timer() as t:
+                            found = len(func(text, args.page_size))
+                        times.append(t['seconds'] * 1000)
+                    rows.append([size, text, name, found,
+                                 f'{percentile(times, 50):.1f}', f'{percentile(times, 99):.1f}'])
+
+        print_table(['products', 'query', 'search', 'found', 'p50 ms', 'p99 ms'], rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+"""
+Бенчмарк выгрузки прайса: магазины на 10k/100k/1M товаров. Измеряет
+время, объём выгрузки и пиковый прирост RSS процесса для потоковой
+выгрузки в yaml/csv/jsonl.
+
+    python -m benchmarks.shop_export [--sizes 10000 100000 1000000] [--legacy]
+
+--legacy дополнительно прогоняет прежний путь (список словарей по всем
+товарам с запросом категории на каждый товар и yaml.safe_dump целиком).
+"""
+import argparse
+import gc
+
+import yaml
+
+from benchmarks.utils import print_table, rss_peak, setup_django, test_database, timer
+
+
+def fill_shop(shop, size, chunk=5000):
+    from products.models import Category, Product
+
+    Product.objects.filter(shop=shop).delete()
+    categories = [Category.objects.get_or_create(external_id=n, defaults={'name': f'Категория {n}'})[0]
+                  for n in range(1, 11)]
+    for start in range(0, size, chunk):
+        Product.objects.bulk_create([
+            Product(
+                external_id=i, category=categories[i % len(categories)], shop=shop,
+                model=f'model-{i}', name=f'Товар {i}', description='Описание товара ' * 5,
+                characteristics={'Цвет': 'чёрный', 'Память (Гб)': 128, 'Диагональ': 6.1},
+                price=1000 + i % 500, price_rrc=1200 + i % 500, quantity=i % 100,
+            )
+            for i in range(start, min(start + chunk, size))
+        ])
+
+
+def legacy_export(shop):
+    from products.models import Category, Product
+
+    categories = [{'id': c.external_id, 'name': c.name}
+                  for c in Category.objects.filter(products__shop=shop).distinct().order_by('external_id')]
+    goods = []
+    for ps in Product.objects.filter(shop=shop).order_by('external_id'):
+        goods.append({
+            'id': ps.external_id, 'category_id': ps.category.external_id, 'model': ps.model,
+            'name': ps.name, 'description': ps.description, 'parameters': ps.characteristics,
+            'price': float(ps.price), 'price_rrc': float(ps.price_rrc), 'quantity': ps.quantity,
+        })
+    data = yaml.safe_dump({'shop': shop.name, 'categories': categories, 'goods': goods},
+                          allow_unicode=True, sort_keys=False, encoding='utf-8')
+    return len(data)
+
+
+def streaming_export(shop, export_format):
+    from shops.services.shop_export import ShopExportService
+
+    return sum(len(chunk) for chunk in ShopExportService(shop).stream(export_format))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--legacy', action='store_true')
+    args = parser.parse_args()
+
+    setup_django()
+    from orders.tests.factories import make_user
+    from shops.models import Shop
+    from users.models import SupplierProfile
+
+    with test_database():
+        supplier = SupplierProfile.objects.create(user=make_user('supplier@example.com'))
+        shop = Shop.objects.create(name='Бенчмарк', supplier=supplier)
+        rows = []
+        for size in args.sizes:
+            fill_shop(shop, size)
+            runs = [(fmt, streaming_export, (shop, fmt)) for fmt in ('yaml', 'csv', 'jsonl')]
+            if args.legacy:
+                runs.append(('legacy yaml', legacy_export, (shop,)))
+            for name, func, func_args in runs:
+                gc.collect()
+                with rss_peak() as peak, timer() as t:
+                    size_bytes = func(*func_args)
+                rows.append([size, name, f'{t["seconds"]:.1f}', f'{size / t["seconds"]:,.0f}',
+                             f'{size_bytes / 2 ** 20:.1f}', f'{peak["bytes"] / 2 ** 20:.1f}'])
+
+        print_table(['goods', 'export', 'seconds', 'rows/s', 'output MB', 'peak RSS MB'], rows)
+
+
+if __name__ == '__main__':
+    main()
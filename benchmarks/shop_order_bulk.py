@@ -0,0 +1,72 @@
+"""
+Бенчмарк смены статуса у волны подзаказов поставщика (10/100/300):
+построчные PATCH /api/shop-orders/{id}/process/ против одного
+POST /api/shop-orders/bulk-process/ — HTTP-запросы, SQL-запросы и время.
+
+    python -m benchmarks.shop_order_bulk [--sizes 10 100 300] [--repeat 3]
+"""
+import argparse
+
+from benchmarks.utils import median, print_table, setup_django, test_database, timer
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 100, 300])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.db import connection
+    from django.urls import reverse
+    from rest_framework.test import APIClient
+
+    from orders.models import ShopOrder
+    from orders.tests.factories import make_orders, make_products, make_shop, make_user
+
+    with test_database():
+        shop = make_shop('Бенчмарк', 'supplier@example.com')
+        make_orders(make_user('buyer@example.com'), make_products(shop, 3), max(args.sizes))
+        all_ids = list(ShopOrder.objects.order_by('pk').values_list('pk', flat=True))
+        client = APIClient()
+        client.force_authenticate(shop.supplier.user)
+
+        def single(ids):
+            for pk in ids:
+                response = client.patch(reverse('shop-orders-process', args=[pk]),
+                                        {'status': ShopOrder.STATUS_IN_PROGRESS}, format='json')
+                assert response.status_code == 200, response.data
+            return len(ids)
+
+        def bulk(ids):
+            response = client.post(reverse('shop-orders-bulk-process'),
+                                   {'ids': ids, 'status': ShopOrder.STATUS_IN_PROGRESS}, format='json')
+            assert response.status_code == 200 and len(response.data['updated']) == len(ids), response.data
+            return 1
+
+        def count(counter):
+            def wrapper(execute, sql, params, many, context):
+                counter['queries'] += 1
+                return execute(sql, params, many, context)
+            return wrapper
+
+        rows = []
+        for size in args.sizes:
+            ids = all_ids[:size]
+            for name, func in (('single', single), ('bulk', bulk)):
+                results = []
+                for _ in range(args.repeat):
+                    ShopOrder.objects.update(status=ShopOrder.STATUS_NEW)
+                    counter = {'queries': 0}
+                    with connection.execute_wrapper(count(counter)), timer() as t:
+                        requests = func(ids)
+                    results.append((requests, counter['queries'], t['seconds']))
+                requests, queries, _ = results[0]
+                ms = median([seconds for *_, seconds in results]) * 1000
+                rows.append([size, name, requests, queries, f'{ms:.1f}'])
+
+        print_table(['sub-orders', 'api', 'http', 'queries', 'median ms'], rows)
+
+
+if __name__ == '__main__':
+    main()
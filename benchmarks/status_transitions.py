@@ -0,0 +1,115 @@
+"""
+Бенчмарк смены статусов под параллельными писателями: N потоков
+одновременно переводят одни и те же 2000 подзаказов new -> in_progress,
+каждый в своём случайном порядке.
+
+- legacy — прежний process: прочитать, проверить, save();
+- cas    — ShopOrder.transition_to: UPDATE ... WHERE status = old и запись в журнал;
+- bulk   — BulkStatusTransition пачками по 100 id.
+
+Считаются переходы в секунду, «двойные» переходы (один подзаказ
+переведён несколькими писателями — в журнале legacy их не видно),
+отказы compare-and-set и записи журнала.
+
+    python -m benchmarks.status_transitions [--orders 2000] [--workers 1 4 8]
+"""
+import argparse
+import random
+import threading
+
+from benchmarks.utils import print_table, setup_django, test_database, timer
+
+
+def run_workers(workers, target):
+    from django.db import connection
+
+    results = []
+    lock = threading.Lock()
+
+    def work(seed):
+        try:
+            result = target(random.Random(seed))
+            with lock:
+                results.append(result)
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=work, args=(seed,)) for seed in range(workers)]
+    with timer() as t:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    return results, t['seconds']
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--orders', type=int, default=2000)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 4, 8])
+    args = parser.parse_args()
+
+    setup_django()
+    from django.db.models import Count
+
+    from orders.models import ShopOrder, StatusTransition, TransitionConflict
+    from orders.services.shop_order_status import BulkStatusTransition
+    from orders.tests.factories import make_orders, make_products, make_shop, make_user
+
+    with test_database():
+        shop = make_shop('Бенчмарк', 'supplier@example.com')
+        make_orders(make_user('buyer@example.com'), make_products(shop, 2), args.orders)
+        ids = list(ShopOrder.objects.order_by('pk').values_list('pk', flat=True))
+        target = ShopOrder.STATUS_IN_PROGRESS
+
+        def legacy(rng):
+            applied = 0
+            for pk in rng.sample(ids, len(ids)):
+                shop_order = ShopOrder.objects.get(pk=pk)
+                if shop_order.status == ShopOrder.STATUS_NEW:
+                    shop_order.status = target
+                    shop_order.save(update_fields=['status'])
+                    applied += 1
+            return applied, 0
+
+        def cas(rng):
+            applied = conflicts = 0
+            for pk in rng.sample(ids, len(ids)):
+                shop_order = ShopOrder.objects.only('status', 'order_id').get(pk=pk)
+                if not shop_order.can_transition(target):
+                    continue
+                try:
+                    shop_order.transition_to(target)
+                    applied += 1
+                except TransitionConflict:
+                    conflicts += 1
+            return applied, conflicts
+
+        def bulk(rng):
+            applied = 0
+            shuffled = rng.sample(ids, len(ids))
+            for start in range(0, len(shuffled), 100):
+                result = BulkStatusTransition(ShopOrder.objects.all(), shuffled[start:start + 100], target).run()
+                applied += len(result['updated'])
+            return applied, 0
+
+        rows = []
+        for workers in args.workers:
+            for name, func in (('legacy', legacy), ('cas', cas), ('bulk', bulk)):
+                ShopOrder.objects.update(status=ShopOrder.STATUS_NEW)
+                StatusTransition.objects.all().delete()
+                results, seconds = run_workers(workers, func)
+                applied = sum(result[0] for result in results)
+                conflicts = sum(result[1] for result in results)
+                logged = StatusTransition.objects.count()
+                doubled = (StatusTransition.objects.values('shop_order').annotate(n=Count('pk'))
+                           .filter(n__gt=1).count())
+                rows.append([workers, name, applied, applied - len(ids), conflicts, logged, doubled,
+                             f'{applied / seconds:.0f}', f'{seconds:.2f}'])
+
+        print_table(['workers', 'engine', 'applied', 'double', 'cas conflicts', 'log rows',
+                     'double in log', 'transitions/s', 'seconds'], rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,140 @@
+"""
+Бенчмарк мягких резервов товара: --carts корзин держат по --per-cart
+товаров (по умолчанию 10 000 x 100 = 1M резервов), срок резервов
+разбросан на ±15 минут, так что примерно половина истекла.
+
+Свободный остаток «горячего» товара, который держат все корзины:
+чтение строки счётчика ReservedStock против суммы действующих
+резервов; SQL-запросы и p50/p99 добавления этого товара в корзину.
+
+Снятие истёкших резервов expire_holds — время, резервов в секунду и
+план выборки пачки (индекс по expires_at), время холостого запуска,
+когда снимать нечего, и согласованность счётчиков с резервами.
+
+    python -m benchmarks.stock_reservations [--carts 10000] [--per-cart 100] [--batch-size 5000] [--repeat 50]
+"""
+import argparse
+
+from benchmarks.utils import percentile, print_table, setup_django, test_database, timer
+
+
+def fill(carts, per_cart):
+    from django.contrib.auth import get_user_model
+    from django.db import connection
+
+    from orders.models import Cart, ReservedStock, StockReservation
+    from orders.tests.factories import make_products, make_shop
+
+    User = get_user_model()
+    products = make_products(make_shop('Бенчмарк'), per_cart, quantity=10 * carts)
+    users = User.objects.bulk_create([
+        User(username=f'holder{i}@example.com', email=f'holder{i}@example.com') for i in range(carts)
+    ])
+    cart_ids = [cart.pk for cart in Cart.objects.bulk_create([Cart(user=user) for user in users])]
+    with connection.cursor() as cursor:
+        cursor.execute(f'''
+            INSERT INTO {StockReservation._meta.db_table} (cart_id, product_id, quantity, expires_at)
+            SELECT c.id, p.id, 1 + (c.id + p.id) %% 3, now() + (random() * 2 - 1) * interval '15 minutes'
+            FROM unnest(%s::bigint[]) AS c(id), unnest(%s::bigint[]) AS p(id)
+        ''', [cart_ids, [product.pk for product in products]])
+        cursor.execute(f'''
+            INSERT INTO {ReservedStock._meta.db_table} (product_id, quantity)
+            SELECT product_id, sum(quantity) FROM {StockReservation._meta.db_table} GROUP BY product_id
+        ''')
+        cursor.execute(f'VACUUM ANALYZE {StockReservation._meta.db_table}, {ReservedStock._meta.db_table}')
+    return products
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--carts', type=int, default=10_000)
+    parser.add_argument('--per-cart', type=int, default=100)
+    parser.add_argument('--batch-size', type=int, default=5000)
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.db import connection, transaction
+    from django.db.models import Sum
+    from django.urls import reverse
+    from django.utils import timezone
+    from rest_framework.test import APIClient
+
+    from orders.models import Cart, ReservedStock, StockReservation
+    from orders.services.reservations import _lock_counters, expire_holds
+    from orders.tests.factories import make_user
+
+    with test_database():
+        with timer() as fill_time:
+            products = fill(args.carts, args.per_cart)
+        total = StockReservation.objects.count()
+        print(f'{total} резервов, {args.carts} корзин, {args.per_cart} товаров; '
+              f'заполнение {fill_time["seconds"]:.1f} с')
+
+        hot = products[0]
+        client = APIClient()
+        client.force_authenticate(make_user('buyer@example.com'))
+        counter = {'queries': 0}
+
+        def count(execute, sql, params, many, context):
+            counter['queries'] += 1
+            return execute(sql, params, many, context)
+
+        add_times, counter_times, sum_times = [], [], []
+        for _ in range(args.repeat):
+            counter['queries'] = 0
+            with connection.execute_wrapper(count), timer() as t:
+                response = client.post(reverse('cart-add-item'), {'product_id': hot.pk, 'quantity': 1})
+            assert response.status_code == 201, response.data
+            add_times.append(t['seconds'] * 1000)
+            with transaction.atomic():
+                with timer() as t:
+                    _lock_counters([hot.pk])
+                counter_times.append(t['seconds'] * 1000)
+            with timer() as t:
+                StockReservation.objects.filter(product=hot, expires_at__gt=timezone.now()) \
+                    .aggregate(total=Sum('quantity'))
+            sum_times.append(t['seconds'] * 1000)
+        print()
+        print_table(['free stock', 'p50 ms', 'p99 ms'], [
+            ['строка ReservedStock под блокировкой', f'{percentile(counter_times, 50):.2f}',
+             f'{percentile(counter_times, 99):.2f}'],
+            [f'SUM по {args.carts} резервам товара', f'{percentile(sum_times, 50):.2f}',
+             f'{percentile(sum_times, 99):.2f}'],
+        ])
+        print(f'POST /api/cart/items/: {counter["queries"]} SQL-запросов, '
+              f'p50 {percentile(add_times, 50):.2f} мс, p99 {percentile(add_times, 99):.2f} мс')
+
+        now = timezone.now()
+        batch = (
+            StockReservation.objects.filter(expires_at__lte=now).order_by('expires_at')
+            .select_for_update(skip_locked=True).values_list('pk', 'product_id', 'quantity')[:args.batch_size]
+        )
+        with transaction.atomic(), connection.cursor() as cursor:
+            sql, params = batch.query.sql_with_params()
+            cursor.execute(f'EXPLAIN {sql}', params)
+            plan = [row[0] for row in cursor.fetchall()]
+        expired = StockReservation.objects.filter(expires_at__lte=now).count()
+        with timer() as sweep:
+            swept = expire_holds(now=now, batch_size=args.batch_size)
+        assert swept == expired, (swept, expired)
+        with timer() as idle:
+            expire_holds(now=now, batch_size=args.batch_size)
+
+        remaining = dict(StockReservation.objects.values('product_id').annotate(total=Sum('quantity'))
+                         .values_list('product_id', 'total'))
+        counters = dict(ReservedStock.objects.filter(quantity__gt=0).values_list('product_id', 'quantity'))
+        print()
+        print('\n'.join(plan))
+        print()
+        print_table(['sweep', 'reservations', 'batches', 'seconds', 'reservations/s'], [
+            ['expire_holds()', swept, -(-swept // args.batch_size), f'{sweep["seconds"]:.2f}',
+             f'{swept / sweep["seconds"]:.0f}'],
+            ['expire_holds(), нечего снимать', 0, 1, f'{idle["seconds"]:.4f}', '-'],
+        ])
+        print(f'счётчики согласованы: {remaining == counters}; корзин с резервами: '
+              f'{Cart.objects.filter(reservations__isnull=False).distinct().count()}')
+
+
+if __name__ == '__main__':
+    main()
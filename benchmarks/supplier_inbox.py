@@ -0,0 +1,103 @@
+"""
+Бенчмарк очереди поставщика на истории в 20k/200k подзаказов магазина
+(1% новых, остальные завершены): первая страница /api/shop-orders/inbox/
+со ?status=new и без фильтра, страница по курсору и сводка по статусам
+/api/shop-orders/summary/ — с индексами shop_order_inbox и
+shop_order_shop_created и без них.
+
+    python -m benchmarks.supplier_inbox [--sizes 20000 200000] [--repeat 5]
+"""
+import argparse
+
+from benchmarks.utils import median, print_table, setup_django, test_database, timer
+
+
+def fill_history(user, contact, shop, start, stop, chunk=20_000):
+    from datetime import timedelta
+
+    from django.utils import timezone
+
+    from orders.models import Order, ShopOrder
+
+    now = timezone.now()
+    for first in range(start, stop, chunk):
+        numbers = range(first, min(first + chunk, stop))
+        orders = Order.objects.bulk_create([
+            Order(user=user, delivery_contact=contact, total_amount=100) for _ in numbers
+        ])
+        ShopOrder.objects.bulk_create([
+            ShopOrder(order=order, shop=shop, total_amount=100,
+                      status=ShopOrder.STATUS_NEW if i % 100 == 0 else ShopOrder.STATUS_COMPLETED)
+            for i, order in zip(numbers, orders)
+        ])
+        # история растёт в прошлое: новые строки «старше» уже записанных
+        ShopOrder.objects.filter(order__in=orders).update(created_at=now - timedelta(minutes=first))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[20_000, 200_000])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.db import connection
+    from django.urls import reverse
+    from rest_framework.test import APIClient
+
+    from orders.tests.factories import make_contact, make_shop, make_user
+
+    with test_database():
+        shop = make_shop('Бенчмарк', 'supplier@example.com')
+        buyer = make_user('buyer@example.com')
+        contact = make_contact(buyer)
+        client = APIClient()
+        client.force_authenticate(shop.supplier.user)
+
+        def get(url, params):
+            response = client.get(url, params)
+            assert response.status_code == 200, response.content
+            return response.data
+
+        def measure(url, params):
+            times = []
+            for _ in range(args.repeat):
+                with timer() as t:
+                    get(url, params)
+                times.append(t['seconds'] * 1000)
+            return f'{median(times):.1f}'
+
+        inbox_url = reverse('shop-orders-inbox')
+        summary_url = reverse('shop-orders-summary')
+
+        def run(size, indexes):
+            with connection.cursor() as cursor:
+                cursor.execute('VACUUM ANALYZE orders_shoporder')
+            page = get(inbox_url, {'page_size': 50})
+            for _ in range(20):
+                page = get(page['next'], {})
+            cursor_url = page['next']
+            requests = [
+                ('inbox ?status=new', inbox_url, {'status': 'new', 'page_size': 50}),
+                ('inbox, все статусы', inbox_url, {'page_size': 50}),
+                ('inbox, 21-я страница', cursor_url, {}),
+                ('summary', summary_url, {}),
+            ]
+            return [[size, label, indexes, measure(url, params)] for label, url, params in requests]
+
+        rows, filled = [], 0
+        for size in args.sizes:
+            fill_history(buyer, contact, shop, filled, size)
+            filled = size
+            rows += run(size, 'есть')
+
+        with connection.cursor() as cursor:
+            cursor.execute('DROP INDEX shop_order_inbox')
+            cursor.execute('DROP INDEX shop_order_shop_created')
+        rows += run(filled, 'нет')
+
+        print_table(['подзаказов', 'запрос', 'индексы', 'median ms'], rows)
+
+
+if __name__ == '__main__':
+    main()
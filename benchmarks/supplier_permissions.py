@@ -0,0 +1,146 @@
+"""
+Бенчмарк выборок и проверок прав поставщика с 1 и 500 магазинами на
+общей истории --shop-orders подзаказов (по умолчанию 200k в 2000
+магазинах):
+
+- join — прежние условия: shop__supplier__user / supplier__user;
+- in   — shop_id IN (...) по id магазинов, вычисленным один раз за запрос.
+
+Для каждой выборки — медиана времени SQL; для API — запросы и медиана
+ответа при прогретом кэше снимков.
+
+    python -m benchmarks.supplier_permissions [--shop-orders 200000] [--shops 1 500] [--repeat 20]
+"""
+import argparse
+import random
+from datetime import timedelta
+
+from benchmarks.utils import median, print_table, setup_django, test_database, timer
+
+
+def fill(total_shops, shop_orders, owned, chunk=20_000):
+    from django.db import connection
+    from django.utils import timezone
+
+    from orders.models import Order, ShopOrder
+    from orders.tests.factories import make_contact, make_user
+    from shops.models import Shop
+    from users.models import SupplierProfile
+
+    rng = random.Random(1)
+    suppliers = {}
+    for size in owned:
+        user = make_user(f'supplier{size}@example.com')
+        profile = SupplierProfile.objects.create(user=user)
+        suppliers[size] = (user, profile)
+    others = SupplierProfile.objects.bulk_create([
+        SupplierProfile(user=make_user(f'other{i}@example.com')) for i in range(20)
+    ])
+    shops = []
+    for size, (_, profile) in suppliers.items():
+        shops += [Shop(supplier=profile, name=f'Магазин {size}-{i}', description='-') for i in range(size)]
+    shops += [Shop(supplier=others[i % len(others)], name=f'Чужой {i}', description='-')
+              for i in range(total_shops - len(shops))]
+    shop_ids = [shop.pk for shop in Shop.objects.bulk_create(shops)]
+
+    buyer = make_user('buyer@example.com')
+    contact = make_contact(buyer)
+    now = timezone.now()
+    statuses = [ShopOrder.STATUS_NEW, ShopOrder.STATUS_IN_PROGRESS, ShopOrder.STATUS_SHIPPED,
+                ShopOrder.STATUS_COMPLETED]
+    for start in range(0, shop_orders, chunk):
+        size = min(chunk, shop_orders - start)
+        orders = Order.objects.bulk_create([
+            Order(user=buyer, delivery_contact=contact, total_amount=100) for _ in range(size)
+        ])
+        ShopOrder.objects.bulk_create([
+            ShopOrder(order=order, shop_id=rng.choice(shop_ids), status=rng.choice(statuses),
+                      total_amount=100, created_at=now - timedelta(minutes=rng.randrange(500_000)))
+            for order in orders
+        ])
+    with connection.cursor() as cursor:
+        cursor.execute('VACUUM ANALYZE orders_shoporder, shops_shop')
+    return {size: user for size, (user, _) in suppliers.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--shop-orders', type=int, default=200_000)
+    parser.add_argument('--total-shops', type=int, default=2000)
+    parser.add_argument('--shops', type=int, nargs='+', default=[1, 500])
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.db import connection
+    from django.urls import reverse
+    from rest_framework.test import APIClient
+
+    from orders.models import ShopOrder
+    from orders.services.order_queries import shop_order_summary
+    from shops.models import Shop
+    from users.services.auth_cache import auth_cache, get_snapshot
+
+    with test_database():
+        suppliers = fill(args.total_shops, args.shop_orders, args.shops)
+
+        def timed(func):
+            results = []
+            for _ in range(args.repeat):
+                with timer() as t:
+                    func()
+                results.append(t['seconds'])
+            return median(results) * 1000
+
+        rows = []
+        for size, user in suppliers.items():
+            shop_ids = tuple(get_snapshot(user.pk)['shop_ids'])
+            foreign_id = Shop.objects.exclude(supplier__user=user).order_by('pk').values_list('pk', flat=True)[0]
+            scopes = {
+                'join': ShopOrder.objects.filter(shop__supplier__user=user),
+                'in': ShopOrder.objects.filter(shop_id__in=shop_ids),
+            }
+            checks = {
+                'join': lambda: Shop.objects.filter(pk=foreign_id, supplier__user=user).exists(),
+                'in': lambda: foreign_id in shop_ids,
+            }
+            for name, queryset in scopes.items():
+                inbox = queryset.order_by('-created_at', '-pk').values_list('pk', flat=True)
+                new = inbox.filter(status=ShopOrder.STATUS_NEW)
+                rows.append([size, name,
+                             f'{timed(lambda: list(inbox[:50])):.2f}',
+                             f'{timed(lambda: list(new[:50])):.2f}',
+                             f'{timed(lambda: shop_order_summary(queryset)):.2f}',
+                             f'{timed(checks[name]):.3f}'])
+        print_table(['shops', 'scope', 'inbox ms', 'inbox new ms', 'summary ms', 'ownership check ms'], rows)
+
+        def count(counter):
+            def wrapper(execute, sql, params, many, context):
+                counter['queries'] += 1
+                return execute(sql, params, many, context)
+            return wrapper
+
+        rows = []
+        for size, user in suppliers.items():
+            client = APIClient()
+            client.force_authenticate(user)
+            auth_cache.clear()
+            get_snapshot(user.pk)
+            foreign_id = Shop.objects.exclude(supplier__user=user).values_list('pk', flat=True)[0]
+            endpoints = [
+                ('inbox', lambda: client.get(reverse('shop-orders-inbox'))),
+                ('summary', lambda: client.get(reverse('shop-orders-summary'))),
+                ('foreign availability', lambda: client.patch(reverse('shop_availability', args=[foreign_id]),
+                                                              {'is_active': False}, format='json')),
+            ]
+            for label, call in endpoints:
+                counter = {'queries': 0}
+                with connection.execute_wrapper(count(counter)):
+                    ms = timed(call)
+                rows.append([size, label, f'{counter["queries"] / args.repeat:.0f}', f'{ms:.2f}'])
+        print()
+        print_table(['shops', 'endpoint', 'queries', 'median ms'], rows)
+
+
+if __name__ == '__main__':
+    main()
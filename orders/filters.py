@@ -0,0 +1,23 @@
+import django_filters
+
+from orders.models import ShopOrder
+
+
+class StatusInFilter(django_filters.BaseInFilter, django_filters.ChoiceFilter):
+    pass
+
+
+class ShopOrderFilter(django_filters.FilterSet):
+    """
+    Фильтры очереди подзаказов поставщика. Вместе с сортировкой по
+    created_at их обслуживают индексы (shop, status, created_at, id)
+    и (shop, created_at, id).
+    """
+    status = StatusInFilter(choices=ShopOrder.STATUS_CHOICES, help_text='Статусы через запятую: new,in_progress')
+    created_after = django_filters.IsoDateTimeFilter(field_name='created_at', lookup_expr='gte')
+    created_before = django_filters.IsoDateTimeFilter(field_name='created_at', lookup_expr='lt')
+    shop = django_filters.NumberFilter(field_name='shop_id')
+
+    class Meta:
+        model = ShopOrder
+        fields = ['status', 'created_after', 'created_before', 'shop']
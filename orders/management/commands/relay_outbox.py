@@ -0,0 +1,39 @@
+from django.core.management import BaseCommand
+
+from orders.services.outbox import OutboxRelay
+
+
+class Command(BaseCommand):
+    help = "Переносит задачи из outbox в брокер Celery"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Отправить всё, что накопилось, и выйти'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=OutboxRelay.batch_size,
+            help='Размер пачки задач'
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=1.0,
+            help='Пауза между опросами outbox, секунд'
+        )
+
+    def report(self, dispatched, error):
+        if dispatched:
+            self.stdout.write(f'Отправлено задач: {dispatched}')
+        if error:
+            self.stderr.write(f'Брокер недоступен: {error}')
+
+    def handle(self, *args, **options):
+        relay = OutboxRelay(batch_size=options['batch_size'])
+        if options['once']:
+            self.report(*relay.drain())
+            return
+        relay.run_forever(interval=options['interval'], on_drain=self.report)
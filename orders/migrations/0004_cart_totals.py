@@ -0,0 +1,35 @@
+# Generated by Django 5.2.4 on 2026-10-17 13:24
+
+from django.db import migrations, models
+from django.db.models import Count, F, Sum
+
+
+def fill_cart_totals(apps, schema_editor):
+    Cart = apps.get_model('orders', 'Cart')
+    CartItem = apps.get_model('orders', 'CartItem')
+    totals = (CartItem.objects.values('cart_id')
+              .annotate(total=Sum(F('quantity') * F('unit_price')), count=Count('pk'))
+              .order_by())
+    for row in totals.iterator():
+        Cart.objects.filter(pk=row['cart_id']).update(total_amount=row['total'], items_count=row['count'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0003_alter_order_delivery_contact_alter_order_status_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cart',
+            name='items_count',
+            field=models.PositiveIntegerField(default=0, help_text='Количество позиций (разных товаров) в корзине'),
+        ),
+        migrations.AddField(
+            model_name='cart',
+            name='total_amount',
+            field=models.DecimalField(decimal_places=2, default=0, help_text='Сумма позиций по ценам на момент добавления', max_digits=12),
+        ),
+        migrations.RunPython(fill_cart_totals, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.4 on 2026-10-17 13:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0004_cart_totals'),
+        ('shops', '0004_shop_catalog_version'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='shoporder',
+            index=models.Index(fields=['shop', 'status', 'created_at', 'id'], name='shop_order_inbox'),
+        ),
+        migrations.AddIndex(
+            model_name='shoporder',
+            index=models.Index(fields=['shop', 'created_at', 'id'], name='shop_order_shop_created'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.4 on 2026-10-17 13:36
+
+import django.contrib.postgres.indexes
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0005_shop_order_inbox_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StatusTransition',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('from_status', models.CharField(choices=[('new', 'Новый'), ('in_progress', 'В обработке'), ('shipped', 'Отправлен'), ('completed', 'Завершён'), ('cancelled', 'Отменён')], max_length=20)),
+                ('to_status', models.CharField(choices=[('new', 'Новый'), ('in_progress', 'В обработке'), ('shipped', 'Отправлен'), ('completed', 'Завершён'), ('cancelled', 'Отменён')], max_length=20)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('changed_by', models.ForeignKey(blank=True, help_text='Кто сменил статус; пусто — система', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('order', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='status_log', to='orders.order')),
+                ('shop_order', models.ForeignKey(blank=True, db_index=False, help_text='Пусто, если менялся статус самого заказа', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='status_log', to='orders.shoporder')),
+            ],
+            options={
+                'indexes': [django.contrib.postgres.indexes.BrinIndex(fields=['created_at'], name='status_log_created_brin'), models.Index(fields=['order', 'created_at'], name='status_log_order_created'), models.Index(condition=models.Q(('shop_order__isnull', False)), fields=['shop_order', 'created_at'], name='status_log_shop_order_created')],
+            },
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.4 on 2026-10-17 16:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0008_stock_reservations'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='outboxmessage',
+            name='outbox_pending',
+        ),
+        migrations.AddField(
+            model_name='outboxmessage',
+            name='failed_at',
+            field=models.DateTimeField(blank=True, help_text='Когда запись признана неотправляемой', null=True),
+        ),
+        migrations.AddIndex(
+            model_name='outboxmessage',
+            index=models.Index(condition=models.Q(('dispatched_at__isnull', True), ('failed_at__isnull', True)), fields=['id'], name='outbox_pending'),
+        ),
+    ]
@@ -1,7 +1,11 @@
 from decimal import Decimal
 
 from django.conf import settings
-from django.db import models
+from django.contrib.postgres.indexes import BrinIndex
+from django.db import models, transaction
+from django.db.models import Count, F, Sum
+from django.utils import timezone
+from django.utils.functional import cached_property
 
 from products.models import Product
 from shops.models import Shop
@@ -9,34 +13,113 @@ from shops.models import Shop
 
 class Cart(models.Model):
     """
-    Корзина текущих товаров у пользователя
+    Корзина текущих товаров у пользователя.
+
+    Сумма и число позиций хранятся в самой корзине и сдвигаются при
+    каждом изменении (add_item, remove_item, clear), поэтому чтение
+    корзины их не пересчитывает. Сумма считается по ценам позиций на
+    момент добавления (CartItem.unit_price) — по ним же оформляется заказ.
     """
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
         related_name='carts'
     )
+    total_amount = models.DecimalField(
+        max_digits=12,
+        decimal_places=2,
+        default=0,
+        help_text='Сумма позиций по ценам на момент добавления'
+    )
+    items_count = models.PositiveIntegerField(
+        default=0,
+        help_text='Количество позиций (разных товаров) в корзине'
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    TOTAL_FIELDS = ['total_amount', 'items_count', 'updated_at']
+
+    @cached_property
+    def lines(self):
+        """
+        Позиции с товаром и магазином. orders.services.cart.load_cart()
+        заполняет их тем же запросом, которым читает корзину.
+        """
+        return list(self.items.select_related('product__shop').order_by('pk'))
+
+    def lock_for_update(self):
+        """
+        Блокирует строку корзины до конца транзакции и перечитывает итоги:
+        изменения одной корзины выполняются по очереди и не затирают
+        чужой сдвиг. Вызывается внутри transaction.atomic().
+        """
+        self.total_amount, self.items_count = (
+            Cart.objects.select_for_update()
+            .filter(pk=self.pk)
+            .values_list('total_amount', 'items_count')
+            .get()
+        )
+        self.__dict__.pop('lines', None)
+
+    def shift_totals(self, amount, lines):
+        self.total_amount += amount
+        self.items_count += lines
+        self.save(update_fields=self.TOTAL_FIELDS)
+
+    @transaction.atomic
     def add_item(self, product, qty=1):
-        item, created = self.items.get_or_create(product=product, defaults={'quantity': qty})
+        """
+        Добавляет товар или увеличивает его количество. Цена фиксируется
+        в unit_price при первом добавлении товара в корзину.
+        """
+        self.lock_for_update()
+        item, created = self.items.get_or_create(
+            product=product,
+            defaults={'quantity': qty, 'unit_price': product.price}
+        )
         if not created:
             item.quantity += qty
             item.save(update_fields=['quantity'])
+        self.shift_totals(qty * item.unit_price, 1 if created else 0)
         return item
 
-    def remove_item(self, product):
-        self.items.filter(product=product).delete()
+    @transaction.atomic
+    def remove_item(self, product, qty=None):
+        """
+        Убирает qty единиц товара, а без qty или при qty не меньше
+        количества в корзине — всю позицию. Возвращает False, если
+        товара в корзине нет.
+        """
+        self.lock_for_update()
+        item = self.items.filter(product=product).first()
+        if item is None:
+            return False
+        if qty is None or qty >= item.quantity:
+            removed, lines = item.quantity, 1
+            item.delete()
+        else:
+            removed, lines = qty, 0
+            item.quantity -= qty
+            item.save(update_fields=['quantity'])
+        self.shift_totals(-removed * item.unit_price, -lines)
+        return True
 
+    @transaction.atomic
     def clear(self):
+        self.lock_for_update()
         self.items.all().delete()
-
-    def get_total(self):
-        total = Decimal('0')
-        for item in self.items.select_related('product'):
-            total += item.get_subtotal()
-        return total
+        self.shift_totals(-self.total_amount, -self.items_count)
+
+    def recalculate_totals(self):
+        """
+        Пересчитывает итоги по позициям — после записи позиций в обход
+        add_item (bulk_create) или для проверки согласованности.
+        """
+        totals = self.items.aggregate(total=Sum(F('quantity') * F('unit_price')), count=Count('pk'))
+        self.total_amount = totals['total'] or Decimal('0')
+        self.items_count = totals['count']
+        self.save(update_fields=self.TOTAL_FIELDS)
 
     def __str__(self):
         return f"Cart #{self.id} {self.user.email}"
@@ -67,15 +150,104 @@ class CartItem(models.Model):
         unique_together = ('cart', 'product')
 
     def get_subtotal(self):
-        return self.product.price * self.quantity
+        return self.unit_price * self.quantity
+
+    def price_changed(self):
+        return self.product.price != self.unit_price
 
     def __str__(self):
         return f"{self.quantity} x {self.product.name}"
 
 
+class StockReservation(models.Model):
+    """
+    Мягкий резерв товара под позицию корзины: пока резерв действует,
+    эти единицы не может добавить в корзину или оформить другой
+    покупатель. Резерв ставится и продлевается при добавлении товара
+    в корзину, уменьшается вместе с позицией, при оформлении заказа
+    превращается в списание остатка, а по истечении expires_at его
+    снимает периодическая задача expire_stock_reservations.
+
+    Сумма действующих резервов по товару хранится в ReservedStock и
+    сдвигается в той же транзакции (orders.services.reservations),
+    поэтому свободный остаток — quantity - reserved — читается одной
+    строкой, сколько бы корзин ни держали товар. Индекс по expires_at —
+    для выборки истёкших резервов пачками.
+    """
+    cart = models.ForeignKey(
+        Cart,
+        on_delete=models.CASCADE,
+        related_name='reservations'
+    )
+    product = models.ForeignKey(
+        Product,
+        on_delete=models.CASCADE,
+        related_name='reservations'
+    )
+    quantity = models.PositiveIntegerField()
+    expires_at = models.DateTimeField()
+
+    class Meta:
+        unique_together = ('cart', 'product')
+        indexes = [
+            models.Index(fields=['expires_at'], name='reservation_expires_at'),
+        ]
+
+    def __str__(self):
+        return f'{self.quantity} x #{self.product_id} для корзины #{self.cart_id} до {self.expires_at}'
+
+
+class ReservedStock(models.Model):
+    """
+    Сколько единиц товара удерживают действующие резервы корзин —
+    сумма StockReservation.quantity по товару. Строка создаётся при
+    первом резерве товара.
+    """
+    product = models.OneToOneField(
+        Product,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='reserved_stock'
+    )
+    quantity = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f'#{self.product_id}: {self.quantity} в резерве'
+
+
+class InvalidTransition(ValueError):
+    """
+    Переход из текущего статуса в запрошенный не разрешён.
+    """
+    def __init__(self, obj, new_status, message=None):
+        self.current = obj.status
+        self.new_status = new_status
+        super().__init__(message or f'Невозможно перевести {type(obj).__name__} #{obj.pk} '
+                                    f'из статуса {obj.status} в {new_status}')
+
+
+class TransitionConflict(InvalidTransition):
+    """
+    Статус успели изменить параллельно: compare-and-set не прошёл,
+    obj.status перечитан из БД.
+    """
+    def __init__(self, obj, new_status):
+        super().__init__(obj, new_status, f'Статус {type(obj).__name__} #{obj.pk} уже изменён '
+                                          f'на {obj.status}, повторите запрос')
+
+
 class StatusMixin(models.Model):
     """
-    Абстрактный класс с константами статусов и методами их изменения.
+    Абстрактный класс со статусами и конечным автоматом переходов
+    между ними, общий для Order и ShopOrder.
+
+    Переход выполняется как compare-and-set:
+
+        UPDATE ... SET status = new WHERE id = … AND status = old
+
+    поэтому из двух параллельных переходов одного объекта проходит
+    только один, второй получает TransitionConflict. Каждый переход
+    записывается в журнал StatusTransition.
     """
     STATUS_NEW = 'new'
     STATUS_IN_PROGRESS = 'in_progress'
@@ -91,6 +263,19 @@ class StatusMixin(models.Model):
         (STATUS_CANCELLED, 'Отменён'),
     ]
 
+    # допустимые переходы: из какого статуса в какие
+    TRANSITIONS = {
+        STATUS_NEW: {STATUS_IN_PROGRESS, STATUS_CANCELLED},
+        STATUS_IN_PROGRESS: {STATUS_SHIPPED, STATUS_CANCELLED},
+        STATUS_SHIPPED: {STATUS_COMPLETED, STATUS_CANCELLED},
+        STATUS_COMPLETED: set(),
+        STATUS_CANCELLED: set(),
+    }
+    TERMINAL_STATUSES = (STATUS_COMPLETED, STATUS_CANCELLED)
+
+    # поля записи журнала -> атрибуты объекта
+    LOG_FIELDS = {}
+
     status = models.CharField(
         max_length=20,
         choices=STATUS_CHOICES,
@@ -101,12 +286,89 @@ class StatusMixin(models.Model):
     class Meta:
         abstract = True
 
-    def set_status(self, new_status):
+    @classmethod
+    def sources_for(cls, new_status):
+        """
+        Статусы, из которых разрешён переход в new_status.
+        """
+        return [status for status, targets in cls.TRANSITIONS.items() if new_status in targets]
+
+    def can_transition(self, new_status):
+        return new_status in self.TRANSITIONS[self.status]
+
+    @transaction.atomic
+    def transition_to(self, new_status, changed_by=None):
+        """
+        Переводит объект в new_status, если переход разрешён и статус
+        в БД всё ещё self.status. Иначе — InvalidTransition или
+        TransitionConflict.
+        """
         if new_status not in dict(self.STATUS_CHOICES):
             raise ValueError(f'Неверный статус: {new_status}')
-        self.status = new_status
-        # при изменении статуса автоматически обновим метку
-        self.save(update_fields=['status'])
+        if not self.can_transition(new_status):
+            raise InvalidTransition(self, new_status)
+
+        old_status, now = self.status, timezone.now()
+        updated = type(self).objects.filter(pk=self.pk, status=old_status).update(
+            status=new_status, updated_at=now
+        )
+        if not updated:
+            self.status = type(self).objects.values_list('status', flat=True).get(pk=self.pk)
+            raise TransitionConflict(self, new_status)
+
+        self.status, self.updated_at = new_status, now
+        StatusTransition.objects.create(
+            from_status=old_status,
+            to_status=new_status,
+            changed_by=changed_by,
+            **{field: getattr(self, attr) for field, attr in self.LOG_FIELDS.items()},
+        )
+        return self
+
+    @classmethod
+    def apply_transitions(cls, rows, new_status, changed_by=None):
+        """
+        Пакетный переход: rows — словари с pk, status и атрибутами из
+        LOG_FIELDS, прочитанные под select_for_update. Одним UPDATE с
+        условием status IN (<откуда разрешён переход>) и одним INSERT
+        в журнал. Строки, из статуса которых переход не разрешён,
+        пропускаются; возвращаются применённые.
+        """
+        sources = cls.sources_for(new_status)
+        rows = [row for row in rows if row['status'] in sources]
+        if not rows:
+            return []
+        cls.objects.filter(pk__in=[row['pk'] for row in rows], status__in=sources).update(
+            status=new_status, updated_at=timezone.now()
+        )
+        StatusTransition.objects.bulk_create([
+            StatusTransition(
+                from_status=row['status'],
+                to_status=new_status,
+                changed_by=changed_by,
+                **{field: row[attr] for field, attr in cls.LOG_FIELDS.items()},
+            )
+            for row in rows
+        ])
+        return rows
+
+    @classmethod
+    def transition_many(cls, queryset, new_status, changed_by=None):
+        """
+        Переводит в new_status все объекты queryset, для которых переход
+        разрешён: строки блокируются, затем apply_transitions.
+        """
+        rows = list(
+            queryset
+            .filter(status__in=cls.sources_for(new_status))
+            .select_for_update(of=('self',))
+            .order_by('pk')
+            .values('pk', 'status', *cls.LOG_FIELDS.values())
+        )
+        return cls.apply_transitions(rows, new_status, changed_by)
+
+    def set_status(self, new_status):
+        return self.transition_to(new_status)
 
     def start_processing(self):
         self.set_status(self.STATUS_IN_PROGRESS)
@@ -125,6 +387,17 @@ class Order(StatusMixin):
     """
     Общий заказ, объединяющий подзаказы по магазинам.
     """
+    # статус заказа следует за подзаказами: когда все они в конечном
+    # статусе, заказ закрывается из любого открытого статуса
+    TRANSITIONS = {
+        **StatusMixin.TRANSITIONS,
+        StatusMixin.STATUS_NEW: {StatusMixin.STATUS_IN_PROGRESS, StatusMixin.STATUS_COMPLETED,
+                                 StatusMixin.STATUS_CANCELLED},
+        StatusMixin.STATUS_IN_PROGRESS: {StatusMixin.STATUS_SHIPPED, StatusMixin.STATUS_COMPLETED,
+                                         StatusMixin.STATUS_CANCELLED},
+    }
+    LOG_FIELDS = {'order_id': 'pk'}
+
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
@@ -158,6 +431,8 @@ class ShopOrder(StatusMixin):
     """
     Подзаказ конкретного магазина в рамках одного Order.
     """
+    LOG_FIELDS = {'order_id': 'order_id', 'shop_order_id': 'pk'}
+
     order = models.ForeignKey(
         Order, on_delete=models.CASCADE,
         related_name='shop_orders'
@@ -174,6 +449,11 @@ class ShopOrder(StatusMixin):
 
     class Meta:
         unique_together = (('order', 'shop'),)
+        indexes = [
+            # очередь поставщика: ?status=… и сортировка по дате создания
+            models.Index(fields=['shop', 'status', 'created_at', 'id'], name='shop_order_inbox'),
+            models.Index(fields=['shop', 'created_at', 'id'], name='shop_order_shop_created'),
+        ]
 
     def calculate_total(self):
         total = sum(
@@ -188,6 +468,61 @@ class ShopOrder(StatusMixin):
         return f"ShopOrder #{self.id} for {self.shop.name}"
 
 
+class StatusTransition(models.Model):
+    """
+    Журнал смен статусов заказов и подзаказов. Записи только
+    добавляются: изменить или удалить запись нельзя (кроме каскада
+    при удалении самого заказа).
+
+    BRIN-индекс по created_at — для выборок за период по всему журналу:
+    строки пишутся в порядке времени, и индекс остаётся крошечным.
+    История одного заказа или подзаказа читается по (order, created_at)
+    и (shop_order, created_at).
+    """
+    order = models.ForeignKey(
+        Order, on_delete=models.CASCADE,
+        related_name='status_log',
+        db_index=False
+    )
+    shop_order = models.ForeignKey(
+        ShopOrder, on_delete=models.CASCADE,
+        related_name='status_log',
+        null=True, blank=True,
+        db_index=False,
+        help_text='Пусто, если менялся статус самого заказа'
+    )
+    from_status = models.CharField(max_length=20, choices=StatusMixin.STATUS_CHOICES)
+    to_status = models.CharField(max_length=20, choices=StatusMixin.STATUS_CHOICES)
+    changed_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True, blank=True,
+        related_name='+',
+        help_text='Кто сменил статус; пусто — система'
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            BrinIndex(fields=['created_at'], name='status_log_created_brin'),
+            models.Index(fields=['order', 'created_at'], name='status_log_order_created'),
+            models.Index(fields=['shop_order', 'created_at'], condition=models.Q(shop_order__isnull=False),
+                         name='status_log_shop_order_created'),
+        ]
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValueError('Журнал статусов только пополняется')
+        super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        raise ValueError('Журнал статусов только пополняется')
+
+    def __str__(self):
+        target = f'ShopOrder #{self.shop_order_id}' if self.shop_order_id else f'Order #{self.order_id}'
+        return f'{target}: {self.from_status} -> {self.to_status}'
+
+
 class ShopOrderItem(models.Model):
     """
     Товар в конкретном ShopOrder.
@@ -241,3 +576,38 @@ class OrderItem(models.Model):
 
     def __str__(self):
         return f"{self.quantity} x {self.product.name}, цена за единицу: {self.unit_price}"
+
+
+class OutboxMessage(models.Model):
+    """
+    Задача Celery, которую нужно поставить после фиксации транзакции.
+
+    Запись создаётся в той же транзакции, что и данные, к которым
+    относится задача (см. orders.services.outbox.publish): откат
+    транзакции отменяет и задачу, а недоступность брокера не мешает
+    фиксации. В брокер записи переносит relay_outbox.
+
+    Запись, которую отправить нельзя в принципе (задача не
+    зарегистрирована), получает failed_at и больше не выбирается:
+    повторять её бессмысленно, а в начале каждой пачки она задерживала
+    бы остальные.
+
+    Частичный индекс покрывает только ожидающие отправки записи, поэтому
+    выборка очередной пачки не читает историю.
+    """
+    task = models.CharField(max_length=200, help_text='Имя задачи Celery')
+    args = models.JSONField(default=list)
+    created_at = models.DateTimeField(auto_now_add=True)
+    dispatched_at = models.DateTimeField(null=True, blank=True)
+    failed_at = models.DateTimeField(null=True, blank=True, help_text='Когда запись признана неотправляемой')
+    attempts = models.PositiveIntegerField(default=0, help_text='Неудачные попытки отправки в брокер')
+    last_error = models.TextField(blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['id'], condition=models.Q(dispatched_at__isnull=True, failed_at__isnull=True),
+                         name='outbox_pending'),
+        ]
+
+    def __str__(self):
+        return f'{self.task}{tuple(self.args)}'
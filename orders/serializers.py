@@ -1,20 +1,33 @@
 from django.db.models import Sum
 from rest_framework import serializers
-from rest_framework.generics import get_object_or_404
+from rest_framework.exceptions import NotFound
 
-from orders.models import CartItem, Cart, OrderItem, Order, ShopOrderItem, ShopOrder
+from orders.models import CartItem, Cart, OrderItem, Order, ShopOrderItem, ShopOrder, StatusMixin
+from orders.services.cart import ACTION_ADD, ACTION_REMOVE, ACTION_SET, ACTIONS
 from products.models import Product
+from products.services.availability import availability_cache
 from users.models import DeliveryContact
 
+BULK_CART_MAX_LINES = 1000
+BULK_SHOP_ORDER_MAX_IDS = 1000
+
 
 class CartItemSerializer(serializers.ModelSerializer):
-    product_id = serializers.IntegerField(source='product.id', read_only=True)
+    product_id = serializers.IntegerField(read_only=True)
     product_name = serializers.CharField(source='product.name', read_only=True)
     shop = serializers.CharField(source='product.shop.name', read_only=True)
     unit_price = serializers.DecimalField(
         max_digits=10,
         decimal_places=2,
-        read_only=True)
+        read_only=True,
+        help_text='Цена на момент добавления — по ней считается сумма и оформляется заказ')
+    current_price = serializers.DecimalField(
+        source='product.price',
+        max_digits=10,
+        decimal_places=2,
+        read_only=True,
+        help_text='Текущая цена товара в каталоге')
+    price_changed = serializers.BooleanField(read_only=True)
     total_price = serializers.ReadOnlyField(source='get_subtotal')
 
     class Meta:
@@ -24,6 +37,8 @@ class CartItemSerializer(serializers.ModelSerializer):
             'product_name',
             'shop',
             'unit_price',
+            'current_price',
+            'price_changed',
             'quantity',
             'total_price',
         ]
@@ -31,42 +46,59 @@ class CartItemSerializer(serializers.ModelSerializer):
 
 class CartSerializer(serializers.ModelSerializer):
     cart_id = serializers.IntegerField(source='id', read_only=True)
-    items = CartItemSerializer(many=True, read_only=True)
-    total = serializers.ReadOnlyField(source='get_total')
+    items = CartItemSerializer(source='lines', many=True, read_only=True)
+    items_count = serializers.IntegerField(read_only=True)
+    total = serializers.ReadOnlyField(source='total_amount')
 
     class Meta:
         model = Cart
-        fields = ('cart_id', 'items', 'total')
+        fields = ('cart_id', 'items', 'items_count', 'total')
 
 
 class AddCartItemSerializer(serializers.Serializer):
     product_id = serializers.IntegerField()
     quantity = serializers.IntegerField(min_value=1)
 
-    def validate(self, data):
+    @staticmethod
+    def _check(availability, quantity):
+        """
+        Ошибка, из-за которой товар нельзя добавить в корзину в
+        количестве quantity (с учётом уже лежащего в ней), или None.
+        """
         # 1 Проверяем, существует ли товар по айди
-        try:
-            product = get_object_or_404(Product.objects.select_related('shop'), pk=data['product_id'])
-        except Product.DoesNotExist:
-            raise serializers.ValidationError('Товар не найден')
-
-        # 2 Проверяем, активен ли магазин
-        if not product.shop.is_active:
-            raise serializers.ValidationError(f'Магазин {product.shop.name} временно не принимает заказы')
+        if availability is None:
+            return NotFound('Товар не найден')
+
+        # 2 Проверяем, не снят ли товар с продажи и активен ли магазин
+        if not availability['is_active']:
+            return serializers.ValidationError('Товар снят с продажи')
+        if not availability['shop_is_active']:
+            return serializers.ValidationError(
+                f"Магазин {availability['shop_name']} временно не принимает заказы"
+            )
 
-        # 3 Проверяем, достаточно ли товара на складе
-        if data['quantity'] > product.quantity:
-            raise serializers.ValidationError('Недостаточно товара на складе')
+        # 3 Проверяем, чтобы количество товара не превышало остаток на складе
+        if quantity > availability['quantity']:
+            return serializers.ValidationError('Недостаточно товара на складе')
+        return None
 
-        # 4 Проверяем, сколько товара уже в корзине
+    def validate(self, data):
+        # сколько товара уже в корзине
         cart, _ = Cart.objects.get_or_create(user=self.context['request'].user)
-        existing_quantity = CartItem.objects.filter(cart=cart, product=product) \
+        existing_quantity = CartItem.objects.filter(cart=cart, product_id=data['product_id']) \
                              .aggregate(total_quantity=Sum('quantity'))['total_quantity'] or 0
-
-        # 5 Проверяем, чтобы количество товара не превышало остаток на складе
-        if (data['quantity'] + existing_quantity) > product.quantity:
-            raise serializers.ValidationError('Недостаточно товара на складе')
-
+        quantity = data['quantity'] + existing_quantity
+
+        # наличие и активность — из кэша наличия, без чтения строки
+        # товара; кэш может отставать, поэтому отказ подтверждается по БД,
+        # а окончательно остаток проверяется резервом и при оформлении
+        error = self._check(availability_cache.get(data['product_id']), quantity)
+        if error is not None:
+            error = self._check(availability_cache.get(data['product_id'], fresh=True), quantity)
+        if error is not None:
+            raise error
+
+        data['cart'] = cart
         return data
 
 
@@ -80,6 +112,26 @@ class RemoveCartItemSerializer(serializers.Serializer):
         return pk
 
 
+class CartLineSerializer(serializers.Serializer):
+    product_id = serializers.IntegerField()
+    quantity = serializers.IntegerField(min_value=0, required=False)
+    action = serializers.ChoiceField(choices=ACTIONS, default=ACTION_ADD)
+
+    def validate(self, data):
+        quantity = data.get('quantity')
+        if data['action'] == ACTION_ADD and not quantity:
+            raise serializers.ValidationError({'quantity': 'Укажите количество больше нуля'})
+        if data['action'] == ACTION_SET and quantity is None:
+            raise serializers.ValidationError({'quantity': 'Укажите количество'})
+        if data['action'] == ACTION_REMOVE and quantity == 0:
+            raise serializers.ValidationError({'quantity': 'Укажите количество больше нуля'})
+        return data
+
+
+class BulkCartSerializer(serializers.Serializer):
+    items = CartLineSerializer(many=True, allow_empty=False, max_length=BULK_CART_MAX_LINES)
+
+
 class ConfirmOrderSerializer(serializers.Serializer):
     cart_id = serializers.IntegerField()
     contact_id = serializers.IntegerField()
@@ -159,8 +211,8 @@ class ShopOrderItemSerializer(serializers.ModelSerializer):
 
 
 class ShopOrderSerializer(serializers.ModelSerializer):
-    order_id = serializers.IntegerField(source='order.id', read_only=True)
-    shop_id = serializers.IntegerField(source='shop.id', read_only=True)
+    order_id = serializers.IntegerField(read_only=True)
+    shop_id = serializers.IntegerField(read_only=True)
     shop_order_id = serializers.IntegerField(source='id', read_only=True)
     shop = serializers.CharField(source='shop.name', read_only=True)
     status_from_shop = serializers.CharField(source='status', read_only=True)
@@ -187,6 +239,38 @@ class ShopOrderSerializer(serializers.ModelSerializer):
         )
 
 
+class ShopOrderInboxSerializer(serializers.ModelSerializer):
+    """
+    Строка очереди подзаказов поставщика — без списка позиций.
+    """
+    order_id = serializers.IntegerField(read_only=True)
+    shop_id = serializers.IntegerField(read_only=True)
+    shop_order_id = serializers.IntegerField(source='id', read_only=True)
+    shop = serializers.CharField(source='shop.name', read_only=True)
+    status_from_shop = serializers.CharField(source='status', read_only=True)
+    suborder_total_amount = serializers.DecimalField(
+                                source='total_amount',
+                                max_digits=12,
+                                decimal_places=2,
+                                read_only=True
+                            )
+    items_count = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = ShopOrder
+        fields = (
+            'order_id',
+            'shop_order_id',
+            'shop_id',
+            'shop',
+            'status_from_shop',
+            'created_at',
+            'updated_at',
+            'suborder_total_amount',
+            'items_count',
+        )
+
+
 class OrderSerializer(serializers.ModelSerializer):
     order_id = serializers.IntegerField(source='id', read_only=True)
     status = serializers.CharField(read_only=True)
@@ -222,17 +306,18 @@ class OrderStatusSerializer(serializers.Serializer):
         new_state = data['status']
         old_state = order.status
 
-        allowed = {
-            Order.STATUS_NEW: {Order.STATUS_IN_PROGRESS, Order.STATUS_CANCELLED},
-            Order.STATUS_IN_PROGRESS: {Order.STATUS_SHIPPED, Order.STATUS_CANCELLED},
-            Order.STATUS_SHIPPED: {Order.STATUS_COMPLETED, Order.STATUS_CANCELLED},
-            Order.STATUS_COMPLETED: set(),
-            Order.STATUS_CANCELLED: set(),
-        }
-        if new_state not in allowed[old_state]:
+        # вручную — только по базовой таблице: обходные переходы в
+        # «завершён» из Order.TRANSITIONS оставлены для закрытия заказа
+        # по подзаказам (close_finished_orders)
+        if new_state not in StatusMixin.TRANSITIONS[old_state]:
             raise serializers.ValidationError(
                 f"Невозможно перевести заказ в состояние {new_state}"
             )
+        if new_state == Order.STATUS_COMPLETED and \
+                order.shop_orders.exclude(status__in=ShopOrder.TERMINAL_STATUSES).exists():
+            raise serializers.ValidationError(
+                'Нельзя завершить заказ, пока не завершены все подзаказы'
+            )
         return data
 
 
@@ -241,3 +326,15 @@ class ShopOrderStatusSerializer(serializers.Serializer):
     Для смены статуса конкретного ShopOrder.
     """
     status = serializers.ChoiceField(choices=ShopOrder.STATUS_CHOICES)
+
+
+class BulkShopOrderStatusSerializer(serializers.Serializer):
+    """
+    Для смены статуса сразу у нескольких ShopOrder.
+    """
+    ids = serializers.ListField(
+        child=serializers.IntegerField(),
+        allow_empty=False,
+        max_length=BULK_SHOP_ORDER_MAX_IDS
+    )
+    status = serializers.ChoiceField(choices=ShopOrder.STATUS_CHOICES)
@@ -0,0 +1,189 @@
+from decimal import Decimal
+
+from django.db import transaction
+
+from orders.models import Cart, CartItem
+from orders.services.reservations import hold_stock, trim_holds
+from orders.services.stock import InsufficientStock
+from products.models import Product
+
+ACTION_ADD = 'add'
+ACTION_SET = 'set'
+ACTION_REMOVE = 'remove'
+ACTIONS = (ACTION_ADD, ACTION_SET, ACTION_REMOVE)
+
+CART_ITEM_FIELDS = [
+    'quantity',
+    'unit_price',
+    'cart__user_id',
+    'cart__total_amount',
+    'cart__items_count',
+    'product__name',
+    'product__price',
+    'product__shop__name',
+]
+
+
+def load_cart(user) -> Cart:
+    """
+    Корзина пользователя вместе с позициями, товарами и магазинами
+    одним запросом: строки выбираются от CartItem с JOIN корзины,
+    товара и магазина, а корзина берётся из первой строки. Отдельный
+    запрос к Cart нужен, только если корзина пуста.
+
+    Позиции доступны как cart.lines — их и сериализует CartSerializer.
+    """
+    items = list(
+        CartItem.objects
+        .filter(cart__user=user)
+        .select_related('cart', 'product__shop')
+        .only(*CART_ITEM_FIELDS)
+        .order_by('pk')
+    )
+    if items:
+        cart = items[0].cart
+    else:
+        cart, _ = Cart.objects.get_or_create(user=user)
+    for item in items:
+        item.cart = cart
+    cart.lines = items
+    return cart
+
+
+class CartUpdateError(ValueError):
+    """
+    Строки пакетного изменения корзины, которые нельзя применить:
+    errors — список {'index', 'product_id', 'detail'}.
+    """
+    def __init__(self, errors):
+        self.errors = errors
+        super().__init__('Корзина не изменена: есть ошибки в строках')
+
+
+class BulkCartUpdate:
+    """
+    Применяет к корзине список строк {product_id, quantity, action}:
+
+        add    — добавить quantity единиц;
+        set    — установить количество (0 — убрать позицию);
+        remove — убрать quantity единиц, без quantity — всю позицию.
+
+    Число запросов не зависит от числа строк: товары с магазинами и
+    текущие позиции корзины читаются двумя запросами, остатки и
+    активность магазинов проверяются в памяти, позиции записываются
+    одним INSERT ... ON CONFLICT и одним DELETE, итоги корзины
+    сдвигаются одним UPDATE.
+
+    Всё выполняется под блокировкой корзины в одной транзакции: если
+    хотя бы одна строка не проходит проверку, выбрасывается
+    CartUpdateError со всеми ошибками и корзина не меняется. Строки
+    с одним товаром применяются по порядку.
+
+    Резервы выросших позиций ставятся и продлеваются одним вызовом
+    hold_stock (не хватает свободного остатка — тоже CartUpdateError),
+    резервы уменьшенных и удалённых урезаются.
+    """
+    def __init__(self, cart: Cart, lines):
+        self.cart = cart
+        self.lines = lines
+
+    def _load_products(self, product_ids):
+        return Product.objects.select_related('shop').only(
+            'price', 'quantity', 'is_active', 'shop__name', 'shop__is_active'
+        ).in_bulk(product_ids)
+
+    def _load_items(self, product_ids):
+        return {
+            item.product_id: item
+            for item in CartItem.objects.filter(cart=self.cart, product_id__in=product_ids)
+        }
+
+    @staticmethod
+    def _new_quantity(line, current):
+        qty = line.get('quantity')
+        if line['action'] == ACTION_ADD:
+            return current + qty
+        if line['action'] == ACTION_SET:
+            return qty
+        return 0 if qty is None else max(current - qty, 0)
+
+    @staticmethod
+    def _check(product, line, current, quantity):
+        if product is None:
+            return 'Товар не найден'
+        if line['action'] == ACTION_REMOVE and not current:
+            return 'Товара нет в корзине'
+        if quantity <= current:
+            # уменьшать количество можно и у снятого с продажи товара
+            return None
+        if not product.is_active:
+            return 'Товар снят с продажи'
+        if not product.shop.is_active:
+            return f'Магазин {product.shop.name} временно не принимает заказы'
+        if quantity > product.quantity:
+            return 'Недостаточно товара на складе'
+        return None
+
+    @transaction.atomic
+    def run(self):
+        product_ids = {line['product_id'] for line in self.lines}
+        self.cart.lock_for_update()
+        products = self._load_products(product_ids)
+        items = self._load_items(product_ids)
+
+        quantities = {pk: item.quantity for pk, item in items.items()}
+        errors = []
+        for index, line in enumerate(self.lines):
+            product_id = line['product_id']
+            current = quantities.get(product_id, 0)
+            quantity = self._new_quantity(line, current)
+            detail = self._check(products.get(product_id), line, current, quantity)
+            if detail:
+                errors.append({'index': index, 'product_id': product_id, 'detail': detail})
+            else:
+                quantities[product_id] = quantity
+        if errors:
+            raise CartUpdateError(errors)
+
+        grown = {pk: qty for pk, qty in quantities.items() if qty > (items[pk].quantity if pk in items else 0)}
+        try:
+            hold_stock(self.cart, grown)
+        except InsufficientStock as e:
+            last_index = {line['product_id']: index for index, line in enumerate(self.lines)}
+            raise CartUpdateError([
+                {'index': last_index[pk], 'product_id': pk, 'detail': str(e)} for pk in e.product_ids
+            ])
+
+        upsert, delete = [], []
+        amount, lines = Decimal('0'), 0
+        for product_id, quantity in quantities.items():
+            item = items.get(product_id)
+            old = item.quantity if item else 0
+            if quantity == old:
+                continue
+            # цена фиксируется при первом добавлении товара в корзину
+            unit_price = item.unit_price if item else products[product_id].price
+            amount += (quantity - old) * unit_price
+            if quantity:
+                upsert.append(CartItem(cart=self.cart, product_id=product_id,
+                                       quantity=quantity, unit_price=unit_price))
+                lines += 0 if item else 1
+            else:
+                delete.append(product_id)
+                lines -= 1
+
+        if upsert:
+            CartItem.objects.bulk_create(
+                upsert,
+                update_conflicts=True,
+                unique_fields=['cart', 'product'],
+                update_fields=['quantity'],
+            )
+        if delete:
+            CartItem.objects.filter(cart=self.cart, product_id__in=delete).delete()
+        if upsert or delete:
+            self.cart.shift_totals(amount, lines)
+        shrunk = [pk for pk, qty in quantities.items() if pk in items and qty < items[pk].quantity]
+        if shrunk:
+            trim_holds(self.cart, shrunk)
+        return self.cart
@@ -0,0 +1,140 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import F
+
+from orders.models import Cart, CartItem, Order, ShopOrder, ShopOrderItem
+from orders.services.outbox import publish
+from orders.services.reservations import release_holds
+from orders.services.stock import InsufficientStock, lock_reserved, reserve_stock
+from products.services.availability import availability_cache
+from users.models import DeliveryContact
+from users.tasks import send_order_confirmation_email
+
+
+class CheckoutService:
+    """
+    Оформляет корзину в Order + ShopOrder/ShopOrderItem.
+
+    Количество запросов к БД не зависит от числа позиций в корзине:
+    строки корзины читаются одним запросом, подзаказы и их позиции
+    создаются через bulk_create, суммы считаются в памяти, а остатки
+    списываются одним UPDATE для всех товаров сразу.
+
+    Всё выполняется в одной транзакции: если хотя бы одной позиции
+    не хватает на складе, выбрасывается InsufficientStock и заказ
+    не создаётся вовсе. До блокировки строк товаров корзина сверяется
+    с кэшем наличия: когда «горячий» товар уже распродан, оформления
+    отказывают сразу, не выстраиваясь в очередь за его строкой (отказ
+    подтверждается чтением без блокировки).
+    Резервы корзины снимаются перед списанием: зарезервированные ею
+    единицы становятся свободными и списываются, а чужие резервы
+    reserve_stock не трогает.
+    Письмо-подтверждение ставится через outbox
+    в той же транзакции, так что задача не увидит недостроенный или
+    откаченный заказ, а недоступность брокера не ломает оформление.
+    """
+    def __init__(self, user, cart: Cart, contact: DeliveryContact):
+        self.user = user
+        self.cart = cart
+        self.contact = contact
+
+    def _load_lines(self):
+        # блокируем корзину: повторная отправка той же корзины
+        # дождётся окончания первой и увидит её уже пустой
+        Cart.objects.select_for_update().filter(pk=self.cart.pk).exists()
+        return list(
+            CartItem.objects
+            .filter(cart=self.cart)
+            .values('product_id', 'quantity', 'unit_price', shop_id=F('product__shop_id'))
+            .order_by('product_id')
+        )
+
+    @staticmethod
+    def _short(quantities, availability):
+        return [
+            pk for pk, qty in quantities.items()
+            if pk not in availability
+            or not availability[pk]['is_active']
+            or availability[pk]['quantity'] < qty
+        ]
+
+    def _precheck(self, quantities):
+        short = self._short(quantities, availability_cache.get_many(quantities))
+        if short:
+            # кэш может отставать: отказываем, только если нехватку
+            # подтверждает чтение из БД
+            short = self._short({pk: quantities[pk] for pk in short},
+                                availability_cache.get_many(short, fresh=True))
+        if short:
+            raise InsufficientStock(short)
+
+    @staticmethod
+    def _group_by_shop(lines):
+        by_shop = defaultdict(list)
+        for line in lines:
+            by_shop[line['shop_id']].append(line)
+        return by_shop
+
+    @staticmethod
+    def _line_total(line):
+        return line['quantity'] * line['unit_price']
+
+    def _create_order(self, by_shop):
+        order_total = sum(
+            (self._line_total(line) for lines in by_shop.values() for line in lines),
+            Decimal('0')
+        )
+        return Order.objects.create(user=self.user,
+                                    delivery_contact=self.contact,
+                                    status=Order.STATUS_NEW,
+                                    total_amount=order_total)
+
+    def _create_shop_orders(self, order, by_shop):
+        shop_orders = ShopOrder.objects.bulk_create([
+            ShopOrder(
+                order=order,
+                shop_id=shop_id,
+                status=ShopOrder.STATUS_NEW,
+                total_amount=sum((self._line_total(line) for line in lines), Decimal('0'))
+            )
+            for shop_id, lines in by_shop.items()
+        ])
+        ShopOrderItem.objects.bulk_create([
+            ShopOrderItem(
+                shop_order=so,
+                product_id=line['product_id'],
+                quantity=line['quantity'],
+                unit_price=line['unit_price']
+            )
+            for so in shop_orders
+            for line in by_shop[so.shop_id]
+        ])
+        return shop_orders
+
+    @transaction.atomic
+    def run(self) -> Order:
+        lines = self._load_lines()
+        if not lines:
+            raise ValueError('Корзина пуста')
+
+        # сначала резервируем остатки: при нехватке товара
+        # ничего, кроме блокировок, ещё не записано
+        quantities = {line['product_id']: line['quantity'] for line in lines}
+        self._precheck(quantities)
+        # счётчики всех товаров корзины блокируются разом, по возрастанию
+        # id, ещё до снятия её резервов (они только по её же товарам):
+        # иначе два оформления с общими товарами могли бы взять их
+        # в разном порядке
+        lock_reserved(quantities)
+        release_holds(self.cart)
+        reserve_stock(quantities)
+
+        by_shop = self._group_by_shop(lines)
+        order = self._create_order(by_shop)
+        self._create_shop_orders(order, by_shop)
+
+        self.cart.clear()
+        publish(send_order_confirmation_email, order.pk)
+        return order
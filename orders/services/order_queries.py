@@ -0,0 +1,86 @@
+from decimal import Decimal
+
+from django.db.models import Count, IntegerField, OuterRef, Prefetch, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+from orders.models import Order, ShopOrder, ShopOrderItem
+
+ORDER_FIELDS = ['status', 'created_at', 'total_amount']
+SHOP_ORDER_FIELDS = ['order', 'shop__name', 'status', 'updated_at', 'total_amount']
+SHOP_ORDER_INBOX_FIELDS = ['order', 'shop__name', 'status', 'created_at', 'updated_at', 'total_amount']
+SHOP_ORDER_ITEM_FIELDS = ['shop_order', 'product__name', 'quantity', 'unit_price']
+
+
+def shop_order_items():
+    return Prefetch(
+        'items',
+        queryset=ShopOrderItem.objects.select_related('product').only(*SHOP_ORDER_ITEM_FIELDS).order_by('pk'),
+    )
+
+
+def shop_orders_for_read(queryset=None):
+    """
+    Подзаказы для ShopOrderSerializer: магазин через JOIN, позиции с
+    названиями товаров — одним дополнительным запросом на страницу.
+    Читаются только колонки, которые выводит сериализатор.
+    """
+    if queryset is None:
+        queryset = ShopOrder.objects.all()
+    return queryset.select_related('shop').only(*SHOP_ORDER_FIELDS).prefetch_related(shop_order_items())
+
+
+def orders_for_read(queryset=None):
+    """
+    Заказы для OrderSerializer за три запроса на страницу независимо от
+    её размера: заказы, их подзаказы с магазинами, позиции подзаказов
+    с товарами.
+    """
+    if queryset is None:
+        queryset = Order.objects.all()
+    return queryset.only(*ORDER_FIELDS).prefetch_related(
+        Prefetch('shop_orders', queryset=shop_orders_for_read().order_by('pk')),
+    )
+
+
+def shop_orders_for_inbox(queryset):
+    """
+    Строки очереди поставщика без списков позиций: число позиций
+    считается коррелированным подзапросом только для строк страницы,
+    а не GROUP BY по всей истории магазина.
+    """
+    items_count = (
+        ShopOrderItem.objects
+        .filter(shop_order=OuterRef('pk'))
+        .order_by()
+        .values('shop_order')
+        .annotate(count=Count('pk'))
+        .values('count')
+    )
+    return queryset.select_related('shop').only(*SHOP_ORDER_INBOX_FIELDS).annotate(
+        items_count=Coalesce(Subquery(items_count, output_field=IntegerField()), 0),
+    )
+
+
+def shop_order_summary(queryset):
+    """
+    Число подзаказов и сумма по каждому статусу одним запросом
+    с GROUP BY status. Статусы без подзаказов тоже попадают в ответ.
+    """
+    rows = {
+        row['status']: row
+        for row in queryset.order_by().values('status').annotate(count=Count('pk'), total=Sum('total_amount'))
+    }
+    statuses = []
+    for status, label in ShopOrder.STATUS_CHOICES:
+        row = rows.get(status, {})
+        statuses.append({
+            'status': status,
+            'label': label,
+            'count': row.get('count', 0),
+            'total': row.get('total') or Decimal('0'),
+        })
+    return {
+        'count': sum(row['count'] for row in statuses),
+        'total': sum((row['total'] for row in statuses), Decimal('0')),
+        'statuses': statuses,
+    }
@@ -0,0 +1,116 @@
+"""
+Transactional outbox: задачи Celery, которые должны выполниться только
+после фиксации транзакции, пишутся в OutboxMessage в той же транзакции,
+а в брокер их переносит отдельный процесс (manage.py relay_outbox).
+
+Доставка — «хотя бы один раз»: если relay упадёт между публикацией
+и отметкой записи, задача уйдёт повторно, поэтому задачи, которые
+ставятся через outbox, должны быть идемпотентными.
+"""
+import time
+
+from celery import current_app
+from django.db import transaction
+from django.utils import timezone
+
+from orders.models import OutboxMessage
+
+
+def publish(task, *args):
+    """
+    Записывает в outbox вызов task.delay(*args). Вызывается внутри
+    транзакции, данные которой нужны задаче.
+    """
+    return OutboxMessage.objects.create(task=task.name, args=list(args))
+
+
+class OutboxRelay:
+    """
+    Переносит записи outbox в брокер пачками по batch_size: пачка
+    читается одним запросом под блокировкой (SKIP LOCKED — несколько
+    relay не отправят одно и то же), задачи публикуются через одно
+    соединение с брокером, отправленные отмечаются одним UPDATE.
+
+    Если брокер недоступен, неотправленный остаток пачки остаётся
+    в outbox с текстом ошибки и уйдёт на следующем проходе. Записи
+    с незарегистрированной задачей отмечаются failed_at и из выборки
+    выпадают.
+    """
+    batch_size = 500
+
+    def __init__(self, app=None, batch_size=None):
+        self.app = app or current_app
+        self.batch_size = batch_size or self.batch_size
+        # регистрирует задачи приложений (autodiscover_tasks), как при старте воркера
+        self.app.loader.import_default_modules()
+
+    @transaction.atomic
+    def relay_batch(self):
+        """
+        Отправляет одну пачку; возвращает (отправлено, отбраковано,
+        ошибка брокера или None).
+        """
+        messages = list(
+            OutboxMessage.objects
+            .filter(dispatched_at__isnull=True, failed_at__isnull=True)
+            .order_by('pk')
+            .select_for_update(skip_locked=True)[:self.batch_size]
+        )
+        if not messages:
+            return 0, 0, None
+
+        dispatched, dead, failed, error = [], set(), {}, None
+        try:
+            with self.app.producer_or_acquire() as producer:
+                for message in messages:
+                    task = self.app.tasks.get(message.task)
+                    if task is None:
+                        # повторять бессмысленно: запись уходит из выборки
+                        failed[message.pk] = f'Задача {message.task} не зарегистрирована'
+                        dead.add(message.pk)
+                        continue
+                    task.apply_async(message.args, producer=producer)
+                    dispatched.append(message.pk)
+        except Exception as e:
+            error = f'{type(e).__name__}: {e}'
+            sent = set(dispatched)
+            failed.update({
+                message.pk: error
+                for message in messages if message.pk not in failed and message.pk not in sent
+            })
+        now = timezone.now()
+        OutboxMessage.objects.filter(pk__in=dispatched).update(dispatched_at=now)
+        for message in messages:
+            if message.pk in failed:
+                message.attempts += 1
+                message.last_error = failed[message.pk]
+                if message.pk in dead:
+                    message.failed_at = now
+        OutboxMessage.objects.bulk_update([m for m in messages if m.pk in failed],
+                                          ['attempts', 'last_error', 'failed_at'])
+        return len(dispatched), len(dead), error
+
+    def drain(self):
+        """
+        Отправляет пачки, пока outbox не опустеет или брокер не
+        откажет; возвращает (отправлено, последняя ошибка или None).
+        """
+        total = 0
+        while True:
+            dispatched, dead, error = self.relay_batch()
+            total += dispatched
+            if error or not (dispatched or dead):
+                return total, error
+
+    def run_forever(self, interval=1.0, max_backoff=30.0, on_drain=None):
+        """
+        Опрашивает outbox каждые interval секунд; пока брокер
+        недоступен, пауза удваивается до max_backoff.
+        """
+        delay = interval
+        while True:
+            dispatched, error = self.drain()
+            if on_drain:
+                on_drain(dispatched, error)
+            delay = min(delay * 2, max_backoff) if error else interval
+            time.sleep(delay)
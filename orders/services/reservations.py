@@ -0,0 +1,198 @@
+"""
+Мягкие резервы товара под позиции корзин (StockReservation).
+
+Свободный остаток товара — Product.quantity минус сумма действующих
+резервов, которая хранится в ReservedStock и сдвигается вместе с
+резервами. Поэтому постановка резерва — постоянное число запросов,
+сколько бы корзин ни держали товар: строка счётчика блокируется,
+свободный остаток сверяется с запрошенным, счётчик и резерв
+записываются.
+
+Блокируются только счётчики, строки товаров — нет, поэтому добавления
+«горячего» товара в корзины не ждут импорт, возврат остатков и другие
+записи в его строку. Счётчики всегда блокируются по возрастанию id
+товара — и здесь, и в снятии истёкших резервов, и в reserve_stock,
+который берёт их раньше строк товаров. Поэтому параллельные операции
+с пересекающимися товарами не могут взаимно заблокироваться, а резерв
+и оформление не могут вместе занять больше остатка. Резерв
+мягкий: окончательно остаток проверяет reserve_stock при оформлении.
+"""
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Case, PositiveIntegerField, Value, When
+from django.utils import timezone
+
+from orders.models import CartItem, ReservedStock, StockReservation
+from orders.services.stock import InsufficientStock
+from products.models import Product
+
+SHIFT_SQL = '''
+    UPDATE {table} AS r SET quantity = GREATEST(r.quantity + d.quantity, 0)
+    FROM unnest(%s::bigint[], %s::integer[]) AS d(product_id, quantity)
+    WHERE r.product_id = d.product_id
+'''
+
+
+def _lock_holds(cart, product_ids=None):
+    holds = StockReservation.objects.select_for_update().filter(cart=cart)
+    if product_ids is not None:
+        holds = holds.filter(product_id__in=product_ids)
+    return dict(holds.order_by('product_id').values_list('product_id', 'quantity'))
+
+
+def _lock_counters(product_ids):
+    """
+    Блокирует счётчики товаров по возрастанию id и возвращает свободный
+    остаток {product_id: free}; у снятого с продажи товара он нулевой.
+
+    Строки товаров не блокируются: остаток читается отдельным запросом
+    уже после блокировки счётчиков, а reserve_stock при оформлении
+    блокирует те же счётчики раньше строк товаров, так что резерв и
+    оформление не могут вместе занять больше остатка.
+    """
+    reserved = dict(
+        ReservedStock.objects
+        .select_for_update()
+        .filter(pk__in=product_ids)
+        .order_by('pk')
+        .values_list('pk', 'quantity')
+    )
+    stock = Product.objects.filter(pk__in=reserved).values_list('pk', 'quantity', 'is_active')
+    return {pk: quantity - reserved[pk] if is_active else 0 for pk, quantity, is_active in stock}
+
+
+def _shift_counters(deltas):
+    """
+    Сдвигает счётчики {product_id: delta} одним UPDATE. Строки должны
+    быть уже заблокированы _lock_counters.
+    """
+    deltas = {pk: delta for pk, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(SHIFT_SQL.format(table=ReservedStock._meta.db_table),
+                       [list(deltas), list(deltas.values())])
+
+
+def _release(freed):
+    if freed:
+        _lock_counters(freed)
+        _shift_counters({pk: -qty for pk, qty in freed.items()})
+
+
+def hold_stock(cart, quantities, now=None):
+    """
+    Ставит или продлевает резервы корзины: {product_id: quantity} —
+    сколько единиц товара должно быть зарезервировано (количество в
+    позиции корзины). Срок каждого резерва — CART_RESERVATION_TTL
+    секунд от now.
+
+    Должна вызываться внутри transaction.atomic() под блокировкой
+    корзины (Cart.lock_for_update). Если свободного остатка не хватает
+    на прирост хотя бы одного резерва, выбрасывается InsufficientStock
+    и ничего не записывается. Число запросов не зависит ни от числа
+    товаров, ни от числа чужих резервов на них.
+    """
+    if not quantities:
+        return
+    held = _lock_holds(cart, quantities)
+    deltas = {pk: qty - held.get(pk, 0) for pk, qty in quantities.items()}
+    grown = {pk: delta for pk, delta in deltas.items() if delta > 0}
+    if grown:
+        ReservedStock.objects.bulk_create([ReservedStock(product_id=pk) for pk in grown], ignore_conflicts=True)
+    if any(deltas.values()):
+        free = _lock_counters([pk for pk, delta in deltas.items() if delta])
+        short = [pk for pk, delta in grown.items() if free.get(pk, 0) < delta]
+        if short:
+            raise InsufficientStock(short)
+        _shift_counters(deltas)
+
+    expires_at = (now or timezone.now()) + timedelta(seconds=settings.CART_RESERVATION_TTL)
+    StockReservation.objects.bulk_create(
+        [
+            StockReservation(cart=cart, product_id=pk, quantity=qty, expires_at=expires_at)
+            for pk, qty in quantities.items() if qty
+        ],
+        update_conflicts=True,
+        unique_fields=['cart', 'product'],
+        update_fields=['quantity', 'expires_at'],
+    )
+    dropped = [pk for pk, qty in quantities.items() if not qty and pk in held]
+    if dropped:
+        StockReservation.objects.filter(cart=cart, product_id__in=dropped).delete()
+
+
+def trim_holds(cart, product_ids=None):
+    """
+    Урезает резервы корзины до текущего количества в её позициях —
+    после удаления или уменьшения позиций. Резерв не растёт и не
+    продлевается, поэтому вызов никогда не отказывает. Без product_ids —
+    по всем резервам корзины.
+    """
+    held = _lock_holds(cart, product_ids)
+    if not held:
+        return
+    lines = dict(CartItem.objects.filter(cart=cart, product_id__in=held).values_list('product_id', 'quantity'))
+    kept = {pk: min(qty, lines.get(pk, 0)) for pk, qty in held.items()}
+    freed = {pk: held[pk] - qty for pk, qty in kept.items() if qty < held[pk]}
+    if not freed:
+        return
+    _release(freed)
+
+    dropped = [pk for pk in freed if not kept[pk]]
+    if dropped:
+        StockReservation.objects.filter(cart=cart, product_id__in=dropped).delete()
+    shrunk = {pk: kept[pk] for pk in freed if kept[pk]}
+    if shrunk:
+        StockReservation.objects.filter(cart=cart, product_id__in=shrunk).update(quantity=Case(
+            *(When(product_id=pk, then=Value(qty)) for pk, qty in shrunk.items()),
+            output_field=PositiveIntegerField()
+        ))
+
+
+def release_holds(cart):
+    """
+    Снимает все резервы корзины и возвращает их {product_id: quantity} —
+    при оформлении заказа, перед списанием остатков, и при удалении
+    корзины.
+    """
+    held = _lock_holds(cart)
+    if held:
+        StockReservation.objects.filter(cart=cart).delete()
+        _release(held)
+    return held
+
+
+def expire_holds(now=None, batch_size=None):
+    """
+    Снимает резервы, истёкшие к now, пачками по batch_size
+    (RESERVATION_SWEEP_BATCH_SIZE), каждая в своей транзакции:
+    выборка идёт по индексу expires_at, резервы, которые сейчас
+    продлевает или оформляет корзина, пропускаются (SKIP LOCKED) и
+    не ждут друг друга. Счётчики товаров пачки сдвигаются одним
+    UPDATE. Возвращает число снятых резервов.
+    """
+    now = now or timezone.now()
+    batch_size = batch_size or settings.RESERVATION_SWEEP_BATCH_SIZE
+    expired = 0
+    while True:
+        with transaction.atomic():
+            rows = list(
+                StockReservation.objects
+                .filter(expires_at__lte=now)
+                .order_by('expires_at')
+                .select_for_update(skip_locked=True)
+                .values_list('pk', 'product_id', 'quantity')[:batch_size]
+            )
+            if rows:
+                StockReservation.objects.filter(pk__in=[pk for pk, _, _ in rows]).delete()
+                freed = Counter()
+                for _, product_id, quantity in rows:
+                    freed[product_id] += quantity
+                _release(freed)
+        expired += len(rows)
+        if len(rows) < batch_size:
+            return expired
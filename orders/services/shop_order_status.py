@@ -0,0 +1,159 @@
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+
+from orders.models import Order, ShopOrder, ShopOrderItem
+from orders.services.stock import release_stock
+
+
+def release_cancelled_stock(shop_order_ids):
+    """
+    Возвращает на склад товары отменённых подзаказов. Вызывается один
+    раз на подзаказ — при его переходе в «отменён».
+    """
+    quantities = defaultdict(int)
+    for product_id, qty in ShopOrderItem.objects.filter(
+            shop_order__in=shop_order_ids).values_list('product_id', 'quantity'):
+        quantities[product_id] += qty
+    release_stock(quantities)
+
+
+def lock_orders(order_ids):
+    """
+    Блокирует заказы order_ids в порядке возрастания id и возвращает их
+    статусы {order_id: status}. Все пути, меняющие статусы, блокируют
+    сначала заказ, потом его подзаказы (тоже по id) — так отмена заказа
+    и параллельная смена статусов его подзаказов не блокируют друг друга
+    взаимно. Вызывается внутри transaction.atomic().
+    """
+    return dict(
+        Order.objects
+        .filter(pk__in=order_ids)
+        .select_for_update()
+        .order_by('pk')
+        .values_list('pk', 'status')
+    )
+
+
+def cancel_order(order, changed_by=None):
+    """
+    Отменяет заказ вместе с незавершёнными подзаказами и возвращает их
+    товары на склад. Заказ перечитывается под блокировкой, поэтому две
+    параллельные отмены не вернут остатки дважды; из конечного статуса —
+    InvalidTransition.
+    """
+    with transaction.atomic():
+        order.status = lock_orders([order.pk])[order.pk]
+        order.transition_to(Order.STATUS_CANCELLED, changed_by=changed_by)
+
+        cancelled = ShopOrder.transition_many(
+            ShopOrder.objects.filter(order=order), ShopOrder.STATUS_CANCELLED, changed_by=changed_by
+        )
+        release_cancelled_stock([row['pk'] for row in cancelled])
+    return order
+
+
+def close_finished_orders(order_ids, changed_by=None):
+    """
+    Закрывает заказы, у которых все подзаказы дошли до конечного
+    статуса: «завершён», если хотя бы один подзаказ завершён, иначе
+    «отменён». Заказы читаются одним запросом под блокировкой, каждый
+    из двух переходов — один UPDATE и одна вставка в журнал.
+    """
+    open_suborders = ShopOrder.objects.filter(order=OuterRef('pk')).exclude(
+        status__in=ShopOrder.TERMINAL_STATUSES
+    )
+    completed_suborders = ShopOrder.objects.filter(order=OuterRef('pk'), status=ShopOrder.STATUS_COMPLETED)
+    finished = list(
+        Order.objects
+        .filter(pk__in=order_ids)
+        .exclude(status__in=Order.TERMINAL_STATUSES)
+        .filter(~Exists(open_suborders))
+        .annotate(has_completed=Exists(completed_suborders))
+        .select_for_update(of=('self',))
+        .order_by('pk')
+        .values('pk', 'status', 'has_completed')
+    )
+    closed = []
+    for new_status, has_completed in ((Order.STATUS_COMPLETED, True), (Order.STATUS_CANCELLED, False)):
+        rows = [row for row in finished if row['has_completed'] == has_completed]
+        closed += [row['pk'] for row in Order.apply_transitions(rows, new_status, changed_by)]
+    return sorted(closed)
+
+
+def after_shop_order_transition(rows, new_status, changed_by=None):
+    """
+    Последствия перехода подзаказов rows (словари с pk и order_id):
+    возврат остатков при отмене и закрытие заказов, все подзаказы
+    которых дошли до конечного статуса. Возвращает id закрытых заказов.
+    """
+    if new_status == ShopOrder.STATUS_CANCELLED:
+        release_cancelled_stock([row['pk'] for row in rows])
+    if new_status in ShopOrder.TERMINAL_STATUSES:
+        return close_finished_orders({row['order_id'] for row in rows}, changed_by)
+    return []
+
+
+class BulkStatusTransition:
+    """
+    Переводит подзаказы ids в статус status.
+
+    queryset — подзаказы, доступные пользователю (для поставщика —
+    только его магазинов). Текущие статусы подзаказов и их заказов
+    читаются под блокировкой: сначала заказов, затем подзаказов (см.
+    lock_orders), переход
+    проверяется по ShopOrder.TRANSITIONS, а сам он выполняется одним
+
+        UPDATE ... WHERE id IN (...) AND status IN (<откуда разрешён переход>)
+
+    с записью в журнал (ShopOrder.apply_transitions). Подзаказы, которые
+    нельзя перевести, не мешают остальным — по ним возвращаются ошибки.
+    """
+    def __init__(self, queryset, ids, status, changed_by=None):
+        self.queryset = queryset
+        self.ids = list(dict.fromkeys(ids))
+        self.status = status
+        self.changed_by = changed_by
+
+    def _check(self, row):
+        if row['order__status'] in Order.TERMINAL_STATUSES:
+            return 'Нельзя менять статус подзаказа — заказ уже закрыт.'
+        if row['status'] == self.status:
+            return 'Подзаказ уже в этом статусе'
+        if self.status not in ShopOrder.TRANSITIONS[row['status']]:
+            return f'Невозможно перевести подзаказ из статуса {row["status"]} в {self.status}'
+        return None
+
+    @transaction.atomic
+    def run(self):
+        # заказ подзаказа не меняется, поэтому его можно узнать до блокировок
+        order_statuses = lock_orders(self.queryset.filter(pk__in=self.ids).values('order_id'))
+        rows = {
+            row['pk']: {**row, 'order__status': order_statuses[row['order_id']]}
+            for row in (
+                self.queryset
+                .filter(pk__in=self.ids)
+                .select_for_update(of=('self',))
+                .order_by('pk')
+                .values('pk', 'status', 'order_id')
+            )
+        }
+
+        allowed, errors = [], []
+        for pk in self.ids:
+            row = rows.get(pk)
+            detail = self._check(row) if row else 'Подзаказ не найден'
+            if detail:
+                errors.append({'id': pk, 'detail': detail})
+            else:
+                allowed.append(row)
+
+        applied = ShopOrder.apply_transitions(allowed, self.status, self.changed_by)
+        closed = after_shop_order_transition(applied, self.status, self.changed_by)
+        return {
+            'status': self.status,
+            'updated': [row['pk'] for row in applied],
+            'errors': errors,
+            'closed_orders': closed,
+        }
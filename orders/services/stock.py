@@ -0,0 +1,107 @@
+from django.db import transaction
+from django.db.models import Case, F, PositiveIntegerField, Value, When
+
+from orders.models import ReservedStock
+from products.models import Product
+from products.services.availability import availability_cache
+from shops.services.catalog_version import bump_catalog_version_for_products
+
+
+class InsufficientStock(ValueError):
+    """
+    На складе недостаточно товара хотя бы для одной позиции.
+    """
+    def __init__(self, product_ids):
+        self.product_ids = sorted(product_ids)
+        super().__init__('Недостаточно товара на складе')
+
+
+def _quantity_case(quantities):
+    return Case(
+        *(When(pk=pk, then=Value(qty)) for pk, qty in quantities.items()),
+        output_field=PositiveIntegerField()
+    )
+
+
+def lock_reserved(product_ids) -> dict:
+    """
+    Блокирует счётчики резервов товаров по возрастанию id и возвращает
+    {product_id: зарезервировано}. Строки счётчиков создаются, если их
+    ещё нет: иначе резерв, создавший строку параллельно, прошёл бы мимо
+    блокировки. Вызывается внутри transaction.atomic().
+    """
+    ReservedStock.objects.bulk_create([ReservedStock(product_id=pk) for pk in product_ids], ignore_conflicts=True)
+    return dict(
+        ReservedStock.objects
+        .select_for_update()
+        .filter(pk__in=product_ids)
+        .order_by('pk')
+        .values_list('pk', 'quantity')
+    )
+
+
+def reserve_stock(quantities: dict) -> dict:
+    """
+    Списывает остатки {product_id: qty} одним условным UPDATE.
+
+    Должна вызываться внутри transaction.atomic(). Сначала блокируются
+    счётчики резервов товаров (ReservedStock — те же, что блокирует
+    orders.services.reservations), затем строки товаров
+    SELECT ... FOR NO KEY UPDATE — каждые в порядке возрастания id,
+    поэтому параллельные оформления и резервы с пересекающимися
+    товарами не могут взаимно заблокироваться. UPDATE дополнительно ограничен условием
+    quantity >= qty: если какая-то строка не прошла (или товар снят
+    с продажи), выбрасывается InsufficientStock и вся транзакция
+    откатывается. Единицы, зарезервированные корзинами
+    (ReservedStock), не списываются: свой резерв оформляемая корзина
+    снимает до вызова (orders.services.reservations.release_holds).
+
+    Возвращает новые остатки {product_id: quantity}. После коммита
+    меняет версию каталога магазинов, чтобы выгрузки прайсов обновились,
+    и записывает новые остатки в кэш наличия.
+    """
+    if not quantities:
+        return {}
+
+    reserved = lock_reserved(quantities)
+    locked, free = {}, {}
+    rows = (
+        Product.objects
+        .select_for_update(no_key=True)
+        .filter(pk__in=quantities, is_active=True)
+        .order_by('pk')
+        .values_list('pk', 'quantity')
+    )
+    for pk, quantity in rows:
+        locked[pk], free[pk] = quantity, quantity - reserved.get(pk, 0)
+    short = [pk for pk, qty in quantities.items() if free.get(pk, 0) < qty]
+    if short:
+        raise InsufficientStock(short)
+
+    updated = (
+        Product.objects
+        .filter(pk__in=quantities)
+        .alias(requested=_quantity_case(quantities))
+        .filter(quantity__gte=F('requested'))
+        .update(quantity=F('quantity') - _quantity_case(quantities))
+    )
+    if updated != len(quantities):
+        raise InsufficientStock(quantities)
+
+    # вне транзакции оформления, чтобы не держать блокировку строки магазина
+    transaction.on_commit(lambda: bump_catalog_version_for_products(quantities))
+    availability_cache.refresh_products(quantities)
+    return {pk: locked[pk] - qty for pk, qty in quantities.items()}
+
+
+def release_stock(quantities: dict):
+    """
+    Возвращает остатки {product_id: qty} на склад одним UPDATE.
+    """
+    if not quantities:
+        return
+    Product.objects.filter(pk__in=quantities).update(
+        quantity=F('quantity') + _quantity_case(quantities)
+    )
+    transaction.on_commit(lambda: bump_catalog_version_for_products(quantities))
+    availability_cache.refresh_products(quantities)
@@ -0,0 +1,13 @@
+from django.db.models.signals import pre_delete
+from django.dispatch import receiver
+
+from orders.models import Cart
+from orders.services.reservations import release_holds
+
+
+@receiver(pre_delete, sender=Cart)
+def cart_deleted(sender, instance, **kwargs):
+    # каскадное удаление резервов счётчики ReservedStock не сдвигает —
+    # снимаем резервы сами, пока корзина ещё на месте. Корзины удаляются
+    # только вместе с пользователем, так что быстрое удаление не нужно
+    release_holds(instance)
@@ -0,0 +1,12 @@
+from celery import shared_task
+
+from orders.services.reservations import expire_holds
+
+
+@shared_task
+def expire_stock_reservations():
+    """
+    Снять истёкшие резервы товаров в корзинах. Запускается по
+    расписанию Celery beat (CELERY_BEAT_SCHEDULE).
+    """
+    return expire_holds()
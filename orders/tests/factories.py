@@ -0,0 +1,95 @@
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+
+from orders.models import Cart, CartItem, Order, ShopOrder, ShopOrderItem
+from products.models import Category, Product
+from shops.models import Shop
+from users.models import DeliveryContact, SupplierProfile
+
+User = get_user_model()
+
+
+def make_user(email='client@example.com', **extra):
+    return User.objects.create_user(username=email, email=email, **extra)
+
+
+def make_contact(user):
+    return DeliveryContact.objects.create(
+        user=user,
+        first_name='Jack',
+        last_name='Sparrow',
+        email=user.email,
+        phone='+70000000000',
+        city='Тортуга',
+        street='Портовая',
+        house='1',
+    )
+
+
+def make_shop(name='Связной', supplier_email=None):
+    supplier_email = supplier_email or f'{name.lower()}@example.com'
+    supplier = SupplierProfile.objects.create(user=make_user(supplier_email))
+    return Shop.objects.create(supplier=supplier, name=name, description=name)
+
+
+def make_category(external_id=224, name='Смартфоны'):
+    category, _ = Category.objects.get_or_create(external_id=external_id, defaults={'name': name})
+    return category
+
+
+def make_products(shop, count, quantity=100, price=Decimal('1000.00'), start_id=None):
+    category = make_category()
+    start_id = start_id or Product.objects.count() + 1
+    return Product.objects.bulk_create([
+        Product(
+            external_id=start_id + i,
+            category=category,
+            shop=shop,
+            model=f'model-{start_id + i}',
+            name=f'Товар {start_id + i}',
+            price=price,
+            price_rrc=price,
+            quantity=quantity,
+        )
+        for i in range(count)
+    ])
+
+
+def fill_cart(user, products, qty=1):
+    cart, _ = Cart.objects.get_or_create(user=user)
+    CartItem.objects.bulk_create([
+        CartItem(cart=cart, product=p, quantity=qty, unit_price=p.price)
+        for p in products
+    ])
+    cart.recalculate_totals()
+    return cart
+
+
+def make_orders(user, products, count, qty=1):
+    """
+    count заказов пользователя, в каждом подзаказ на каждый магазин из
+    products и по позиции на каждый товар. Пишется тремя bulk_create.
+    """
+    contact = make_contact(user)
+    by_shop = {}
+    for product in products:
+        by_shop.setdefault(product.shop_id, []).append(product)
+
+    orders = Order.objects.bulk_create([
+        Order(user=user, delivery_contact=contact,
+              total_amount=sum(p.price for p in products) * qty)
+        for _ in range(count)
+    ])
+    shop_orders = ShopOrder.objects.bulk_create([
+        ShopOrder(order=order, shop_id=shop_id,
+                  total_amount=sum(p.price for p in shop_products) * qty)
+        for order in orders
+        for shop_id, shop_products in by_shop.items()
+    ])
+    ShopOrderItem.objects.bulk_create([
+        ShopOrderItem(shop_order=shop_order, product=product, quantity=qty, unit_price=product.price)
+        for shop_order in shop_orders
+        for product in by_shop[shop_order.shop_id]
+    ])
+    return orders
@@ -0,0 +1,103 @@
+from decimal import Decimal
+
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from orders.models import Cart
+from orders.services.checkout import CheckoutService
+from orders.tests.factories import fill_cart, make_contact, make_products, make_shop, make_user
+from products.models import Product
+
+
+class CartReadTests(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.shop = make_shop('Связной', 'supplier@example.com')
+        cls.products = make_products(cls.shop, 500, price=Decimal('10.50'))
+
+    def test_query_count_does_not_depend_on_cart_size(self):
+        for size in (1, 50, 500):
+            with self.subTest(size=size):
+                user = make_user(f'client{size}@example.com')
+                fill_cart(user, self.products[:size], qty=2)
+                self.client.force_authenticate(user)
+
+                with self.assertNumQueries(1):
+                    response = self.client.get(reverse('cart-list'))
+
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+                self.assertEqual(len(response.data['items']), size)
+                self.assertEqual(response.data['items_count'], size)
+                self.assertEqual(response.data['total'], Decimal('21.00') * size)
+                self.assertEqual(response.data['items'][0]['shop'], 'Связной')
+
+    def test_empty_cart(self):
+        self.client.force_authenticate(make_user())
+        response = self.client.get(reverse('cart-list'))
+        self.assertEqual(response.data['items'], [])
+        self.assertEqual((response.data['items_count'], response.data['total']), (0, Decimal('0')))
+
+
+class CartTotalsTests(APITestCase):
+
+    def setUp(self):
+        self.user = make_user()
+        self.client.force_authenticate(self.user)
+        self.products = make_products(make_shop('Связной'), 2, price=Decimal('100.00'))
+        self.url = reverse('cart-add-item')
+
+    def add(self, product, quantity):
+        response = self.client.post(self.url, {'product_id': product.pk, 'quantity': quantity})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED, response.data)
+        return response.data
+
+    def remove(self, product, quantity=None):
+        data = {'quantity': quantity} if quantity else {}
+        return self.client.delete(reverse('cart-remove-item', args=[product.pk]), data, format='json')
+
+    def assertTotalsConsistent(self):
+        cart = Cart.objects.get(user=self.user)
+        stored = (cart.total_amount, cart.items_count)
+        cart.recalculate_totals()
+        self.assertEqual(stored, (cart.total_amount, cart.items_count))
+
+    def test_totals_follow_changes(self):
+        first, second = self.products
+        self.assertEqual(self.add(first, 2)['total'], Decimal('200.00'))
+        self.assertEqual(self.add(first, 1)['total'], Decimal('300.00'))
+        data = self.add(second, 1)
+        self.assertEqual((data['items_count'], data['total']), (2, Decimal('400.00')))
+
+        data = self.remove(first, 2).data
+        self.assertEqual((data['items_count'], data['total']), (2, Decimal('200.00')))
+        data = self.remove(first).data
+        self.assertEqual((data['items_count'], data['total']), (1, Decimal('100.00')))
+        self.assertTotalsConsistent()
+
+        self.assertEqual(self.remove(first).status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_price_snapshot(self):
+        product = self.products[0]
+        self.add(product, 2)
+        Product.objects.filter(pk=product.pk).update(price=Decimal('150.00'))
+
+        data = self.add(product, 1)
+        item = data['items'][0]
+        # сумма и оформление — по цене на момент первого добавления
+        self.assertEqual(item['unit_price'], '100.00')
+        self.assertEqual(item['current_price'], '150.00')
+        self.assertTrue(item['price_changed'])
+        self.assertEqual(item['total_price'], Decimal('300.00'))
+        self.assertEqual(data['total'], Decimal('300.00'))
+        self.assertTotalsConsistent()
+
+    def test_checkout_resets_totals(self):
+        self.add(self.products[0], 1)
+        cart = Cart.objects.get(user=self.user)
+        CheckoutService(self.user, cart, make_contact(self.user)).run()
+
+        cart.refresh_from_db()
+        self.assertEqual((cart.total_amount, cart.items_count), (Decimal('0'), 0))
+        self.assertTotalsConsistent()
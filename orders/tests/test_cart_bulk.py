@@ -0,0 +1,125 @@
+from decimal import Decimal
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from orders.models import Cart, CartItem
+from orders.tests.factories import fill_cart, make_products, make_shop, make_user
+from products.models import Product
+
+
+class BulkCartTests(APITestCase):
+
+    def setUp(self):
+        self.user = make_user()
+        self.client.force_authenticate(self.user)
+        self.shop = make_shop('Связной')
+        self.products = make_products(self.shop, 5, price=Decimal('100.00'))
+        self.url = reverse('cart-bulk-update')
+
+    def post(self, items):
+        return self.client.post(self.url, {'items': items}, format='json')
+
+    def quantities(self):
+        return dict(CartItem.objects.filter(cart__user=self.user).values_list('product_id', 'quantity'))
+
+    def assertTotalsConsistent(self):
+        cart = Cart.objects.get(user=self.user)
+        stored = (cart.total_amount, cart.items_count)
+        cart.recalculate_totals()
+        self.assertEqual(stored, (cart.total_amount, cart.items_count))
+
+    def test_actions(self):
+        first, second, third = self.products[:3]
+        fill_cart(self.user, [first, second], qty=3)
+
+        response = self.post([
+            {'product_id': first.pk, 'quantity': 2},
+            {'product_id': second.pk, 'action': 'remove'},
+            {'product_id': third.pk, 'quantity': 4, 'action': 'set'},
+            {'product_id': third.pk, 'quantity': 1, 'action': 'remove'},
+        ])
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        self.assertEqual(self.quantities(), {first.pk: 5, third.pk: 3})
+        self.assertEqual((response.data['items_count'], response.data['total']), (2, Decimal('800.00')))
+        self.assertTotalsConsistent()
+
+    def test_set_zero_removes_line(self):
+        fill_cart(self.user, self.products[:2], qty=1)
+        response = self.post([{'product_id': self.products[0].pk, 'quantity': 0, 'action': 'set'}])
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        self.assertEqual(self.quantities(), {self.products[1].pk: 1})
+        self.assertTotalsConsistent()
+
+    def test_price_snapshot_is_kept(self):
+        product = self.products[0]
+        self.post([{'product_id': product.pk, 'quantity': 1}])
+        Product.objects.filter(pk=product.pk).update(price=Decimal('150.00'))
+
+        data = self.post([{'product_id': product.pk, 'quantity': 1}]).data
+        self.assertEqual(data['items'][0]['unit_price'], '100.00')
+        self.assertEqual(data['total'], Decimal('200.00'))
+
+    def test_errors_leave_cart_untouched(self):
+        first, second, third = self.products[:3]
+        fill_cart(self.user, [first], qty=1)
+        Product.objects.filter(pk=second.pk).update(is_active=False)
+
+        response = self.post([
+            {'product_id': first.pk, 'quantity': 1},
+            {'product_id': second.pk, 'quantity': 1},
+            {'product_id': third.pk, 'quantity': third.quantity + 1},
+            {'product_id': 0, 'quantity': 1},
+            {'product_id': third.pk, 'action': 'remove'},
+        ])
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            [(error['index'], error['detail']) for error in response.data['errors']],
+            [(1, 'Товар снят с продажи'),
+             (2, 'Недостаточно товара на складе'),
+             (3, 'Товар не найден'),
+             (4, 'Товара нет в корзине')],
+        )
+        self.assertEqual(self.quantities(), {first.pk: 1})
+        self.assertTotalsConsistent()
+
+    def test_stock_is_checked_against_accumulated_quantity(self):
+        product = self.products[0]
+        half = product.quantity // 2 + 1
+        response = self.post([{'product_id': product.pk, 'quantity': half}] * 2)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual([error['index'] for error in response.data['errors']], [1])
+
+    def test_inactive_shop(self):
+        self.shop.is_active = False
+        self.shop.save()
+        response = self.post([{'product_id': self.products[0].pk, 'quantity': 1}])
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('временно не принимает заказы', response.data['errors'][0]['detail'])
+
+    def test_invalid_payload(self):
+        for items in [[], [{'product_id': self.products[0].pk}], [{'product_id': 1, 'action': 'set'}],
+                      [{'product_id': 1, 'quantity': 1, 'action': 'move'}]]:
+            with self.subTest(items=items):
+                self.assertEqual(self.post(items).status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_query_count_does_not_depend_on_lines(self):
+        products = make_products(self.shop, 300, price=Decimal('10.00'))
+        fill_cart(self.user, products[:100], qty=1)
+        counts = []
+        for lines in (products[:10], products[:300]):
+            items = [{'product_id': product.pk, 'quantity': 1} for product in lines]
+            with self.subTest(lines=len(items)):
+                with CaptureQueriesContext(connection) as ctx:
+                    response = self.post(items)
+                self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+                counts.append(len(ctx.captured_queries))
+        self.assertEqual(counts[0], counts[1])
+        self.assertEqual(self.quantities()[products[0].pk], 3)
+        self.assertEqual(len(self.quantities()), 300)
+        self.assertTotalsConsistent()
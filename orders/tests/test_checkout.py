@@ -0,0 +1,91 @@
+from decimal import Decimal
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from orders.models import CartItem, Order, OutboxMessage, ShopOrder, ShopOrderItem
+from orders.services.checkout import CheckoutService
+from orders.tests.factories import fill_cart, make_contact, make_products, make_shop, make_user
+from products.models import Product
+from products.services.availability import availability_cache
+from users.tasks import send_order_confirmation_email
+
+
+class CheckoutServiceTests(APITestCase):
+
+    def setUp(self):
+        self.user = make_user()
+        self.contact = make_contact(self.user)
+        self.shop_1 = make_shop('Связной')
+        self.shop_2 = make_shop('Евросеть')
+
+    def test_creates_suborders_and_decreases_stock(self):
+        products = (make_products(self.shop_1, 2, quantity=10, price=Decimal('100.00'))
+                    + make_products(self.shop_2, 1, quantity=5, price=Decimal('250.50')))
+        cart = fill_cart(self.user, products, qty=2)
+
+        order = CheckoutService(self.user, cart, self.contact).run()
+
+        self.assertEqual(order.total_amount, Decimal('901.00'))
+        totals = dict(ShopOrder.objects.filter(order=order).values_list('shop_id', 'total_amount'))
+        self.assertEqual(totals, {self.shop_1.id: Decimal('400.00'), self.shop_2.id: Decimal('501.00')})
+        self.assertEqual(ShopOrderItem.objects.filter(shop_order__order=order).count(), 3)
+        self.assertEqual(
+            sorted(Product.objects.values_list('quantity', flat=True)),
+            [3, 8, 8]
+        )
+        self.assertFalse(CartItem.objects.filter(cart=cart).exists())
+
+    def test_query_count_does_not_depend_on_cart_size(self):
+        counts = []
+        for size in (2, 40):
+            user = make_user(f'client{size}@example.com')
+            products = make_products(self.shop_1, size // 2) + make_products(self.shop_2, size // 2)
+            cart = fill_cart(user, products)
+            availability_cache.clear()
+            with CaptureQueriesContext(connection) as ctx:
+                CheckoutService(user, cart, make_contact(user)).run()
+            counts.append(len(ctx.captured_queries))
+        self.assertEqual(counts[0], counts[1])
+
+    def test_empty_cart(self):
+        cart = fill_cart(self.user, [])
+        with self.assertRaises(ValueError):
+            CheckoutService(self.user, cart, self.contact).run()
+        self.assertFalse(Order.objects.exists())
+
+
+class ConfirmOrderAPITests(APITestCase):
+
+    def setUp(self):
+        self.user = make_user()
+        self.contact = make_contact(self.user)
+        self.client.force_authenticate(self.user)
+
+    def test_confirm(self):
+        products = make_products(make_shop(), 3, quantity=10)
+        cart = fill_cart(self.user, products, qty=3)
+
+        response = self.client.post(reverse('orders-confirm'),
+                                    {'cart_id': cart.id, 'contact_id': self.contact.id},
+                                    format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(response.data['suborders']), 1)
+        self.assertEqual(len(response.data['suborders'][0]['items']), 3)
+        message = OutboxMessage.objects.get()
+        self.assertEqual((message.task, message.args),
+                         (send_order_confirmation_email.name, [response.data['order_id']]))
+
+    def test_confirm_empty_cart(self):
+        cart = fill_cart(self.user, [])
+
+        response = self.client.post(reverse('orders-confirm'),
+                                    {'cart_id': cart.id, 'contact_id': self.contact.id},
+                                    format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(OutboxMessage.objects.exists())
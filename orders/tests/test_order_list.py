@@ -0,0 +1,106 @@
+from decimal import Decimal
+
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from orders.tests.factories import make_orders, make_products, make_shop, make_user
+from users.services.auth_cache import get_snapshot
+
+# запросов на страницу: заказы, подзаказы с магазинами, позиции с товарами
+ORDER_QUERY_BUDGET = 3
+# подзаказы с магазинами и позиции с товарами; магазины поставщика
+# берутся из кэша снимков пользователей
+SHOP_ORDER_QUERY_BUDGET = 2
+
+
+class OrderListQueryTests(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.shops = [make_shop('Связной'), make_shop('Евросеть'), make_shop('DNS')]
+        cls.products = [product for shop in cls.shops
+                        for product in make_products(shop, 4, price=Decimal('10.00'))]
+
+    def test_query_budget_does_not_depend_on_page_size(self):
+        for count in (1, 50):
+            with self.subTest(count=count):
+                user = make_user(f'client{count}@example.com')
+                make_orders(user, self.products, count, qty=2)
+                self.client.force_authenticate(user)
+
+                with self.assertNumQueries(ORDER_QUERY_BUDGET):
+                    response = self.client.get(reverse('orders-list'), {'page_size': 50})
+
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+                self.assertEqual(len(response.data['results']), count)
+                order = response.data['results'][0]
+                self.assertEqual(order['order_total_amount'], '240.00')
+                self.assertEqual(len(order['suborders']), 3)
+                suborder = order['suborders'][0]
+                self.assertEqual((suborder['order_id'], suborder['shop']), (order['order_id'], 'Связной'))
+                self.assertEqual(len(suborder['items']), 4)
+                self.assertEqual(suborder['items'][0]['item_total_price'], Decimal('20.00'))
+
+    def test_pages_newest_first(self):
+        user = make_user()
+        orders = make_orders(user, self.products[:1], 5)
+        self.client.force_authenticate(user)
+
+        first = self.client.get(reverse('orders-list'), {'page_size': 3}).data
+        second = self.client.get(first['next']).data
+        ids = [order['order_id'] for order in first['results'] + second['results']]
+        self.assertEqual(ids, [order.pk for order in reversed(orders)])
+        self.assertIsNone(second['next'])
+
+    def test_ordering_only_by_whitelisted_fields(self):
+        user = make_user()
+        orders = make_orders(user, self.products[:1], 3)
+        self.client.force_authenticate(user)
+        newest_first = [order.pk for order in reversed(orders)]
+
+        for ordering, expected in (('status', newest_first), ('-order_total_amount', newest_first),
+                                   ('pk', newest_first[::-1]), ('-created_at', newest_first)):
+            with self.subTest(ordering=ordering):
+                first = self.client.get(reverse('orders-list'), {'page_size': 2, 'ordering': ordering}).data
+                second = self.client.get(first['next']).data
+                ids = [order['order_id'] for order in first['results'] + second['results']]
+                self.assertEqual(ids, expected)
+
+    def test_detail_and_foreign_orders(self):
+        user, other = make_user(), make_user('other@example.com')
+        order, = make_orders(user, self.products, 1)
+        make_orders(other, self.products, 1)
+        self.client.force_authenticate(user)
+
+        with self.assertNumQueries(ORDER_QUERY_BUDGET):
+            response = self.client.get(reverse('orders-detail', args=[order.pk]))
+        self.assertEqual(response.data['order_id'], order.pk)
+        self.assertEqual(len(self.client.get(reverse('orders-list')).data['results']), 1)
+
+
+class ShopOrderListQueryTests(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.shop = make_shop('Связной', 'supplier@example.com')
+        cls.other_shop = make_shop('Евросеть')
+        cls.products = (make_products(cls.shop, 5, price=Decimal('10.00'))
+                        + make_products(cls.other_shop, 2))
+
+    def test_query_budget_does_not_depend_on_page_size(self):
+        supplier = self.shop.supplier.user
+        self.client.force_authenticate(supplier)
+        get_snapshot(supplier.pk)
+        for count in (1, 50):
+            with self.subTest(count=count):
+                make_orders(make_user(f'client{count}@example.com'), self.products, count)
+
+                with self.assertNumQueries(SHOP_ORDER_QUERY_BUDGET):
+                    response = self.client.get(reverse('shop-orders-list'), {'page_size': 100})
+
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+                results = response.data['results']
+                self.assertEqual(len(results), 1 if count == 1 else 51)
+                self.assertEqual({result['shop'] for result in results}, {'Связной'})
+                self.assertEqual(len(results[0]['items']), 5)
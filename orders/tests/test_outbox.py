@@ -0,0 +1,102 @@
+from unittest import mock
+
+from django.urls import reverse
+from kombu.exceptions import OperationalError
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from backend.celery import app
+from orders.models import Order, OutboxMessage
+from orders.services.outbox import OutboxRelay
+from orders.tests.factories import fill_cart, make_contact, make_products, make_shop, make_user
+from users.tasks import send_order_confirmation_email
+
+# публикация в брокер — последний шаг перед сетью: подменяя его, задачи
+# проходят весь путь Celery, но в настоящий Redis ничего не попадает
+PUBLISH = 'kombu.Producer.publish'
+# соединение с брокером и бэкенд результатов — в памяти процесса
+MEMORY_TRANSPORT = {'broker_url': 'memory://', 'result_backend': 'cache+memory://'}
+
+
+class OutboxTests(APITestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        previous = {key: app.conf[key] for key in MEMORY_TRANSPORT}
+        app.conf.update(MEMORY_TRANSPORT)
+        # закрывает пул соединений, если он уже открыт по прежнему адресу
+        app.close()
+        cls.addClassCleanup(app.close)
+        cls.addClassCleanup(app.conf.update, previous)
+
+    def setUp(self):
+        self.user = make_user()
+        self.contact = make_contact(self.user)
+        self.products = make_products(make_shop(), 2, quantity=5)
+        self.client.force_authenticate(self.user)
+
+    def confirm(self, qty=1):
+        cart = fill_cart(self.user, self.products, qty=qty)
+        return self.client.post(reverse('orders-confirm'),
+                                {'cart_id': cart.id, 'contact_id': self.contact.id}, format='json')
+
+    def published_tasks(self, publish):
+        return [call.kwargs['headers']['task'] for call in publish.call_args_list]
+
+    def test_checkout_survives_broker_outage(self):
+        with mock.patch(PUBLISH, side_effect=OperationalError('Connection refused')) as publish:
+            response = self.confirm()
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+            # в ходе оформления брокер не трогали вовсе
+            publish.assert_not_called()
+
+            self.assertEqual(OutboxRelay().drain(), (0, 'OperationalError: Connection refused'))
+
+        message = OutboxMessage.objects.get()
+        self.assertIsNone(message.dispatched_at)
+        self.assertEqual(message.attempts, 1)
+
+        # брокер вернулся — задача уходит один раз
+        with mock.patch(PUBLISH) as publish:
+            self.assertEqual(OutboxRelay().drain(), (1, None))
+            self.assertEqual(OutboxRelay().drain(), (0, None))
+        self.assertEqual(self.published_tasks(publish), [send_order_confirmation_email.name])
+        self.assertEqual(publish.call_args.args[0], ([response.data['order_id']], {}, mock.ANY))
+        self.assertIsNotNone(OutboxMessage.objects.get().dispatched_at)
+
+    def test_failed_checkout_leaves_no_message(self):
+        response = self.confirm(qty=10)
+
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertFalse(Order.objects.exists())
+        self.assertFalse(OutboxMessage.objects.exists())
+
+    def test_relay_sends_in_batches_and_skips_unknown_tasks(self):
+        OutboxMessage.objects.create(task='unknown.task', args=[1])
+        OutboxMessage.objects.bulk_create([
+            OutboxMessage(task=send_order_confirmation_email.name, args=[pk]) for pk in range(5)
+        ])
+
+        with mock.patch(PUBLISH) as publish:
+            self.assertEqual(OutboxRelay(batch_size=2).drain(), (5, None))
+
+        self.assertEqual(publish.call_count, 5)
+        unknown = OutboxMessage.objects.get(task='unknown.task')
+        self.assertIsNone(unknown.dispatched_at)
+        self.assertIsNotNone(unknown.failed_at)
+        self.assertIn('не зарегистрирована', unknown.last_error)
+
+    def test_full_batch_of_unknown_tasks_does_not_block_the_rest(self):
+        OutboxMessage.objects.bulk_create([OutboxMessage(task='unknown.task', args=[pk]) for pk in range(4)])
+        valid = OutboxMessage.objects.create(task=send_order_confirmation_email.name, args=[1])
+
+        with mock.patch(PUBLISH) as publish:
+            self.assertEqual(OutboxRelay(batch_size=2).drain(), (1, None))
+            self.assertEqual(OutboxRelay(batch_size=2).drain(), (0, None))
+
+        self.assertEqual(publish.call_count, 1)
+        self.assertIsNotNone(OutboxMessage.objects.get(pk=valid.pk).dispatched_at)
+        self.assertEqual(OutboxMessage.objects.filter(failed_at__isnull=False).count(), 4)
+        self.assertEqual(set(OutboxMessage.objects.filter(task='unknown.task').values_list('attempts', flat=True)),
+                         {1})
@@ -0,0 +1,174 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase, APITransactionTestCase
+
+from orders.models import Cart, ReservedStock, StockReservation
+from orders.services.checkout import CheckoutService
+from orders.services.reservations import expire_holds, hold_stock
+from orders.services.stock import InsufficientStock
+from orders.tasks import expire_stock_reservations
+from orders.tests.factories import fill_cart, make_contact, make_products, make_shop, make_user
+from products.models import Product
+from products.services.availability import availability_cache
+
+
+class StockReservationTests(APITestCase):
+
+    def setUp(self):
+        availability_cache.clear()
+        self.product, self.other = make_products(make_shop('Связной'), 2, quantity=5, price=Decimal('100.00'))
+        self.user = make_user()
+        self.client.force_authenticate(self.user)
+
+    def add(self, product, quantity, user=None):
+        if user is not None:
+            self.client.force_authenticate(user)
+        return self.client.post(reverse('cart-add-item'), {'product_id': product.pk, 'quantity': quantity})
+
+    def held(self, user=None):
+        return dict(
+            StockReservation.objects.filter(cart__user=user or self.user).values_list('product_id', 'quantity')
+        )
+
+    def reserved(self, product):
+        return ReservedStock.objects.filter(product=product).values_list('quantity', flat=True).first() or 0
+
+    def test_add_to_cart_holds_stock(self):
+        self.assertEqual(self.add(self.product, 1).status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self.add(self.product, 2).status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self.held(), {self.product.pk: 3})
+
+        rival = make_user('rival@example.com')
+        response = self.add(self.product, 3, rival)
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(response.data['product_ids'], [self.product.pk])
+        self.assertEqual(self.held(rival), {})
+
+        self.assertEqual(self.add(self.product, 2, rival).status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self.reserved(self.product), 5)
+
+    def test_remove_trims_hold(self):
+        self.add(self.product, 3)
+        self.client.delete(reverse('cart-remove-item', args=[self.product.pk]), {'quantity': 2}, format='json')
+        self.assertEqual((self.held(), self.reserved(self.product)), ({self.product.pk: 1}, 1))
+
+        self.client.delete(reverse('cart-remove-item', args=[self.product.pk]))
+        self.assertEqual((self.held(), self.reserved(self.product)), ({}, 0))
+
+    def test_add_query_count_does_not_depend_on_other_holds(self):
+        Product.objects.filter(pk=self.product.pk).update(quantity=100)
+        counts = []
+        for holders in (1, 30):
+            for i in range(holders):
+                cart = Cart.objects.create(user=make_user(f'holder{holders}-{i}@example.com'))
+                hold_stock(cart, {self.product.pk: 1})
+            user = make_user(f'buyer{holders}@example.com')
+            self.add(self.product, 1, user)
+            with CaptureQueriesContext(connection) as queries:
+                self.assertEqual(self.add(self.product, 1, user).status_code, status.HTTP_201_CREATED)
+            counts.append(len(queries))
+        self.assertEqual(counts[0], counts[1])
+        self.assertEqual(self.reserved(self.product), 31 + 2 * 2)
+
+    def test_hold_locks_only_counter(self):
+        cart = Cart.objects.create(user=self.user)
+        with CaptureQueriesContext(connection) as queries:
+            hold_stock(cart, {self.product.pk: 1})
+        locked = [table for q in queries if 'FOR UPDATE' in q['sql']
+                  for table in ('products_product', 'orders_reservedstock') if f'FROM "{table}"' in q['sql']]
+        self.assertEqual(locked, ['orders_reservedstock'])
+
+    def test_checkout_respects_other_holds(self):
+        self.add(self.product, 3)
+        rival = make_user('rival@example.com')
+        rival_cart = fill_cart(rival, [self.product], qty=3)
+        with self.assertRaises(InsufficientStock):
+            CheckoutService(rival, rival_cart, make_contact(rival)).run()
+
+        cart = Cart.objects.get(user=self.user)
+        CheckoutService(self.user, cart, make_contact(self.user)).run()
+        self.assertEqual(Product.objects.get(pk=self.product.pk).quantity, 2)
+        self.assertEqual((self.held(), self.reserved(self.product)), ({}, 0))
+
+    def test_bulk_update_holds_all_or_nothing(self):
+        self.add(self.product, 4, make_user('rival@example.com'))
+        self.client.force_authenticate(self.user)
+        response = self.client.post(reverse('cart-bulk-update'), {'items': [
+            {'product_id': self.other.pk, 'quantity': 2},
+            {'product_id': self.product.pk, 'quantity': 2},
+        ]}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['errors'], [
+            {'index': 1, 'product_id': self.product.pk, 'detail': 'Недостаточно товара на складе'},
+        ])
+        self.assertEqual((self.held(), self.reserved(self.other)), ({}, 0))
+
+    def test_expired_holds_are_swept_in_batches(self):
+        for i in range(5):
+            self.add(self.product, 1, make_user(f'buyer{i}@example.com'))
+        self.add(self.other, 2, self.user)
+        StockReservation.objects.filter(product=self.product).update(expires_at=timezone.now() - timedelta(minutes=1))
+
+        self.assertEqual(self.add(self.product, 1).status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(expire_holds(batch_size=2), 5)
+        self.assertEqual(expire_stock_reservations(), 0)
+        self.assertEqual((self.reserved(self.product), self.reserved(self.other)), (0, 2))
+        self.assertEqual(self.add(self.product, 5).status_code, status.HTTP_201_CREATED)
+
+    def test_deleting_user_releases_holds(self):
+        rival = make_user('rival@example.com')
+        self.add(self.product, 5, rival)
+        get_user_model().objects.filter(pk=rival.pk).delete()
+        self.assertEqual(self.reserved(self.product), 0)
+
+
+class HotProductHoldTests(APITransactionTestCase):
+    """
+    Пока оформление держит строку товара, добавления того же товара
+    в корзины не ждут её: они блокируют только счётчик резервов.
+    """
+    adds = 5
+
+    def test_adds_do_not_wait_on_product_row(self):
+        product = make_products(make_shop(), 1, quantity=self.adds)[0]
+        users = [make_user(f'client{i}@example.com') for i in range(self.adds)]
+        locked, done = threading.Event(), threading.Event()
+
+        def hold_product_row():
+            try:
+                with transaction.atomic():
+                    # та же блокировка, что берёт reserve_stock при оформлении
+                    Product.objects.select_for_update(no_key=True).get(pk=product.pk)
+                    locked.set()
+                    done.wait(timeout=10)
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            blocker = pool.submit(hold_product_row)
+            self.assertTrue(locked.wait(timeout=5))
+            try:
+                with connection.cursor() as cursor:
+                    # ожидание строки товара — ошибка, а не зависший тест
+                    cursor.execute("SET lock_timeout = '2s'")
+                for user in users:
+                    self.client.force_authenticate(user)
+                    response = self.client.post(reverse('cart-add-item'), {'product_id': product.pk, 'quantity': 1})
+                    self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+            finally:
+                done.set()
+                blocker.result()
+                with connection.cursor() as cursor:
+                    cursor.execute('RESET lock_timeout')
+
+        self.assertEqual(ReservedStock.objects.get(product=product).quantity, self.adds)
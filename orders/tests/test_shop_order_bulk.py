@@ -0,0 +1,93 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from orders.models import Order, ShopOrder
+from orders.tests.factories import make_orders, make_products, make_shop, make_user
+
+
+class BulkShopOrderStatusTests(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.shop = make_shop('Связной', 'supplier@example.com')
+        cls.other_shop = make_shop('Евросеть')
+        cls.products = make_products(cls.shop, 2) + make_products(cls.other_shop, 1)
+        cls.orders = make_orders(make_user(), cls.products, 60)
+
+    def setUp(self):
+        self.url = reverse('shop-orders-bulk-process')
+        self.client.force_authenticate(self.shop.supplier.user)
+
+    def ids(self, shop, count):
+        return list(ShopOrder.objects.filter(shop=shop).order_by('pk').values_list('pk', flat=True)[:count])
+
+    def post(self, ids, new_status):
+        response = self.client.post(self.url, {'ids': ids, 'status': new_status}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        return response.data
+
+    def statuses(self, ids):
+        return set(ShopOrder.objects.filter(pk__in=ids).values_list('status', flat=True))
+
+    def test_query_count_does_not_depend_on_ids(self):
+        counts = []
+        for ids in (self.ids(self.shop, 60)[:1], self.ids(self.shop, 60)[10:60]):
+            with CaptureQueriesContext(connection) as ctx:
+                data = self.post(ids, ShopOrder.STATUS_IN_PROGRESS)
+            counts.append(len(ctx.captured_queries))
+            self.assertEqual(data['updated'], ids)
+            self.assertEqual(data['errors'], [])
+            self.assertEqual(self.statuses(ids), {ShopOrder.STATUS_IN_PROGRESS})
+        self.assertEqual(counts[0], counts[1])
+
+    def test_per_id_errors(self):
+        own = self.ids(self.shop, 3)
+        foreign = self.ids(self.other_shop, 1)
+        ShopOrder.objects.filter(pk=own[1]).update(status=ShopOrder.STATUS_IN_PROGRESS)
+        Order.objects.filter(shop_orders=own[2]).update(status=Order.STATUS_CANCELLED)
+
+        data = self.post([own[0], own[1], own[2], foreign[0], 0, own[0]], ShopOrder.STATUS_IN_PROGRESS)
+
+        self.assertEqual(data['updated'], [own[0]])
+        self.assertEqual([error['id'] for error in data['errors']], [own[1], own[2], foreign[0], 0])
+        self.assertEqual(data['errors'][0]['detail'], 'Подзаказ уже в этом статусе')
+        self.assertIn('заказ уже закрыт', data['errors'][1]['detail'])
+        self.assertEqual(data['errors'][2]['detail'], 'Подзаказ не найден')
+        self.assertEqual(self.statuses(foreign), {ShopOrder.STATUS_NEW})
+
+    def test_transition_table(self):
+        ids = self.ids(self.shop, 2)
+        data = self.post(ids, ShopOrder.STATUS_SHIPPED)
+        self.assertEqual(data['updated'], [])
+        self.assertEqual(self.statuses(ids), {ShopOrder.STATUS_NEW})
+
+        for new_status in (ShopOrder.STATUS_IN_PROGRESS, ShopOrder.STATUS_SHIPPED, ShopOrder.STATUS_COMPLETED):
+            self.assertEqual(self.post(ids, new_status)['updated'], ids)
+        self.assertEqual(self.post(ids, ShopOrder.STATUS_CANCELLED)['updated'], [])
+
+    def test_parent_order_closes_when_all_suborders_finish(self):
+        self.client.force_authenticate(make_user('admin@example.com', is_staff=True))
+        first, second = self.orders[:2]
+        own = {so.order_id: so.pk for so in ShopOrder.objects.filter(shop=self.shop, order__in=[first, second])}
+        foreign = {so.order_id: so.pk for so in ShopOrder.objects.filter(shop=self.other_shop, order__in=[first, second])}
+
+        data = self.post([own[first.pk], foreign[second.pk], own[second.pk]], ShopOrder.STATUS_CANCELLED)
+        self.assertEqual(data['closed_orders'], [second.pk])
+
+        for new_status in (ShopOrder.STATUS_IN_PROGRESS, ShopOrder.STATUS_SHIPPED):
+            self.post([foreign[first.pk]], new_status)
+        data = self.post([foreign[first.pk]], ShopOrder.STATUS_COMPLETED)
+        self.assertEqual(data['closed_orders'], [first.pk])
+
+        statuses = dict(Order.objects.filter(pk__in=[first.pk, second.pk]).values_list('pk', 'status'))
+        self.assertEqual(statuses, {first.pk: Order.STATUS_COMPLETED, second.pk: Order.STATUS_CANCELLED})
+        self.assertEqual(Order.objects.get(pk=self.orders[2].pk).status, Order.STATUS_NEW)
+
+    def test_invalid_payload(self):
+        for payload in [{'ids': [], 'status': 'shipped'}, {'ids': [1], 'status': 'lost'}, {'status': 'shipped'}]:
+            with self.subTest(payload=payload):
+                response = self.client.post(self.url, payload, format='json')
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
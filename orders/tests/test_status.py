@@ -0,0 +1,138 @@
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from orders.models import InvalidTransition, Order, ShopOrder, StatusTransition, TransitionConflict
+from orders.tests.factories import make_orders, make_products, make_shop, make_user
+from products.models import Product
+
+
+class StatusMachineTests(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.shop = make_shop('Связной', 'supplier@example.com')
+        cls.other_shop = make_shop('Евросеть')
+        cls.products = make_products(cls.shop, 1, quantity=10) + make_products(cls.other_shop, 1, quantity=10)
+
+    def setUp(self):
+        self.order, = make_orders(make_user(), self.products, 1, qty=3)
+        self.own = ShopOrder.objects.get(order=self.order, shop=self.shop)
+        self.foreign = ShopOrder.objects.get(order=self.order, shop=self.other_shop)
+
+    def log(self, **filters):
+        return list(StatusTransition.objects.filter(**filters).order_by('pk')
+                    .values_list('from_status', 'to_status'))
+
+    def test_transition_is_checked_and_logged(self):
+        with self.assertRaises(InvalidTransition):
+            self.own.transition_to(ShopOrder.STATUS_SHIPPED)
+
+        self.own.transition_to(ShopOrder.STATUS_IN_PROGRESS)
+
+        self.own.refresh_from_db()
+        self.assertEqual(self.own.status, ShopOrder.STATUS_IN_PROGRESS)
+        self.assertEqual(self.log(shop_order=self.own), [('new', 'in_progress')])
+        self.assertEqual(StatusTransition.objects.get().order_id, self.order.pk)
+
+    def test_compare_and_set(self):
+        stale = ShopOrder.objects.get(pk=self.own.pk)
+        self.own.transition_to(ShopOrder.STATUS_CANCELLED)
+
+        with self.assertRaises(TransitionConflict):
+            stale.transition_to(ShopOrder.STATUS_IN_PROGRESS)
+        self.assertEqual(stale.status, ShopOrder.STATUS_CANCELLED)
+        self.assertEqual(self.log(shop_order=self.own), [('new', 'cancelled')])
+
+    def test_log_is_append_only(self):
+        self.order.transition_to(Order.STATUS_IN_PROGRESS)
+        entry = StatusTransition.objects.get()
+        entry.to_status = Order.STATUS_SHIPPED
+        with self.assertRaises(ValueError):
+            entry.save()
+        with self.assertRaises(ValueError):
+            entry.delete()
+
+    def test_process_endpoint(self):
+        supplier = self.shop.supplier.user
+        self.client.force_authenticate(supplier)
+        url = reverse('shop-orders-process', args=[self.own.pk])
+
+        response = self.client.patch(url, {'status': 'shipped'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        response = self.client.patch(url, {'status': 'cancelled'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        # товары отменённого подзаказа вернулись на склад
+        self.assertEqual(Product.objects.get(pk=self.products[0].pk).quantity, 13)
+        self.assertEqual(StatusTransition.objects.get(shop_order=self.own).changed_by, supplier)
+
+        # второй подзаказ завершён — заказ закрывается
+        for new_status in ('in_progress', 'shipped'):
+            self.foreign.transition_to(new_status)
+        self.client.force_authenticate(make_user('admin@example.com', is_staff=True))
+        response = self.client.patch(reverse('shop-orders-process', args=[self.foreign.pk]),
+                                     {'status': 'completed'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.status, Order.STATUS_COMPLETED)
+        self.assertEqual(self.log(order=self.order, shop_order__isnull=True), [('new', 'completed')])
+
+    def test_order_cancel_keeps_completed_suborders(self):
+        for new_status in ('in_progress', 'shipped', 'completed'):
+            self.foreign.transition_to(new_status)
+        self.client.force_authenticate(self.order.user)
+
+        response = self.client.post(reverse('orders-cancel', args=[self.order.pk]))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        statuses = dict(ShopOrder.objects.filter(order=self.order).values_list('shop_id', 'status'))
+        self.assertEqual(statuses, {self.shop.pk: 'cancelled', self.other_shop.pk: 'completed'})
+        quantities = dict(Product.objects.values_list('pk', 'quantity'))
+        self.assertEqual(quantities, {self.products[0].pk: 13, self.products[1].pk: 10})
+        self.assertEqual(self.log(order=self.order, shop_order__isnull=True), [('new', 'cancelled')])
+
+    def test_admin_status_endpoint(self):
+        url = reverse('orders-change-status', args=[self.order.pk])
+        self.client.force_authenticate(self.order.user)
+        self.assertEqual(self.client.patch(url, {'status': 'in_progress'}, format='json').status_code,
+                         status.HTTP_403_FORBIDDEN)
+
+        self.client.force_authenticate(make_user('admin@example.com', is_staff=True))
+        response = self.client.patch(url, {'status': 'in_progress'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['status'], 'in_progress')
+        response = self.client.patch(url, {'status': 'new'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_admin_cancel_cancels_suborders_and_releases_stock(self):
+        self.foreign.transition_to(ShopOrder.STATUS_IN_PROGRESS)
+        self.client.force_authenticate(make_user('admin@example.com', is_staff=True))
+
+        response = self.client.patch(reverse('orders-change-status', args=[self.order.pk]),
+                                     {'status': 'cancelled'}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(set(ShopOrder.objects.filter(order=self.order).values_list('status', flat=True)),
+                         {ShopOrder.STATUS_CANCELLED})
+        quantities = dict(Product.objects.values_list('pk', 'quantity'))
+        self.assertEqual(quantities, {self.products[0].pk: 13, self.products[1].pk: 13})
+
+    def test_admin_cannot_complete_order_with_open_suborders(self):
+        url = reverse('orders-change-status', args=[self.order.pk])
+        self.client.force_authenticate(make_user('admin@example.com', is_staff=True))
+        # обход в «завершён» разрешён только закрытию по подзаказам
+        response = self.client.patch(url, {'status': 'completed'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        for new_status in ('in_progress', 'shipped'):
+            self.order.transition_to(new_status)
+        response = self.client.patch(url, {'status': 'completed'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        self.own.transition_to(ShopOrder.STATUS_CANCELLED)
+        for new_status in ('in_progress', 'shipped', 'completed'):
+            self.foreign.transition_to(new_status)
+        response = self.client.patch(url, {'status': 'completed'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['status'], 'completed')
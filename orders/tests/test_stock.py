@@ -0,0 +1,108 @@
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import connection
+from django.db.models import Sum
+from django.test import TestCase, TransactionTestCase, tag
+
+from orders.models import Order, ShopOrderItem
+from orders.services.checkout import CheckoutService
+from orders.services.stock import InsufficientStock, release_stock, reserve_stock
+from orders.tests.factories import fill_cart, make_contact, make_products, make_shop, make_user
+from products.models import Product
+
+
+class ReserveStockTests(TestCase):
+
+    def setUp(self):
+        self.products = make_products(make_shop(), 2, quantity=5)
+
+    def test_reserve_and_release(self):
+        a, b = self.products
+        remaining = reserve_stock({a.id: 5, b.id: 2})
+        self.assertEqual(remaining, {a.id: 0, b.id: 3})
+
+        release_stock({a.id: 1, b.id: 2})
+        a.refresh_from_db()
+        b.refresh_from_db()
+        self.assertEqual((a.quantity, b.quantity), (1, 5))
+
+    def test_insufficient_stock_changes_nothing(self):
+        a, b = self.products
+        with self.assertRaises(InsufficientStock) as ctx:
+            reserve_stock({a.id: 1, b.id: 6})
+        self.assertEqual(ctx.exception.product_ids, [b.id])
+        self.assertEqual(list(Product.objects.values_list('quantity', flat=True)), [5, 5])
+
+    def test_checkout_is_rolled_back_on_shortage(self):
+        user = make_user()
+        a, b = self.products
+        cart = fill_cart(user, [a, b], qty=3)
+        Product.objects.filter(pk=b.pk).update(quantity=2)
+
+        with self.assertRaises(InsufficientStock):
+            CheckoutService(user, cart, make_contact(user)).run()
+
+        self.assertFalse(Order.objects.exists())
+        self.assertEqual(cart.items.count(), 2)
+        a.refresh_from_db()
+        self.assertEqual(a.quantity, 5)
+
+
+@tag('stress')
+class ConcurrentCheckoutTests(TransactionTestCase):
+    """
+    Сотни параллельных оформлений одного «горячего» товара:
+    продано ровно столько, сколько было на складе, без дедлоков
+    и без недописанных заказов.
+    """
+    checkouts = 200
+    workers = 40
+    hot_stock = 50
+
+    def test_no_oversell_and_no_deadlocks(self):
+        hot, *others = make_products(make_shop(), 4, quantity=self.hot_stock)
+        Product.objects.filter(pk__in=[p.pk for p in others]).update(quantity=self.checkouts)
+
+        jobs = []
+        for i in range(self.checkouts):
+            user = make_user(f'client{i}@example.com')
+            # каждая корзина содержит горячий товар и пару других в случайном порядке
+            products = [hot] + random.sample(others, 2)
+            random.shuffle(products)
+            jobs.append((user, fill_cart(user, products), make_contact(user)))
+
+        barrier = threading.Barrier(self.workers)
+        outcomes = []
+
+        def checkout(job):
+            try:
+                try:
+                    barrier.wait(timeout=5)
+                except threading.BrokenBarrierError:
+                    pass
+                CheckoutService(*job).run()
+                return 'ok'
+            except InsufficientStock:
+                return 'short'
+            except Exception as e:
+                return repr(e)
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            outcomes = list(pool.map(checkout, jobs))
+
+        unexpected = [o for o in outcomes if o not in ('ok', 'short')]
+        self.assertEqual(unexpected, [])
+        self.assertEqual(outcomes.count('ok'), self.hot_stock)
+
+        hot.refresh_from_db()
+        self.assertEqual(hot.quantity, 0)
+        self.assertEqual(Order.objects.count(), self.hot_stock)
+        sold = ShopOrderItem.objects.filter(product=hot).aggregate(total=Sum('quantity'))['total']
+        self.assertEqual(sold, self.hot_stock)
+        others_left = sum(Product.objects.filter(pk__in=[p.pk for p in others])
+                          .values_list('quantity', flat=True))
+        self.assertEqual(others_left, self.checkouts * 3 - 2 * self.hot_stock)
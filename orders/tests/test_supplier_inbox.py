@@ -0,0 +1,89 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from orders.models import ShopOrder
+from orders.tests.factories import make_orders, make_products, make_shop, make_user
+from users.services.auth_cache import get_snapshot
+
+
+class SupplierInboxTests(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.shop = make_shop('Связной', 'supplier@example.com')
+        cls.other_shop = make_shop('Евросеть')
+        products = make_products(cls.shop, 3, price=Decimal('10.00')) + make_products(cls.other_shop, 1)
+        make_orders(make_user(), products, 6)
+
+        cls.shop_orders = list(ShopOrder.objects.filter(shop=cls.shop).order_by('pk'))
+        now = timezone.now()
+        for days, shop_order in enumerate(reversed(cls.shop_orders)):
+            shop_order.created_at = now - timedelta(days=days)
+        ShopOrder.objects.bulk_update(cls.shop_orders, ['created_at'])
+        ShopOrder.objects.filter(pk__in=[so.pk for so in cls.shop_orders[:2]]).update(status=ShopOrder.STATUS_SHIPPED)
+        ShopOrder.objects.filter(pk=cls.shop_orders[2].pk).update(status=ShopOrder.STATUS_CANCELLED)
+
+    def setUp(self):
+        self.client.force_authenticate(self.shop.supplier.user)
+        get_snapshot(self.shop.supplier.user_id)
+
+    def inbox(self, params=None, queries=1):
+        # только страница очереди: магазины поставщика — из кэша снимков
+        with self.assertNumQueries(queries):
+            response = self.client.get(reverse('shop-orders-inbox'), params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        return response.data
+
+    def test_rows_without_items_newest_first(self):
+        data = self.inbox()
+        self.assertEqual([row['shop_order_id'] for row in data['results']],
+                         [so.pk for so in reversed(self.shop_orders)])
+        row = data['results'][0]
+        self.assertEqual((row['shop'], row['items_count'], row['suborder_total_amount']), ('Связной', 3, '30.00'))
+        self.assertNotIn('items', row)
+
+    def test_filters(self):
+        new = self.inbox({'status': 'new'})['results']
+        self.assertEqual({row['status_from_shop'] for row in new}, {'new'})
+        self.assertEqual(len(new), 3)
+        self.assertEqual(len(self.inbox({'status': 'new,shipped'})['results']), 5)
+
+        since = (timezone.now() - timedelta(days=2, hours=1)).isoformat()
+        recent = self.inbox({'created_after': since})['results']
+        self.assertEqual([row['shop_order_id'] for row in recent],
+                         [so.pk for so in reversed(self.shop_orders[-3:])])
+        self.assertEqual(self.inbox({'shop': self.other_shop.pk})['results'], [])
+
+    def test_keyset_pages(self):
+        first = self.inbox({'page_size': 4})
+        second = self.client.get(first['next']).data
+        ids = [row['shop_order_id'] for row in first['results'] + second['results']]
+        self.assertEqual(ids, [so.pk for so in reversed(self.shop_orders)])
+        self.assertIsNone(second['next'])
+
+    def test_invalid_status(self):
+        response = self.client.get(reverse('shop-orders-inbox'), {'status': 'lost'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_summary(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('shop-orders-summary'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        statuses = {row['status']: (row['count'], row['total']) for row in response.data['statuses']}
+        self.assertEqual(statuses[ShopOrder.STATUS_NEW], (3, Decimal('90.00')))
+        self.assertEqual(statuses[ShopOrder.STATUS_SHIPPED], (2, Decimal('60.00')))
+        self.assertEqual(statuses[ShopOrder.STATUS_COMPLETED], (0, Decimal('0')))
+        self.assertEqual((response.data['count'], response.data['total']), (6, Decimal('180.00')))
+
+        since = (timezone.now() - timedelta(days=1, hours=1)).isoformat()
+        response = self.client.get(reverse('shop-orders-summary'), {'created_after': since})
+        self.assertEqual(response.data['count'], 2)
+
+    def test_client_sees_nothing(self):
+        self.client.force_authenticate(make_user('buyer@example.com'))
+        self.assertEqual(self.inbox(queries=1)['results'], [])
@@ -1,19 +1,29 @@
-from collections import defaultdict
-
-from django.core.exceptions import ObjectDoesNotExist
-from django.db.models import F
+from django.db import transaction
 from django.shortcuts import get_object_or_404
 from rest_framework import viewsets, status, mixins
 from rest_framework.decorators import action
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.exceptions import NotFound
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
 
-from orders.models import Cart, CartItem, Order, ShopOrder, ShopOrderItem
+from backend.pagination import KeysetPagination
+
+from orders.filters import ShopOrderFilter
+from orders.models import Cart, InvalidTransition, Order, ShopOrder, TransitionConflict
 from orders.serializers import (CartSerializer, AddCartItemSerializer, RemoveCartItemSerializer,
-                                OrderSerializer, ShopOrderStatusSerializer, ShopOrderSerializer)
+                                BulkCartSerializer, OrderSerializer, OrderStatusSerializer, ShopOrderStatusSerializer, ShopOrderSerializer,
+                                ShopOrderInboxSerializer, BulkShopOrderStatusSerializer)
+from orders.services.cart import BulkCartUpdate, CartUpdateError, load_cart
+from orders.services.checkout import CheckoutService
+from orders.services.order_queries import (orders_for_read, shop_order_summary, shop_orders_for_inbox,
+                                           shop_orders_for_read)
+from orders.services.reservations import hold_stock, trim_holds
+from orders.services.shop_order_status import (BulkStatusTransition, after_shop_order_transition,
+                                               cancel_order, lock_orders)
+from orders.services.stock import InsufficientStock
 from products.models import Product
+from shops.permissions import IsShopOwner, scope_to_owned_shops
 from users.models import DeliveryContact
-from users.tasks import send_order_confirmation_email
 
 
 class CartViewSet(viewsets.ViewSet):
@@ -24,36 +34,59 @@ class CartViewSet(viewsets.ViewSet):
         GET /api/cart/
         -> возвращает текущую корзину пользователя
         """
-        cart, _ = Cart.objects.get_or_create(user=request.user)
-        serializer = CartSerializer(cart)
-        return Response(serializer.data)
+        return Response(CartSerializer(load_cart(request.user)).data)
 
     @action(methods=['post'], detail=False, url_path='items')
     def add_item(self, request):
         """
         POST /api/cart/items/
         { "product_id": 1, "quantity": 2 }
-        -> добавляет товар в корзину (или увеличивает его кол-во)
+        -> добавляет товар в корзину (или увеличивает его кол-во) и
+           резервирует его на CART_RESERVATION_TTL секунд; если свободный
+           остаток удерживают другие корзины — 409
         """
         serializer = AddCartItemSerializer(data=request.data,
                                            context={'request': request}
                                            )
         serializer.is_valid(raise_exception=True)
 
-        product = get_object_or_404(Product, pk=serializer.validated_data['product_id'])
-        qty = serializer.validated_data['quantity']
-        cart, _ = Cart.objects.get_or_create(user=request.user)
+        data = serializer.validated_data
+        try:
+            with transaction.atomic():
+                # цена для unit_price — из строки товара, а не из кэша наличия
+                product = Product.objects.only('pk', 'price').get(pk=data['product_id'])
+                item = data['cart'].add_item(product, data['quantity'])
+                hold_stock(data['cart'], {item.product_id: item.quantity})
+        except InsufficientStock as e:
+            return Response({'detail': str(e), 'product_ids': e.product_ids},
+                            status=status.HTTP_409_CONFLICT)
+
+        return Response(CartSerializer(load_cart(request.user)).data, status=status.HTTP_201_CREATED)
+
+    @action(methods=['post'], detail=False, url_path='items/bulk')
+    def bulk_update(self, request):
+        """
+        POST /api/cart/items/bulk/
+        { "items": [
+            { "product_id": 1, "quantity": 2 },
+            { "product_id": 2, "quantity": 5, "action": "set" },
+            { "product_id": 3, "action": "remove" }
+        ] }
+        -> применяет все строки одной транзакцией (action по умолчанию add).
+           Если хоть одна строка не проходит проверку — корзина не меняется,
+           в ответе 400 и ошибки по номерам строк.
+        """
+        serializer = BulkCartSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
 
-        item, created = CartItem.objects.get_or_create(
-            cart=cart,
-            product=product,
-            defaults={'quantity': qty, 'unit_price': product.price}
-        )
-        if not created:
-            item.quantity += qty
-            item.save(update_fields=['quantity'])
+        cart, _ = Cart.objects.get_or_create(user=request.user)
+        try:
+            BulkCartUpdate(cart, serializer.validated_data['items']).run()
+        except CartUpdateError as e:
+            return Response({'detail': str(e), 'errors': e.errors},
+                            status=status.HTTP_400_BAD_REQUEST)
 
-        return Response(CartSerializer(cart).data, status=status.HTTP_201_CREATED)
+        return Response(CartSerializer(load_cart(request.user)).data, status=status.HTTP_200_OK)
 
     @action(methods=['delete'], detail=False, url_path=r'items/(?P<product_id>[^/.]+)')
     def remove_item(self, request, product_id=None):
@@ -79,19 +112,12 @@ class CartViewSet(viewsets.ViewSet):
         qty_to_remove = serializer.validated_data.get('quantity')
 
         cart = get_object_or_404(Cart, user=request.user)
-        item = get_object_or_404(
-            CartItem,
-            cart=cart,
-            product_id=product_id
-        )
-
-        if qty_to_remove is None or qty_to_remove >= item.quantity:
-            item.delete()
-        else:
-            item.quantity -= qty_to_remove
-            item.save(update_fields=['quantity'])
+        with transaction.atomic():
+            if not cart.remove_item(serializer.validated_data['product_id'], qty_to_remove):
+                raise NotFound('Товара нет в корзине')
+            trim_holds(cart, [serializer.validated_data['product_id']])
 
-        return Response(CartSerializer(cart).data, status=status.HTTP_200_OK)
+        return Response(CartSerializer(load_cart(request.user)).data, status=status.HTTP_200_OK)
 
 
 class OrderViewSet(mixins.ListModelMixin,
@@ -99,20 +125,35 @@ class OrderViewSet(mixins.ListModelMixin,
                    viewsets.GenericViewSet):
     """
     list:
-        GET /api/orders/ — список всех заказов клиента (или всех для admin).
+        GET /api/orders/ — список всех заказов клиента (или всех для admin),
+        новые первыми, постранично по ключу (?cursor=…, ?page_size=…);
+        ?ordering= — только created_at или pk.
     retrieve:
         GET /api/orders/{pk}/ — детали одного заказа.
     confirm:
         POST /api/orders/confirm/ — оформить корзину в Order + ShopOrder.
+    cancel:
+        POST /api/orders/{pk}/cancel/ — отменить заказ.
+    change_status:
+        PATCH /api/orders/{pk}/status/ — сменить статус заказа (только admin).
     """
     serializer_class = OrderSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
+    # курсор держится только на сортировке, которую добивает pk:
+    # прочие ?ordering= отбрасываются
+    ordering_fields = ['created_at', 'pk']
+    ordering = ['-pk']
+
+    # действия, которые отдают заказ целиком и читаются через orders_for_read
+    read_actions = ('list', 'retrieve')
 
     def get_queryset(self):
         user = self.request.user
-        if user.is_staff:
-            return Order.objects.all()
-        return Order.objects.filter(user=user)
+        queryset = Order.objects.all() if user.is_staff else Order.objects.filter(user=user)
+        if self.action in self.read_actions:
+            queryset = orders_for_read(queryset)
+        return queryset
 
     @action(detail=False, methods=['post'], url_path='confirm')
     def confirm(self, request):
@@ -132,54 +173,16 @@ class OrderViewSet(mixins.ListModelMixin,
                                     pk=contact_id,
                                     user=request.user)
 
-        if not cart.items.exists():
-            return Response({'detail': 'Корзина пуста'},
+        # создаём Order, ShopOrder'ы, списываем остатки и ставим письмо-подтверждение в outbox
+        try:
+            order = CheckoutService(request.user, cart, contact).run()
+        except InsufficientStock as e:
+            return Response({'detail': str(e), 'product_ids': e.product_ids},
+                            status=status.HTTP_409_CONFLICT)
+        except ValueError as e:
+            return Response({'detail': str(e)},
                             status=status.HTTP_400_BAD_REQUEST)
 
-        # 1) заводим общий Order
-        order = Order.objects.create(user=request.user,
-                                     delivery_contact=contact,
-                                     status=Order.STATUS_NEW,
-                                     total_amount=0)
-
-        # 2) группируем CartItem по shop
-        by_shop = defaultdict(list)
-        for ci in cart.items.select_related('product__shop'):
-            by_shop[ci.product.shop].append(ci)
-
-        # 3) по каждой группе создаём ShopOrder + ShopOrderItem’ы
-        for shop, items in by_shop.items():
-            so = ShopOrder.objects.create(
-                order=order,
-                shop=shop,
-                status=ShopOrder.STATUS_NEW,
-                total_amount=0
-            )
-            for ci in items:
-                ShopOrderItem.objects.create(
-                    shop_order=so,
-                    product=ci.product,
-                    quantity=ci.quantity,
-                    unit_price=ci.unit_price
-                )
-            so.calculate_total()
-
-        # 4) пересчитываем итоговую сумму общего Order
-        order.calculate_total()
-
-        # 4.1) "Списываем" товар со склада
-        for so in order.shop_orders.all():
-            for item in so.items.all():
-                Product.objects.filter(pk=item.product_id).update(
-                    quantity=F('quantity') - item.quantity
-                )
-
-        # 5) Отправляем email с подтверждением заказа
-        send_order_confirmation_email.delay(order.id)
-
-        # 5) очищаем корзину
-        cart.items.all().delete()
-
         return Response(OrderSerializer(order).data,
                         status=status.HTTP_201_CREATED)
 
@@ -196,23 +199,36 @@ class OrderViewSet(mixins.ListModelMixin,
             return Response({'detail': 'Недостаточно прав'},
                             status=status.HTTP_403_FORBIDDEN)
 
-        # если уже отменён или завершён
-        if order.status in (Order.STATUS_CANCELLED, Order.STATUS_COMPLETED):
+        try:
+            cancel_order(order, changed_by=request.user)
+        except InvalidTransition:
             return Response({'detail': 'Нельзя отменить'},
                             status=status.HTTP_400_BAD_REQUEST)
 
-        # ставим статус cancelled
-        order.cancel()
+        return Response(self.get_serializer(order).data,
+                        status=status.HTTP_200_OK)
 
-        # отменяем все связанные ShopOrder
-        ShopOrder.objects.filter(order=order).update(status=ShopOrder.STATUS_CANCELLED)
+    @action(methods=['patch'], detail=True, url_path='status', permission_classes=[IsAdminUser])
+    def change_status(self, request, pk=None):
+        """
+        PATCH /api/orders/{pk}/status/
+        { "status": "<new_status>" }
+        — смена статуса заказа администратором по таблице переходов.
+          Отмена выполняется так же, как POST /cancel/: вместе с
+          подзаказами и возвратом остатков.
+        """
+        order = self.get_object()
+        serializer = OrderStatusSerializer(data=request.data, context={'order': order})
+        serializer.is_valid(raise_exception=True)
+        new_status = serializer.validated_data['status']
 
-        # Восстанавливаем остаток на складе
-        for so in order.shop_orders.all():
-            for item in so.items.all():
-                Product.objects.filter(pk=item.product_id).update(
-                    quantity=F('quantity') + item.quantity
-                )
+        try:
+            if new_status == Order.STATUS_CANCELLED:
+                cancel_order(order, changed_by=request.user)
+            else:
+                order.transition_to(new_status, changed_by=request.user)
+        except InvalidTransition as e:
+            return Response({'detail': str(e)}, status=status.HTTP_409_CONFLICT)
 
         return Response(self.get_serializer(order).data,
                         status=status.HTTP_200_OK)
@@ -223,29 +239,80 @@ class ShopOrderViewSet(mixins.ListModelMixin,
                        viewsets.GenericViewSet):
     """
     list:
-        GET /api/shop-orders/ — список подзаказов магазина.
+        GET /api/shop-orders/ — список подзаказов магазина, новые первыми,
+        постранично по ключу (?cursor=…, ?page_size=…).
+    inbox:
+        GET /api/shop-orders/inbox/ — очередь подзаказов без списков
+        позиций (только их число), новые первыми, постранично по ключу.
+    summary:
+        GET /api/shop-orders/summary/ — число подзаказов и сумма по статусам.
     retrieve:
         GET /api/shop-orders/{pk}/ — детали одного подзаказа.
     process:
         PATCH /api/shop-orders/{pk}/process/ — сменить статус подзаказа.
+    bulk_process:
+        POST /api/shop-orders/bulk-process/ — сменить статус сразу у многих подзаказов.
+
+    Список, очередь и сводка фильтруются:
+        - ?status=new,in_progress — статусы через запятую
+        - ?created_after=…, ?created_before=… — дата создания (ISO 8601)
+        - ?shop=… — id магазина поставщика
     """
     serializer_class = ShopOrderSerializer
-    permission_classes = [IsAuthenticated]
+    permission_classes = [IsAuthenticated, IsShopOwner]
+    pagination_class = KeysetPagination
+    filterset_class = ShopOrderFilter
+    ordering_fields = ['created_at', 'pk']
+    ordering = ['-created_at']
 
-    def get_queryset(self):
-        user = self.request.user
+    read_actions = ('list', 'retrieve')
 
-        # админ видит все
-        if user.is_staff:
-            return ShopOrder.objects.all()
+    def get_queryset(self):
+        # админ видит все, поставщики — только свои ShopOrder’ы; условие
+        # по shop_id, а не JOIN с магазинами, чтобы работали индексы по (shop, …)
+        queryset = scope_to_owned_shops(self.request, ShopOrder.objects.all())
+
+        if self.action in self.read_actions:
+            queryset = shop_orders_for_read(queryset)
+        elif self.action == 'inbox':
+            queryset = shop_orders_for_inbox(queryset)
+        return queryset
+
+    def get_serializer_class(self):
+        if self.action == 'inbox':
+            return ShopOrderInboxSerializer
+        return super().get_serializer_class()
+
+    @action(detail=False, methods=['get'], url_path='inbox')
+    def inbox(self, request):
+        return self.list(request)
+
+    @action(detail=False, methods=['get'], url_path='summary')
+    def summary(self, request):
+        queryset = self.filter_queryset(self.get_queryset())
+        return Response(shop_order_summary(queryset))
+
+    @action(detail=False, methods=['post'], url_path='bulk-process')
+    def bulk_process(self, request):
+        """
+        POST /api/shop-orders/bulk-process/
+        { "ids": [1, 2, 3], "status": "shipped" }
+        — переводит подзаказы в статус, если переход разрешён. Ответ:
+          updated — переведённые id, errors — [{id, detail}] по остальным,
+          closed_orders — заказы, закрытые после перехода всех их подзаказов
+          в конечный статус.
+        """
+        serializer = BulkShopOrderStatusSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
 
-        # поставщики — только свои ShopOrder’ы
-        try:
-            sp = user.supplier_profile
-        except ObjectDoesNotExist:
-            return ShopOrder.objects.none()
+        result = BulkStatusTransition(
+            self.get_queryset(),
+            serializer.validated_data['ids'],
+            serializer.validated_data['status'],
+            changed_by=request.user,
+        ).run()
 
-        return ShopOrder.objects.filter(shop__supplier=sp)
+        return Response(result, status=status.HTTP_200_OK)
 
     @action(detail=True, methods=['patch'], url_path='process')
     def process(self, request, pk=None):
@@ -256,28 +323,30 @@ class ShopOrderViewSet(mixins.ListModelMixin,
         """
         shop_order = self.get_object()
 
-        parent_order = shop_order.order
-        if parent_order.status in (parent_order.STATUS_CANCELLED,
-                                   parent_order.STATUS_COMPLETED):
-            return Response(
-                {'detail': 'Нельзя менять статус подзаказа — заказ уже закрыт.'},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-
-        # Проверка прав
-        profile = request.user.supplier_profile
-        if shop_order.shop.supplier != profile and not request.user.is_staff:
-            return Response({'detail': 'Недостаточно прав'},
-                            status=status.HTTP_403_FORBIDDEN)
-
         serializer = ShopOrderStatusSerializer(
             data=request.data,
             context={'shop_order': shop_order}
         )
         serializer.is_valid(raise_exception=True)
+        new_status = serializer.validated_data['status']
 
-        shop_order.status = serializer.validated_data['status']
-        shop_order.save(update_fields=['status'])
+        try:
+            with transaction.atomic():
+                # заказ блокируется раньше подзаказа — в том же порядке,
+                # что и при отмене заказа
+                if lock_orders([shop_order.order_id])[shop_order.order_id] in Order.TERMINAL_STATUSES:
+                    return Response(
+                        {'detail': 'Нельзя менять статус подзаказа — заказ уже закрыт.'},
+                        status=status.HTTP_400_BAD_REQUEST
+                    )
+                shop_order.transition_to(new_status, changed_by=request.user)
+                after_shop_order_transition(
+                    [{'pk': shop_order.pk, 'order_id': shop_order.order_id}], new_status, request.user
+                )
+        except TransitionConflict as e:
+            return Response({'detail': str(e)}, status=status.HTTP_409_CONFLICT)
+        except InvalidTransition as e:
+            return Response({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
         return Response(self.get_serializer(shop_order).data,
                         status=status.HTTP_200_OK)
@@ -1,6 +1,102 @@
+import json
+from collections import defaultdict
+from decimal import Decimal, InvalidOperation
+
 import django_filters
+from django import forms
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db.models import BooleanField, F, Func, Value
+from rest_framework.filters import SearchFilter
+
+from products.models import Product, ProductListing
+from products.services.search import correct_search_text
+
+
+class JSONPathExists(Func):
+    """
+    jsonb @? jsonpath — условие, которое обслуживает GIN-индекс
+    product_characteristics (jsonb_path_ops).
+    """
+    arg_joiner = ' @? '
+    template = '%(expressions)s'
+    output_field = BooleanField()
+
+
+class CharacteristicField(forms.Field):
+    """
+    Повторяемый параметр вида «характеристика:значение», например
+    ?attr=Цвет:черный&attr=Встроенная память (Гб):256. Ключ отделяется
+    по первому двоеточию. С numeric=True значение должно быть числом.
+    """
+    widget = forms.MultipleHiddenInput
+
+    def __init__(self, *args, numeric=False, **kwargs):
+        self.numeric = numeric
+        super().__init__(*args, **kwargs)
+
+    def to_python(self, value):
+        pairs = []
+        for raw in value or []:
+            key, sep, text = raw.partition(':')
+            key, text = key.strip(), text.strip()
+            if not sep or not key or not text:
+                raise forms.ValidationError('Ожидается «характеристика:значение»')
+            number = _parse_number(text)
+            if self.numeric:
+                if number is None:
+                    raise forms.ValidationError(f'Значение «{key}» должно быть числом')
+                pairs.append((key, [number]))
+                continue
+            # в прайсе 256 может быть и числом, и строкой, а true — булевым
+            candidates = [text]
+            if number is not None:
+                candidates.append(number)
+            if text.lower() in ('true', 'false'):
+                candidates.append(text.lower() == 'true')
+            pairs.append((key, candidates))
+        return pairs
+
+
+def _parse_number(text):
+    try:
+        number = Decimal(text)
+    except InvalidOperation:
+        return None
+    return number if number.is_finite() else None
+
+
+def _jsonpath_literal(value):
+    if isinstance(value, Decimal):
+        return format(value, 'f')
+    return json.dumps(value, ensure_ascii=False)
+
 
-from products.models import Product
+class CharacteristicFilter(django_filters.Filter):
+    """
+    Фильтр по Product.characteristics через jsonpath:
+
+        operator='==' — значения одной характеристики объединяются по ИЛИ,
+                        разные характеристики — по И;
+        operator='>=' / '<=' — числовые границы, строки им не подходят.
+    """
+    field_class = CharacteristicField
+
+    def __init__(self, *args, operator='==', **kwargs):
+        self.operator = operator
+        kwargs.setdefault('numeric', operator != '==')
+        super().__init__(*args, **kwargs)
+
+    def filter(self, qs, value):
+        if not value:
+            return qs
+        conditions = defaultdict(list)
+        for key, candidates in value:
+            conditions[key].extend(f'@ {self.operator} {_jsonpath_literal(c)}' for c in candidates)
+        joiner = ' || ' if self.operator == '==' else ' && '
+        for key, parts in conditions.items():
+            path = f'$.{_jsonpath_literal(key)} ? ({joiner.join(parts)})'
+            qs = qs.filter(JSONPathExists(F(self.field_name), Value(path)))
+        return qs
 
 
 class ProductFilter(django_filters.FilterSet):
@@ -8,7 +104,59 @@ class ProductFilter(django_filters.FilterSet):
     price_max = django_filters.NumberFilter(field_name='price', lookup_expr='lte')
     supplier = django_filters.CharFilter(field_name='shop__id')
     category = django_filters.CharFilter(field_name='category__external_id')
+    attr = CharacteristicFilter(field_name='characteristics')
+    attr_min = CharacteristicFilter(field_name='characteristics', operator='>=')
+    attr_max = CharacteristicFilter(field_name='characteristics', operator='<=')
 
     class Meta:
         model = Product
-        fields = ['supplier', 'category', 'price_min', 'price_max']
\ No newline at end of file
+        fields = ['supplier', 'category', 'price_min', 'price_max', 'attr', 'attr_min', 'attr_max']
+
+
+class ProductListingFilter(ProductFilter):
+    """
+    Фильтры каталога по витрине: магазин и внешний id категории —
+    её собственные колонки, без JOIN.
+    """
+    supplier = django_filters.CharFilter(field_name='shop_id')
+    category = django_filters.CharFilter(field_name='category_external_id')
+
+    class Meta(ProductFilter.Meta):
+        model = ProductListing
+
+
+class ProductSearchFilter(SearchFilter):
+    """
+    ?search=… по Product.search_vector (GIN): морфология названия и
+    описания, модели вроде apple/iphone/xs-max как отдельные токены.
+    Если по запросу ничего не нашлось, слова с опечатками исправляются
+    по словарю SearchWord (триграммы pg_trgm) и поиск повторяется.
+
+    Вместо ILIKE '%…%' по name и description, который всегда читает
+    всю таблицу, товары выбираются по индексу. Найденные товары
+    получают аннотацию search_rank — без явного ?ordering= выдача
+    сортируется по ней.
+    """
+    rank_annotation = 'search_rank'
+
+    def get_search_text(self, request):
+        return ' '.join(self.get_search_terms(request))
+
+    @staticmethod
+    def build_query(text):
+        return (SearchQuery(text, config='russian', search_type='websearch')
+                | SearchQuery(text, config='english', search_type='websearch'))
+
+    def filter_queryset(self, request, queryset, view):
+        text = self.get_search_text(request)
+        if not text:
+            return queryset
+
+        query = self.build_query(text)
+        if not queryset.filter(search_vector=query).exists():
+            corrected = correct_search_text(text)
+            if corrected:
+                query = self.build_query(corrected)
+        return queryset.filter(search_vector=query).annotate(
+            **{self.rank_annotation: SearchRank(F('search_vector'), query)}
+        )
@@ -0,0 +1,255 @@
+import json
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import yaml
+from django.core.management import BaseCommand, CommandError
+from django.db import connections
+
+from shops.services.feed_parser import init_feed_worker, parse_feed_file
+from shops.services.shop_import import ShopImportService
+from users.models import SupplierProfile
+
+FEED_SUFFIXES = ('.yaml', '.yml')
+
+
+class FeedRun:
+    """
+    Состояние импорта одного прайса.
+    """
+    def __init__(self, path, service):
+        self.path = path
+        self.service = service
+        self.errors = []
+        self.parsed = False
+        self.started_at = self.finished_at = time.perf_counter()
+
+    @property
+    def failed(self):
+        return bool(self.errors)
+
+    def touch(self):
+        self.finished_at = max(self.finished_at, time.perf_counter())
+
+
+class Command(BaseCommand):
+    help = "Параллельно импортирует несколько yaml-прайсов"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'paths',
+            nargs='*',
+            help='Файлы прайсов или каталоги с *.yaml/*.yml'
+        )
+        parser.add_argument(
+            '--supplier-email',
+            type=str,
+            help='Email поставщика для прайсов, переданных в paths'
+        )
+        parser.add_argument(
+            '--manifest',
+            type=str,
+            help='yaml/json-файл вида {"feeds": [{"file": ..., "supplier_email": ...}]}; '
+                 'относительные пути считаются от каталога манифеста'
+        )
+        parser.add_argument(
+            '--processes',
+            type=int,
+            default=os.cpu_count() or 1,
+            help='Число процессов, разбирающих yaml'
+        )
+        parser.add_argument(
+            '--writers',
+            type=int,
+            default=4,
+            help='Число потоков, записывающих товары в БД'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=ShopImportService.batch_size,
+            help='Размер пачки товаров'
+        )
+        parser.add_argument(
+            '--incremental',
+            action='store_true',
+            help='Записывать только изменившиеся товары'
+        )
+        parser.add_argument(
+            '--deactivate-missing',
+            action='store_true',
+            help='Снимать с продажи товары, которых нет в прайсе'
+        )
+
+    def _collect_feeds(self, options):
+        feeds = []
+        if options['paths']:
+            if not options['supplier_email']:
+                raise CommandError('Для прайсов из paths нужно указать --supplier-email')
+            for raw in options['paths']:
+                path = Path(raw)
+                if path.is_dir():
+                    feeds += [(p, options['supplier_email'])
+                              for p in sorted(path.iterdir()) if p.suffix in FEED_SUFFIXES]
+                elif path.is_file():
+                    feeds.append((path, options['supplier_email']))
+                else:
+                    raise CommandError(f'Файл {path} не найден')
+
+        if options['manifest']:
+            manifest = Path(options['manifest'])
+            try:
+                with open(manifest, encoding='utf-8') as f:
+                    data = json.load(f) if manifest.suffix == '.json' else yaml.safe_load(f)
+            except FileNotFoundError:
+                raise CommandError(f'Файл {manifest} не найден')
+            except (ValueError, yaml.YAMLError) as e:
+                raise CommandError(f'Ошибка: {e}')
+            for entry in (data or {}).get('feeds', []):
+                email = entry.get('supplier_email') or options['supplier_email']
+                if not entry.get('file') or not email:
+                    raise CommandError(f'В манифесте не указан file или supplier_email: {entry}')
+                feeds.append((manifest.parent / entry['file'], email))
+
+        if not feeds:
+            raise CommandError('Не найдено ни одного прайса')
+        return feeds
+
+    def _load_suppliers(self, feeds):
+        emails = {email for _, email in feeds}
+        suppliers = {s.user.email: s for s in
+                     SupplierProfile.objects.select_related('user').filter(user__email__in=emails)}
+        missing = sorted(emails - suppliers.keys())
+        if missing:
+            raise CommandError(f"Поставщик с email {', '.join(missing)} не найден")
+        return suppliers
+
+    def _writer(self, tasks):
+        try:
+            while (task := tasks.get()) is not None:
+                run, goods = task
+                try:
+                    if not run.failed:
+                        run.service.import_products(goods)
+                except Exception as e:
+                    run.errors.append(str(e))
+                finally:
+                    run.touch()
+                    tasks.task_done()
+            tasks.task_done()
+        finally:
+            connections.close_all()
+
+    def handle(self, *args, **options):
+        feeds = self._collect_feeds(options)
+        suppliers = self._load_suppliers(feeds)
+        processes = max(1, min(options['processes'], len(feeds)))
+        writers = max(1, options['writers'])
+
+        runs = []
+        for path, email in feeds:
+            service = ShopImportService(
+                suppliers[email],
+                batch_size=options['batch_size'],
+                incremental=options['incremental'],
+                deactivate_missing=options['deactivate_missing'],
+            )
+            service.start()
+            runs.append(FeedRun(path, service))
+
+        # обе очереди ограничены: если запись в БД не успевает, парсеры
+        # останавливаются на put(), а не накапливают пачки в памяти
+        batches = multiprocessing.Queue(maxsize=writers * 2)
+        tasks = queue.Queue(maxsize=writers * 2)
+        # дочерние процессы не должны наследовать открытые соединения с БД
+        connections.close_all()
+        started = time.perf_counter()
+        with ProcessPoolExecutor(processes, initializer=init_feed_worker, initargs=(batches,)) as pool:
+            futures = {
+                pool.submit(parse_feed_file, key, str(run.path), options['batch_size']): run
+                for key, run in enumerate(runs)
+            }
+            # потоки запускаются после создания процессов пула, чтобы fork
+            # не копировал их состояние
+            threads = [threading.Thread(target=self._writer, args=(tasks,), daemon=True)
+                       for _ in range(writers)]
+            for thread in threads:
+                thread.start()
+
+            pending = len(runs)
+            while pending:
+                try:
+                    key, kind, value = batches.get(timeout=1)
+                except queue.Empty:
+                    # процесс пула мог упасть, не успев ничего сообщить
+                    for future, run in futures.items():
+                        if future.done() and future.exception() and not run.parsed:
+                            run.errors.append(str(future.exception()))
+                            run.parsed = True
+                            pending -= 1
+                    continue
+
+                run = runs[key]
+                try:
+                    if kind == 'goods':
+                        tasks.put((run, value))
+                    elif run.failed:
+                        pass
+                    elif kind == 'shop':
+                        run.service.import_shop(value)
+                    elif kind == 'categories':
+                        run.service.import_categories(value)
+                    elif kind == 'error':
+                        run.errors.append(value)
+                except Exception as e:
+                    run.errors.append(str(e))
+                if kind in ('done', 'error'):
+                    run.parsed = True
+                    run.touch()
+                    pending -= 1
+
+        tasks.join()
+        for _ in threads:
+            tasks.put(None)
+        for thread in threads:
+            thread.join()
+
+        for run in runs:
+            if run.failed:
+                continue
+            try:
+                run.service.finish()
+            except Exception as e:
+                run.errors.append(str(e))
+            run.touch()
+        elapsed = time.perf_counter() - started
+
+        self._report(runs, elapsed)
+
+    def _report(self, runs, elapsed):
+        total_rows = 0
+        for run in runs:
+            service = run.service
+            if run.failed:
+                self.stdout.write(self.style.ERROR(f"{run.path}: ошибка — {'; '.join(run.errors)}"))
+                continue
+            rows = service.rows_processed
+            total_rows += rows
+            seconds = run.finished_at - run.started_at
+            self.stdout.write(
+                f"{run.path}: магазин {service.shop.name} {'создан' if service.shop_created else 'найден'}, "
+                f"товаров {rows} за {seconds:.1f} с — создано {service.created_products}, "
+                f"обновлено {service.updated_products}, без изменений {service.unchanged_products}, "
+                f"пропущено {service.skipped_products}, снято с продажи {service.removed_products}"
+            )
+
+        failed = sum(run.failed for run in runs)
+        rate = total_rows / elapsed if elapsed else 0
+        summary = (f"Прайсов: {len(runs)}, с ошибками: {failed}. "
+                   f"Товаров: {total_rows} за {elapsed:.1f} с ({rate:.0f} строк/с)")
+        self.stdout.write(self.style.ERROR(summary) if failed else self.style.SUCCESS(summary))
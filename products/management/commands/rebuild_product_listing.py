@@ -0,0 +1,60 @@
+from django.core.management import BaseCommand, CommandError
+
+from products.services.catalog_cache import catalog_cache
+from products.services.listing import check_listing, rebuild_listing, sync_listing
+
+SAMPLE_SIZE = 20
+
+
+class Command(BaseCommand):
+    help = "Пересобирает витрину каталога (ProductListing) или сверяет её с товарами"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Только сверить витрину с товарами; при расхождениях код возврата 1'
+        )
+        parser.add_argument(
+            '--repair',
+            action='store_true',
+            help='Сверить и переписать только расходящиеся строки'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=10_000,
+            help='Размер пачки товаров при полной пересборке'
+        )
+
+    def report(self, report):
+        for name, ids in report.items():
+            if ids:
+                sample = ', '.join(map(str, ids[:SAMPLE_SIZE]))
+                more = '…' if len(ids) > SAMPLE_SIZE else ''
+                self.stdout.write(f'{name}: {len(ids)} ({sample}{more})')
+        return sum(map(len, report.values()))
+
+    def handle(self, *args, **options):
+        if options['check'] or options['repair']:
+            report = check_listing()
+            diverged = self.report(report)
+            if not diverged:
+                self.stdout.write('Витрина согласована с товарами')
+                return
+            if options['check']:
+                raise CommandError(f'Расходящихся строк: {diverged}')
+            written = sync_listing(pk for ids in report.values() for pk in ids)
+        else:
+            stats = rebuild_listing(batch_size=options['batch_size'])
+            self.stdout.write(
+                f"Товаров: {stats['products']}, записано строк: {stats['written']}, "
+                f"удалено: {stats['deleted']}"
+            )
+            written = stats['written'] + stats['deleted']
+        if written:
+            catalog_cache.invalidate()
+        diverged = self.report(check_listing())
+        if diverged:
+            raise CommandError(f'После пересборки осталось расходящихся строк: {diverged}')
+        self.stdout.write('Витрина согласована с товарами')
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.4 on 2026-10-17 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='feed_fingerprint',
+            field=models.CharField(blank=True, default='', help_text='Хэш строки прайса, из которой товар импортирован последний раз', max_length=32),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='is_active',
+            field=models.BooleanField(default=True, help_text='Есть ли товар в актуальном прайсе поставщика'),
+        ),
+    ]
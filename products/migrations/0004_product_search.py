@@ -0,0 +1,54 @@
+# Generated by Django 5.2.4 on 2026-10-17 12:45
+
+import re
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations, models
+
+
+def fill_search_words(apps, schema_editor):
+    # копия products.services.search.extract_words на момент миграции
+    Product = apps.get_model('products', 'Product')
+    SearchWord = apps.get_model('products', 'SearchWord')
+    words = set()
+    for name in Product.objects.values_list('name', flat=True).iterator(chunk_size=10000):
+        for word in re.findall(r'\w+', name.lower()):
+            if 3 <= len(word) <= 64 and not word.isdigit():
+                words.add(word)
+    SearchWord.objects.bulk_create([SearchWord(word=word) for word in words],
+                                   batch_size=10000, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0003_product_keyset_indexes'),
+        ('shops', '0004_shop_catalog_version'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.CreateModel(
+            name='SearchWord',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('word', models.CharField(max_length=64, unique=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='search_vector',
+            field=models.GeneratedField(db_persist=True, expression=django.contrib.postgres.search.CombinedSearchVector(django.contrib.postgres.search.CombinedSearchVector(django.contrib.postgres.search.CombinedSearchVector(django.contrib.postgres.search.SearchVector('name', config='russian', weight='A'), '||', django.contrib.postgres.search.SearchVector('name', config='english', weight='A'), django.contrib.postgres.search.SearchConfig('russian')), '||', django.contrib.postgres.search.SearchVector('model', config='simple', weight='A'), django.contrib.postgres.search.SearchConfig('russian')), '||', django.contrib.postgres.search.SearchVector('description', config='russian', weight='B'), django.contrib.postgres.search.SearchConfig('russian')), output_field=django.contrib.postgres.search.SearchVectorField()),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='product_search_vector'),
+        ),
+        migrations.AddIndex(
+            model_name='searchword',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['word'], name='search_word_trgm', opclasses=['gin_trgm_ops']),
+        ),
+        migrations.RunPython(fill_search_words, migrations.RunPython.noop),
+    ]
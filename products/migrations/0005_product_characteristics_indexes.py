@@ -0,0 +1,23 @@
+# Generated by Django 5.2.4 on 2026-10-17 13:15
+
+import django.contrib.postgres.indexes
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0004_product_search'),
+        ('shops', '0004_shop_catalog_version'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='product',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['characteristics'], name='product_characteristics', opclasses=['jsonb_path_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['category'], include=('characteristics',), name='product_active_category_facets'),
+        ),
+    ]
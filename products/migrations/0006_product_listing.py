@@ -0,0 +1,160 @@
+# Generated by Django 5.2.4 on 2026-10-17 13:54
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations, models
+
+# Витрина пересобирается из исходных таблиц функцией
+# products_listing_sync(ids): строки товаров из списка записываются
+# (только если что-то изменилось), строки удалённых товаров удаляются.
+# Триггеры товаров — на уровне оператора с таблицами переходов, чтобы
+# пачка импорта обходилась одним вызовом, а не вызовом на строку.
+LISTING_SQL = '''
+CREATE FUNCTION products_listing_sync(product_ids bigint[]) RETURNS integer AS $$
+DECLARE
+    deleted integer;
+    written integer;
+BEGIN
+    DELETE FROM products_productlisting l
+    WHERE l.id = ANY(product_ids)
+      AND NOT EXISTS (SELECT 1 FROM products_product p WHERE p.id = l.id);
+    GET DIAGNOSTICS deleted = ROW_COUNT;
+
+    INSERT INTO products_productlisting AS l (
+        id, shop_id, shop_name, shop_is_active, category_id, category_external_id, category_name,
+        model, name, description, characteristics, price, quantity, is_active, search_vector
+    )
+    SELECT p.id, p.shop_id, s.name, s.is_active, p.category_id, c.external_id, c.name,
+           p.model, p.name, p.description, p.characteristics, p.price, p.quantity, p.is_active, p.search_vector
+    FROM products_product p
+    JOIN shops_shop s ON s.id = p.shop_id
+    JOIN products_category c ON c.id = p.category_id
+    WHERE p.id = ANY(product_ids)
+    ON CONFLICT (id) DO UPDATE SET
+        shop_id = EXCLUDED.shop_id,
+        shop_name = EXCLUDED.shop_name,
+        shop_is_active = EXCLUDED.shop_is_active,
+        category_id = EXCLUDED.category_id,
+        category_external_id = EXCLUDED.category_external_id,
+        category_name = EXCLUDED.category_name,
+        model = EXCLUDED.model,
+        name = EXCLUDED.name,
+        description = EXCLUDED.description,
+        characteristics = EXCLUDED.characteristics,
+        price = EXCLUDED.price,
+        quantity = EXCLUDED.quantity,
+        is_active = EXCLUDED.is_active,
+        search_vector = EXCLUDED.search_vector
+    WHERE (l.shop_id, l.shop_name, l.shop_is_active, l.category_id, l.category_external_id,
+           l.category_name, l.model, l.name, l.description, l.characteristics, l.price,
+           l.quantity, l.is_active, l.search_vector)
+          IS DISTINCT FROM
+          (EXCLUDED.shop_id, EXCLUDED.shop_name, EXCLUDED.shop_is_active, EXCLUDED.category_id,
+           EXCLUDED.category_external_id, EXCLUDED.category_name, EXCLUDED.model, EXCLUDED.name,
+           EXCLUDED.description, EXCLUDED.characteristics, EXCLUDED.price, EXCLUDED.quantity,
+           EXCLUDED.is_active, EXCLUDED.search_vector);
+    GET DIAGNOSTICS written = ROW_COUNT;
+    RETURN deleted + written;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE FUNCTION products_listing_written() RETURNS trigger AS $$
+BEGIN
+    PERFORM products_listing_sync(ARRAY(SELECT id FROM new_rows));
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE FUNCTION products_listing_deleted() RETURNS trigger AS $$
+BEGIN
+    DELETE FROM products_productlisting WHERE id IN (SELECT id FROM old_rows);
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER products_listing_insert AFTER INSERT ON products_product
+    REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION products_listing_written();
+CREATE TRIGGER products_listing_update AFTER UPDATE ON products_product
+    REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION products_listing_written();
+CREATE TRIGGER products_listing_delete AFTER DELETE ON products_product
+    REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE FUNCTION products_listing_deleted();
+
+-- магазин обновляется при каждой смене catalog_version, а витрине
+-- важны только название и активность
+CREATE FUNCTION products_listing_shop_changed() RETURNS trigger AS $$
+BEGIN
+    UPDATE products_productlisting SET shop_name = NEW.name, shop_is_active = NEW.is_active
+    WHERE shop_id = NEW.id;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER products_listing_shop AFTER UPDATE ON shops_shop FOR EACH ROW
+    WHEN (OLD.name IS DISTINCT FROM NEW.name OR OLD.is_active IS DISTINCT FROM NEW.is_active)
+    EXECUTE FUNCTION products_listing_shop_changed();
+
+CREATE FUNCTION products_listing_category_changed() RETURNS trigger AS $$
+BEGIN
+    UPDATE products_productlisting SET category_external_id = NEW.external_id, category_name = NEW.name
+    WHERE category_id = NEW.id;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER products_listing_category AFTER UPDATE ON products_category FOR EACH ROW
+    WHEN (OLD.name IS DISTINCT FROM NEW.name OR OLD.external_id IS DISTINCT FROM NEW.external_id)
+    EXECUTE FUNCTION products_listing_category_changed();
+
+SELECT products_listing_sync(ARRAY(SELECT id FROM products_product));
+'''
+
+DROP_LISTING_SQL = '''
+DROP TRIGGER products_listing_category ON products_category;
+DROP TRIGGER products_listing_shop ON shops_shop;
+DROP TRIGGER products_listing_delete ON products_product;
+DROP TRIGGER products_listing_update ON products_product;
+DROP TRIGGER products_listing_insert ON products_product;
+DROP FUNCTION products_listing_category_changed();
+DROP FUNCTION products_listing_shop_changed();
+DROP FUNCTION products_listing_deleted();
+DROP FUNCTION products_listing_written();
+DROP FUNCTION products_listing_sync(bigint[]);
+'''
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0005_product_characteristics_indexes'),
+        ('shops', '0004_shop_catalog_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductListing',
+            fields=[
+                ('id', models.BigIntegerField(help_text='id товара', primary_key=True, serialize=False)),
+                ('shop_id', models.BigIntegerField(db_index=True)),
+                ('shop_name', models.CharField(max_length=255)),
+                ('shop_is_active', models.BooleanField()),
+                ('category_id', models.BigIntegerField(db_index=True)),
+                ('category_external_id', models.IntegerField()),
+                ('category_name', models.CharField(max_length=255)),
+                ('model', models.CharField(max_length=255)),
+                ('name', models.CharField(max_length=255)),
+                ('description', models.TextField(blank=True)),
+                ('characteristics', models.JSONField(blank=True, null=True)),
+                ('price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('quantity', models.PositiveIntegerField()),
+                ('is_active', models.BooleanField(help_text='Товар есть в актуальном прайсе')),
+                ('search_vector', django.contrib.postgres.search.SearchVectorField()),
+                ('is_listed', models.GeneratedField(db_persist=True, expression=models.ExpressionWrapper(models.Q(('is_active', True), ('shop_is_active', True)), output_field=models.BooleanField()), output_field=models.BooleanField())),
+            ],
+            options={
+                'verbose_name': 'Товар в каталоге',
+                'verbose_name_plural': 'Витрина каталога',
+                'indexes': [models.Index(condition=models.Q(('is_listed', True)), fields=['price', 'id'], name='listing_price_id'), models.Index(condition=models.Q(('is_listed', True)), fields=['name', 'id'], name='listing_name_id'), models.Index(condition=models.Q(('is_listed', True)), fields=['quantity', 'id'], name='listing_quantity_id'), django.contrib.postgres.indexes.GinIndex(condition=models.Q(('is_listed', True)), fields=['search_vector'], name='listing_search_vector'), django.contrib.postgres.indexes.GinIndex(condition=models.Q(('is_listed', True)), fields=['characteristics'], name='listing_characteristics', opclasses=['jsonb_path_ops']), models.Index(condition=models.Q(('is_listed', True)), fields=['category_external_id', 'name', 'id'], name='listing_category_name_id'), models.Index(condition=models.Q(('is_listed', True)), fields=['category_external_id'], include=('characteristics',), name='listing_category_facets')],
+            },
+        ),
+        migrations.RunSQL(LISTING_SQL, DROP_LISTING_SQL),
+    ]
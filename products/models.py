@@ -1,4 +1,7 @@
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector, SearchVectorField
 from django.db import models
+from django.db.models import ExpressionWrapper, Q
 
 
 class Product(models.Model):
@@ -25,12 +28,52 @@ class Product(models.Model):
     price = models.DecimalField(max_digits=10, decimal_places=2)
     price_rrc = models.DecimalField(max_digits=10, decimal_places=2)
     quantity = models.PositiveIntegerField()
+    is_active = models.BooleanField(
+        default=True,
+        help_text='Есть ли товар в актуальном прайсе поставщика'
+    )
+    feed_fingerprint = models.CharField(
+        max_length=32,
+        blank=True,
+        default='',
+        help_text='Хэш строки прайса, из которой товар импортирован последний раз'
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # поддерживается самой БД: название (русская и английская морфология),
+    # модель как есть и описание с меньшим весом
+    search_vector = models.GeneratedField(
+        expression=(
+            SearchVector('name', config='russian', weight='A')
+            + SearchVector('name', config='english', weight='A')
+            + SearchVector('model', config='simple', weight='A')
+            + SearchVector('description', config='russian', weight='B')
+        ),
+        output_field=SearchVectorField(),
+        db_persist=True,
+    )
 
     class Meta:
         verbose_name = 'Товар'
         verbose_name_plural = 'Товары'
+        # keyset-пагинация каталога: сортировка по полю с id для однозначности
+        indexes = [
+            models.Index(fields=['price', 'id'], condition=models.Q(is_active=True),
+                         name='product_active_price_id'),
+            models.Index(fields=['name', 'id'], condition=models.Q(is_active=True),
+                         name='product_active_name_id'),
+            models.Index(fields=['quantity', 'id'], condition=models.Q(is_active=True),
+                         name='product_active_quantity_id'),
+            # полнотекстовый поиск
+            GinIndex(fields=['search_vector'], name='product_search_vector'),
+            # фильтры по характеристикам (?attr=…) через @? и @>
+            GinIndex(fields=['characteristics'], opclasses=['jsonb_path_ops'],
+                     name='product_characteristics'),
+            # фасеты категории читаются из индекса (index-only scan), а не
+            # из страниц таблицы, разбросанных по всему каталогу
+            models.Index(fields=['category'], include=['characteristics'], condition=models.Q(is_active=True),
+                         name='product_active_category_facets'),
+        ]
 
     def in_stock(self, qty=1):
         return self.quantity >= qty
@@ -45,6 +88,67 @@ class Product(models.Model):
         return f"{self.name} ({self.supplier.user.email})"
 
 
+class ProductListing(models.Model):
+    """
+    Денормализованная витрина каталога: строка на каждый товар с тем,
+    что нужно API, — поля товара, название и флаг активности магазина,
+    внешний id и название категории, готовый search_vector. Каталог
+    читает её без JOIN с магазинами и категориями.
+
+    Поддерживается триггерами PostgreSQL (миграция 0006): любая запись
+    в products_product — bulk_create импорта, UPDATE остатков при
+    оформлении, bulk_update, удаление — и переименование или
+    отключение магазина и категории сразу отражаются в витрине в той
+    же транзакции. Сверка с исходными таблицами и пересборка —
+    products.services.listing и команда rebuild_product_listing.
+    """
+    id = models.BigIntegerField(primary_key=True, help_text='id товара')
+    shop_id = models.BigIntegerField(db_index=True)
+    shop_name = models.CharField(max_length=255)
+    shop_is_active = models.BooleanField()
+    category_id = models.BigIntegerField(db_index=True)
+    category_external_id = models.IntegerField()
+    category_name = models.CharField(max_length=255)
+    model = models.CharField(max_length=255)
+    name = models.CharField(max_length=255)
+    description = models.TextField(blank=True)
+    characteristics = models.JSONField(blank=True, null=True)
+    price = models.DecimalField(max_digits=10, decimal_places=2)
+    quantity = models.PositiveIntegerField()
+    is_active = models.BooleanField(help_text='Товар есть в актуальном прайсе')
+    # копия Product.search_vector: второй раз не считается
+    search_vector = SearchVectorField()
+    # товар в продаже и магазин принимает заказы — единственное условие
+    # частичных индексов витрины
+    is_listed = models.GeneratedField(
+        expression=ExpressionWrapper(Q(is_active=True, shop_is_active=True), output_field=models.BooleanField()),
+        output_field=models.BooleanField(),
+        db_persist=True,
+    )
+
+    class Meta:
+        verbose_name = 'Товар в каталоге'
+        verbose_name_plural = 'Витрина каталога'
+        indexes = [
+            models.Index(fields=['price', 'id'], condition=Q(is_listed=True), name='listing_price_id'),
+            models.Index(fields=['name', 'id'], condition=Q(is_listed=True), name='listing_name_id'),
+            models.Index(fields=['quantity', 'id'], condition=Q(is_listed=True), name='listing_quantity_id'),
+            GinIndex(fields=['search_vector'], condition=Q(is_listed=True), name='listing_search_vector'),
+            GinIndex(fields=['characteristics'], opclasses=['jsonb_path_ops'], condition=Q(is_listed=True),
+                     name='listing_characteristics'),
+            # ?category= с сортировкой по умолчанию: страница читается из
+            # индекса, а не сортируется вся категория
+            models.Index(fields=['category_external_id', 'name', 'id'], condition=Q(is_listed=True),
+                         name='listing_category_name_id'),
+            # фасеты по ?category=<внешний id> — index-only scan без JOIN
+            models.Index(fields=['category_external_id'], include=['characteristics'],
+                         condition=Q(is_listed=True), name='listing_category_facets'),
+        ]
+
+    def __str__(self):
+        return f'{self.name} ({self.shop_name})'
+
+
 class Category(models.Model):
     """
     Хранит данные из shop1.yaml:
@@ -56,3 +160,21 @@ class Category(models.Model):
 
     def __str__(self):
         return self.name
+
+
+class SearchWord(models.Model):
+    """
+    Словарь слов из названий товаров. По нему поиск исправляет опечатки:
+    слово запроса заменяется ближайшим по триграммам словом словаря.
+    Словарь на порядки меньше таблицы товаров, поэтому нечёткий поиск
+    по нему дешёвый, а сами товары ищутся по полнотекстовому индексу.
+    """
+    word = models.CharField(max_length=64, unique=True)
+
+    class Meta:
+        indexes = [
+            GinIndex(fields=['word'], opclasses=['gin_trgm_ops'], name='search_word_trgm'),
+        ]
+
+    def __str__(self):
+        return self.word
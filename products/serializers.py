@@ -1,9 +1,10 @@
 from rest_framework import serializers
 
-from products.models import Product
+from backend.serializers import SparseFieldsetMixin
+from products.models import Product, ProductListing
 
 
-class ProductSerializer(serializers.ModelSerializer):
+class ProductSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     supplier = serializers.CharField(source='shop.name', read_only=True)
     category = serializers.CharField(source='category.name', read_only=True)
 
@@ -19,3 +20,15 @@ class ProductSerializer(serializers.ModelSerializer):
             'price',
             'quantity',
         ]
+
+
+class ProductListingSerializer(ProductSerializer):
+    """
+    Тот же ответ каталога, но из витрины ProductListing: названия
+    магазина и категории лежат в её колонках.
+    """
+    supplier = serializers.CharField(source='shop_name', read_only=True)
+    category = serializers.CharField(source='category_name', read_only=True)
+
+    class Meta(ProductSerializer.Meta):
+        model = ProductListing
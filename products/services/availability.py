@@ -0,0 +1,184 @@
+"""
+Кэш наличия: по каждому товару — остаток, цена, активность и магазин,
+по каждому магазину — название и принимает ли он заказы. По нему
+добавление в корзину и оформление заказа заранее отсекают снятые с
+продажи и закончившиеся товары, не читая строки «горячих» товаров из
+PostgreSQL. Источник истины — по-прежнему БД: кэш используется только
+для быстрого отказа, и отказ перед ответом подтверждается чтением из
+БД (get_many(fresh=True)); цена позиции корзины берётся из строки
+товара, а остатки окончательно проверяет и списывает reserve_stock
+под блокировкой строк.
+
+Два уровня, как у кэша каталога и аутентификации: near-cache процесса
+(availability_local, живёт AVAILABILITY_LOCAL_TIMEOUT секунд) и общий
+Redis (availability, AVAILABILITY_CACHE_URL). Запись сквозная: после
+коммита списания и возврата остатков, импорта прайса и сохранения
+товара или магазина новые значения сразу кладутся в оба уровня.
+Ошибки общего уровня не роняют запрос — он обслуживается из БД.
+"""
+import threading
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+from products.models import Product
+from shops.models import Shop
+
+PRODUCT_FIELDS = ('quantity', 'price', 'is_active', 'shop_id')
+SHOP_FIELDS = ('name', 'is_active')
+
+
+class AvailabilityCache:
+
+    def __init__(self, local_alias='availability_local', shared_alias='availability'):
+        self.local_alias = local_alias
+        self.shared_alias = shared_alias
+        self._stats = Counter()
+        self._lock = threading.Lock()
+
+    @property
+    def local(self):
+        return caches[self.local_alias]
+
+    @property
+    def shared(self):
+        return caches[self.shared_alias]
+
+    def _count(self, name, n=1):
+        if n:
+            with self._lock:
+                self._stats[name] += n
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        for name in ('hit_local', 'hit_shared', 'miss', 'errors'):
+            stats.setdefault(name, 0)
+        return stats
+
+    @staticmethod
+    def product_key(product_id):
+        return f'availability:product:{product_id}'
+
+    @staticmethod
+    def shop_key(shop_id):
+        return f'availability:shop:{shop_id}'
+
+    def _get_many(self, keys):
+        found = self.local.get_many(keys)
+        self._count('hit_local', len(found))
+        rest = [key for key in keys if key not in found]
+        if rest:
+            try:
+                shared = self.shared.get_many(rest)
+            except Exception:
+                self._count('errors')
+                shared = {}
+            if shared:
+                self.local.set_many(shared, settings.AVAILABILITY_LOCAL_TIMEOUT)
+            self._count('hit_shared', len(shared))
+            self._count('miss', len(rest) - len(shared))
+            found.update(shared)
+        return found
+
+    def _set_many(self, entries):
+        if not entries:
+            return
+        self.local.set_many(entries, settings.AVAILABILITY_LOCAL_TIMEOUT)
+        try:
+            self.shared.set_many(entries, settings.AVAILABILITY_CACHE_TIMEOUT)
+        except Exception:
+            self._count('errors')
+
+    def _product_entries(self, rows):
+        return {self.product_key(row['id']): {name: row[name] for name in PRODUCT_FIELDS} for row in rows}
+
+    def _shop_entries(self, rows):
+        return {self.shop_key(row['id']): {name: row[name] for name in SHOP_FIELDS} for row in rows}
+
+    def get_many(self, product_ids, fresh=False):
+        """
+        {product_id: {'quantity', 'price', 'is_active', 'shop_id',
+        'shop_name', 'shop_is_active'}}; товаров, которых нет в БД, в
+        ответе нет. Промахи дочитываются из БД одним запросом на товары
+        и одним — на магазины и сразу кладутся в кэш.
+
+        С fresh=True всё читается из БД, а кэш перезаписывается: так
+        подтверждается отказ, который дал кэш, — его значения могут
+        отставать от БД на AVAILABILITY_CACHE_TIMEOUT.
+        """
+        product_ids = list(dict.fromkeys(product_ids))
+        products = {} if fresh else self._get_many([self.product_key(pk) for pk in product_ids])
+        missing = [pk for pk in product_ids if self.product_key(pk) not in products]
+        if missing:
+            loaded = self._product_entries(
+                Product.objects.filter(pk__in=missing).values('id', *PRODUCT_FIELDS)
+            )
+            self._set_many(loaded)
+            products.update(loaded)
+
+        shop_ids = {entry['shop_id'] for entry in products.values()}
+        shops = {} if fresh else self._get_many([self.shop_key(pk) for pk in shop_ids])
+        missing = [pk for pk in shop_ids if self.shop_key(pk) not in shops]
+        if missing:
+            loaded = self._shop_entries(Shop.objects.filter(pk__in=missing).order_by().values('id', *SHOP_FIELDS))
+            self._set_many(loaded)
+            shops.update(loaded)
+
+        result = {}
+        for pk in product_ids:
+            entry = products.get(self.product_key(pk))
+            shop = shops.get(self.shop_key(entry['shop_id'])) if entry else None
+            if shop is not None:
+                result[pk] = {**entry, 'shop_name': shop['name'], 'shop_is_active': shop['is_active']}
+        return result
+
+    def get(self, product_id, fresh=False):
+        return self.get_many([product_id], fresh=fresh).get(product_id)
+
+    def store_products(self, products):
+        """
+        Записывает после коммита значения из уже загруженных или только
+        что записанных экземпляров Product (импорт прайса).
+        """
+        entries = self._product_entries(
+            {'id': product.pk, **{name: getattr(product, name) for name in PRODUCT_FIELDS}}
+            for product in products
+        )
+        transaction.on_commit(lambda: self._set_many(entries))
+
+    def store_shop(self, shop):
+        entries = self._shop_entries([{'id': shop.pk, 'name': shop.name, 'is_active': shop.is_active}])
+        transaction.on_commit(lambda: self._set_many(entries))
+
+    def refresh_products(self, product_ids):
+        """
+        После коммита перечитывает товары из БД одним запросом и
+        записывает их в оба уровня — для записей, новых значений
+        которых в памяти нет (списание остатков UPDATE ... SET
+        quantity = quantity - …, снятие с продажи).
+        """
+        product_ids = list(product_ids)
+        if product_ids:
+            transaction.on_commit(lambda: self._refresh(product_ids))
+
+    def _refresh(self, product_ids):
+        rows = list(Product.objects.filter(pk__in=product_ids).values('id', *PRODUCT_FIELDS))
+        self._set_many(self._product_entries(rows))
+        gone = set(product_ids) - {row['id'] for row in rows}
+        if gone:
+            keys = [self.product_key(pk) for pk in gone]
+            self.local.delete_many(keys)
+            try:
+                self.shared.delete_many(keys)
+            except Exception:
+                self._count('errors')
+
+    def clear(self):
+        self.local.clear()
+        self.shared.clear()
+
+
+availability_cache = AvailabilityCache()
@@ -0,0 +1,179 @@
+import hashlib
+import secrets
+import threading
+from collections import Counter
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+HIT_LOCAL = 'HIT-LOCAL'
+HIT_SHARED = 'HIT-SHARED'
+MISS = 'MISS'
+BYPASS = 'BYPASS'
+
+
+class CatalogCache:
+    """
+    Двухуровневый кэш ответов каталога (GET /api/products/ и карточки).
+
+    Ключ — версии каталога и нормализованный запрос: путь и параметры
+    (фильтры, поиск, сортировка, курсор, fields) в отсортированном виде.
+    Версии хранятся в общем уровне: общая (витрина перестроена целиком),
+    по магазину и «любой магазин». Изменение товаров магазина (см.
+    shops.services.catalog_version) меняет версию этого магазина и
+    «любого»: ответы по одному магазину (?supplier=…, карточка товара)
+    ключуются версией своего магазина и не сбрасываются чужими
+    изменениями, а список по всем магазинам — версией «любого».
+    Записи со старой версией просто перестают читаться — удалять их
+    не нужно, их вытеснят LRU и timeout.
+
+    Локальный уровень — LocMemCache процесса с LRU-вытеснением,
+    общий — Redis, его видят все воркеры (CATALOG_CACHE_URL). Версию
+    каждый запрос читает из общего уровня, так что после коммита
+    импорта ни один процесс не отдаст ответ, собранный до него.
+
+    Если общий уровень недоступен, запросы обслуживаются без кэша
+    (BYPASS) — ошибка Redis не должна ронять каталог.
+    """
+    version_key = 'catalog:version'
+    any_shop_version_key = 'catalog:version:shop:any'
+
+    def __init__(self, local_alias='catalog_local', shared_alias='catalog'):
+        self.local_alias = local_alias
+        self.shared_alias = shared_alias
+        self._stats = Counter()
+        self._lock = threading.Lock()
+
+    @property
+    def local(self):
+        return caches[self.local_alias]
+
+    @property
+    def shared(self):
+        return caches[self.shared_alias]
+
+    @property
+    def timeout(self):
+        return settings.CATALOG_CACHE_TIMEOUT
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def stats(self):
+        """
+        Счётчики этого процесса: попадания по уровням, промахи, обходы
+        кэша, ошибки общего уровня и смены версии.
+        """
+        with self._lock:
+            stats = dict(self._stats)
+        for name in (HIT_LOCAL, HIT_SHARED, MISS, BYPASS, 'errors', 'bumps'):
+            stats.setdefault(name, 0)
+        return stats
+
+    @staticmethod
+    def shop_version_key(shop_id):
+        return f'catalog:version:shop:{shop_id}'
+
+    def version_keys(self, shop_ids=None):
+        """
+        Ключи версий, от которых зависит ответ по магазинам shop_ids
+        (None — по всем магазинам).
+        """
+        if shop_ids is None:
+            return [self.version_key, self.any_shop_version_key]
+        return [self.version_key, *(self.shop_version_key(pk) for pk in sorted(set(shop_ids)))]
+
+    def version(self, shop_ids=None):
+        keys = self.version_keys(shop_ids)
+        try:
+            versions = self.shared.get_many(keys)
+            missing = [key for key in keys if key not in versions]
+            if missing:
+                # версия вытеснена или ещё не заводилась: любая новая
+                # делает недействительными все прежние записи
+                for key in missing:
+                    self.shared.add(key, secrets.token_hex(8), timeout=None)
+                versions.update(self.shared.get_many(missing))
+        except Exception:
+            self._count('errors')
+            return None
+        if len(versions) != len(keys):
+            return None
+        return '-'.join(versions[key] for key in keys)
+
+    def _bump(self, keys):
+        try:
+            self.shared.set_many({key: secrets.token_hex(8) for key in keys}, timeout=None)
+        except Exception:
+            self._count('errors')
+            return
+        self._count('bumps')
+
+    def invalidate(self, shop_ids=None):
+        """
+        Меняет версии магазинов shop_ids (без них — общую версию) сразу
+        и ещё раз после коммита текущей транзакции: запрос, прочитавший
+        данные до коммита, мог успеть сохранить их под промежуточной
+        версией.
+        """
+        if shop_ids is None:
+            keys = [self.version_key]
+        else:
+            keys = [self.any_shop_version_key, *(self.shop_version_key(pk) for pk in set(shop_ids))]
+        self._bump(keys)
+        transaction.on_commit(lambda: self._bump(keys))
+
+    def key(self, request, version):
+        params = sorted(
+            (name, value)
+            for name in request.query_params
+            for value in request.query_params.getlist(name)
+        )
+        # ссылки next/previous абсолютные, поэтому хост входит в ключ
+        raw = f'{request.build_absolute_uri(request.path)}?{urlencode(params)}'
+        digest = hashlib.blake2b(raw.encode('utf-8'), digest_size=16).hexdigest()
+        return f'catalog:{version}:{digest}'
+
+    def lookup(self, request, shop_ids=None):
+        """
+        Возвращает (key, data, источник). shop_ids — магазины, товары
+        которых могут попасть в ответ (None — любые). key равен None,
+        если кэш сейчас недоступен и ответ сохранять не нужно.
+        """
+        version = self.version(shop_ids)
+        if version is None:
+            self._count(BYPASS)
+            return None, None, BYPASS
+        key = self.key(request, version)
+        data = self.local.get(key)
+        if data is not None:
+            self._count(HIT_LOCAL)
+            return key, data, HIT_LOCAL
+        try:
+            data = self.shared.get(key)
+        except Exception:
+            self._count('errors')
+            data = None
+        if data is not None:
+            self.local.set(key, data, self.timeout)
+            self._count(HIT_SHARED)
+            return key, data, HIT_SHARED
+        self._count(MISS)
+        return key, None, MISS
+
+    def store(self, key, data):
+        self.local.set(key, data, self.timeout)
+        try:
+            self.shared.set(key, data, self.timeout)
+        except Exception:
+            self._count('errors')
+
+    def clear(self):
+        self.local.clear()
+        self.shared.clear()
+
+
+catalog_cache = CatalogCache()
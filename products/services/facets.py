@@ -0,0 +1,53 @@
+import json
+
+from django.db import connection
+
+FACETS_SQL = '''
+    SELECT kv.key, kv.value, count(*)
+    FROM ({products}) AS p
+    CROSS JOIN LATERAL jsonb_each(p.characteristics) AS kv
+    WHERE jsonb_typeof(p.characteristics) = 'object'
+    GROUP BY kv.key, kv.value
+'''
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def facet_counts(queryset):
+    """
+    Гистограммы значений характеристик товаров queryset одним запросом:
+    jsonb_each разворачивает characteristics, GROUP BY считает товары
+    на каждую пару «характеристика — значение».
+
+    Возвращает список
+        {'key': 'Цвет', 'values': [{'value': 'черный', 'count': 12}, ...]}
+    упорядоченный по названию характеристики; у числовых характеристик
+    есть ещё min и max, а значения идут по возрастанию, у остальных —
+    по убыванию количества.
+    """
+    sql, params = queryset.order_by().values('characteristics').query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(FACETS_SQL.format(products=sql), params)
+        rows = cursor.fetchall()
+
+    histograms = {}
+    for key, value, count in rows:
+        if isinstance(value, str):
+            value = json.loads(value)
+        histograms.setdefault(key, []).append({'value': value, 'count': count})
+
+    facets = []
+    for key in sorted(histograms):
+        values = histograms[key]
+        facet = {'key': key}
+        if all(_is_number(item['value']) for item in values):
+            values.sort(key=lambda item: item['value'])
+            facet['min'] = values[0]['value']
+            facet['max'] = values[-1]['value']
+        else:
+            values.sort(key=lambda item: (-item['count'], str(item['value'])))
+        facet['values'] = values
+        facets.append(facet)
+    return facets
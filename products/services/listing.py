@@ -0,0 +1,112 @@
+from django.db import connection, transaction
+from django.db.models import Exists, OuterRef
+
+from products.models import Product, ProductListing
+
+# колонка витрины -> выражение над products_product p, shops_shop s,
+# products_category c; должно совпадать с products_listing_sync()
+# из миграции 0006
+LISTING_COLUMNS = {
+    'shop_id': 'p.shop_id',
+    'shop_name': 's.name',
+    'shop_is_active': 's.is_active',
+    'category_id': 'p.category_id',
+    'category_external_id': 'c.external_id',
+    'category_name': 'c.name',
+    'model': 'p.model',
+    'name': 'p.name',
+    'description': 'p.description',
+    'characteristics': 'p.characteristics',
+    'price': 'p.price',
+    'quantity': 'p.quantity',
+    'is_active': 'p.is_active',
+    'search_vector': 'p.search_vector',
+}
+
+CHECK_SQL = '''
+    SELECT coalesce(src.id, l.id), src.id IS NULL, l.id IS NULL
+    FROM (
+        SELECT p.id, {source}
+        FROM products_product p
+        JOIN shops_shop s ON s.id = p.shop_id
+        JOIN products_category c ON c.id = p.category_id
+    ) AS src
+    FULL JOIN products_productlisting l ON l.id = src.id
+    WHERE src.id IS NULL OR l.id IS NULL OR ({expected}) IS DISTINCT FROM ({actual})
+    ORDER BY 1
+'''
+
+
+def sync_listing(product_ids):
+    """
+    Переписывает строки витрины для товаров product_ids из исходных
+    таблиц: изменившиеся обновляет, недостающие добавляет, строки
+    удалённых товаров убирает. Возвращает число изменённых строк.
+
+    Триггеры делают то же самое при каждой записи в товары; вызывать
+    вручную нужно только для починки расхождений (см. check_listing).
+    """
+    product_ids = sorted(set(product_ids))
+    if not product_ids:
+        return 0
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT products_listing_sync(%s::bigint[])', [product_ids])
+        return cursor.fetchone()[0]
+
+
+def rebuild_listing(batch_size=10_000):
+    """
+    Пересобирает витрину целиком пачками по batch_size товаров, каждая
+    в своей транзакции: каталог продолжает работать, а неизменившиеся
+    строки не перезаписываются. В конце удаляет строки товаров,
+    которых больше нет.
+
+    Возвращает {'products': …, 'written': …, 'deleted': …}.
+    """
+    stats = {'products': 0, 'written': 0, 'deleted': 0}
+    last_id = 0
+    while True:
+        ids = list(
+            Product.objects.filter(pk__gt=last_id).order_by('pk').values_list('pk', flat=True)[:batch_size]
+        )
+        if not ids:
+            break
+        with transaction.atomic():
+            stats['written'] += sync_listing(ids)
+        stats['products'] += len(ids)
+        last_id = ids[-1]
+    stats['deleted'], _ = (
+        ProductListing.objects
+        .filter(~Exists(Product.objects.filter(pk=OuterRef('pk'))))
+        .delete()
+    )
+    return stats
+
+
+def check_listing():
+    """
+    Сверяет витрину с товарами, магазинами и категориями одним
+    запросом (FULL JOIN по id товара). Возвращает списки id:
+
+        missing  — товар есть, строки витрины нет;
+        orphaned — строка витрины без товара;
+        stale    — значения в витрине отличаются от исходных.
+
+    Пустые списки означают, что витрина согласована.
+    """
+    sql = CHECK_SQL.format(
+        source=', '.join(f'{expr} AS {column}' for column, expr in LISTING_COLUMNS.items()),
+        expected=', '.join(f'src.{column}' for column in LISTING_COLUMNS),
+        actual=', '.join(f'l.{column}' for column in LISTING_COLUMNS),
+    )
+    report = {'missing': [], 'orphaned': [], 'stale': []}
+    with connection.cursor() as cursor:
+        cursor.execute(sql)
+        for pk, orphaned, missing in cursor.fetchall():
+            if orphaned:
+                report['orphaned'].append(pk)
+            elif missing:
+                report['missing'].append(pk)
+            else:
+                report['stale'].append(pk)
+    return report
@@ -0,0 +1,55 @@
+import re
+
+from django.contrib.postgres.search import TrigramSimilarity
+
+from products.models import SearchWord
+
+WORD_RE = re.compile(r'\w+')
+# короткие слова и числа опечатками не считаем
+MIN_WORD_LENGTH = 3
+
+
+def extract_words(texts):
+    words = set()
+    for text in texts:
+        for word in WORD_RE.findall(text.lower()):
+            if MIN_WORD_LENGTH <= len(word) <= 64 and not word.isdigit():
+                words.add(word)
+    return words
+
+
+def remember_words(names):
+    """
+    Добавляет в словарь поиска слова из названий товаров.
+    """
+    words = extract_words(names)
+    if words:
+        SearchWord.objects.bulk_create([SearchWord(word=word) for word in words], ignore_conflicts=True)
+
+
+def correct_search_text(text):
+    """
+    Заменяет слова запроса, которых нет в словаре, ближайшими по
+    триграммам словами (pg_trgm, индекс search_word_trgm). Возвращает
+    исправленный запрос или None, если исправлять нечего.
+    """
+    words = WORD_RE.findall(text.lower())
+    candidates = extract_words([text])
+    known = set(SearchWord.objects.filter(word__in=candidates).values_list('word', flat=True))
+
+    corrected = []
+    changed = False
+    for word in words:
+        if word in candidates and word not in known:
+            best = (
+                SearchWord.objects
+                .filter(word__trigram_similar=word)
+                .annotate(similarity=TrigramSimilarity('word', word))
+                .order_by('-similarity', 'word')
+                .values_list('word', flat=True)
+                .first()
+            )
+            if best:
+                word, changed = best, True
+        corrected.append(word)
+    return ' '.join(corrected) if changed else None
@@ -0,0 +1,131 @@
+from decimal import Decimal
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from orders.services.checkout import CheckoutService
+from orders.services.stock import InsufficientStock, release_stock, reserve_stock
+from orders.tests.factories import fill_cart, make_contact, make_products, make_shop, make_user
+from products.models import Product
+from products.services.availability import availability_cache
+from shops.services.shop_import import ShopImportService
+
+FEED_PATH = settings.BASE_DIR / 'data' / 'shop1.yaml'
+
+
+class AvailabilityCacheTests(APITestCase):
+
+    def setUp(self):
+        availability_cache.clear()
+        self.shop = make_shop('Связной', 'supplier@example.com')
+        self.product, self.other = make_products(self.shop, 2, quantity=5, price=Decimal('100.00'))
+        self.user = make_user()
+        self.client.force_authenticate(self.user)
+
+    def add(self, product, quantity=1):
+        return self.client.post(reverse('cart-add-item'), {'product_id': product.pk, 'quantity': quantity})
+
+    def assertNoProductLocks(self, queries):
+        locks = [q['sql'] for q in queries if 'FROM "products_product"' in q['sql'] and 'FOR UPDATE' in q['sql']]
+        self.assertEqual(locks, [])
+
+    def test_add_to_cart_takes_price_from_database(self):
+        availability_cache.get_many([self.product.pk, self.other.pk])
+        # кэш отстаёт от БД: цена позиции всё равно берётся из строки товара
+        Product.objects.filter(pk=self.other.pk).update(price=Decimal('120.00'))
+
+        response = self.add(self.other, 2)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['items'][0]['unit_price'], '120.00')
+
+        response = self.add(self.other, 4)
+        self.assertEqual(response.data, {'non_field_errors': ['Недостаточно товара на складе']})
+        self.assertEqual(self.client.post(reverse('cart-add-item'), {'product_id': 0, 'quantity': 1}).status_code,
+                         status.HTTP_404_NOT_FOUND)
+
+    def test_stale_refusal_is_confirmed_by_database(self):
+        availability_cache.get(self.product.pk)
+        Product.objects.filter(pk=self.product.pk).update(quantity=10)
+
+        self.assertEqual(self.add(self.product, 8).status_code, status.HTTP_201_CREATED)
+        self.assertEqual(availability_cache.get(self.product.pk)['quantity'], 10)
+
+    def test_stock_changes_are_written_through(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                reserve_stock({self.product.pk: 5})
+        self.assertEqual(availability_cache.get(self.product.pk)['quantity'], 0)
+        self.assertEqual(self.add(self.product).data, {'non_field_errors': ['Недостаточно товара на складе']})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            release_stock({self.product.pk: 2})
+        self.assertEqual(availability_cache.get(self.product.pk)['quantity'], 2)
+
+    def test_rolled_back_reservation_is_not_cached(self):
+        availability_cache.get(self.product.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                reserve_stock({self.product.pk: 5})
+                transaction.set_rollback(True)
+        self.assertEqual(availability_cache.get(self.product.pk)['quantity'], 5)
+
+    def test_shop_toggle_is_written_through(self):
+        self.add(self.product)
+        supplier = self.client_class()
+        supplier.force_authenticate(self.shop.supplier.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = supplier.patch(reverse('shop_availability', args=[self.shop.pk]),
+                                      {'is_active': False}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        self.assertEqual(self.add(self.other).data,
+                         {'non_field_errors': ['Магазин Связной временно не принимает заказы']})
+
+    def test_import_is_written_through(self):
+        supplier = self.shop.supplier
+        with self.captureOnCommitCallbacks(execute=True):
+            with open(FEED_PATH, 'rb') as f:
+                ShopImportService(supplier, f).run()
+        product = Product.objects.filter(shop__name='Связной', external_id=4216292).get()
+        with self.assertNumQueries(0):
+            cached = availability_cache.get(product.pk)
+        self.assertEqual((cached['quantity'], cached['price']), (product.quantity, product.price))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            with open(FEED_PATH, 'rb') as f:
+                ShopImportService(supplier, f, deactivate_missing=True).run()
+        self.assertFalse(availability_cache.get(self.product.pk)['is_active'])
+
+    def test_checkout_rejects_sold_out_before_locking(self):
+        cart = fill_cart(self.user, [self.product, self.other], qty=1)
+        with self.captureOnCommitCallbacks(execute=True):
+            Product.objects.filter(pk=self.product.pk).update(quantity=0)
+            availability_cache.refresh_products([self.product.pk, self.other.pk])
+
+        with CaptureQueriesContext(connection) as queries, self.assertRaises(InsufficientStock) as ctx:
+            CheckoutService(self.user, cart, make_contact(self.user)).run()
+        self.assertEqual(ctx.exception.product_ids, [self.product.pk])
+        self.assertNoProductLocks(queries)
+
+    def test_checkout_is_not_refused_by_stale_cache(self):
+        cart = fill_cart(self.user, [self.product], qty=3)
+        with self.captureOnCommitCallbacks(execute=True):
+            Product.objects.filter(pk=self.product.pk).update(quantity=0)
+            availability_cache.refresh_products([self.product.pk])
+        Product.objects.filter(pk=self.product.pk).update(quantity=5)
+
+        CheckoutService(self.user, cart, make_contact(self.user)).run()
+        self.assertEqual(Product.objects.get(pk=self.product.pk).quantity, 2)
+
+    def test_shared_tier_failure_falls_back_to_database(self):
+        shared = caches['availability']
+        with mock.patch.object(shared, 'get_many', side_effect=ConnectionError), \
+                mock.patch.object(shared, 'set_many', side_effect=ConnectionError):
+            self.assertEqual(self.add(self.product).status_code, status.HTTP_201_CREATED)
+        self.assertGreater(availability_cache.stats()['errors'], 0)
@@ -0,0 +1,105 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from orders.tests.factories import make_products, make_shop, make_user
+from products.models import Product
+from products.services.catalog_cache import catalog_cache
+
+
+class ProductCatalogPaginationTests(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = make_user('buyer@example.com')
+        shop = make_shop('Связной', 'supplier@example.com')
+        cls.products = make_products(shop, 23)
+        # повторяющиеся цены и количества — проверяем однозначность по id
+        for i, product in enumerate(cls.products):
+            product.price = 100 + i % 4
+            product.quantity = i % 3
+        Product.objects.bulk_update(cls.products, ['price', 'quantity'])
+        Product.objects.filter(pk=cls.products[0].pk).update(is_active=False)
+
+    def setUp(self):
+        catalog_cache.clear()
+        self.client.force_authenticate(self.user)
+        self.url = reverse('products-list')
+
+    def walk(self, url, direction='next'):
+        pages = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            pages.append([item['id'] for item in response.data['results']])
+            url = response.data[direction]
+        return pages
+
+    def expected(self, *ordering):
+        return list(Product.objects.filter(is_active=True).order_by(*ordering).values_list('pk', flat=True))
+
+    def test_walks_catalog_for_every_ordering(self):
+        for ordering, expected in [
+            ('price', self.expected('price', 'pk')),
+            ('-price', self.expected('-price', '-pk')),
+            ('name', self.expected('name', 'pk')),
+            ('-quantity', self.expected('-quantity', '-pk')),
+        ]:
+            with self.subTest(ordering=ordering):
+                pages = self.walk(f'{self.url}?ordering={ordering}&page_size=5')
+                self.assertEqual(sum(pages, []), expected)
+                self.assertEqual([len(page) for page in pages], [5, 5, 5, 5, 2])
+
+    def test_previous_links_return_same_pages(self):
+        forward = self.walk(f'{self.url}?ordering=price&page_size=5')
+        url = self.client.get(f'{self.url}?ordering=price&page_size=5').data['next']
+        for _ in range(3):
+            url = self.client.get(url).data['next']
+        backward = self.walk(url, direction='previous')
+        self.assertEqual(backward[::-1], forward)
+
+    def test_page_query_count_does_not_depend_on_depth(self):
+        url = f'{self.url}?ordering=price&page_size=5'
+        with self.assertNumQueries(1):
+            response = self.client.get(url)
+        with self.assertNumQueries(1):
+            self.client.get(response.data['next'])
+
+    def test_invalid_cursor(self):
+        response = self.client.get(self.url, {'cursor': 'garbage'})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class ProductSparseFieldsetTests(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = make_user('buyer@example.com')
+        cls.products = make_products(make_shop('Связной', 'supplier@example.com'), 3)
+
+    def setUp(self):
+        catalog_cache.clear()
+        self.client.force_authenticate(self.user)
+        self.url = reverse('products-list')
+
+    def test_only_requested_fields_are_selected(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url, {'fields': 'id,name,price,supplier'})
+
+        self.assertEqual(set(response.data['results'][0]), {'id', 'name', 'price', 'supplier'})
+        self.assertEqual(response.data['results'][0]['supplier'], 'Связной')
+        self.assertEqual(len(queries), 1)
+        sql = queries[0]['sql']
+        self.assertNotIn('description', sql)
+        self.assertNotIn('characteristics', sql)
+        self.assertNotIn('products_category', sql)
+
+    def test_detail_supports_fields(self):
+        response = self.client.get(reverse('products-detail', args=[self.products[0].pk]), {'fields': 'id,quantity'})
+        self.assertEqual(response.data, {'id': self.products[0].pk, 'quantity': self.products[0].quantity})
+
+    def test_unknown_field(self):
+        response = self.client.get(self.url, {'fields': 'id,password'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
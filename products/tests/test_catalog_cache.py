@@ -0,0 +1,159 @@
+from unittest import mock
+
+import yaml
+from django.conf import settings
+from django.db import transaction
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from orders.services.stock import reserve_stock
+from orders.tests.factories import make_products, make_shop, make_user
+from products.models import Product
+from products.services.catalog_cache import CatalogCache, catalog_cache
+from shops.services.shop_import import ShopImportService
+
+FEED_PATH = settings.BASE_DIR / 'data' / 'shop1.yaml'
+
+
+class BrokenCache:
+
+    def __getattr__(self, name):
+        def fail(*args, **kwargs):
+            raise ConnectionError('redis недоступен')
+        return fail
+
+
+class CatalogCacheTests(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = make_user('buyer@example.com')
+        cls.shop = make_shop('Связной', 'supplier@example.com')
+        cls.products = make_products(cls.shop, 5)
+
+    def setUp(self):
+        catalog_cache.clear()
+        self.client.force_authenticate(self.user)
+        self.url = reverse('products-list')
+
+    def get(self, url, params=None):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response
+
+    def test_hits_by_tier(self):
+        first = self.get(self.url, {'ordering': 'price', 'page_size': 2})
+        self.assertEqual(first['X-Cache'], 'MISS')
+
+        # порядок параметров не важен
+        with self.assertNumQueries(0):
+            second = self.get(self.url, {'page_size': 2, 'ordering': 'price'})
+        self.assertEqual(second['X-Cache'], 'HIT-LOCAL')
+        self.assertEqual(second.data, first.data)
+
+        catalog_cache.local.clear()
+        with self.assertNumQueries(0):
+            third = self.get(self.url, {'ordering': 'price', 'page_size': 2})
+        self.assertEqual(third['X-Cache'], 'HIT-SHARED')
+        self.assertEqual(third.data, first.data)
+
+    def test_detail_and_other_params_are_separate_entries(self):
+        self.get(self.url)
+        detail = self.get(reverse('products-detail', args=[self.products[0].pk]))
+        self.assertEqual(detail['X-Cache'], 'MISS')
+        self.assertEqual(detail.data['id'], self.products[0].pk)
+        self.assertEqual(self.get(self.url, {'fields': 'id'})['X-Cache'], 'MISS')
+
+    def test_product_save_invalidates(self):
+        self.get(self.url)
+        product = self.products[0]
+        product.quantity = 7
+        product.save()
+
+        response = self.get(self.url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        quantities = {item['id']: item['quantity'] for item in response.data['results']}
+        self.assertEqual(quantities[product.pk], 7)
+
+    def test_shop_change_keeps_other_shops_entries(self):
+        other = make_products(make_shop('Евросеть'), 1)[0]
+        filtered = {'supplier': self.shop.pk}
+        detail = reverse('products-detail', args=[self.products[0].pk])
+        for url, params in ((self.url, filtered), (detail, None), (self.url, None)):
+            self.get(url, params)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            other.name = 'Новое название'
+            other.save()
+
+        self.assertEqual(self.get(self.url, filtered)['X-Cache'], 'HIT-LOCAL')
+        self.assertEqual(self.get(detail)['X-Cache'], 'HIT-LOCAL')
+        self.assertEqual(self.get(self.url)['X-Cache'], 'MISS')
+
+    def test_stock_change_keeps_cache(self):
+        self.get(self.url)
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                reserve_stock({self.products[0].pk: 1})
+        self.assertEqual(self.get(self.url)['X-Cache'], 'HIT-LOCAL')
+
+    def test_errors_are_not_cached(self):
+        self.client.get(self.url, {'fields': 'password'})
+        response = self.client.get(self.url, {'fields': 'password'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.client.get(reverse('products-detail', args=[0]))
+        response = self.client.get(reverse('products-detail', args=[0]))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_shared_tier_failure_bypasses_cache(self):
+        self.get(self.url)
+        with mock.patch.object(CatalogCache, 'shared', new_callable=mock.PropertyMock, return_value=BrokenCache()):
+            response = self.get(self.url)
+        self.assertEqual(response['X-Cache'], 'BYPASS')
+        self.assertEqual(len(response.data['results']), 5)
+
+    def test_stats_for_staff_only(self):
+        self.get(self.url)
+        self.get(self.url)
+        url = reverse('products-cache-stats')
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_403_FORBIDDEN)
+
+        self.client.force_authenticate(make_user('admin@example.com', is_staff=True))
+        stats = self.client.get(url).data
+        self.assertGreaterEqual(stats['MISS'], 1)
+        self.assertGreaterEqual(stats['HIT-LOCAL'], 1)
+
+
+class CatalogCacheImportTests(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = make_user('buyer@example.com')
+        cls.shop = make_shop('Связной', 'supplier@example.com')
+
+    def setUp(self):
+        catalog_cache.clear()
+        self.client.force_authenticate(self.user)
+
+    def import_feed(self, price=None):
+        with open(FEED_PATH, 'rb') as f:
+            feed = yaml.safe_load(f)
+        feed['shop'] = self.shop.name
+        if price is not None:
+            for item in feed['goods']:
+                item['price'] = price
+        ShopImportService(self.shop.supplier, feed).run()
+
+    def test_no_stale_prices_after_import(self):
+        self.import_feed()
+        url = reverse('products-list')
+        self.client.get(url, {'ordering': 'price'})
+        self.assertEqual(self.client.get(url, {'ordering': 'price'})['X-Cache'], 'HIT-LOCAL')
+
+        self.import_feed(price=999)
+
+        response = self.client.get(url, {'ordering': 'price'})
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual({item['price'] for item in response.data['results']}, {'999.00'})
+        self.assertEqual(Product.objects.filter(shop=self.shop).count(), len(response.data['results']))
@@ -0,0 +1,96 @@
+from django.conf import settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from orders.tests.factories import make_user
+from products.services.catalog_cache import catalog_cache
+from shops.services.shop_import import ShopImportService
+from users.models import SupplierProfile
+
+FEED_PATH = settings.BASE_DIR / 'data' / 'shop1.yaml'
+
+
+class ProductCharacteristicFilterTests(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = make_user('buyer@example.com')
+        supplier = SupplierProfile.objects.create(user=make_user('supplier@example.com'))
+        with open(FEED_PATH, 'rb') as f:
+            ShopImportService(supplier, f).run()
+
+    def setUp(self):
+        catalog_cache.clear()
+        self.client.force_authenticate(self.user)
+        self.url = reverse('products-list')
+
+    def names(self, params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        return sorted(item['name'] for item in response.data['results'])
+
+    def test_equality(self):
+        self.assertEqual(self.names({'attr': 'Цвет:черный'}), ['Смартфон Apple iPhone XR 256GB (черный)'])
+        # числа и булевы значения из прайса сравниваются как числа и true/false
+        self.assertEqual(len(self.names({'attr': 'Встроенная память (Гб):256'})), 3)
+        self.assertEqual(len(self.names({'attr': 'Smart TV:true'})), 5)
+
+    def test_values_of_one_key_are_or_and_keys_are_and(self):
+        names = self.names({'attr': ['Цвет:черный', 'Цвет:красный']})
+        self.assertEqual(len(names), 2)
+        names = self.names({'attr': ['Цвет:черный', 'Встроенная память (Гб):512']})
+        self.assertEqual(names, [])
+
+    def test_numeric_range(self):
+        names = self.names({'attr_min': 'Screen Size (inches):60', 'attr_max': 'Screen Size (inches):70'})
+        self.assertEqual(len(names), 2)
+        self.assertTrue(all('65"' in name for name in names))
+        # строковое значение не попадает в числовой диапазон
+        self.assertEqual(self.names({'attr_max': 'Цвет:100'}), [])
+
+    def test_invalid_values(self):
+        for params in [{'attr': 'Цвет'}, {'attr_min': 'Диагональ (дюйм):много'}]:
+            with self.subTest(params=params):
+                response = self.client.get(self.url, params)
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class ProductFacetsTests(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = make_user('buyer@example.com')
+        supplier = SupplierProfile.objects.create(user=make_user('supplier@example.com'))
+        with open(FEED_PATH, 'rb') as f:
+            ShopImportService(supplier, f).run()
+
+    def setUp(self):
+        catalog_cache.clear()
+        self.client.force_authenticate(self.user)
+        self.url = reverse('products-facets')
+
+    def facets(self, params):
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return {facet['key']: facet for facet in response.data['facets']}
+
+    def test_counts_for_category(self):
+        facets = self.facets({'category': 224})
+        self.assertEqual(facets['Встроенная память (Гб)']['values'],
+                         [{'value': 256, 'count': 3}, {'value': 512, 'count': 1}])
+        self.assertEqual((facets['Диагональ (дюйм)']['min'], facets['Диагональ (дюйм)']['max']), (6.1, 6.5))
+        self.assertEqual(len(facets['Цвет']['values']), 4)
+        self.assertNotIn('min', facets['Цвет'])
+        # Xiaomi из той же категории описан английскими ключами
+        self.assertEqual(facets['Color']['values'], [{'value': 'cosmic black', 'count': 1}])
+
+    def test_counts_respect_other_filters(self):
+        facets = self.facets({'category': 224, 'attr': 'Встроенная память (Гб):256'})
+        self.assertEqual(facets['Встроенная память (Гб)']['values'], [{'value': 256, 'count': 3}])
+        self.assertNotIn('Color', facets)
+
+    def test_category_is_required(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
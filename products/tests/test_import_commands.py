@@ -0,0 +1,82 @@
+import io
+import json
+import shutil
+import tempfile
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management import CommandError, call_command
+from django.test import TestCase, TransactionTestCase
+
+from orders.tests.factories import make_user
+from products.models import Product
+from shops.models import Shop
+from users.models import SupplierProfile
+
+DATA_DIR = settings.BASE_DIR / 'data'
+
+
+class ImportShopCommandTests(TestCase):
+
+    def setUp(self):
+        SupplierProfile.objects.create(user=make_user('supplier@example.com'))
+
+    def test_import(self):
+        out = io.StringIO()
+        call_command('import_shop', str(DATA_DIR / 'shop1.yaml'),
+                     supplier_email='supplier@example.com', batch_size=5, stdout=out)
+
+        self.assertIn('Магазин Связной создан', out.getvalue())
+        self.assertIn('Создано 14 товаров, обновлено 0', out.getvalue())
+        self.assertEqual(Product.objects.filter(shop__name='Связной').count(), 14)
+
+    def test_unknown_supplier(self):
+        with self.assertRaises(CommandError):
+            call_command('import_shop', str(DATA_DIR / 'shop1.yaml'),
+                         supplier_email='nobody@example.com', stdout=io.StringIO())
+
+
+class ImportFeedsCommandTests(TransactionTestCase):
+
+    def setUp(self):
+        SupplierProfile.objects.create(user=make_user('first@example.com'))
+        SupplierProfile.objects.create(user=make_user('second@example.com'))
+
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = Path(tmp.name)
+        shutil.copy(DATA_DIR / 'shop1.yaml', self.dir)
+        shutil.copy(DATA_DIR / 'shop2.yaml', self.dir)
+
+    def import_feeds(self, *args, **options):
+        out = io.StringIO()
+        call_command('import_feeds', *args, processes=2, writers=2, batch_size=3,
+                     stdout=out, **options)
+        return out.getvalue()
+
+    def test_import_directory(self):
+        output = self.import_feeds(str(self.dir), supplier_email='first@example.com')
+
+        self.assertIn('Прайсов: 2, с ошибками: 0', output)
+        self.assertEqual(Shop.objects.filter(supplier__user__email='first@example.com').count(), 2)
+        self.assertEqual(Product.objects.filter(shop__name='Связной').count(), 14)
+        self.assertTrue(Product.objects.filter(shop__name='Три смартфона').exists())
+
+        output = self.import_feeds(str(self.dir), supplier_email='first@example.com', incremental=True)
+        self.assertIn('создано 0, обновлено 0, без изменений 14', output)
+
+    def test_manifest_with_broken_feed(self):
+        (self.dir / 'broken.yaml').write_text('shop: A\ngoods: [\n')
+        manifest = self.dir / 'manifest.json'
+        manifest.write_text(json.dumps({'feeds': [
+            {'file': 'shop1.yaml', 'supplier_email': 'first@example.com'},
+            {'file': 'shop2.yaml', 'supplier_email': 'second@example.com'},
+            {'file': 'broken.yaml', 'supplier_email': 'second@example.com'},
+        ]}))
+
+        output = self.import_feeds(manifest=str(manifest))
+
+        self.assertIn('Прайсов: 3, с ошибками: 1', output)
+        self.assertIn('broken.yaml: ошибка', output)
+        self.assertEqual(Shop.objects.get(name='Три смартфона').supplier.user.email, 'second@example.com')
+        self.assertEqual(Product.objects.filter(shop__name='Связной').count(), 14)
@@ -0,0 +1,161 @@
+import io
+
+from django.conf import settings
+from django.core.management import CommandError, call_command
+from django.db import connection, transaction
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from orders.services.stock import release_stock, reserve_stock
+from orders.tests.factories import make_products, make_shop, make_user
+from products.models import Category, Product, ProductListing
+from products.services.catalog_cache import catalog_cache
+from products.services.listing import check_listing, rebuild_listing
+from shops.services.shop_import import ShopImportService
+from users.models import SupplierProfile
+
+FEED_PATH = settings.BASE_DIR / 'data' / 'shop1.yaml'
+
+
+def clean_report():
+    return {'missing': [], 'orphaned': [], 'stale': []}
+
+
+class ProductListingSyncTests(TestCase):
+
+    def setUp(self):
+        supplier = SupplierProfile.objects.create(user=make_user('supplier@example.com'))
+        with open(FEED_PATH, 'rb') as f:
+            ShopImportService(supplier, f, batch_size=5).run()
+        self.product = Product.objects.select_related('shop', 'category').order_by('pk').first()
+
+    def listing(self, product=None):
+        return ProductListing.objects.get(pk=(product or self.product).pk)
+
+    def test_import_fills_listing(self):
+        self.assertEqual(ProductListing.objects.count(), Product.objects.count())
+        listing = self.listing()
+        self.assertEqual(listing.shop_name, self.product.shop.name)
+        self.assertEqual(listing.category_external_id, self.product.category.external_id)
+        self.assertEqual(listing.category_name, self.product.category.name)
+        self.assertEqual(listing.characteristics, self.product.characteristics)
+        self.assertTrue(listing.is_listed)
+        self.assertEqual(check_listing(), clean_report())
+
+    def test_product_writes_are_reflected(self):
+        self.product.price = 1
+        self.product.save()
+        Product.objects.filter(pk=self.product.pk).update(name='Новое название')
+        with transaction.atomic():
+            reserve_stock({self.product.pk: 2})
+
+        listing = self.listing()
+        self.assertEqual((listing.price, listing.name), (1, 'Новое название'))
+        self.assertEqual(listing.quantity, self.product.quantity - 2)
+        release_stock({self.product.pk: 2})
+        self.assertEqual(self.listing().quantity, self.product.quantity)
+
+        Product.objects.filter(pk=self.product.pk).update(is_active=False)
+        self.assertFalse(self.listing().is_listed)
+
+        product_id = self.product.pk
+        self.product.delete()
+        self.assertFalse(ProductListing.objects.filter(pk=product_id).exists())
+        self.assertEqual(check_listing(), clean_report())
+
+    def test_shop_and_category_changes_are_reflected(self):
+        shop, category = self.product.shop, self.product.category
+        shop.name = 'Связной Плюс'
+        shop.is_active = False
+        shop.save()
+        Category.objects.filter(pk=category.pk).update(name='Телефоны')
+
+        listing = self.listing()
+        self.assertEqual((listing.shop_name, listing.category_name), ('Связной Плюс', 'Телефоны'))
+        self.assertFalse(ProductListing.objects.filter(shop_id=shop.pk, is_listed=True).exists())
+
+        shop.delete()
+        self.assertFalse(ProductListing.objects.exists())
+
+    def test_check_and_rebuild(self):
+        other = Product.objects.exclude(pk=self.product.pk).order_by('pk').first()
+        with connection.cursor() as cursor:
+            cursor.execute('UPDATE products_productlisting SET quantity = 0 WHERE id = %s', [self.product.pk])
+            cursor.execute('DELETE FROM products_productlisting WHERE id = %s', [other.pk])
+            cursor.execute("INSERT INTO products_productlisting SELECT 0, shop_id, shop_name, shop_is_active, "
+                           "category_id, category_external_id, category_name, model, name, description, "
+                           "characteristics, price, quantity, is_active, search_vector "
+                           "FROM products_productlisting WHERE id = %s", [self.product.pk])
+        self.assertEqual(check_listing(), {'missing': [other.pk], 'orphaned': [0], 'stale': [self.product.pk]})
+
+        stats = rebuild_listing(batch_size=4)
+        self.assertEqual(stats, {'products': Product.objects.count(), 'written': 2, 'deleted': 1})
+        self.assertEqual(check_listing(), clean_report())
+
+
+class RebuildProductListingCommandTests(TestCase):
+
+    def setUp(self):
+        self.products = make_products(make_shop(), 3)
+
+    def call(self, *args):
+        out = io.StringIO()
+        call_command('rebuild_product_listing', *args, stdout=out)
+        return out.getvalue()
+
+    def test_check_reports_divergence(self):
+        self.assertIn('Витрина согласована', self.call('--check'))
+
+        ProductListing.objects.filter(pk=self.products[0].pk).update(price=1)
+        with self.assertRaisesMessage(CommandError, 'Расходящихся строк: 1'):
+            self.call('--check')
+
+        output = self.call('--repair')
+        self.assertIn(f'stale: 1 ({self.products[0].pk})', output)
+        self.assertIn('Витрина согласована', output)
+        self.assertEqual(ProductListing.objects.get(pk=self.products[0].pk).price, self.products[0].price)
+
+    def test_rebuild(self):
+        ProductListing.objects.all().delete()
+        output = self.call('--batch-size', '2')
+        self.assertIn('Товаров: 3, записано строк: 3, удалено: 0', output)
+        self.assertEqual(ProductListing.objects.count(), 3)
+
+
+class CatalogReadsListingTests(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = make_user('buyer@example.com')
+        cls.shop = make_shop('Связной', 'supplier@example.com')
+        cls.products = make_products(cls.shop, 3)
+        cls.other = make_products(make_shop('Евросеть'), 2)
+
+    def setUp(self):
+        catalog_cache.clear()
+        self.client.force_authenticate(self.user)
+        self.url = reverse('products-list')
+
+    def ids(self, params=None):
+        response = self.client.get(self.url, params or {})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return sorted(item['id'] for item in response.data['results'])
+
+    def test_list_does_not_join(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url, {'category': 224, 'ordering': 'price'})
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('JOIN', queries[0]['sql'])
+        self.assertEqual(response.data['results'][0]['supplier'], 'Связной')
+        self.assertEqual(response.data['results'][0]['category'], 'Смартфоны')
+
+    def test_inactive_shop_is_hidden(self):
+        self.shop.is_active = False
+        self.shop.save()
+
+        self.assertEqual(self.ids(), sorted(p.pk for p in self.other))
+        response = self.client.get(reverse('products-detail', args=[self.products[0].pk]))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
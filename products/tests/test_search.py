@@ -0,0 +1,48 @@
+from django.conf import settings
+from django.urls import reverse
+from rest_framework.test import APITestCase
+
+from orders.tests.factories import make_user
+from products.services.catalog_cache import catalog_cache
+from shops.services.shop_import import ShopImportService
+from users.models import SupplierProfile
+
+FEED_PATH = settings.BASE_DIR / 'data' / 'shop1.yaml'
+
+
+class ProductSearchTests(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = make_user('buyer@example.com')
+        supplier = SupplierProfile.objects.create(user=make_user('supplier@example.com'))
+        with open(FEED_PATH, 'rb') as f:
+            ShopImportService(supplier, f).run()
+
+    def setUp(self):
+        catalog_cache.clear()
+        self.client.force_authenticate(self.user)
+        self.url = reverse('products-list')
+
+    def search(self, text, **params):
+        response = self.client.get(self.url, {'search': text, **params})
+        self.assertEqual(response.status_code, 200)
+        return [item['name'] for item in response.data['results']]
+
+    def test_morphology(self):
+        # «смартфонов» и «Смартфон» — одна словоформа для русской конфигурации
+        names = self.search('смартфонов')
+        self.assertTrue(names)
+        self.assertTrue(all('Смартфон' in name for name in names))
+
+    def test_model_number_and_typo(self):
+        self.assertTrue(any('iPhone XS Max' in name for name in self.search('apple/iphone/xs-max')))
+        self.assertTrue(any('iPhone' in name for name in self.search('iphonr')))
+
+    def test_relevance_ordering(self):
+        names = self.search('Samsung Galaxy S20')
+        self.assertIn('Galaxy S20', names[0])
+        self.assertEqual(sorted(names), self.search('Samsung Galaxy S20', ordering='name'))
+
+    def test_nothing_found(self):
+        self.assertEqual(self.search('холодильник'), [])
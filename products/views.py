@@ -1,30 +1,111 @@
 from django.shortcuts import render
 
 from django_filters.rest_framework import DjangoFilterBackend
-from rest_framework import viewsets
-from rest_framework.filters import SearchFilter, OrderingFilter
+from rest_framework import status, viewsets
+from rest_framework.decorators import action
+from rest_framework.filters import OrderingFilter
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
 
-from products.filters import ProductFilter
-from products.models import Product
-from products.serializers import ProductSerializer
+from backend.pagination import KeysetPagination
+from products.filters import ProductListingFilter, ProductSearchFilter
+from products.models import ProductListing
+from products.serializers import ProductListingSerializer
+from products.services.availability import availability_cache
+from products.services.catalog_cache import catalog_cache
+from products.services.facets import facet_counts
 
 
 class ProductViewSet(viewsets.ReadOnlyModelViewSet):
     """
     GET /api/products/
     Поддерживается:
-        - ?search=… — поиск по name и description
+        - ?search=… — полнотекстовый и нечёткий поиск по названию, модели
+          и описанию; без ?ordering= результаты идут по релевантности
         - ?supplier=… — фильтр по id магазина
         - ?category=… — фильтр по внешнему id категории
         - ?price_min=… — цена >= …
         - ?price_max=… — цена <= …
+        - ?attr=Цвет:черный — значение характеристики (можно повторять)
+        - ?attr_min=…:128, ?attr_max=…:512 — числовые границы характеристики
         - ?ordering=… — сортировка (например price, -name)
+        - ?fields=… — только перечисленные поля (например id,name,price)
+        - ?cursor=…, ?page_size=… — постраничная выдача по ключу (см. next/previous)
+
+    GET /api/products/facets/?category=…
+        Количество товаров по значениям каждой характеристики в категории
+        с учётом остальных фильтров.
+
+    Каталог читается из витрины ProductListing, без JOIN с магазинами
+    и категориями; товары неактивных магазинов в него не попадают.
+
+    Ответы списка, карточки и фасетов кэшируются (CatalogCache) до
+    следующего изменения каталога; заголовок X-Cache показывает,
+    откуда взят ответ. GET /api/products/cache-stats/ (для staff) —
+    счётчики попаданий и промахов процесса.
     """
-    queryset = Product.objects.select_related('shop', 'category').all()
-    serializer_class = ProductSerializer
+    queryset = ProductListing.objects.filter(is_listed=True)
+    serializer_class = ProductListingSerializer
+    pagination_class = KeysetPagination
 
-    filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
-    filterset_class = ProductFilter
-    search_fields = ['name', 'description']
+    filter_backends = [DjangoFilterBackend, ProductSearchFilter, OrderingFilter]
+    filterset_class = ProductListingFilter
     ordering_fields = ['price', 'name', 'quantity']
-    ordering = ['name']
+
+    @property
+    def ordering(self):
+        # OrderingFilter и пагинация берут отсюда сортировку по умолчанию
+        if ProductSearchFilter().get_search_text(self.request):
+            return [f'-{ProductSearchFilter.rank_annotation}']
+        return ['name']
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        # грузим только колонки ответа: без search_vector и служебных
+        # колонок витрины, а при ?fields= — и без description и characteristics
+        fields = self.serializer_class.requested_fields(self.request) or self.serializer_class.Meta.fields
+        return queryset.only('pk', *self.serializer_class.model_paths(fields))
+
+    def cache_scope(self, request):
+        """
+        Магазины, от товаров которых зависит ответ, — по ним выбираются
+        версии кэша каталога; None — от всех магазинов.
+        """
+        if self.action == 'retrieve':
+            pk = str(self.kwargs.get(self.lookup_field, ''))
+            availability = availability_cache.get(int(pk)) if pk.isdigit() else None
+        else:
+            supplier = request.query_params.get('supplier', '')
+            return [int(supplier)] if supplier.isdigit() else None
+        return [availability['shop_id']] if availability else None
+
+    def cached(self, request, handler, *args, **kwargs):
+        key, data, source = catalog_cache.lookup(request, self.cache_scope(request))
+        if data is not None:
+            response = Response(data)
+        else:
+            response = handler(request, *args, **kwargs)
+            if key and response.status_code == status.HTTP_200_OK:
+                catalog_cache.store(key, response.data)
+        response['X-Cache'] = source
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.cached(request, super().list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached(request, super().retrieve, *args, **kwargs)
+
+    @action(detail=False, methods=['get'], url_path='facets')
+    def facets(self, request):
+        if not request.query_params.get('category'):
+            return Response({'detail': 'Укажите категорию: ?category=…'}, status=status.HTTP_400_BAD_REQUEST)
+        return self.cached(request, self.facet_response)
+
+    def facet_response(self, request):
+        queryset = self.filter_queryset(self.get_queryset())
+        return Response({'facets': facet_counts(queryset)})
+
+    @action(detail=False, methods=['get'], url_path='cache-stats', permission_classes=[IsAdminUser])
+    def cache_stats(self, request):
+        return Response(catalog_cache.stats())
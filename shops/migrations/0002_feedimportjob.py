@@ -0,0 +1,39 @@
+# Generated by Django 5.2.4 on 2026-10-17 11:59
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shops', '0001_initial'),
+        ('users', '0002_remove_role_from_supplierprofile'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FeedImportJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('file', models.FileField(help_text='Загруженный YAML-файл', upload_to='feeds/%Y/%m/%d/')),
+                ('phase', models.CharField(choices=[('queued', 'В очереди'), ('categories', 'Импорт категорий'), ('products', 'Импорт товаров'), ('done', 'Завершён'), ('failed', 'Ошибка')], default='queued', help_text='Текущий этап импорта', max_length=20)),
+                ('rows_processed', models.PositiveIntegerField(default=0)),
+                ('created_categories', models.PositiveIntegerField(default=0)),
+                ('updated_categories', models.PositiveIntegerField(default=0)),
+                ('created_products', models.PositiveIntegerField(default=0)),
+                ('updated_products', models.PositiveIntegerField(default=0)),
+                ('skipped_products', models.PositiveIntegerField(default=0)),
+                ('errors', models.JSONField(blank=True, default=list)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('supplier', models.ForeignKey(help_text='Поставщик, загрузивший прайс', on_delete=django.db.models.deletion.CASCADE, related_name='feed_import_jobs', to='users.supplierprofile')),
+            ],
+            options={
+                'verbose_name': 'Импорт прайса',
+                'verbose_name_plural': 'Импорты прайсов',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.4 on 2026-10-17 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shops', '0002_feedimportjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='feedimportjob',
+            name='deactivate_missing',
+            field=models.BooleanField(default=False, help_text='Снимать с продажи товары, которых нет в прайсе'),
+        ),
+        migrations.AddField(
+            model_name='feedimportjob',
+            name='incremental',
+            field=models.BooleanField(default=False, help_text='Записывать только изменившиеся товары'),
+        ),
+        migrations.AddField(
+            model_name='feedimportjob',
+            name='removed_products',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='feedimportjob',
+            name='unchanged_products',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.4 on 2026-10-17 12:14
+
+import shops.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shops', '0003_feedimportjob_incremental'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='shop',
+            name='catalog_version',
+            field=models.CharField(default=shops.models.new_catalog_version, help_text='Меняется при любом изменении магазина или его товаров', max_length=16),
+        ),
+    ]
@@ -1,4 +1,12 @@
+import secrets
+
 from django.db import models
+from django.utils import timezone
+
+
+def new_catalog_version():
+    return secrets.token_hex(8)
+
 
 class Shop(models.Model):
     supplier = models.ForeignKey(
@@ -20,6 +28,11 @@ class Shop(models.Model):
         default=True,
         help_text='Принимает ли магазин заказы'
     )
+    catalog_version = models.CharField(
+        max_length=16,
+        default=new_catalog_version,
+        help_text='Меняется при любом изменении магазина или его товаров'
+    )
     created_at = models.DateTimeField(
         auto_now_add=True,
         help_text='Дата и время создания магазина'
@@ -36,3 +49,110 @@ class Shop(models.Model):
 
     def __str__(self):
         return self.name
+
+
+class FeedImportJob(models.Model):
+    """
+    Фоновый импорт прайса: загруженный файл и прогресс его обработки.
+    """
+    PHASE_QUEUED = 'queued'
+    PHASE_CATEGORIES = 'categories'
+    PHASE_PRODUCTS = 'products'
+    PHASE_DONE = 'done'
+    PHASE_FAILED = 'failed'
+
+    PHASE_CHOICES = [
+        (PHASE_QUEUED, 'В очереди'),
+        (PHASE_CATEGORIES, 'Импорт категорий'),
+        (PHASE_PRODUCTS, 'Импорт товаров'),
+        (PHASE_DONE, 'Завершён'),
+        (PHASE_FAILED, 'Ошибка'),
+    ]
+
+    supplier = models.ForeignKey(
+        'users.SupplierProfile',
+        on_delete=models.CASCADE,
+        related_name='feed_import_jobs',
+        help_text='Поставщик, загрузивший прайс'
+    )
+    file = models.FileField(
+        upload_to='feeds/%Y/%m/%d/',
+        help_text='Загруженный YAML-файл'
+    )
+    incremental = models.BooleanField(
+        default=False,
+        help_text='Записывать только изменившиеся товары'
+    )
+    deactivate_missing = models.BooleanField(
+        default=False,
+        help_text='Снимать с продажи товары, которых нет в прайсе'
+    )
+    phase = models.CharField(
+        max_length=20,
+        choices=PHASE_CHOICES,
+        default=PHASE_QUEUED,
+        help_text='Текущий этап импорта'
+    )
+    rows_processed = models.PositiveIntegerField(default=0)
+    created_categories = models.PositiveIntegerField(default=0)
+    updated_categories = models.PositiveIntegerField(default=0)
+    created_products = models.PositiveIntegerField(default=0)
+    updated_products = models.PositiveIntegerField(default=0)
+    skipped_products = models.PositiveIntegerField(default=0)
+    unchanged_products = models.PositiveIntegerField(default=0)
+    removed_products = models.PositiveIntegerField(default=0)
+    errors = models.JSONField(default=list, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    STATS_FIELDS = [
+        'created_categories',
+        'updated_categories',
+        'created_products',
+        'updated_products',
+        'skipped_products',
+        'unchanged_products',
+        'removed_products',
+    ]
+
+    class Meta:
+        verbose_name = 'Импорт прайса'
+        verbose_name_plural = 'Импорты прайсов'
+        ordering = ['-created_at']
+
+    @property
+    def rows_per_sec(self):
+        if not self.started_at:
+            return 0.0
+        elapsed = ((self.finished_at or timezone.now()) - self.started_at).total_seconds()
+        return round(self.rows_processed / elapsed, 1) if elapsed > 0 else 0.0
+
+    def start(self):
+        self.phase = self.PHASE_CATEGORIES
+        self.started_at = timezone.now()
+        self.save(update_fields=['phase', 'started_at'])
+
+    def report_progress(self, service):
+        """
+        Колбэк для ShopImportService: сохраняет прогресс после каждой пачки.
+        """
+        self.phase = service.phase
+        self.rows_processed = service.rows_processed
+        for field, value in service.stats().items():
+            setattr(self, field, value)
+        self.save(update_fields=['phase', 'rows_processed', *self.STATS_FIELDS])
+
+    def finish(self):
+        self.phase = self.PHASE_DONE
+        self.finished_at = timezone.now()
+        self.save(update_fields=['phase', 'finished_at'])
+
+    def fail(self, error):
+        self.phase = self.PHASE_FAILED
+        self.errors = [*self.errors, str(error)]
+        self.finished_at = timezone.now()
+        self.save(update_fields=['phase', 'errors', 'finished_at'])
+
+    def __str__(self):
+        return f"FeedImportJob #{self.id} ({self.get_phase_display()})"
@@ -0,0 +1,60 @@
+"""
+Права поставщика на магазины.
+
+Какими магазинами владеет пользователь, выясняется один раз за запрос:
+из снимка CachedJWTAuthentication (user.shop_ids), а без него — из
+кэша снимков (users.services.auth_cache), который сбрасывается при
+создании и удалении магазинов. Дальше проверки владения — это
+проверка id по списку, а выборки поставщика — условие shop_id IN (...),
+которое идёт по индексам на shop_id без JOIN с магазинами и профилями.
+"""
+from rest_framework.permissions import BasePermission
+
+from users.services.auth_cache import get_snapshot
+
+
+def owned_shop_ids(request):
+    """
+    Отсортированный кортеж id магазинов текущего пользователя
+    (пустой, если он не поставщик).
+    """
+    shop_ids = getattr(request, '_owned_shop_ids', None)
+    if shop_ids is None:
+        user = request.user
+        shop_ids = getattr(user, 'shop_ids', None)
+        if shop_ids is None:
+            snapshot = get_snapshot(user.pk) if user.is_authenticated else None
+            shop_ids = snapshot['shop_ids'] if snapshot else ()
+        shop_ids = request._owned_shop_ids = tuple(shop_ids)
+    return shop_ids
+
+
+def owns_shop(request, shop_id):
+    return shop_id in owned_shop_ids(request)
+
+
+def scope_to_owned_shops(request, queryset, field='shop_id'):
+    """
+    Ограничивает queryset магазинами пользователя; администратор
+    видит всё.
+    """
+    if request.user.is_staff:
+        return queryset
+    shop_ids = owned_shop_ids(request)
+    if not shop_ids:
+        return queryset.none()
+    return queryset.filter(**{f'{field}__in': shop_ids})
+
+
+class IsShopOwner(BasePermission):
+    """
+    Объект (магазин или запись с полем shop_id) принадлежит магазину
+    текущего поставщика. Администратору разрешено всё.
+    """
+    message = 'Недостаточно прав'
+
+    def has_object_permission(self, request, view, obj):
+        if request.user.is_staff:
+            return True
+        shop_id = getattr(obj, 'shop_id', obj.pk)
+        return owns_shop(request, shop_id)
@@ -1,9 +1,37 @@
 from rest_framework import serializers
 
-from shops.models import Shop
+from shops.models import Shop, FeedImportJob
 
 
 class ShopAvialableSerializer(serializers.ModelSerializer):
     class Meta:
         model = Shop
-        fields = ('id', 'is_active')
\ No newline at end of file
+        fields = ('id', 'is_active')
+
+
+class FeedImportJobSerializer(serializers.ModelSerializer):
+    job_id = serializers.IntegerField(source='id', read_only=True)
+    rows_per_sec = serializers.FloatField(read_only=True)
+
+    class Meta:
+        model = FeedImportJob
+        fields = (
+            'job_id',
+            'incremental',
+            'deactivate_missing',
+            'phase',
+            'rows_processed',
+            'rows_per_sec',
+            'created_categories',
+            'updated_categories',
+            'created_products',
+            'updated_products',
+            'skipped_products',
+            'unchanged_products',
+            'removed_products',
+            'errors',
+            'created_at',
+            'started_at',
+            'finished_at',
+        )
+        read_only_fields = fields
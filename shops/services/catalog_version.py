@@ -0,0 +1,30 @@
+from products.services.catalog_cache import catalog_cache
+from shops.models import Shop, new_catalog_version
+
+
+def bump_catalog_version(shop_ids):
+    """
+    Выдаёт магазинам новую версию каталога, из-за чего кэшированные
+    выгрузки их прайсов и ответы API каталога становятся недействительными.
+
+    Версия — случайный токен, а не счётчик: даже если устаревший
+    экземпляр Shop перезапишет поле при save(), сигнал сразу выдаст
+    новую версию, и уже использованное значение не вернётся.
+    """
+    shop_ids = set(shop_ids)
+    if shop_ids:
+        Shop.objects.filter(pk__in=shop_ids).update(catalog_version=new_catalog_version())
+        catalog_cache.invalidate(shop_ids)
+
+
+def bump_catalog_version_for_products(product_ids):
+    """
+    После списания и возврата остатков: меняет версию каталога магазинов
+    этих товаров, чтобы обновились выгрузки прайсов. Кэш ответов
+    каталога не сбрасывается — остатки для корзины и оформления отдаёт
+    кэш наличия, а в каталоге они устаревают не дольше
+    CATALOG_CACHE_TIMEOUT.
+    """
+    product_ids = set(product_ids)
+    if product_ids:
+        Shop.objects.filter(products__pk__in=product_ids).update(catalog_version=new_catalog_version())
@@ -0,0 +1,88 @@
+import gzip
+import os
+import tempfile
+from pathlib import Path
+
+from django.conf import settings
+
+from shops.models import Shop
+from shops.services.shop_export import ShopExportService
+
+
+class ShopExportCache:
+    """
+    Хранит выгрузки прайсов на диске в виде gzip-файлов
+    <root>/<shop_id>/<catalog_version>.<format>.gz.
+
+    Версия каталога меняется при любом изменении магазина или его
+    товаров, поэтому устаревшую выгрузку не нужно искать и удалять:
+    следующий запрос просто не найдёт файл для новой версии и соберёт
+    его заново, а старые версии того же формата удаляются при сборке.
+
+    Файл пишется во временный файл рядом и переименовывается
+    os.replace(), так что параллельный запрос никогда не увидит
+    недописанную выгрузку. Запросу отдаётся уже открытый файл (open()),
+    поэтому удаление старой версии не обрывает её чтение.
+    """
+    compresslevel = 6
+    read_size = 64 * 1024
+
+    def __init__(self, root=None):
+        self.root = Path(root or settings.SHOP_EXPORT_CACHE_ROOT)
+
+    @staticmethod
+    def etag(shop: Shop, export_format, gzipped=False):
+        # сжатая и распакованная выгрузки — разные представления,
+        # строгие валидаторы у них должны различаться (RFC 9110, 8.8.3)
+        suffix = '-gz' if gzipped else ''
+        return f'"{shop.pk}-{shop.catalog_version}-{export_format}{suffix}"'
+
+    def path(self, shop: Shop, export_format):
+        return self.root / str(shop.pk) / f'{shop.catalog_version}.{export_format}.gz'
+
+    def open(self, shop: Shop, export_format):
+        """
+        Открывает сжатую выгрузку на чтение, при необходимости собрав её.
+        Возвращается уже открытый файл: если параллельная сборка новой
+        версии удалит его, он всё равно дочитается до конца.
+        """
+        path = self.path(shop, export_format)
+        try:
+            return open(path, 'rb')
+        except FileNotFoundError:
+            return self._build(shop, export_format, path)
+
+    def _build(self, shop, export_format, path):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_name = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+        f = None
+        try:
+            with os.fdopen(fd, 'wb') as raw, \
+                    gzip.GzipFile(fileobj=raw, mode='wb', compresslevel=self.compresslevel, mtime=0) as gz:
+                for chunk in ShopExportService(shop).stream(export_format):
+                    gz.write(chunk)
+            # открываем до переименования: файл не пропадёт из-под
+            # запроса, даже если его тут же удалит сборка новой версии
+            f = open(tmp_name, 'rb')
+            os.replace(tmp_name, path)
+        except BaseException:
+            if f is not None:
+                f.close()
+            os.unlink(tmp_name)
+            raise
+
+        for stale in path.parent.glob(f'*.{export_format}.gz'):
+            if stale != path:
+                stale.unlink(missing_ok=True)
+        return f
+
+    def iter_decompressed(self, f):
+        """
+        Для клиентов без Accept-Encoding: gzip — распаковывает открытую
+        выгрузку (см. open) по частям.
+        """
+        def chunks():
+            with gzip.GzipFile(fileobj=f, mode='rb') as gz, f:
+                while chunk := gz.read(self.read_size):
+                    yield chunk
+        return chunks()
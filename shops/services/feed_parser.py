@@ -0,0 +1,191 @@
+import yaml
+from yaml.events import (AliasEvent, MappingEndEvent, MappingStartEvent, ScalarEvent, SequenceEndEvent,
+                         SequenceStartEvent, StreamEndEvent)
+from yaml.nodes import MappingNode, ScalarNode, SequenceNode
+
+# libyaml разбирает поток событий в разы быстрее чистого Python
+FeedLoader = yaml.CSafeLoader if yaml.__with_libyaml__ else yaml.SafeLoader
+
+# секции прайса, элементы которых выдаются по одному
+FEED_SECTIONS = {
+    'categories': 'category',
+    'goods': 'good',
+}
+
+
+class _EventComposer:
+    """
+    Собирает узел YAML из потока событий загрузчика.
+
+    Повторяет yaml.composer.Composer, но работает поверх get_event(),
+    который есть и у SafeLoader, и у CSafeLoader, — это позволяет
+    строить отдельные элементы списка, не загружая документ целиком.
+    """
+    def __init__(self, loader):
+        self.loader = loader
+        self.anchors = {}
+
+    def _tag(self, kind, event, value=None):
+        if event.tag is None or event.tag == '!':
+            return self.loader.resolve(kind, value, event.implicit)
+        return event.tag
+
+    def compose_node(self):
+        event = self.loader.get_event()
+        if isinstance(event, AliasEvent):
+            if event.anchor not in self.anchors:
+                raise yaml.YAMLError(f'Неизвестный якорь {event.anchor!r}')
+            return self.anchors[event.anchor]
+
+        if isinstance(event, ScalarEvent):
+            node = ScalarNode(self._tag(ScalarNode, event, event.value), event.value,
+                              event.start_mark, event.end_mark, style=event.style)
+        elif isinstance(event, SequenceStartEvent):
+            node = SequenceNode(self._tag(SequenceNode, event, None), [],
+                                event.start_mark, None, flow_style=event.flow_style)
+        elif isinstance(event, MappingStartEvent):
+            node = MappingNode(self._tag(MappingNode, event, None), [],
+                               event.start_mark, None, flow_style=event.flow_style)
+        else:
+            raise yaml.YAMLError(f'Неожиданное событие {event}')
+
+        if event.anchor is not None:
+            self.anchors[event.anchor] = node
+
+        if isinstance(node, SequenceNode):
+            while not self.loader.check_event(SequenceEndEvent):
+                node.value.append(self.compose_node())
+            node.end_mark = self.loader.get_event().end_mark
+        elif isinstance(node, MappingNode):
+            while not self.loader.check_event(MappingEndEvent):
+                key = self.compose_node()
+                node.value.append((key, self.compose_node()))
+            node.end_mark = self.loader.get_event().end_mark
+        return node
+
+    def load(self):
+        return self.loader.construct_document(self.compose_node())
+
+
+def iter_feed(stream):
+    """
+    Потоково разбирает YAML-прайс (файл или любой объект с read())
+    и выдаёт пары (kind, value):
+
+        ('shop', <имя>)
+        ('category', {'id': ..., 'name': ...})
+        ('good', {'id': ..., 'category': ..., ...})
+
+    Документ читается по событиям парсера, и в памяти одновременно
+    находится только текущий элемент списка, а не весь прайс.
+    """
+    loader = FeedLoader(stream)
+    composer = _EventComposer(loader)
+    try:
+        loader.get_event()  # StreamStart
+        if loader.check_event(StreamEndEvent):
+            return
+        loader.get_event()  # DocumentStart
+        if not loader.check_event(MappingStartEvent):
+            raise yaml.YAMLError('Корнем прайса должен быть словарь')
+        loader.get_event()
+
+        while not loader.check_event(MappingEndEvent):
+            key = composer.load()
+            kind = FEED_SECTIONS.get(key)
+
+            if kind and loader.check_event(SequenceStartEvent):
+                loader.get_event()
+                while not loader.check_event(SequenceEndEvent):
+                    yield kind, composer.load()
+                loader.get_event()
+                continue
+
+            value = composer.load()
+            if key == 'shop':
+                yield 'shop', value
+    finally:
+        loader.dispose()
+
+
+def iter_feed_data(data: dict):
+    """
+    То же, что iter_feed, но для уже разобранного словаря.
+    """
+    if not data:
+        return
+    if 'shop' in data:
+        yield 'shop', data['shop']
+    for key, kind in FEED_SECTIONS.items():
+        for value in data.get(key) or []:
+            yield kind, value
+
+
+def iter_feed_batches(events, batch_size):
+    """
+    Группирует события iter_feed в пачки:
+
+        ('shop', <имя>)
+        ('categories', [<категория>, ...])
+        ('goods', [<товар>, ...])
+
+    Оставшиеся категории выдаются перед первой пачкой товаров, чтобы
+    к моменту записи товаров все их категории уже были сохранены.
+    """
+    categories, goods = [], []
+    for kind, value in events:
+        if kind == 'shop':
+            yield 'shop', value
+        elif kind == 'category':
+            categories.append(value)
+            if len(categories) >= batch_size:
+                yield 'categories', categories
+                categories = []
+        elif kind == 'good':
+            if categories:
+                yield 'categories', categories
+                categories = []
+            goods.append(value)
+            if len(goods) >= batch_size:
+                yield 'goods', goods
+                goods = []
+    if categories:
+        yield 'categories', categories
+    if goods:
+        yield 'goods', goods
+
+
+# очередь, через которую процессы-парсеры передают пачки в основной процесс
+_batch_queue = None
+
+
+def init_feed_worker(queue):
+    """
+    Инициализатор процесса пула: запоминает очередь для parse_feed_file.
+    """
+    global _batch_queue
+    _batch_queue = queue
+
+
+def parse_feed_file(key, path, batch_size):
+    """
+    Разбирает файл прайса в процессе пула и отправляет в очередь
+    сообщения (key, kind, value) в формате iter_feed_batches, а в конце —
+    (key, 'done', <число товаров>) или (key, 'error', <текст ошибки>).
+    Очередь ограничена, поэтому парсер ждёт, пока записывающие потоки
+    её разгрузят, и не накапливает весь прайс в памяти.
+
+    Модуль не зависит от Django, поэтому процессу пула не нужно ни
+    настраивать Django, ни открывать соединение с БД.
+    """
+    goods = 0
+    try:
+        with open(path, 'rb') as f:
+            for kind, value in iter_feed_batches(iter_feed(f), batch_size):
+                if kind == 'goods':
+                    goods += len(value)
+                _batch_queue.put((key, kind, value))
+    except (OSError, yaml.YAMLError) as e:
+        _batch_queue.put((key, 'error', str(e)))
+    else:
+        _batch_queue.put((key, 'done', goods))
@@ -1,70 +1,160 @@
-from collections import OrderedDict
+import csv
+import json
+from decimal import Decimal
 
 import yaml
+from django.db.models import F
 
 from products.models import Category, Product
 from shops.models import Shop
 
+# libyaml сериализует в разы быстрее чистого Python
+FeedDumper = yaml.CSafeDumper if yaml.__with_libyaml__ else yaml.SafeDumper
+
+CSV_COLUMNS = [
+    'id',
+    'category_id',
+    'category_name',
+    'model',
+    'name',
+    'description',
+    'price',
+    'price_rrc',
+    'quantity',
+    'parameters',
+]
+
+
+def _number(value: Decimal):
+    # YAML и JSON не умеют Decimal: целые цены выгружаем как int, остальные — как float
+    return int(value) if value == value.to_integral_value() else float(value)
+
+
+class _Echo:
+    """
+    Псевдофайл для csv.writer: write() просто возвращает строку.
+    """
+    def write(self, value):
+        return value
+
 
 class ShopExportService:
     """
-    Собирает для заданного магазина товары,
-    и возвращает валидный YAML-документ в виде строки.
+    Потоково выгружает прайс магазина.
+
+    Товары читаются серверным курсором (.iterator) по chunk_size строк
+    одним запросом с JOIN категории, а документ выдаётся кусками байт,
+    поэтому память не зависит от размера магазина. Поддерживаются
+    форматы yaml (совместим с импортом прайса), csv и jsonl.
     """
-    def __init__(self, shop: Shop):
-        self.shop = Shop
+    chunk_size = 2000
+
+    FORMATS = {
+        'yaml': 'application/x-yaml',
+        'csv': 'text/csv',
+        'jsonl': 'application/x-ndjson',
+    }
+
+    def __init__(self, shop: Shop, chunk_size=None):
+        self.shop = shop
+        self.chunk_size = chunk_size or self.chunk_size
 
     def assembly_categories(self):
-        queryset = Category.objects.filter(
-            products__shop=self.shop
-        ).distinct().order_by('external_id')
-        categories = []
-        for cat in queryset:
-            categories.append(OrderedDict([
-                ('id', cat.external_id),
-                ('name', cat.name)
-            ]))
-        return categories
-
-    def assembly_products(self):
-        queryset = Product.objects.filter(shop=self.shop).ordered_by('external_id')
-        products = []
-        for ps in queryset:
-            products.append(OrderedDict([
-                ('id', ps.external_id),
-                ('category_id', ps.category.external_id),
-                ('model', ps.model),
-                ('name', ps.name),
-                ('description', ps.description),
-                ('parameters', ps.characteristics),
-                ('price', ps.price),
-                ('price_rrc', ps.price_rrc),
-                ('quantity', ps.quantity),
-            ]))
-        return products
+        return [
+            {'id': external_id, 'name': name}
+            for external_id, name in Category.objects
+            .filter(products__shop=self.shop)
+            .distinct()
+            .order_by('external_id')
+            .values_list('external_id', 'name')
+        ]
 
-    def run(self) -> str:
-        """
-        Формирует структуру и возвращает YAML-строку:
+    def iter_products(self):
+        queryset = (
+            Product.objects
+            .filter(shop=self.shop)
+            .order_by('external_id')
+            .values('external_id', 'model', 'name', 'description', 'characteristics',
+                    'price', 'price_rrc', 'quantity',
+                    category_external_id=F('category__external_id'),
+                    category_name=F('category__name'))
+            .iterator(chunk_size=self.chunk_size)
+        )
+        for row in queryset:
+            yield {
+                'id': row['external_id'],
+                'category_id': row['category_external_id'],
+                'category_name': row['category_name'],
+                'model': row['model'],
+                'name': row['name'],
+                'description': row['description'],
+                'parameters': row['characteristics'] or {},
+                'price': _number(row['price']),
+                'price_rrc': _number(row['price_rrc']),
+                'quantity': row['quantity'],
+            }
+
+    def iter_chunks(self):
+        chunk = []
+        for item in self.iter_products():
+            chunk.append(item)
+            if len(chunk) >= self.chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    def _dump_yaml(self, data):
+        return yaml.dump(data, Dumper=FeedDumper, default_flow_style=False,
+                         allow_unicode=True, sort_keys=False)
 
+    def iter_yaml(self):
+        """
         shop: <имя>
         categories:
-          - id: ...
-            name: ...
+        - id: ...
+          name: ...
         goods:
-          - id: ...
-            category_id: ...
-            ...
+        - id: ...
+          category_id: ...
+          ...
+        """
+        header = {'shop': self.shop.name, 'categories': self.assembly_categories()}
+        yield self._dump_yaml(header).encode('utf-8')
+
+        empty = True
+        for chunk in self.iter_chunks():
+            for item in chunk:
+                del item['category_name']
+            body = self._dump_yaml(chunk)
+            yield (('goods:\n' + body) if empty else body).encode('utf-8')
+            empty = False
+        if empty:
+            yield b'goods: []\n'
+
+    def iter_csv(self):
+        writer = csv.writer(_Echo())
+        yield writer.writerow(CSV_COLUMNS).encode('utf-8')
+        for chunk in self.iter_chunks():
+            lines = []
+            for item in chunk:
+                item['parameters'] = json.dumps(item['parameters'], ensure_ascii=False)
+                lines.append(writer.writerow([item[column] for column in CSV_COLUMNS]))
+            yield ''.join(lines).encode('utf-8')
+
+    def iter_jsonl(self):
+        for chunk in self.iter_chunks():
+            yield ''.join(
+                json.dumps(item, ensure_ascii=False) + '\n' for item in chunk
+            ).encode('utf-8')
+
+    def stream(self, export_format='yaml'):
+        if export_format not in self.FORMATS:
+            raise ValueError(f'Неизвестный формат выгрузки: {export_format}')
+        return getattr(self, f'iter_{export_format}')()
+
+    def run(self) -> str:
+        """
+        Возвращает YAML-документ целиком.
         """
-        data = OrderedDict([
-            ('shop', self.shop.name),
-            ('categories', self.assembly_categories()),
-            ('goods', self.assembly_products())
-        ])
-        return yaml.safe_dump(
-            data,
-            default_flow_style=False,
-            allow_unicode=True,
-            sort_keys=False,
-            encoding='utf-8'
-        )
\ No newline at end of file
+        return b''.join(self.iter_yaml()).decode('utf-8')
@@ -1,71 +1,280 @@
-from django.core.exceptions import ObjectDoesNotExist
+import hashlib
+import json
+import threading
+from decimal import Decimal
+
+from django.utils import timezone
 
 from products.models import Category, Product
+from products.services.availability import availability_cache
+from products.services.search import remember_words
 from shops.models import Shop
+from shops.services.catalog_version import bump_catalog_version
+from shops.services.feed_parser import iter_feed, iter_feed_batches, iter_feed_data
 from users.models import SupplierProfile
 
+PRODUCT_UPDATE_FIELDS = [
+    'category',
+    'shop',
+    'model',
+    'name',
+    'description',
+    'characteristics',
+    'price',
+    'price_rrc',
+    'quantity',
+    'is_active',
+    'feed_fingerprint',
+    'updated_at',
+]
+
+
+def feed_fingerprint(shop_id, category_id, item):
+    """
+    Хэш нормализованной строки прайса без цены и остатка. Остаток
+    меняется и в обход импорта — при оформлении и отмене заказов,
+    поэтому цена и остаток сверяются не по хэшу, а с текущими
+    значениями в БД (см. ShopImportService.import_products).
+    """
+    normalized = [
+        shop_id,
+        category_id,
+        item['model'],
+        item['name'],
+        item.get('description', ''),
+        item.get('parameters', {}),
+        str(Decimal(str(item['price_rrc'])).quantize(Decimal('0.01'))),
+    ]
+    payload = json.dumps(normalized, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.blake2b(payload.encode('utf-8'), digest_size=16).hexdigest()
+
 
 class ShopImportService:
-    def __init__(self, supplier: SupplierProfile, shop_data: dict):
+    """
+    Импортирует прайс поставщика.
+
+    feed — уже разобранный словарь или файловый объект с YAML. Файл
+    разбирается потоково, а категории и товары записываются пачками
+    по batch_size строк через bulk_create(update_conflicts=True),
+    поэтому память ограничена размером пачки, а не размером прайса.
+
+    on_progress(service) вызывается после каждой записанной пачки —
+    по нему фоновая задача обновляет прогресс импорта.
+
+    В инкрементальном режиме (incremental=True) записываются только
+    строки, хэш которых отличается от сохранённого в Product.feed_fingerprint
+    или цена и остаток которых отличаются от текущих в БД;
+    с deactivate_missing=True товары магазина, которых нет в прайсе,
+    снимаются с продажи (is_active=False).
+
+    run() последовательно вызывает start(), import_shop(),
+    import_categories(), import_products() и finish(). Команда
+    import_feeds вызывает эти шаги сама: пачки приходят от процессов,
+    разбирающих YAML, а товары пишутся из нескольких потоков, поэтому
+    import_products() обновляет счётчики под блокировкой.
+    """
+    batch_size = 1000
+
+    PHASE_CATEGORIES = 'categories'
+    PHASE_PRODUCTS = 'products'
+
+    def __init__(self, supplier: SupplierProfile, feed=None, batch_size=None, on_progress=None,
+                 incremental=False, deactivate_missing=False):
         self.supplier = supplier
-        self.shop_data = shop_data
+        self.feed = feed
+        self.batch_size = batch_size or self.batch_size
+        self.on_progress = on_progress
+        self.incremental = incremental
+        self.deactivate_missing = deactivate_missing
+        self.phase = self.PHASE_CATEGORIES
+        self.shop = None
+        self.shop_created = False
+        self.category_map = {}
+        self.seen_external_ids = set()
         self.created_cats = self.updated_cats = 0
-        self.created_products = self.updated_products = 0
+        self.created_products = self.updated_products = self.skipped_products = 0
+        self.unchanged_products = self.removed_products = 0
+        self._lock = threading.Lock()
+
+    @property
+    def rows_processed(self):
+        return (self.created_products + self.updated_products
+                + self.unchanged_products + self.skipped_products)
+
+    def _report_progress(self):
+        if self.on_progress:
+            self.on_progress(self)
+
+    def _events(self):
+        if isinstance(self.feed, dict):
+            return iter_feed_data(self.feed)
+        return iter_feed(self.feed)
+
+    def start(self):
+        self.category_map = dict(Category.objects.values_list('external_id', 'pk'))
 
-    def _get_or_create_shop(self):
-        name = self.shop_data.get('shop')
+    def import_shop(self, name):
         if not name:
-            raise ValueError('Название магазина не указано в yaml файле')
-        shop, created = Shop.objects.get_or_create(
+            raise ValueError('Название магазина не указано в yaml файле')
+        self.shop, self.shop_created = Shop.objects.get_or_create(
             name=name,
             supplier=self.supplier,
             defaults={'description': name, 'is_active': True}
         )
-        return shop
+        availability_cache.store_shop(self.shop)
+        return self.shop
 
-    def _import_categories(self):
-        for cat in self.shop_data.get('categories', []):
-            obj, created = Category.objects.get_or_create(
-                external_id=cat.get('id'),
-                defaults={'name': cat.get('name')}
-            )
-            if created:
-                self.created_cats += 1
-            else:
+    def import_categories(self, categories):
+        if not categories:
+            return
+        objs = {
+            cat['id']: Category(external_id=cat['id'], name=cat.get('name'))
+            for cat in categories
+        }
+        renamed = [
+            external_id for external_id, name in Category.objects
+            .filter(external_id__in=objs)
+            .values_list('external_id', 'name')
+            if objs[external_id].name != name
+        ]
+        saved = Category.objects.bulk_create(
+            objs.values(),
+            update_conflicts=True,
+            unique_fields=['external_id'],
+            update_fields=['name'],
+        )
+        for obj in saved:
+            if obj.external_id in self.category_map:
                 self.updated_cats += 1
+            else:
+                self.created_cats += 1
+            self.category_map[obj.external_id] = obj.pk
+        if renamed:
+            # название категории попадает в выгрузки всех магазинов с её товарами
+            bump_catalog_version(
+                Shop.objects.filter(products__category__external_id__in=renamed).values_list('pk', flat=True)
+            )
+        self._report_progress()
 
-    def _import_products(self, shop):
-        for item in self.shop_data.get('goods', []):
-            try:
-                category = Category.objects.get(external_id=item.get('category_id'))
-            except ObjectDoesNotExist:
+    def _build_product(self, item):
+        # в исходных прайсах ключ называется category, в выгрузке — category_id
+        category_id = self.category_map.get(item.get('category', item.get('category_id')))
+        if category_id is None:
+            return None
+        return Product(
+            external_id=item['id'],
+            category_id=category_id,
+            shop=self.shop,
+            model=item['model'],
+            name=item['name'],
+            description=item.get('description', ''),
+            characteristics=item.get('parameters', {}),
+            price=item['price'],
+            price_rrc=item['price_rrc'],
+            quantity=item['quantity'],
+            is_active=True,
+            feed_fingerprint=feed_fingerprint(self.shop.pk, category_id, item),
+        )
+
+    def import_products(self, goods):
+        if self.shop is None:
+            raise ValueError('Название магазина не указано в yaml файле')
+        if not goods:
+            return
+        self.phase = self.PHASE_PRODUCTS
+
+        products = {}
+        skipped = 0
+        for item in goods:
+            product = self._build_product(item)
+            if product is None:
+                skipped += 1
                 continue
-            product, created = Product.objects.update_or_create(
-                external_id=item.get('id'),
-                defaults={
-                    'category': category,
-                    'shop': shop,
-                    'model': item['model'],
-                    'name': item['name'],
-                    'description': item.get('description', ''),
-                    'characteristics': item.get('parameters', {}),
-                    'price': item['price'],
-                    'price_rrc': item['price_rrc'],
-                    'quantity': item['quantity'],
-                }
+            # в одном INSERT ... ON CONFLICT ключ не может повторяться
+            products[product.external_id] = product
+
+        existing = {}
+        if products:
+            existing = {
+                external_id: (fingerprint, is_active, price, quantity)
+                for external_id, fingerprint, is_active, price, quantity in Product.objects
+                .filter(external_id__in=products)
+                .values_list('external_id', 'feed_fingerprint', 'is_active', 'price', 'quantity')
+            }
+
+        unchanged = set()
+        if self.incremental:
+            unchanged = {
+                external_id for external_id, product in products.items()
+                if existing.get(external_id) == (product.feed_fingerprint, True,
+                                                 Decimal(str(product.price)), int(product.quantity))
+            }
+        to_write = [product for external_id, product in products.items()
+                    if external_id not in unchanged]
+
+        if to_write:
+            Product.objects.bulk_create(
+                to_write,
+                update_conflicts=True,
+                unique_fields=['external_id'],
+                update_fields=PRODUCT_UPDATE_FIELDS,
             )
-            if created:
-                self.created_products += 1
-            else:
-                self.updated_products += 1
+            bump_catalog_version([self.shop.pk])
+            availability_cache.store_products(to_write)
+            remember_words(product.name for product in to_write)
+        updated = sum(1 for product in to_write if product.external_id in existing)
 
-    def run(self):
-        shop = self._get_or_create_shop()
-        self._import_categories()
-        self._import_products(shop)
+        with self._lock:
+            if self.deactivate_missing:
+                self.seen_external_ids.update(products)
+            self.skipped_products += skipped
+            self.unchanged_products += len(unchanged)
+            self.updated_products += updated
+            self.created_products += len(to_write) - updated
+            self._report_progress()
+
+    def _deactivate_missing_products(self):
+        missing = [
+            pk for pk, external_id in Product.objects
+            .filter(shop=self.shop, is_active=True)
+            .values_list('pk', 'external_id')
+            .iterator(chunk_size=self.batch_size)
+            if external_id not in self.seen_external_ids
+        ]
+        for start in range(0, len(missing), self.batch_size):
+            self.removed_products += Product.objects.filter(
+                pk__in=missing[start:start + self.batch_size]
+            ).update(is_active=False, updated_at=timezone.now())
+        if missing:
+            bump_catalog_version([self.shop.pk])
+            availability_cache.refresh_products(missing)
+        self._report_progress()
+
+    def finish(self):
+        if self.shop is None:
+            raise ValueError('Название магазина не указано в yaml файле')
+        if self.deactivate_missing:
+            self._deactivate_missing_products()
+        return self.stats()
+
+    def stats(self):
         return {
             'created_categories': self.created_cats,
             'updated_categories': self.updated_cats,
             'created_products': self.created_products,
             'updated_products': self.updated_products,
+            'skipped_products': self.skipped_products,
+            'unchanged_products': self.unchanged_products,
+            'removed_products': self.removed_products,
         }
+
+    def run(self):
+        self.start()
+        for kind, value in iter_feed_batches(self._events(), self.batch_size):
+            if kind == 'shop':
+                self.import_shop(value)
+            elif kind == 'categories':
+                self.import_categories(value)
+            elif kind == 'goods':
+                self.import_products(value)
+        return self.finish()
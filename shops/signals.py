@@ -0,0 +1,31 @@
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from products.models import Product
+from products.services.availability import availability_cache
+from shops.models import Shop
+from shops.services.catalog_version import bump_catalog_version
+
+
+@receiver(post_save, sender=Shop)
+def shop_saved(sender, instance, created=False, raw=False, **kwargs):
+    # у нового магазина версия и так свежая
+    if created or raw:
+        return
+    bump_catalog_version([instance.pk])
+    # в том числе ShopToggleAvailability: корзина сразу видит, что
+    # магазин перестал принимать заказы
+    availability_cache.store_shop(instance)
+    instance.refresh_from_db(fields=['catalog_version'])
+
+
+@receiver(post_save, sender=Product)
+def product_saved(sender, instance, raw=False, **kwargs):
+    # bulk_create/update сигналов не шлют — импорт и списание остатков
+    # меняют версию каталога сами. На post_delete не подписываемся:
+    # обработчик отключил бы быстрое каскадное удаление товаров, а товары
+    # не удаляются, а снимаются с продажи (is_active=False)
+    if raw:
+        return
+    bump_catalog_version([instance.shop_id])
+    availability_cache.store_products([instance])
@@ -0,0 +1,32 @@
+import yaml
+from celery import shared_task
+
+from shops.models import FeedImportJob
+from shops.services.shop_import import ShopImportService
+
+
+@shared_task
+def run_feed_import(job_id):
+    """
+    Импортировать загруженный прайс в фоне, сохраняя прогресс в FeedImportJob.
+    """
+    job = FeedImportJob.objects.select_related('supplier').get(pk=job_id)
+    job.start()
+
+    try:
+        with job.file.open('rb') as f:
+            ShopImportService(
+                job.supplier,
+                f,
+                on_progress=job.report_progress,
+                incremental=job.incremental,
+                deactivate_missing=job.deactivate_missing,
+            ).run()
+    except (yaml.YAMLError, ValueError) as e:
+        job.fail(e)
+        return
+    except Exception as e:
+        job.fail(e)
+        raise
+
+    job.finish()
@@ -0,0 +1,206 @@
+import csv
+import gzip
+import io
+import json
+import tempfile
+
+import yaml
+from django.conf import settings
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from orders.services.stock import reserve_stock
+from orders.tests.factories import make_user
+from products.models import Category, Product
+from shops.models import Shop
+from shops.services.export_cache import ShopExportCache
+from shops.services.feed_parser import iter_feed
+from shops.services.shop_import import ShopImportService
+from users.models import SupplierProfile
+from users.services.auth_cache import get_snapshot
+
+FEED_PATH = settings.BASE_DIR / 'data' / 'shop1.yaml'
+
+
+class ShopExportTests(APITestCase):
+
+    def setUp(self):
+        cache_root = tempfile.TemporaryDirectory()
+        self.addCleanup(cache_root.cleanup)
+        self.enterContext(override_settings(SHOP_EXPORT_CACHE_ROOT=cache_root.name))
+
+        self.user = make_user('supplier@example.com')
+        supplier = SupplierProfile.objects.create(user=self.user)
+        with open(FEED_PATH, 'rb') as f:
+            service = ShopImportService(supplier, f)
+            service.run()
+        self.shop = service.shop
+        self.url = reverse('shop_export', args=[self.shop.pk])
+        self.client.force_authenticate(self.user)
+        get_snapshot(self.user.pk)
+
+    def export(self, export_format=None):
+        params = {'format': export_format} if export_format else {}
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content)
+
+    def test_yaml_round_trip(self):
+        # магазин, категории и товары одним JOIN-запросом, без запроса на товар
+        with self.assertNumQueries(3):
+            content = self.export()
+        # повторная выгрузка берётся из кэша
+        with self.assertNumQueries(1):
+            self.assertEqual(self.export(), content)
+
+        with open(FEED_PATH, encoding='utf-8') as f:
+            source = yaml.safe_load(f)
+        exported = yaml.safe_load(content)
+        self.assertEqual(exported['shop'], source['shop'])
+        self.assertEqual(exported['categories'], sorted(source['categories'], key=lambda c: c['id']))
+        self.assertEqual(len(exported['goods']), len(source['goods']))
+        self.assertEqual(list(iter_feed(io.BytesIO(content)))[0], ('shop', source['shop']))
+
+        # выгрузка без изменений импортируется обратно
+        Product.objects.update(price=1)
+        result = ShopImportService(self.shop.supplier, exported).run()
+        self.assertEqual(result['updated_products'], len(source['goods']))
+        self.assertFalse(Product.objects.filter(price=1).exists())
+
+    def test_csv_and_jsonl(self):
+        rows = list(csv.DictReader(io.StringIO(self.export('csv').decode('utf-8'))))
+        lines = [json.loads(line) for line in self.export('jsonl').decode('utf-8').splitlines()]
+
+        self.assertEqual(len(rows), 14)
+        self.assertEqual(len(lines), 14)
+        self.assertEqual(int(rows[0]['id']), lines[0]['id'])
+        self.assertEqual(json.loads(rows[0]['parameters']), lines[0]['parameters'])
+        first = Product.objects.select_related('category').order_by('external_id').first()
+        self.assertEqual(lines[0]['category_name'], first.category.name)
+
+    def test_empty_shop(self):
+        self.shop.products.all().delete()
+        self.assertEqual(yaml.safe_load(self.export())['goods'], [])
+
+    def test_unknown_format(self):
+        response = self.client.get(self.url, {'format': 'xml'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_only_owner_can_export(self):
+        self.client.force_authenticate(make_user('buyer@example.com'))
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_404_NOT_FOUND)
+
+
+class ShopExportCacheTests(APITestCase):
+
+    def setUp(self):
+        cache_root = tempfile.TemporaryDirectory()
+        self.addCleanup(cache_root.cleanup)
+        self.enterContext(override_settings(SHOP_EXPORT_CACHE_ROOT=cache_root.name))
+
+        self.user = make_user('supplier@example.com')
+        self.supplier = SupplierProfile.objects.create(user=self.user)
+        with open(FEED_PATH, encoding='utf-8') as f:
+            self.feed = yaml.safe_load(f)
+        service = ShopImportService(self.supplier, self.feed)
+        service.run()
+        self.shop = service.shop
+        self.url = reverse('shop_export', args=[self.shop.pk])
+        self.client.force_authenticate(self.user)
+
+    def assertInvalidated(self, change):
+        etag = self.client.get(self.url)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            change()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+        return yaml.safe_load(b''.join(response.streaming_content))
+
+    def test_not_modified(self):
+        etag = self.client.get(self.url)['ETag']
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response['ETag'], etag)
+
+        # у другого формата свой ETag
+        response = self.client.get(self.url, {'format': 'csv'}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_gzip_is_served_precompressed(self):
+        plain = b''.join(self.client.get(self.url).streaming_content)
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip, br')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(b''.join(response.streaming_content)), plain)
+
+    def test_gzip_has_own_etag_and_respects_q(self):
+        plain_etag = self.client.get(self.url)['ETag']
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertNotEqual(response['ETag'], plain_etag)
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=plain_etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        for accept_encoding in ('gzip;q=0, br', 'br, *;q=0', 'identity'):
+            response = self.client.get(self.url, HTTP_ACCEPT_ENCODING=accept_encoding)
+            self.assertFalse(response.has_header('Content-Encoding'), accept_encoding)
+            self.assertEqual(response['ETag'], plain_etag)
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING='br;q=1, gzip;q=0.5')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+
+    def test_open_export_survives_removal(self):
+        cache, shop = ShopExportCache(), Shop.objects.get(pk=self.shop.pk)
+        plain = b''.join(self.client.get(self.url).streaming_content)
+
+        f = cache.open(shop, 'yaml')
+        # сборка новой версии удаляет файл, который уже читает запрос
+        cache.path(shop, 'yaml').unlink()
+        self.assertEqual(b''.join(cache.iter_decompressed(f)), plain)
+
+        # между проверкой и открытием файла не стало — собирается заново
+        f = cache.open(shop, 'yaml')
+        self.assertEqual(b''.join(cache.iter_decompressed(f)), plain)
+
+    def test_product_save_invalidates(self):
+        product = self.shop.products.order_by('external_id').first()
+
+        def change():
+            product.price = 1
+            product.save()
+        exported = self.assertInvalidated(change)
+        self.assertEqual(exported['goods'][0]['price'], 1)
+
+    def test_import_invalidates(self):
+        self.feed['goods'][0]['quantity'] = 777
+        exported = self.assertInvalidated(
+            lambda: ShopImportService(self.supplier, self.feed, incremental=True).run()
+        )
+        self.assertIn(777, [good['quantity'] for good in exported['goods']])
+
+    def test_unchanged_incremental_import_keeps_cache(self):
+        etag = self.client.get(self.url)['ETag']
+        ShopImportService(self.supplier, self.feed, incremental=True).run()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_category_rename_invalidates(self):
+        category = self.feed['categories'][0]
+        category['name'] = 'Новое название'
+        exported = self.assertInvalidated(lambda: ShopImportService(self.supplier, self.feed).run())
+        self.assertIn({'id': category['id'], 'name': 'Новое название'}, exported['categories'])
+        self.assertEqual(Category.objects.get(external_id=category['id']).name, 'Новое название')
+
+    def test_toggle_availability_invalidates(self):
+        self.assertInvalidated(lambda: self.client.patch(
+            reverse('shop_availability', args=[self.shop.pk]), {'is_active': False}
+        ))
+        self.shop.refresh_from_db()
+        self.assertFalse(self.shop.is_active)
+
+    def test_stock_reservation_invalidates(self):
+        product = self.shop.products.order_by('external_id').first()
+        exported = self.assertInvalidated(lambda: reserve_stock({product.pk: 1}))
+        self.assertEqual(exported['goods'][0]['quantity'], product.quantity - 1)
@@ -0,0 +1,163 @@
+import io
+import tempfile
+
+import yaml
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from orders.services.checkout import CheckoutService
+from orders.tests.factories import fill_cart, make_contact, make_user
+from products.models import Category, Product
+from shops.models import FeedImportJob, Shop
+from shops.services.feed_parser import iter_feed, iter_feed_data
+from shops.services.shop_import import ShopImportService
+from users.models import SupplierProfile
+
+FEED_PATH = settings.BASE_DIR / 'data' / 'shop1.yaml'
+
+
+class FeedParserTests(APITestCase):
+
+    def test_stream_matches_safe_load(self):
+        with open(FEED_PATH, 'rb') as f:
+            streamed = list(iter_feed(f))
+        with open(FEED_PATH, encoding='utf-8') as f:
+            loaded = list(iter_feed_data(yaml.safe_load(f)))
+        self.assertEqual(streamed, loaded)
+        self.assertEqual(streamed[0], ('shop', 'Связной'))
+
+    def test_unknown_keys_are_skipped(self):
+        feed = io.StringIO('version: 2\nshop: A\nmeta: {a: [1, 2]}\ngoods:\n  - {id: 1}\n')
+        self.assertEqual(list(iter_feed(feed)), [('shop', 'A'), ('good', {'id': 1})])
+
+    def test_invalid_yaml(self):
+        with self.assertRaises(yaml.YAMLError):
+            list(iter_feed(io.StringIO('shop: A\ngoods: [\n')))
+
+
+class ShopImportServiceTests(APITestCase):
+
+    def setUp(self):
+        self.supplier = SupplierProfile.objects.create(user=make_user('supplier@example.com'))
+
+    def test_import_and_reimport(self):
+        with open(FEED_PATH, 'rb') as f:
+            result = ShopImportService(self.supplier, f, batch_size=5).run()
+
+        self.assertEqual(result['created_categories'], 4)
+        self.assertEqual(result['created_products'], 14)
+        self.assertEqual(result['updated_products'], 0)
+        self.assertEqual(result['skipped_products'], 0)
+        self.assertEqual(Product.objects.filter(shop__name='Связной').count(), 14)
+
+        with open(FEED_PATH, 'rb') as f:
+            result = ShopImportService(self.supplier, f, batch_size=5).run()
+        self.assertEqual(result['created_products'], 0)
+        self.assertEqual(result['updated_products'], 14)
+        self.assertEqual(result['updated_categories'], 4)
+
+    def test_updates_existing_products(self):
+        feed = {
+            'shop': 'Связной',
+            'categories': [{'id': 1, 'name': 'Flash-накопители'}],
+            'goods': [
+                {'id': 10, 'category': 1, 'model': 'm', 'name': 'A',
+                 'price': 10, 'price_rrc': 12, 'quantity': 1},
+                {'id': 11, 'category': 999, 'model': 'm', 'name': 'B',
+                 'price': 10, 'price_rrc': 12, 'quantity': 1},
+            ],
+        }
+        ShopImportService(self.supplier, feed).run()
+        feed['goods'][0].update(price=15, quantity=7)
+        result = ShopImportService(self.supplier, feed).run()
+
+        product = Product.objects.get(external_id=10)
+        self.assertEqual((product.price, product.quantity), (15, 7))
+        self.assertEqual(result['skipped_products'], 1)
+        self.assertEqual(Category.objects.get(external_id=1).name, 'Flash-накопители')
+
+    def test_incremental_reimport_writes_only_changed_rows(self):
+        with open(FEED_PATH, encoding='utf-8') as f:
+            feed = yaml.safe_load(f)
+        ShopImportService(self.supplier, feed).run()
+        untouched = Product.objects.get(external_id=feed['goods'][1]['id'])
+
+        feed['goods'][0]['price'] += 100
+        removed = feed['goods'].pop()
+        result = ShopImportService(self.supplier, feed, incremental=True, deactivate_missing=True).run()
+
+        self.assertEqual(result['updated_products'], 1)
+        self.assertEqual(result['unchanged_products'], 12)
+        self.assertEqual(result['removed_products'], 1)
+        self.assertFalse(Product.objects.get(external_id=removed['id']).is_active)
+        self.assertEqual(Product.objects.get(pk=untouched.pk).updated_at, untouched.updated_at)
+
+        # товар вернулся в прайс без изменений — его нужно снова включить
+        feed['goods'].append(removed)
+        result = ShopImportService(self.supplier, feed, incremental=True).run()
+        self.assertEqual(result['updated_products'], 1)
+        self.assertTrue(Product.objects.get(external_id=removed['id']).is_active)
+
+    def test_incremental_reimport_restores_stock_changed_by_checkout(self):
+        with open(FEED_PATH, encoding='utf-8') as f:
+            feed = yaml.safe_load(f)
+        ShopImportService(self.supplier, feed).run()
+        product = Product.objects.get(external_id=feed['goods'][0]['id'])
+        user = make_user()
+        CheckoutService(user, fill_cart(user, [product], qty=2), make_contact(user)).run()
+
+        result = ShopImportService(self.supplier, feed, incremental=True).run()
+
+        self.assertEqual(result['updated_products'], 1)
+        self.assertEqual(Product.objects.get(pk=product.pk).quantity, feed['goods'][0]['quantity'])
+
+    def test_missing_shop_name(self):
+        with self.assertRaises(ValueError):
+            ShopImportService(self.supplier, {'goods': []}).run()
+
+
+class SupplierFeedUploadTests(APITestCase):
+
+    def setUp(self):
+        user = make_user('supplier@example.com')
+        SupplierProfile.objects.create(user=user)
+        self.client.force_authenticate(user)
+
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=media.name, CELERY_TASK_ALWAYS_EAGER=True))
+
+    def upload(self, content):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('supplier_feed_upload'),
+                                        {'file': SimpleUploadedFile('feed.yaml', content)})
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        return response
+
+    def test_upload_runs_job(self):
+        response = self.upload(FEED_PATH.read_bytes())
+
+        job = self.client.get(response.data['status_url']).data
+        self.assertEqual(job['phase'], FeedImportJob.PHASE_DONE)
+        self.assertEqual(job['rows_processed'], 14)
+        self.assertEqual(job['created_products'], 14)
+        self.assertEqual(job['errors'], [])
+        self.assertTrue(Shop.objects.filter(name='Связной').exists())
+
+    def test_upload_invalid_yaml(self):
+        response = self.upload(b'shop: A\ngoods: [\n')
+
+        job = FeedImportJob.objects.get(pk=response.data['job_id'])
+        self.assertEqual(job.phase, FeedImportJob.PHASE_FAILED)
+        self.assertEqual(len(job.errors), 1)
+
+    def test_job_is_visible_only_to_owner(self):
+        response = self.upload(FEED_PATH.read_bytes())
+
+        self.client.force_authenticate(make_user('other@example.com'))
+        self.assertEqual(self.client.get(response.data['status_url']).status_code,
+                         status.HTTP_404_NOT_FOUND)
@@ -0,0 +1,67 @@
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from orders.models import ShopOrder
+from orders.tests.factories import make_orders, make_products, make_shop, make_user
+from shops.models import Shop
+from users.services.auth_cache import auth_cache
+
+
+class SupplierPermissionTests(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.shop = make_shop('Связной', 'supplier@example.com')
+        cls.second_shop = Shop.objects.create(supplier=cls.shop.supplier, name='Связной-2', description='-')
+        cls.other_shop = make_shop('Евросеть')
+        cls.supplier = cls.shop.supplier.user
+        make_orders(make_user(), make_products(cls.shop, 1) + make_products(cls.second_shop, 1)
+                    + make_products(cls.other_shop, 1), 2)
+
+    def setUp(self):
+        auth_cache.clear()
+        self.client.force_authenticate(self.supplier)
+
+    def availability(self, shop_id):
+        return self.client.patch(reverse('shop_availability', args=[shop_id]), {'is_active': False}, format='json')
+
+    def test_shop_ids_are_resolved_once(self):
+        # снимок поставщика и сводка — при любом числе магазинов
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('shop-orders-summary'))
+        self.assertEqual(response.data['count'], 4)
+
+        # чужой магазин отсекается без запросов
+        with self.assertNumQueries(0):
+            self.assertEqual(self.availability(self.other_shop.pk).status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.availability(self.second_shop.pk).status_code, status.HTTP_200_OK)
+
+    def test_new_shop_is_visible_at_once(self):
+        self.client.get(reverse('shop-orders-summary'))
+        shop = Shop.objects.create(supplier=self.shop.supplier, name='Связной-3', description='-')
+
+        self.assertEqual(self.availability(shop.pk).status_code, status.HTTP_200_OK)
+
+        shop_id = shop.pk
+        shop.delete()
+        self.assertEqual(self.availability(shop_id).status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_foreign_shop_orders(self):
+        foreign = ShopOrder.objects.filter(shop=self.other_shop).first()
+
+        response = self.client.patch(reverse('shop-orders-process', args=[foreign.pk]),
+                                     {'status': 'in_progress'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        response = self.client.get(reverse('shop_export', args=[self.other_shop.pk]))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+        self.client.force_authenticate(make_user('admin@example.com', is_staff=True))
+        response = self.client.patch(reverse('shop-orders-process', args=[foreign.pk]),
+                                     {'status': 'in_progress'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_client_owns_nothing(self):
+        self.client.force_authenticate(make_user('buyer@example.com'))
+        self.assertEqual(self.client.get(reverse('shop-orders-summary')).data['count'], 0)
+        self.assertEqual(self.availability(self.shop.pk).status_code, status.HTTP_404_NOT_FOUND)
@@ -1,23 +1,35 @@
-import yaml
-from django.http import HttpResponse
+from django.db import transaction
+from django.http import FileResponse, Http404, HttpResponseNotModified, StreamingHttpResponse
 from django.shortcuts import render, get_object_or_404
 from django.utils import timezone
+from django.utils.http import parse_etags
 from django.utils.text import slugify
 from rest_framework import permissions, status, generics
 from rest_framework.parsers import MultiPartParser
 from rest_framework.response import Response
+from rest_framework.reverse import reverse
 from rest_framework.views import APIView
 
-from shops.models import Shop
-from shops.serializers import ShopAvialableSerializer
+from shops.models import Shop, FeedImportJob
+from shops.permissions import owns_shop
+from shops.serializers import ShopAvialableSerializer, FeedImportJobSerializer
+from shops.services.export_cache import ShopExportCache
 from shops.services.shop_export import ShopExportService
-from shops.services.shop_import import ShopImportService
+from shops.tasks import run_feed_import
 from users.models import SupplierProfile
 
 
 class SupplierFeedUpload(APIView):
     """
-    Позволяет поставщику загрузить YAML-файл с товарами
+    Позволяет поставщику загрузить YAML-файл с товарами.
+
+    Файл сохраняется, импорт ставится в очередь Celery, а в ответ сразу
+    возвращается id задачи — ход импорта можно смотреть через
+    GET /api/suppliers/import-jobs/{job_id}/.
+
+    Необязательные поля формы:
+        - mode=incremental — записывать только изменившиеся товары
+        - deactivate_missing=true — снять с продажи товары, которых нет в прайсе
     """
     permission_classes = [permissions.IsAuthenticated]
     parser_classes = [MultiPartParser]
@@ -27,24 +39,43 @@ class SupplierFeedUpload(APIView):
         try:
             supplier = request.user.supplier_profile
         except SupplierProfile.DoesNotExist:
-            return Response({'detail': 'Поставщик не найден'}, status=status.HTTP_400_BAD_REQUEST)
+            return Response({'detail': 'Поставщик не найден'}, status=status.HTTP_400_BAD_REQUEST)
 
-        # 2 загрузить и распарсить файл
+        # 2 проверить, что файл загружен
         uploaded = request.FILES.get('file')
         if not uploaded:
             return Response({'detail': 'Файл не загружен'}, status=status.HTTP_400_BAD_REQUEST)
 
-        try:
-            raw = uploaded.read().decode('utf-8')
-            shop_data = yaml.safe_load(raw)
-        except yaml.YAMLError as e:
-            return Response({'detail': f'Ошибка при чтении YAML-файла: {e}'}, status=status.HTTP_400_BAD_REQUEST)
+        # 3 сохраняем файл и ставим импорт в очередь после коммита
+        job = FeedImportJob.objects.create(
+            supplier=supplier,
+            file=uploaded,
+            incremental=request.data.get('mode') == 'incremental',
+            deactivate_missing=str(request.data.get('deactivate_missing', '')).lower() in ('1', 'true'),
+        )
+        transaction.on_commit(lambda: run_feed_import.delay(job.pk))
+
+        return Response(
+            {
+                'job_id': job.pk,
+                'phase': job.phase,
+                'status_url': reverse('feed_import_job', kwargs={'pk': job.pk}, request=request),
+            },
+            status=status.HTTP_202_ACCEPTED
+        )
 
-        # 3 импортируем товары
-        service = ShopImportService(supplier, shop_data)
-        result = service.run()
 
-        return Response(result, status=status.HTTP_200_OK)
+class FeedImportJobDetail(generics.RetrieveAPIView):
+    """
+    GET /api/suppliers/import-jobs/{job_id}/
+    - этап, число обработанных строк, скорость и счётчики импорта.
+    Доступно только поставщику, загрузившему прайс.
+    """
+    serializer_class = FeedImportJobSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        return FeedImportJob.objects.filter(supplier__user=self.request.user)
 
 
 class ShopToggleAvailability(generics.UpdateAPIView):
@@ -60,38 +91,88 @@ class ShopToggleAvailability(generics.UpdateAPIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def get_object(self):
-        supplier = self.request.user.supplier_profile
-        shop_pk = self.kwargs['shop_id']
-        return get_object_or_404(Shop, pk=shop_pk, supplier=supplier)
+        # чужой магазин отсекается по списку id владельца, без запроса к БД
+        if not owns_shop(self.request, self.kwargs['pk']):
+            raise Http404
+        return get_object_or_404(Shop, pk=self.kwargs['pk'])
+
+
+def accepts_gzip(accept_encoding):
+    """
+    Разрешает ли заголовок Accept-Encoding ответ в gzip: кодировка
+    указана явно (или через *) и её q не равен нулю.
+    """
+    weights = {}
+    for part in accept_encoding.split(','):
+        coding, *params = [token.strip() for token in part.split(';')]
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if coding:
+            weights[coding.lower()] = q
+    for coding in ('gzip', 'x-gzip', '*'):
+        if coding in weights:
+            return weights[coding] > 0
+    return False
 
 
 class ShopExportView(APIView):
     """
-    GET /api/shops/{shop_id}/export/
-    - сгенерировать и скачать YAML-файл (прайс) заданного магазина.
+    GET /api/shops/{shop_id}/export/?format=yaml|csv|jsonl
+    - скачать прайс заданного магазина (по умолчанию YAML).
     Доступно только его владельцу (supplier_profile).
+
+    Выгрузка собирается один раз на версию каталога магазина и хранится
+    сжатой (ShopExportCache). Клиентам с Accept-Encoding: gzip файл
+    отдаётся как есть (с отдельным ETag), а по If-None-Match с текущим
+    ETag — 304 без тела.
     """
     permission_classes = [permissions.IsAuthenticated]
 
+    def perform_content_negotiation(self, request, force=False):
+        # ?format= здесь выбирает формат файла, а не рендерер DRF
+        return super().perform_content_negotiation(request, force=True)
+
     def get(self, request, shop_id):
         # 1 Проверяем, что магазин принадлежит текущему поставщику
-        shop = get_object_or_404(
-            Shop,
-            pk=shop_id,
-            supplier=request.user.supplier_profile
-        )
-
-        # 2 Генерируем YAML-файл
-        yaml_str = ShopExportService(shop).run()
-
-        # 3 Формируем имя файла
+        if not owns_shop(request, shop_id):
+            raise Http404
+        shop = get_object_or_404(Shop, pk=shop_id)
+
+        # 2 Проверяем формат выгрузки
+        export_format = request.query_params.get('format', 'yaml')
+        if export_format not in ShopExportService.FORMATS:
+            return Response(
+                {'detail': f"Неизвестный формат, доступны: {', '.join(ShopExportService.FORMATS)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        # 3 Каталог не менялся — клиенту достаточно своей копии
+        cache = ShopExportCache()
+        gzipped = accepts_gzip(request.headers.get('Accept-Encoding', ''))
+        etag = cache.etag(shop, export_format, gzipped)
+        headers = {'ETag': etag, 'Vary': 'Accept-Encoding'}
+        if_none_match = request.headers.get('If-None-Match')
+        if if_none_match and (if_none_match.strip() == '*' or etag in parse_etags(if_none_match)):
+            return HttpResponseNotModified(headers=headers)
+
+        # 4 Формируем имя файла
         slug = slugify(shop.name)
         timestamp = timezone.localtime().strftime('%Y%m%d')
-        filename = f'{slug}_{timestamp}.yaml'
-
-        # 4 Возвращаем HttpResponse с заголовком для скачивания
-        return HttpResponse(
-            yaml_str,
-            content_type='application/x-yaml',
-            headers={'Content-Disposition': f'attachment; filename="{filename}"'}
-        )
+        filename = f'{slug}_{timestamp}.{export_format}'
+
+        # 5 Берём готовую сжатую выгрузку или собираем её
+        f = cache.open(shop, export_format)
+        content_type = ShopExportService.FORMATS[export_format]
+        if gzipped:
+            response = FileResponse(f, as_attachment=True, filename=filename,
+                                    content_type=content_type, headers=headers)
+            response['Content-Encoding'] = 'gzip'
+            return response
+        headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return StreamingHttpResponse(cache.iter_decompressed(f), content_type=content_type, headers=headers)
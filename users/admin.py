@@ -1,6 +1,6 @@
 from django.contrib import admin
 
-from users.models import UserProfile, SupplierProfile
+from users.models import OutgoingEmail, UserProfile, SupplierProfile
 
 
 @admin.register(UserProfile)
@@ -16,3 +16,10 @@ class UserProfileAdmin(admin.ModelAdmin):
 @admin.register(SupplierProfile)
 class SupplierProfileAdmin(admin.ModelAdmin):
     list_display = ('user', )
+
+
+@admin.register(OutgoingEmail)
+class OutgoingEmailAdmin(admin.ModelAdmin):
+    list_display = ('kind', 'object_id', 'status', 'attempts', 'next_attempt_at', 'sent_at')
+    list_filter = ('status', 'kind')
+    readonly_fields = ('created_at', 'sent_at', 'last_error')
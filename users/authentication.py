@@ -0,0 +1,67 @@
+import time
+
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+from users.services.auth_cache import auth_cache, get_snapshot, user_from_snapshot
+
+
+class CachedToken(dict):
+    """
+    Проверенный токен из кэша: claims и исходная строка. Для кода,
+    читающего request.auth, ведёт себя как токен simplejwt
+    (token['user_id'], token.get(...), str(token)).
+    """
+    def __init__(self, raw_token, claims):
+        super().__init__(claims)
+        self.token = raw_token
+        self.payload = self
+
+    def __str__(self):
+        return self.token.decode()
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication с кэшем (users.services.auth_cache).
+
+    Подпись и сроки токена проверяются один раз: claims кладутся в кэш
+    до истечения токена (exp), так что из кэша просроченный токен не
+    достать. Пользователь собирается из снимка (поля User, профиль
+    поставщика, id магазинов) — повторный запрос с тем же токеном
+    не делает ни одного запроса к БД ради аутентификации.
+    """
+
+    def get_validated_token(self, raw_token):
+        key = auth_cache.claims_key(raw_token)
+        claims = auth_cache.get(key)
+        if claims is not None:
+            return CachedToken(raw_token, claims)
+        token = super().get_validated_token(raw_token)
+        claims = dict(token.payload)
+        auth_cache.set(key, claims, self.ttl(claims))
+        return CachedToken(raw_token, claims)
+
+    @staticmethod
+    def ttl(claims):
+        return int(claims.get('exp', 0) - time.time())
+
+    def get_user(self, validated_token):
+        if api_settings.CHECK_REVOKE_TOKEN:
+            # сверка с хэшем пароля требует полной строки пользователя
+            return super().get_user(validated_token)
+
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_('Token contained no recognizable user identification'))
+
+        snapshot = get_snapshot(user_id, self.ttl(validated_token))
+        if snapshot is None:
+            raise AuthenticationFailed(_('User not found'), code='user_not_found')
+
+        if api_settings.CHECK_USER_IS_ACTIVE and not snapshot['is_active']:
+            raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+        return user_from_snapshot(snapshot)
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.4 on 2026-10-17 13:45
+
+from django.db import migrations, models
+from django.db.models import Count, F
+
+
+def drop_duplicate_emails(apps, schema_editor):
+    # очередь писалась до ограничения: из повторов одного письма
+    # остаётся отправленное, если оно есть, иначе самое раннее
+    OutgoingEmail = apps.get_model('users', 'OutgoingEmail')
+    duplicates = (OutgoingEmail.objects.values('kind', 'object_id')
+                  .annotate(count=Count('pk')).filter(count__gt=1).order_by())
+    for row in duplicates.iterator():
+        emails = OutgoingEmail.objects.filter(kind=row['kind'], object_id=row['object_id'])
+        keep = emails.order_by(F('sent_at').desc(nulls_last=True), 'pk').values_list('pk', flat=True).first()
+        emails.exclude(pk=keep).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0003_outgoing_email'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_duplicate_emails, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='outgoingemail',
+            constraint=models.UniqueConstraint(fields=('kind', 'object_id'), name='outgoing_email_unique'),
+        ),
+    ]
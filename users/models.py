@@ -2,6 +2,7 @@ import uuid
 
 from django.conf import settings
 from django.db import models
+from django.utils import timezone
 
 class UserProfile(models.Model):
 
@@ -81,3 +82,53 @@ class EmailVerification(models.Model):
     def __str__(self):
         return f"Email verification for {self.user.email}"
 
+
+
+class OutgoingEmail(models.Model):
+    """
+    Очередь исходящих писем. Письмо хранится как (kind, object_id):
+    текст рендерится при отправке, пачкой — см. users.services.mail.
+
+    Частичный индекс по next_attempt_at покрывает только ожидающие
+    письма, поэтому выборка очередной пачки не читает историю.
+    """
+    KIND_WELCOME = 'welcome'
+    KIND_ORDER_CONFIRMATION = 'order_confirmation'
+    KIND_ORDER_ADMIN = 'order_admin'
+    KIND_CHOICES = [
+        (KIND_WELCOME, 'Приветствие'),
+        (KIND_ORDER_CONFIRMATION, 'Подтверждение заказа'),
+        (KIND_ORDER_ADMIN, 'Новый заказ (администратору)'),
+    ]
+
+    STATUS_PENDING = 'pending'
+    STATUS_SENT = 'sent'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Ожидает отправки'),
+        (STATUS_SENT, 'Отправлено'),
+        (STATUS_FAILED, 'Не отправлено'),
+    ]
+
+    kind = models.CharField(max_length=32, choices=KIND_CHOICES)
+    object_id = models.PositiveBigIntegerField(help_text='id пользователя или заказа, по которому рендерится письмо')
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            # задачи постановки приходят через outbox «хотя бы один раз»:
+            # повтор не должен порождать второе письмо
+            models.UniqueConstraint(fields=['kind', 'object_id'], name='outgoing_email_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['next_attempt_at', 'id'], condition=models.Q(status='pending'),
+                         name='outgoing_email_pending'),
+        ]
+
+    def __str__(self):
+        return f'{self.get_kind_display()} #{self.object_id} ({self.status})'
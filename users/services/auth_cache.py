@@ -0,0 +1,163 @@
+"""
+Кэш аутентификации: проверенные claims JWT и компактный снимок
+пользователя, по которому запрос обслуживается без чтения users,
+профиля поставщика и его магазинов.
+
+Два уровня, как у кэша каталога: локальный LocMemCache процесса
+(auth_local) и общий Redis (auth, AUTH_CACHE_URL). Записи claims живут
+не дольше самого токена. Снимок пользователя удаляется из общего
+уровня при изменении пользователя, профиля поставщика или его
+магазинов (users.signals); в локальном уровне других процессов он
+доживает не больше AUTH_CACHE_LOCAL_TIMEOUT секунд.
+"""
+import hashlib
+import threading
+from collections import Counter
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.postgres.aggregates import ArrayAgg
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import F, Q
+
+from users.models import SupplierProfile
+
+User = get_user_model()
+
+SNAPSHOT_FIELDS = ('id', 'username', 'email', 'first_name', 'last_name', 'is_active', 'is_staff', 'is_superuser')
+
+
+class AuthCache:
+    """
+    Двухуровневый кэш claims и снимков пользователей. Ошибки общего
+    уровня не роняют запрос: он обслуживается как при промахе.
+    """
+    def __init__(self, local_alias='auth_local', shared_alias='auth'):
+        self.local_alias = local_alias
+        self.shared_alias = shared_alias
+        self._stats = Counter()
+        self._lock = threading.Lock()
+
+    @property
+    def local(self):
+        return caches[self.local_alias]
+
+    @property
+    def shared(self):
+        return caches[self.shared_alias]
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats)
+
+    @staticmethod
+    def claims_key(raw_token):
+        digest = hashlib.blake2b(raw_token, digest_size=16).hexdigest()
+        return f'auth:claims:{digest}'
+
+    @staticmethod
+    def user_key(user_id):
+        return f'auth:user:{user_id}'
+
+    def get(self, key):
+        value = self.local.get(key)
+        if value is not None:
+            self._count('hit_local')
+            return value
+        try:
+            value = self.shared.get(key)
+        except Exception:
+            self._count('errors')
+            value = None
+        if value is None:
+            self._count('miss')
+            return None
+        self.local.set(key, value, settings.AUTH_CACHE_LOCAL_TIMEOUT)
+        self._count('hit_shared')
+        return value
+
+    def set(self, key, value, timeout):
+        if timeout <= 0:
+            return
+        self.local.set(key, value, min(timeout, settings.AUTH_CACHE_LOCAL_TIMEOUT))
+        try:
+            self.shared.set(key, value, timeout)
+        except Exception:
+            self._count('errors')
+
+    def delete_users(self, user_ids):
+        keys = [self.user_key(user_id) for user_id in user_ids]
+        self.local.delete_many(keys)
+        try:
+            self.shared.delete_many(keys)
+        except Exception:
+            self._count('errors')
+
+    def invalidate_users(self, user_ids):
+        """
+        Удаляет снимки сразу и ещё раз после коммита: запрос, успевший
+        прочитать данные до коммита, мог сохранить устаревший снимок.
+        """
+        user_ids = list(user_ids)
+        self.delete_users(user_ids)
+        transaction.on_commit(lambda: self.delete_users(user_ids))
+
+    def clear(self):
+        self.local.clear()
+        self.shared.clear()
+
+
+auth_cache = AuthCache()
+
+
+def load_snapshot(user_id):
+    """
+    Снимок пользователя одним запросом: поля User, id профиля
+    поставщика и id его магазинов. None, если пользователя нет.
+    """
+    return (
+        User.objects
+        .filter(pk=user_id)
+        .values(*SNAPSHOT_FIELDS, supplier_profile_id=F('supplier_profile__id'))
+        .annotate(shop_ids=ArrayAgg('supplier_profile__shops__id', filter=Q(supplier_profile__shops__isnull=False),
+                                    ordering='supplier_profile__shops__id', default=[]))
+        .first()
+    )
+
+
+def user_from_snapshot(snapshot):
+    """
+    Пользователь из снимка без запросов к БД. Остальные поля User
+    отложены (загрузятся при обращении), поэтому save() такого
+    пользователя пишет только поля снимка. request.user.supplier_profile
+    тоже берётся из снимка, а id магазинов поставщика — в user.shop_ids.
+    """
+    fields = [f.attname for f in User._meta.concrete_fields if f.attname in snapshot]
+    user = User.from_db(DEFAULT_DB_ALIAS, fields, [snapshot[name] for name in fields])
+    profile = None
+    if snapshot['supplier_profile_id'] is not None:
+        profile = SupplierProfile.from_db(DEFAULT_DB_ALIAS, ['id', 'user_id'],
+                                          [snapshot['supplier_profile_id'], user.pk])
+    User.supplier_profile.related.set_cached_value(user, profile)
+    user.shop_ids = tuple(snapshot['shop_ids'])
+    return user
+
+
+def get_snapshot(user_id, timeout=None):
+    """
+    Снимок пользователя из кэша; при промахе читается из БД и
+    кладётся в кэш на timeout (по умолчанию AUTH_CACHE_TIMEOUT) секунд.
+    """
+    key = auth_cache.user_key(user_id)
+    snapshot = auth_cache.get(key)
+    if snapshot is None:
+        snapshot = load_snapshot(user_id)
+        if snapshot is not None:
+            timeout = settings.AUTH_CACHE_TIMEOUT if timeout is None else timeout
+            auth_cache.set(key, snapshot, min(timeout, settings.AUTH_CACHE_TIMEOUT))
+    return snapshot
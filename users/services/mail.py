@@ -0,0 +1,292 @@
+"""
+Отправка писем из очереди OutgoingEmail.
+
+Письма отправляются пачками: пачка забирается из очереди одним
+запросом (SELECT ... FOR UPDATE SKIP LOCKED, так что несколько
+воркеров не берут одни и те же письма), объекты для всех писем пачки
+читаются по запросу на вид письма, шаблоны компилируются один раз,
+а сами письма уходят через одно SMTP-соединение (get_connection()).
+"""
+import time
+from datetime import timedelta
+from smtplib import SMTPServerDisconnected
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import transaction
+from django.db.models import F, Prefetch
+from django.template.loader import get_template
+from django.utils import timezone
+
+from orders.models import Order, ShopOrder, ShopOrderItem
+from users.models import OutgoingEmail
+
+User = get_user_model()
+
+# на столько письмо «арендуется» воркером: если он упадёт, не отправив
+# пачку, письма вернутся в очередь по истечении аренды
+LEASE = timedelta(minutes=5)
+MAX_RETRY_DELAY = timedelta(hours=1)
+
+
+def enqueue(kind, object_ids):
+    """
+    Ставит в очередь письма вида kind по объектам object_ids
+    одним INSERT. Письма, уже стоящие в очереди или отправленные,
+    повторно не ставятся.
+    """
+    return OutgoingEmail.objects.bulk_create([
+        OutgoingEmail(kind=kind, object_id=object_id) for object_id in object_ids
+    ], ignore_conflicts=True)
+
+
+def retry_delay(attempts):
+    """Экспоненциальная задержка перед попыткой attempts + 1."""
+    delay = timedelta(seconds=settings.EMAIL_RETRY_DELAY) * 2 ** (attempts - 1)
+    return min(delay, MAX_RETRY_DELAY)
+
+
+class RateLimiter:
+    """
+    Token bucket: не больше rate писем в секунду в среднем и не больше
+    burst подряд. rate = 0 — без ограничения.
+    """
+    def __init__(self, rate, burst=None, clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate
+        self.burst = burst or max(rate, 1)
+        self.tokens = self.burst
+        self.clock = clock
+        self.sleep = sleep
+        self.updated = clock()
+
+    def acquire(self):
+        if not self.rate:
+            return
+        now = self.clock()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens < 1:
+            self.sleep((1 - self.tokens) / self.rate)
+            self.tokens = 1
+            self.updated = self.clock()
+        self.tokens -= 1
+
+
+class Renderer:
+    """
+    Вид письма: как прочитать объекты пачки и собрать из объекта тему,
+    получателей и контекст шаблонов template.txt/template.html.
+    """
+    template = None
+
+    def load(self, ids):
+        raise NotImplementedError
+
+    def subject(self, obj):
+        raise NotImplementedError
+
+    def recipients(self, obj):
+        raise NotImplementedError
+
+    def context(self, obj):
+        raise NotImplementedError
+
+
+class WelcomeRenderer(Renderer):
+    template = 'emails/welcome'
+
+    def load(self, ids):
+        return User.objects.only('pk', 'email', 'first_name').in_bulk(ids)
+
+    def subject(self, user):
+        return 'Добро пожаловать!'
+
+    def recipients(self, user):
+        return [user.email]
+
+    def context(self, user):
+        return {'user': user}
+
+
+class OrderConfirmationRenderer(Renderer):
+    template = 'emails/order_confirmation'
+
+    def load(self, ids):
+        return (
+            Order.objects
+            .select_related('delivery_contact')
+            .prefetch_related(Prefetch(
+                'shop_orders',
+                queryset=ShopOrder.objects.select_related('shop').prefetch_related(Prefetch(
+                    'items', queryset=ShopOrderItem.objects.select_related('product'),
+                )),
+            ))
+            .in_bulk(ids)
+        )
+
+    def subject(self, order):
+        return f'Ваш заказ #{order.pk} принят'
+
+    def recipients(self, order):
+        return [order.delivery_contact.email]
+
+    def context(self, order):
+        return {'order': order}
+
+
+class OrderAdminRenderer(OrderConfirmationRenderer):
+
+    def subject(self, order):
+        return f'[ADMIN] Новый заказ #{order.pk}'
+
+    def recipients(self, order):
+        return list(settings.ORDER_NOTIFY_EMAILS)
+
+
+RENDERERS = {
+    OutgoingEmail.KIND_WELCOME: WelcomeRenderer(),
+    OutgoingEmail.KIND_ORDER_CONFIRMATION: OrderConfirmationRenderer(),
+    OutgoingEmail.KIND_ORDER_ADMIN: OrderAdminRenderer(),
+}
+
+
+class EmailPipeline:
+    """
+    Отправляет ожидающие письма пачками по batch_size, пока очередь
+    не опустеет, и возвращает счётчики {'sent', 'retry', 'failed'}.
+
+    Неотправленное письмо возвращается в очередь с экспоненциальной
+    задержкой (EMAIL_RETRY_DELAY, 2x, 4x, ...), после EMAIL_MAX_ATTEMPTS
+    попыток — помечается как failed. Письма, объект которых удалён,
+    сразу помечаются как failed.
+    """
+    def __init__(self, connection=None, batch_size=None, rate_limiter=None):
+        self.connection = connection or get_connection()
+        self.batch_size = batch_size or settings.EMAIL_BATCH_SIZE
+        self.rate_limiter = rate_limiter or RateLimiter(settings.EMAIL_RATE_LIMIT)
+        self.templates = {}
+
+    @transaction.atomic
+    def claim(self):
+        """
+        Забирает пачку писем, которым пора уйти, и продлевает им
+        next_attempt_at на время аренды.
+        """
+        now = timezone.now()
+        rows = list(
+            OutgoingEmail.objects
+            .filter(status=OutgoingEmail.STATUS_PENDING, next_attempt_at__lte=now)
+            .order_by('next_attempt_at', 'pk')
+            .select_for_update(skip_locked=True)
+            .only('pk', 'kind', 'object_id', 'attempts')[:self.batch_size]
+        )
+        OutgoingEmail.objects.filter(pk__in=[row.pk for row in rows]).update(
+            attempts=F('attempts') + 1, next_attempt_at=now + LEASE,
+        )
+        for row in rows:
+            row.attempts += 1
+        return rows
+
+    def get_templates(self, name):
+        if name not in self.templates:
+            self.templates[name] = (get_template(f'{name}.txt'), get_template(f'{name}.html'))
+        return self.templates[name]
+
+    def render(self, rows):
+        """
+        Собирает письма пачки: {row.pk: message}; письма, объект
+        которых не найден, в результат не попадают. Тексты, общие для
+        нескольких писем (клиенту и администратору), рендерятся один раз.
+        """
+        # объекты читаются по шаблону, а не по виду письма: подтверждение
+        # и копия администратору читают одни и те же заказы
+        loads = {}
+        for row in rows:
+            renderer = RENDERERS[row.kind]
+            loads.setdefault(renderer.template, (renderer, set()))[1].add(row.object_id)
+        objects = {template: renderer.load(ids) for template, (renderer, ids) in loads.items()}
+
+        bodies, messages = {}, {}
+        for row in rows:
+            renderer = RENDERERS[row.kind]
+            obj = objects[renderer.template].get(row.object_id)
+            if obj is None:
+                continue
+            key = (renderer.template, row.object_id)
+            if key not in bodies:
+                text, html = self.get_templates(renderer.template)
+                context = renderer.context(obj)
+                bodies[key] = (text.render(context), html.render(context))
+            text_body, html_body = bodies[key]
+            message = EmailMultiAlternatives(
+                renderer.subject(obj), text_body, settings.DEFAULT_FROM_EMAIL,
+                renderer.recipients(obj), connection=self.connection,
+            )
+            message.attach_alternative(html_body, 'text/html')
+            messages[row.pk] = message
+        return messages
+
+    def deliver(self, message):
+        """
+        Отправляет письмо через общее соединение; если сервер закрыл
+        соединение (таймаут, лимит писем на сессию), переоткрывает его
+        и пробует ещё раз.
+        """
+        self.rate_limiter.acquire()
+        try:
+            self.connection.send_messages([message])
+        except SMTPServerDisconnected:
+            self.connection.close()
+            self.connection.open()
+            self.connection.send_messages([message])
+
+    def send_batch(self, rows):
+        """
+        Отправляет пачку и возвращает id отправленных писем и ошибки
+        по остальным: {pk: (текст ошибки, можно ли повторить)}.
+        """
+        messages = self.render(rows)
+        sent, errors = [], {}
+        try:
+            self.connection.open()
+        except Exception as e:
+            return sent, {row.pk: (f'{type(e).__name__}: {e}', True) for row in rows}
+        try:
+            for row in rows:
+                message = messages.get(row.pk)
+                if message is None:
+                    errors[row.pk] = ('Объект письма не найден', False)
+                    continue
+                try:
+                    self.deliver(message)
+                except Exception as e:
+                    errors[row.pk] = (f'{type(e).__name__}: {e}', True)
+                else:
+                    sent.append(row.pk)
+        finally:
+            self.connection.close()
+        return sent, errors
+
+    def run(self):
+        stats = {'sent': 0, 'retry': 0, 'failed': 0}
+        while rows := self.claim():
+            sent, errors = self.send_batch(rows)
+            now = timezone.now()
+            OutgoingEmail.objects.filter(pk__in=sent).update(
+                status=OutgoingEmail.STATUS_SENT, sent_at=now, last_error='',
+            )
+            failed = [row for row in rows if row.pk in errors]
+            for row in failed:
+                row.last_error, retryable = errors[row.pk]
+                row.next_attempt_at = now
+                if not retryable or row.attempts >= settings.EMAIL_MAX_ATTEMPTS:
+                    row.status = OutgoingEmail.STATUS_FAILED
+                    stats['failed'] += 1
+                else:
+                    row.status = OutgoingEmail.STATUS_PENDING
+                    row.next_attempt_at = now + retry_delay(row.attempts)
+                    stats['retry'] += 1
+            OutgoingEmail.objects.bulk_update(failed, ['status', 'next_attempt_at', 'last_error'])
+            stats['sent'] += len(sent)
+        return stats
@@ -0,0 +1,30 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from shops.models import Shop
+from users.models import SupplierProfile
+from users.services.auth_cache import auth_cache
+
+User = get_user_model()
+
+
+@receiver([post_save, post_delete], sender=User)
+def user_changed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        auth_cache.invalidate_users([instance.pk])
+
+
+@receiver([post_save, post_delete], sender=SupplierProfile)
+def supplier_profile_changed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        auth_cache.invalidate_users([instance.user_id])
+
+
+@receiver([post_save, post_delete], sender=Shop)
+def shop_changed(sender, instance, raw=False, **kwargs):
+    # магазины поставщика входят в снимок его пользователя
+    if raw:
+        return
+    user_ids = SupplierProfile.objects.filter(pk=instance.supplier_id).values_list('user_id', flat=True)
+    auth_cache.invalidate_users(list(user_ids))
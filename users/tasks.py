@@ -1,64 +1,80 @@
+import math
+
 from celery import shared_task
 from django.conf import settings
-from django.contrib.auth import get_user_model
-from django.core.mail import send_mail
-from django.template.loader import render_to_string
+from django.core.cache import caches
+from django.db.models import Min
+from django.utils import timezone
+
+from users.models import OutgoingEmail
+from users.services.mail import EmailPipeline, enqueue
+
+FLUSH_LOCK_KEY = 'email-queue:flush-scheduled'
+RETRY_LOCK_KEY = 'email-queue:retry-scheduled'
+
+
+def schedule_flush():
+    """
+    Планирует разбор очереди писем через EMAIL_FLUSH_DELAY секунд.
+    Пока разбор уже запланирован, новые задачи не ставятся — письма,
+    пришедшие за это время, уйдут одной пачкой. Флаг хранится в общем
+    кэше locks, поэтому действует сразу для всех воркеров и веб-процессов.
+    """
+    if caches['locks'].add(FLUSH_LOCK_KEY, 1, settings.EMAIL_FLUSH_DELAY):
+        flush_email_queue.apply_async(countdown=settings.EMAIL_FLUSH_DELAY)
+
 
-from orders.models import Order
+def schedule_retry(eta):
+    """
+    Планирует разбор очереди на eta — время ближайшей повторной попытки.
+    Флаг в кэше locks хранит eta уже запланированного разбора до его
+    наступления: новый ставится, только если нужен раньше, поэтому
+    сколько бы разборов ни завершилось, следующий за ними — один.
+    """
+    locks = caches['locks']
+    timeout = max(math.ceil((eta - timezone.now()).total_seconds()), 1)
+    if not locks.add(RETRY_LOCK_KEY, eta, timeout):
+        scheduled = locks.get(RETRY_LOCK_KEY)
+        if scheduled is not None and scheduled <= eta:
+            return
+        locks.set(RETRY_LOCK_KEY, eta, timeout)
+    flush_email_queue.apply_async(eta=eta)
 
-User = get_user_model()
 
 @shared_task
 def send_welcome_email(user_id):
     """
-    Отправить новому пользователю письмо с приветствием после успешной регистрации.
+    Поставить в очередь письмо с приветствием после успешной регистрации.
     """
-    user = User.objects.get(id=user_id)
-    subject = 'Добро пожаловать!'
-    context = {'user': user}
-    text_body = render_to_string('emails/welcome.txt', context)
-    html_body = render_to_string('emails/welcome.html', context)
+    enqueue(OutgoingEmail.KIND_WELCOME, [user_id])
+    schedule_flush()
 
-    send_mail(
-        subject,
-        text_body,
-        settings.EMAIL_HOST_USER,
-        [user.email],
-        html_message=html_body,
-        fail_silently=False,
-    )
 
 @shared_task
 def send_order_confirmation_email(order_id):
     """
-    Отправить письмо-подтверждение клиенту и админу
+    Поставить в очередь письмо-подтверждение клиенту и копию
+    администраторам (ORDER_NOTIFY_EMAILS, если заданы).
     """
-    order = Order.objects.select_related('delivery_contact', 'user').prefetch_related('shop_orders__items').get(pk=order_id)
-    # Формируем текст письма
-    subject = f"Ваш заказ #{order.id} принят"
-    context = {'order': order}
-    text_body = render_to_string('emails/order_confirmation.txt', context)
-    html_body = render_to_string('emails/order_confirmation.html', context)
-
-    recipient = [order.delivery_contact.email]
-    # можно добавить администратора:
-    # admin_email = [settings.DEFAULT_FROM_EMAIL]
+    enqueue(OutgoingEmail.KIND_ORDER_CONFIRMATION, [order_id])
+    if settings.ORDER_NOTIFY_EMAILS:
+        enqueue(OutgoingEmail.KIND_ORDER_ADMIN, [order_id])
+    schedule_flush()
 
-    # Отправляем клиенту
-    send_mail(
-        subject,
-        text_body,
-        settings.DEFAULT_FROM_EMAIL,
-        recipient,
-        html_message=html_body,
-        fail_silently=False,
-    )
 
-    # отправляем администратору
-    send_mail(
-        f"[ADMIN] Новый заказ #{order.id}",
-        text_body,
-        settings.DEFAULT_FROM_EMAIL,
-        html_message=html_body,
-        fail_silently=False,
+@shared_task
+def flush_email_queue():
+    """
+    Отправить ожидающие письма пачками через одно SMTP-соединение.
+    Если в очереди остались письма, отложенные до повторной попытки,
+    разбор планируется на время ближайшей из них (schedule_retry).
+    """
+    stats = EmailPipeline().run()
+    next_attempt_at = (
+        OutgoingEmail.objects
+        .filter(status=OutgoingEmail.STATUS_PENDING)
+        .aggregate(next_attempt_at=Min('next_attempt_at'))['next_attempt_at']
     )
+    if next_attempt_at is not None:
+        schedule_retry(max(next_attempt_at, timezone.now()))
+    return stats
@@ -0,0 +1,107 @@
+"""
+Локальный SMTP-сервер для тестов и бенчмарков почты.
+
+Принимает письма на 127.0.0.1, ничего никуда не пересылает и считает
+соединения и письма. Умеет имитировать медленное рукопожатие
+(connect_delay), отказ по адресам (refuse) и разрыв соединения
+сервером после drop_after писем.
+
+    with SMTPSink() as sink, override_settings(**sink.settings()):
+        ...
+"""
+import socketserver
+import threading
+import time
+
+
+class SMTPHandler(socketserver.StreamRequestHandler):
+
+    def reply(self, line):
+        self.wfile.write(f'{line}\r\n'.encode())
+
+    def read_data(self):
+        lines = []
+        while (line := self.rfile.readline()) not in (b'.\r\n', b''):
+            lines.append(line[1:] if line.startswith(b'..') else line)
+        return b''.join(lines)
+
+    def handle(self):
+        sink = self.server.sink
+        with sink.lock:
+            sink.connections += 1
+        time.sleep(sink.connect_delay)
+        self.reply('220 localhost SMTPSink')
+        mail_from, rcpt_to, received = None, [], 0
+        while line := self.rfile.readline():
+            command, _, arg = line.decode().strip().partition(' ')
+            command = command.upper()
+            if command in ('EHLO', 'HELO'):
+                self.reply('250 localhost')
+            elif command == 'MAIL':
+                mail_from, rcpt_to = arg.partition(':')[2].strip('<> '), []
+                self.reply('250 OK')
+            elif command == 'RCPT':
+                address = arg.partition(':')[2].strip('<> ')
+                if address in sink.refuse:
+                    self.reply('550 Mailbox unavailable')
+                else:
+                    rcpt_to.append(address)
+                    self.reply('250 OK')
+            elif command == 'DATA':
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                data = self.read_data()
+                with sink.lock:
+                    sink.messages.append((mail_from, rcpt_to, data))
+                self.reply('250 OK')
+                received += 1
+                if sink.drop_after and received >= sink.drop_after:
+                    return
+            elif command in ('RSET', 'NOOP'):
+                self.reply('250 OK')
+            elif command == 'QUIT':
+                self.reply('221 Bye')
+                return
+            else:
+                self.reply('502 Command not implemented')
+
+
+class SMTPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class SMTPSink:
+
+    def __init__(self, connect_delay=0, refuse=(), drop_after=0):
+        self.connect_delay = connect_delay
+        self.refuse = set(refuse)
+        self.drop_after = drop_after
+        self.connections = 0
+        self.messages = []
+        self.lock = threading.Lock()
+
+    @property
+    def recipients(self):
+        return [address for _, rcpt_to, _ in self.messages for address in rcpt_to]
+
+    def settings(self):
+        return {
+            'EMAIL_BACKEND': 'django.core.mail.backends.smtp.EmailBackend',
+            'EMAIL_HOST': '127.0.0.1',
+            'EMAIL_PORT': self.server.server_address[1],
+            'EMAIL_HOST_USER': '',
+            'EMAIL_HOST_PASSWORD': '',
+            'EMAIL_USE_SSL': False,
+            'EMAIL_USE_TLS': False,
+        }
+
+    def __enter__(self):
+        self.server = SMTPServer(('127.0.0.1', 0), SMTPHandler)
+        self.server.sink = self
+        self.thread = threading.Thread(target=self.server.serve_forever, args=(0.05,), daemon=True)
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.server.shutdown()
+        self.server.server_close()
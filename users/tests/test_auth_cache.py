@@ -0,0 +1,78 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.core.cache import caches
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import AccessToken
+
+from orders.tests.factories import make_shop, make_user
+from shops.models import Shop
+from users.services.auth_cache import auth_cache
+
+
+class AuthCacheTests(APITestCase):
+
+    def setUp(self):
+        auth_cache.clear()
+        self.shop = make_shop('Связной', 'supplier@example.com')
+        self.supplier = self.shop.supplier.user
+        self.authorize(self.supplier)
+        self.url = reverse('supplier_feed_upload')
+
+    def authorize(self, user):
+        self.token = AccessToken.for_user(user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token}')
+
+    def upload(self):
+        # без файла: 400 после проверки профиля поставщика
+        return self.client.post(self.url, {}, format='multipart')
+
+    def test_warm_request_does_not_touch_database(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(self.upload().status_code, status.HTTP_400_BAD_REQUEST)
+        with self.assertNumQueries(0):
+            response = self.upload()
+        self.assertEqual(response.data['detail'], 'Файл не загружен')
+
+    def snapshot(self):
+        return auth_cache.get(auth_cache.user_key(self.supplier.pk))
+
+    def test_snapshot_follows_shops(self):
+        self.upload()
+        self.assertEqual(self.snapshot()['supplier_profile_id'], self.shop.supplier_id)
+        self.assertEqual(self.snapshot()['shop_ids'], [self.shop.pk])
+
+        other = Shop.objects.create(supplier=self.shop.supplier, name='Евросеть', description='Евросеть')
+        self.assertIsNone(self.snapshot())
+        self.upload()
+        self.assertEqual(self.snapshot()['shop_ids'], sorted([self.shop.pk, other.pk]))
+
+    def test_user_change_invalidates_snapshot(self):
+        client = make_user()
+        self.authorize(client)
+        self.assertEqual(self.upload().data['detail'], 'Поставщик не найден')
+
+        client.is_active = False
+        client.save()
+
+        self.assertEqual(self.upload().status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_claims_live_until_token_expiry(self):
+        with mock.patch.object(caches['auth'], 'set', wraps=caches['auth'].set) as shared_set:
+            self.upload()
+        timeouts = {call.args[0].split(':')[1]: call.args[2] for call in shared_set.call_args_list}
+        lifetime = self.token['exp'] - self.token['iat']
+        self.assertTrue(lifetime - 5 <= timeouts['claims'] <= lifetime)
+
+        expired = AccessToken.for_user(self.supplier)
+        expired.set_exp(lifetime=-timedelta(seconds=1))
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {expired}')
+        self.assertEqual(self.upload().status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_shared_tier_failure_falls_back_to_database(self):
+        with mock.patch.object(caches['auth'], 'get', side_effect=ConnectionError), \
+                mock.patch.object(caches['auth'], 'set', side_effect=ConnectionError):
+            self.assertEqual(self.upload().status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertGreater(auth_cache.stats()['errors'], 0)
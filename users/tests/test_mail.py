@@ -0,0 +1,155 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.core.cache import caches
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from orders.tests.factories import make_orders, make_products, make_shop, make_user
+from users.models import OutgoingEmail
+from users.services.mail import EmailPipeline, RateLimiter, enqueue
+from users.tasks import flush_email_queue, send_order_confirmation_email, send_welcome_email
+from users.tests.smtp import SMTPSink
+
+MAIL_SETTINGS = {
+    'DEFAULT_FROM_EMAIL': 'shop@example.com',
+    'ORDER_NOTIFY_EMAILS': ['admin@example.com'],
+    'EMAIL_RETRY_DELAY': 60,
+    'EMAIL_MAX_ATTEMPTS': 3,
+    'EMAIL_RATE_LIMIT': 0,
+}
+
+
+@override_settings(**MAIL_SETTINGS)
+class EmailPipelineTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        shop = make_shop('Связной')
+        cls.orders = make_orders(make_user(), make_products(shop, 2), 5)
+
+    def setUp(self):
+        caches['locks'].clear()
+        patcher = mock.patch('users.tasks.flush_email_queue.apply_async')
+        self.apply_async = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def run_pipeline(self, **sink_options):
+        with SMTPSink(**sink_options) as sink, override_settings(**sink.settings()):
+            stats = EmailPipeline().run()
+        return sink, stats
+
+    def statuses(self):
+        return sorted(OutgoingEmail.objects.values_list('status', flat=True))
+
+    def test_tasks_enqueue_and_schedule_one_flush(self):
+        for order in self.orders:
+            send_order_confirmation_email(order.pk)
+        send_welcome_email(self.orders[0].user_id)
+        # повторная доставка задачи из outbox не ставит письма второй раз
+        send_order_confirmation_email(self.orders[0].pk)
+
+        kinds = OutgoingEmail.objects.values_list('kind', flat=True)
+        self.assertEqual(sorted(set(kinds)), ['order_admin', 'order_confirmation', 'welcome'])
+        self.assertEqual(len(kinds), 11)
+        self.apply_async.assert_called_once()
+
+    def test_batch_is_sent_over_one_connection(self):
+        for order in self.orders:
+            send_order_confirmation_email(order.pk)
+
+        sink, stats = self.run_pipeline()
+
+        self.assertEqual(stats, {'sent': 10, 'retry': 0, 'failed': 0})
+        self.assertEqual(sink.connections, 1)
+        self.assertEqual(sorted(set(sink.recipients)), ['admin@example.com', 'client@example.com'])
+        self.assertIn('Товар'.encode(), b''.join(data for *_, data in sink.messages))
+        self.assertEqual(self.statuses(), ['sent'] * 10)
+
+    def test_query_count_does_not_depend_on_batch(self):
+        counts = []
+        for orders in (self.orders[:1], self.orders[1:]):
+            enqueue(OutgoingEmail.KIND_ORDER_CONFIRMATION, [order.pk for order in orders])
+            enqueue(OutgoingEmail.KIND_ORDER_ADMIN, [order.pk for order in orders])
+            with CaptureQueriesContext(connection) as ctx:
+                self.run_pipeline()
+            counts.append(len(ctx.captured_queries))
+        self.assertEqual(counts[0], counts[1])
+
+    def test_reconnects_when_server_drops_connection(self):
+        enqueue(OutgoingEmail.KIND_ORDER_CONFIRMATION, [order.pk for order in self.orders])
+
+        sink, stats = self.run_pipeline(drop_after=2)
+
+        self.assertEqual(stats['sent'], 5)
+        self.assertEqual(sink.connections, 3)
+
+    def test_retry_with_backoff_then_fail(self):
+        enqueue(OutgoingEmail.KIND_ORDER_CONFIRMATION, [self.orders[0].pk])
+        enqueue(OutgoingEmail.KIND_ORDER_ADMIN, [self.orders[0].pk])
+
+        _, stats = self.run_pipeline(refuse=['admin@example.com'])
+
+        self.assertEqual(stats, {'sent': 1, 'retry': 1, 'failed': 0})
+        email = OutgoingEmail.objects.get(kind=OutgoingEmail.KIND_ORDER_ADMIN)
+        self.assertEqual((email.status, email.attempts), (OutgoingEmail.STATUS_PENDING, 1))
+        self.assertIn('SMTPRecipientsRefused', email.last_error)
+        self.assertAlmostEqual(email.next_attempt_at, timezone.now() + timedelta(seconds=60),
+                               delta=timedelta(seconds=5))
+
+        # повтор ещё не наступил
+        self.assertEqual(self.run_pipeline()[1]['sent'], 0)
+
+        OutgoingEmail.objects.filter(pk=email.pk).update(next_attempt_at=timezone.now())
+        self.run_pipeline(refuse=['admin@example.com'])
+        email.refresh_from_db()
+        self.assertEqual(email.attempts, 2)
+        self.assertAlmostEqual(email.next_attempt_at, timezone.now() + timedelta(seconds=120),
+                               delta=timedelta(seconds=5))
+
+        OutgoingEmail.objects.filter(pk=email.pk).update(next_attempt_at=timezone.now())
+        _, stats = self.run_pipeline(refuse=['admin@example.com'])
+        self.assertEqual(stats['failed'], 1)
+        self.assertEqual(OutgoingEmail.objects.get(pk=email.pk).status, OutgoingEmail.STATUS_FAILED)
+
+    def test_flushes_schedule_one_follow_up_for_backoff(self):
+        enqueue(OutgoingEmail.KIND_ORDER_ADMIN, [self.orders[0].pk])
+        with SMTPSink(refuse=['admin@example.com']) as sink, override_settings(**sink.settings()):
+            for _ in range(3):
+                flush_email_queue()
+
+        self.assertEqual(OutgoingEmail.objects.get().status, OutgoingEmail.STATUS_PENDING)
+        self.apply_async.assert_called_once()
+        eta = self.apply_async.call_args.kwargs['eta']
+        self.assertEqual(eta, OutgoingEmail.objects.get().next_attempt_at)
+
+    def test_missing_object_fails_at_once(self):
+        enqueue(OutgoingEmail.KIND_WELCOME, [0])
+
+        _, stats = self.run_pipeline()
+
+        self.assertEqual(stats, {'sent': 0, 'retry': 0, 'failed': 1})
+
+
+class RateLimiterTests(TestCase):
+
+    def test_token_bucket(self):
+        clock = [0.0]
+        sleeps = []
+
+        def sleep(seconds):
+            sleeps.append(seconds)
+            clock[0] += seconds
+
+        limiter = RateLimiter(10, burst=2, clock=lambda: clock[0], sleep=sleep)
+        for _ in range(4):
+            limiter.acquire()
+        self.assertEqual(len(sleeps), 2)
+        self.assertAlmostEqual(sum(sleeps), 0.2)
+
+        clock[0] += 1
+        limiter.acquire()
+        limiter.acquire()
+        self.assertEqual(len(sleeps), 2)
@@ -1,3 +1,4 @@
+from django.db import transaction
 from django.db.models import ProtectedError
 from django.shortcuts import render
 from rest_framework import permissions, status, generics, viewsets
@@ -5,6 +6,7 @@ from rest_framework.response import Response
 from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework_simplejwt.views import TokenObtainPairView
 
+from orders.services.outbox import publish
 from users.models import DeliveryContact
 from users.serializers import RegistrationSerializer, EmailTokenObtainPairSerializer, DeliveryContactSerializer
 from users.tasks import send_welcome_email
@@ -32,11 +34,12 @@ class RegisterAPIView(generics.CreateAPIView):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
 
-        # 2 Создаем пользователя + профиль
-        user = serializer.save()
+        # 2 Создаем пользователя + профиль и ставим приветственный email в outbox
+        with transaction.atomic():
+            user = serializer.save()
+            publish(send_welcome_email, user.id)
 
-        # 3 Генерируем токен и отправляем приветственный email
-        send_welcome_email.delay(user.id)
+        # 3 Генерируем токен
         refresh = RefreshToken.for_user(user)
         access = refresh.access_token
 